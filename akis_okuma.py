@@ -0,0 +1,260 @@
+"""Büyük ham CSV dosyaları için parça parça (akışlı) okuma.
+
+Ham dışa aktarım `chunksize` satırlık parçalar halinde okunur; her parça
+temizlenir ve (tesisat, bina, dönem) bazında toplanarak koşan toplamlara
+eklenir. Tüm ham tablo hiçbir zaman bellekte tutulmaz, bellek kullanımı
+parça boyutu + benzersiz (tesisat, bina, dönem) grup sayısı ile sınırlıdır.
+Temizleme kuralları `ham_veri.convert_raw_to_pivot` ile aynıdır.
+"""
+import os
+
+import numpy as np
+import pandas as pd
+
+from kimlik import encode_ids, new_vocab, normalize_ids
+from pivot_motoru import pivot_records
+
+REQUIRED_COLUMNS = ['belge_tarihi', 'tesisat_no', 'bina_no', 'tuketim']
+
+# Paketlenmiş grup anahtarı: tesisat (24 bit) | bina (24 bit) | dönem (16 bit)
+_ID_BITS = 24
+_PERIOD_BITS = 16
+_PERIOD_BASE_YEAR = 1900
+
+
+def map_raw_columns(columns):
+    """Ham sütun adlarını standart adlara eşle (her hedef için ilk eşleşme)"""
+    column_mapping = {}
+    for col in columns:
+        col_lower = str(col).lower().strip()
+        if 'belge tarihi' in col_lower or col_lower == 'tarih':
+            hedef = 'belge_tarihi'
+        elif 'tüketim noktası' in col_lower or 'tesisat' in col_lower:
+            hedef = 'tesisat_no'
+        elif 'bağlantı nesnesi' in col_lower or 'bina' in col_lower:
+            hedef = 'bina_no'
+        elif 'sm3' in col_lower or 'tüketim' in col_lower:
+            hedef = 'tuketim'
+        else:
+            continue
+        if hedef not in column_mapping.values():
+            column_mapping[col] = hedef
+    return column_mapping
+
+
+def _map_uniques(series, func):
+    """Fonksiyonu yalnızca benzersiz değerlere uygulayıp sonucu geri yay
+
+    Tarih sütununda benzersiz değer sayısı satır sayısından çok küçük
+    olduğundan ayrıştırma maliyeti ciddi oranda düşer.
+    """
+    codes, uniques = pd.factorize(series, use_na_sentinel=False)
+    return func(pd.Series(uniques, dtype=object)).to_numpy()[codes]
+
+
+def _clean_tuketim(series):
+    """Tüketim sütununu `convert_raw_to_pivot`taki adımlarla sayıya çevir
+
+    astype(str), virgül -> nokta, rakam / nokta / eksi dışındaki karakterler
+    atılır, boş kalanlar NaN, sonra to_numeric; okunamayanlar ve negatifler 0.
+    """
+    text = series.astype(str)
+    text = text.str.replace(',', '.', regex=False)
+    text = text.str.replace(r'[^\d.-]', '', regex=True)
+    text = text.replace('', np.nan).replace('nan', np.nan)
+    values = pd.to_numeric(text, errors='coerce')
+    return values.fillna(0).clip(lower=0).to_numpy(dtype=np.float64)
+
+
+def _csv_numbers(text):
+    """Metin okunan tüketim sütunu read_csv tip çıkarımıyla okunsaydı: (sayı sütunu mu, değerler)
+
+    Tam okumada (`load_data`) bütün hücreleri sayı olan sütun float okunur ve
+    `_clean_tuketim` sayının kendisini görür ('1e3' -> 1000); tek hücre sayı
+    değilse sütun metin kalır ve aynı hücre '13' olur.
+    """
+    values = pd.to_numeric(text, errors='coerce')
+    return not (values.isna() & text.notna()).any(), values
+
+
+def _parse_periods(dates):
+    """Tarih metinlerini YYYYMM dönem koduna çevir (geçersiz tarih -1)"""
+    dates = pd.to_datetime(dates, errors='coerce', dayfirst=True)
+    return (dates.dt.year * 100 + dates.dt.month).fillna(-1).astype(np.int64)
+
+
+def clean_raw_chunk(chunk):
+    """Standart adlı ham parçayı temizle
+
+    Döner: (tesisat, bina, dönem YYYYMM, tüketim, tarih sonrası kayıt sayısı).
+    Parçada 'tuketim_sayi' (`_csv_numbers` değerleri) varsa tüketim iki
+    sütunludur: metin olarak ve sayı olarak okunmuş sütunun temizlenmişi.
+    """
+    tuketim = _clean_tuketim(chunk['tuketim'])
+    if 'tuketim_sayi' in chunk:
+        tuketim = np.column_stack([tuketim, _clean_tuketim(chunk['tuketim_sayi'])])
+    period = _map_uniques(chunk['belge_tarihi'], _parse_periods)
+    tesisat = normalize_ids(chunk['tesisat_no'])
+    bina = normalize_ids(chunk['bina_no'])
+
+    tarih_ok = period >= 0
+    keep = tarih_ok & pd.notna(tesisat) & pd.notna(bina)
+    return tesisat[keep], bina[keep], period[keep], tuketim[keep], int(tarih_ok.sum())
+
+
+def _encode(values, vocab):
+    """Normalize kimlikleri paylaşılan sözlükteki kalıcı kodlara çevir"""
+    codes, _ = encode_ids(values, vocab)
+    if len(vocab['keys']) >= (1 << _ID_BITS):
+        raise ValueError("Akışlı okuma: benzersiz tesisat/bina sayısı sınırı aşıldı")
+    return codes.astype(np.uint64)
+
+
+def _period_index(period):
+    """YYYYMM dönemini anahtarın dönem alanına çevir (1900 Ocak'tan beri ay sırası)
+
+    Alan 16 bittir (1900-7361 yılları); dışındaki tarihler paketlenmiş
+    anahtarı taşıracağından akışlı okuma durur.
+    """
+    p = (period // 100 - _PERIOD_BASE_YEAR) * 12 + period % 100 - 1
+    disarida = (p < 0) | (p >= 1 << _PERIOD_BITS)
+    if disarida.any():
+        raise ValueError(f"Akışlı okuma: desteklenmeyen tarih yılı {period[disarida][0] // 100} "
+                         f"({_PERIOD_BASE_YEAR}-7361 dışı); akışlı okumayı kapatarak deneyin")
+    return p.astype(np.uint64)
+
+
+def _sorted_vocab(vocab):
+    """Sözlük değerlerini sıralı dizi ve kod -> sıra eşlemesi olarak döndür"""
+    keys = np.array(vocab['keys'], dtype=object)
+    order = np.argsort(keys, kind='stable')
+    rank = np.empty(len(keys), dtype=np.int64)
+    rank[order] = np.arange(len(keys))
+    return keys[order], rank
+
+
+def _reduce(keys, sums, counts):
+    """Aynı anahtarlı toplamları birleştir (sums: anahtar x sütun)"""
+    uniq, inverse = np.unique(keys, return_inverse=True)
+    return (uniq,
+            np.column_stack([np.bincount(inverse, weights=s, minlength=len(uniq)) for s in sums.T]),
+            np.bincount(inverse, weights=counts, minlength=len(uniq)))
+
+
+def _compact(parts):
+    """Biriken parça özetlerini tek özet halinde birleştir"""
+    if len(parts) > 1:
+        keys, sums, counts = (np.concatenate(p) for p in zip(*parts))
+        parts[:] = [_reduce(keys, sums, counts)]
+    return len(parts[0][0]) if parts else 0
+
+
+def _read_header(file, sep, encoding):
+    if hasattr(file, 'seek'):
+        file.seek(0)
+    return list(pd.read_csv(file, sep=sep, encoding=encoding, nrows=0).columns.str.strip())
+
+
+def _file_size(file):
+    if isinstance(file, str):
+        return os.path.getsize(file)
+    if hasattr(file, 'getbuffer'):
+        return file.getbuffer().nbytes
+    return None
+
+
+def _stream(file, sep, encoding, chunksize, progress):
+    header = _read_header(file, sep, encoding)
+    column_mapping = map_raw_columns(header)
+    missing = [c for c in REQUIRED_COLUMNS if c not in column_mapping.values()]
+    if missing:
+        raise ValueError(f"Eksik kolonlar: {missing} (mevcut: {header})")
+
+    if hasattr(file, 'seek'):
+        file.seek(0)
+    size = _file_size(file)
+    reader = pd.read_csv(
+        file, sep=sep, encoding=encoding, chunksize=chunksize, dtype=str,
+        usecols=lambda c: str(c).strip() in column_mapping,
+    )
+
+    # Parça özetleri biriktirilir; toplam boyut son birleştirilmiş boyutun
+    # iki katını aşınca birleştirilir (amortize O(G log G))
+    t_vocab, b_vocab = new_vocab(), new_vocab()
+    parts, pending, compacted = [], 0, 0
+    # Tüketim sütununun tamamı sayıysa tam okuma onu float okur (`_csv_numbers`);
+    # ilk metin hücresine kadar iki yorumun toplamları birlikte tutulur
+    sayisal = True
+    rapor = {'baslangic': 0, 'tarih_sonrasi': 0, 'son': 0, 'parca_sayisi': 0,
+             'kolon_eslesme': column_mapping}
+
+    for chunk in reader:
+        chunk.columns = chunk.columns.str.strip()
+        chunk = chunk.rename(columns=column_mapping)
+        if sayisal:
+            sayisal, chunk['tuketim_sayi'] = _csv_numbers(chunk['tuketim'])
+            if not sayisal:
+                # Metin hücresi görüldü: sayı yorumu artık seçilemez, atılır
+                chunk = chunk.drop(columns='tuketim_sayi')
+                parts[:] = [(k, s[:, :1], c) for k, s, c in parts]
+        tesisat, bina, period, tuketim, tarih_sonrasi = clean_raw_chunk(chunk)
+
+        rapor['baslangic'] += len(chunk)
+        rapor['tarih_sonrasi'] += tarih_sonrasi
+        rapor['son'] += len(tesisat)
+        rapor['parca_sayisi'] += 1
+
+        if len(tesisat):
+            t = _encode(tesisat, t_vocab)
+            b = _encode(bina, b_vocab)
+            p = _period_index(period)
+            keys = (t << np.uint64(_ID_BITS + _PERIOD_BITS)) | (b << np.uint64(_PERIOD_BITS)) | p
+            parts.append(_reduce(keys, tuketim.reshape(len(keys), -1), np.ones(len(keys))))
+            pending += len(parts[-1][0])
+            if pending > max(2 * compacted, 1_000_000):
+                compacted = pending = _compact(parts)
+
+        if progress is not None and size and hasattr(file, 'tell'):
+            progress(min(file.tell() / size, 1.0))
+
+    _compact(parts)
+    if parts:
+        keys, sums, counts = parts[0]
+    else:
+        keys, sums, counts = np.empty(0, dtype=np.uint64), np.empty((0, 2)), np.empty(0)
+    sums = sums[:, 1 if sayisal else 0]
+    # Sözlük kodları metin sırasına göre sıralanır; pivot tamsayı kodlarla
+    # kurulup kimlik sütunları en sonda metne çevrilir
+    t_keys, t_rank = _sorted_vocab(t_vocab)
+    b_keys, b_rank = _sorted_vocab(b_vocab)
+    t = (keys >> np.uint64(_ID_BITS + _PERIOD_BITS)).astype(np.int64)
+    b = ((keys >> np.uint64(_PERIOD_BITS)) & np.uint64((1 << _ID_BITS) - 1)).astype(np.int64)
+    p = (keys & np.uint64((1 << _PERIOD_BITS) - 1)).astype(np.int64)
+    period = (p // 12 + _PERIOD_BASE_YEAR) * 100 + p % 12 + 1
+
+    pivot_df, pivot_bilgi = pivot_records(t_rank[t], b_rank[b], period, sums)
+    pivot_df['tesisat_no'] = t_keys[pivot_df['tesisat_no'].to_numpy()]
+    pivot_df['bina_no'] = b_keys[pivot_df['bina_no'].to_numpy()]
+    pivot_bilgi['duplicate_grup'] = int((counts > 1).sum())
+    rapor.update(pivot_bilgi)
+    rapor['toplam_tuketim'] = float(sums.sum())
+    if progress is not None:
+        progress(1.0)
+    return pivot_df, rapor
+
+
+def stream_raw_csv(file, chunksize=500_000, sep=',', encodings=('utf-8', 'latin1'), progress=None):
+    """Ham CSV'yi parça parça okuyup doğrudan pivot tabloya topla
+
+    file: dosya yolu veya dosya nesnesi (Streamlit UploadedFile)
+    progress: isteğe bağlı, 0-1 arası okunan oranla çağrılan fonksiyon
+
+    Döner: (pivot_df, rapor) - pivot_df `convert_raw_to_pivot` biçiminde,
+    rapor kayıt sayıları ve pivot boyutları.
+    """
+    for i, encoding in enumerate(encodings):
+        try:
+            return _stream(file, sep, encoding, chunksize, progress)
+        except UnicodeDecodeError:
+            if i == len(encodings) - 1:
+                raise
@@ -0,0 +1,214 @@
+"""parttern.py "aktif dönem" kuralları için düzensiz (ragged) dizi motoru.
+
+Tüm abonelerin sıfır olmayan (aktif) ayları tek bir düz dizide, abone
+sırasıyla tutulur; her abonenin aktif ayları `offsets[i]:offsets[i+1]`
+aralığıdır. 12 kural bu düz dizi üzerinde segment bazlı NumPy işlemleriyle
+değerlendirilir: ardışık aktif ay çiftleri (kural 1, 4) segment sınırını
+aşmayan kaydırmalarla, sayımlar `np.bincount` ile, ortalama / sapmalar
+eski döngüdeki `np.mean` / `np.std` ile aynı olacak şekilde segment başına
+`ndarray.sum` ile (`cekirdekler.segment_sums`) hesaplanır. Sıralı taramalar
+(kural 6 patlama, kural 11 yön değişimi)
+`cekirdekler` döngüleriyle (Numba varsa derlenmiş) çalışır. Kurallar ve
+eşikler parttern.py'deki abone döngüsüyle aynıdır.
+"""
+import numpy as np
+
+from cekirdekler import burst_after_low, direction_changes, first_per_row, segment_sums
+
+KIS_AYLARI = ('/12', '/01', '/02')
+YAZ_AYLARI = ('/06', '/07', '/08')
+
+
+def month_seasons(month_cols):
+    """Ay sütunlarını kış / yaz olarak işaretle (parttern.py'deki metin kuralıyla)"""
+    kis, yaz = [], []
+    for month in month_cols:
+        month = str(month)
+        is_kis = any(k in month for k in KIS_AYLARI) or month in ['Aralık', 'Ocak', 'Şubat']
+        is_yaz = not is_kis and (any(y in month for y in YAZ_AYLARI) or
+                                 month in ['Haziran', 'Temmuz', 'Ağustos'])
+        kis.append(is_kis)
+        yaz.append(is_yaz)
+    return np.array(kis, dtype=bool), np.array(yaz, dtype=bool)
+
+
+def build_active_arrays(values):
+    """(abone x ay) matrisinden aktif ayların düz dizisi
+
+    Döner: {'values': aktif tüketimler, 'rows': abone satırı, 'cols': ay
+    sütunu, 'pos': abone içindeki sıra, 'counts', 'offsets'}
+    """
+    values = np.asarray(values, dtype=np.float64)
+    rows, cols = np.nonzero(values > 0)
+    counts = np.bincount(rows, minlength=len(values))
+    offsets = np.concatenate(([0], np.cumsum(counts)))
+    return {
+        'values': values[rows, cols],
+        'rows': rows,
+        'cols': cols,
+        'pos': np.arange(len(rows)) - offsets[rows],
+        'counts': counts,
+        'offsets': offsets,
+    }
+
+
+def segment_means(a, r, mask, n_rows):
+    """`mask`'lı aktif değerlerin abone başına `np.mean`'i (değer yoksa NaN) ve adedi"""
+    adet = np.bincount(r[mask], minlength=n_rows)
+    baslangic = np.concatenate(([0], np.cumsum(adet)[:-1]))
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return segment_sums(a[mask], baslangic, adet) / adet, adet
+
+
+def evaluate_active_rules(values, month_cols):
+    """12 aktif dönem kuralını tüm aboneler için değerlendir
+
+    Döner: dict; satır başına 'risk_score', 'analiz' (en az 3 aktif ay),
+    kural bayrakları 'k1'..'k12' ve mesajlarda kullanılan ara değerler.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    n_rows = len(values)
+    act = build_active_arrays(values)
+    a, r, counts = act['values'], act['rows'], act['counts']
+    n = counts.astype(np.float64)
+    analiz = counts >= 3
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        # Aktif dönem istatistikleri (segment başına np.mean / np.std gibi)
+        starts = act['offsets'][:-1]
+        active_mean = segment_sums(a, starts, counts) / n
+        dev = a - active_mean[r]
+        active_std = np.sqrt(segment_sums(dev * dev, starts, counts) / n)
+        active_cv = np.where(active_mean > 0, active_std / active_mean * 100, 0)
+        active_max = np.zeros(n_rows)
+        np.maximum.at(active_max, r, a)
+        active_min = np.full(n_rows, np.inf)
+        np.minimum.at(active_min, r, a)
+
+    # Segment içi ardışık çiftler: j, j-1 aynı abonede
+    j = np.flatnonzero(act['pos'] >= 1)
+    onceki, simdiki, rj = a[j - 1], a[j], r[j]
+
+    # KURAL 1: Dramatik düşüş (ilk çift)
+    k1_idx = first_per_row((onceki > 50) & (simdiki < onceki * 0.1), rj, n_rows)
+    # -1 (tetiklenmedi) sona eklenen NaN'a düşer
+    k1_prev = np.append(onceki, np.nan)[k1_idx]
+    k1_cur = np.append(simdiki, np.nan)[k1_idx]
+
+    # KURAL 2 / 3: Kış ve yaz aktif ortalamaları
+    kis, yaz = month_seasons(month_cols)
+    kis_a, yaz_a = kis[act['cols']], yaz[act['cols']]
+    winter_avg, winter_n = segment_means(a, r, kis_a, n_rows)
+    summer_avg, summer_n = segment_means(a, r, yaz_a, n_rows)
+    k2 = (winter_n >= 2) & (winter_avg < 30)
+    k3 = (winter_n >= 2) & (summer_n >= 2) & (summer_avg > winter_avg * 1.2)
+
+    # KURAL 4: On-Off geçişleri
+    gecis = ((onceki < 20) & (simdiki > 100)) | ((onceki > 100) & (simdiki < 20))
+    transitions = np.bincount(rj, weights=gecis, minlength=n_rows).astype(np.int64)
+    k4 = transitions >= 3
+
+    # KURAL 5: Tek ay istisna (maksimuma eşit olmayan aktif ayların ortalaması)
+    diger = a != active_max[r]
+    other_mean, other_n = segment_means(a, r, diger, n_rows)
+    k5 = (active_max > 150) & (counts > 3) & (other_n > 0) & (other_mean < 50)
+
+    # KURAL 6: Önceki 3 aktif ayın ortalaması düşük, sonra patlama (ilk konum)
+    k6_prev_avg, k6_val = burst_after_low(a, act['offsets'], 40, 200)
+    k6 = ~np.isnan(k6_val)
+
+    # KURAL 7: Aşırı volatilite
+    k7 = active_cv > 150
+
+    # KURAL 8 / 9: Mikro ve hayalet tüketim sayıları
+    micro_months = np.bincount(r, weights=a < 5, minlength=n_rows).astype(np.int64)
+    k8 = micro_months > n * 0.5
+    ghost_months = np.bincount(r, weights=(a > 0.5) & (a < 3), minlength=n_rows).astype(np.int64)
+    k9 = ghost_months >= 4
+
+    # KURAL 10: En düşük z-skor (en küçük aktif değerde)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        min_z = np.where(active_std > 0, (active_min - active_mean) / active_std, 0)
+    k10 = min_z < -2.5
+
+    # KURAL 11: Anlamlı ardışık farkların işaret değişimi
+    yon_degisimi = direction_changes(a, act['offsets'], 10)
+    k11 = yon_degisimi > n * 0.5
+
+    # KURAL 12: Anormal düşük ortalama
+    k12 = (active_mean < 15) & (counts >= 6)
+
+    kurallar = [(k1_idx >= 0, 35), (k2, 40), (k3, 30), (k4, 30), (k5, 25), (k6, 40),
+                (k7, 25), (k8, 20), (k9, 25), (k10, 25), (k11, 20), (k12, 30)]
+    risk_score = np.zeros(n_rows, dtype=np.int64)
+    sonuc = {}
+    for no, (bayrak, puan) in enumerate(kurallar, 1):
+        bayrak = bayrak & analiz
+        sonuc[f'k{no}'] = bayrak
+        risk_score += np.where(bayrak, puan, 0)
+
+    sonuc.update({
+        'risk_score': risk_score,
+        'analiz': analiz,
+        'active_n': counts,
+        'active_mean': active_mean,
+        'active_cv': active_cv,
+        'active_max': active_max,
+        'k1_prev': k1_prev,
+        'k1_cur': k1_cur,
+        'winter_avg': winter_avg,
+        'summer_avg': summer_avg,
+        'transitions': transitions,
+        'other_mean': other_mean,
+        'k6_prev_avg': k6_prev_avg,
+        'k6_val': k6_val,
+        'micro_months': micro_months,
+        'ghost_months': ghost_months,
+        'min_z': min_z,
+        'direction_changes': yon_degisimi,
+    })
+    return sonuc
+
+
+def anomaly_messages(sonuc, i, consumption, kis, yaz):
+    """i. abonenin tetiklenen kurallarının mesajları (parttern.py sırası ve biçimiyle)
+
+    consumption: abonenin tüketim satırı, kis / yaz: `month_seasons` maskeleri.
+    Mesajlarda gösterilen ortalamalar abonenin aktif ayları üzerinde
+    `np.mean` / `np.std` ile yeniden hesaplanır (eski döngünün ifadeleri).
+    """
+    consumption = np.asarray(consumption, dtype=np.float64)
+    aktif_ay = consumption > 0
+    aktif = consumption[aktif_ay]
+    if sonuc['k2'][i] or sonuc['k3'][i]:
+        winter_avg = np.mean(consumption[aktif_ay & kis])
+    if sonuc['k7'][i] or sonuc['k10'][i] or sonuc['k12'][i]:
+        active_mean = np.mean(aktif)
+        active_std = np.std(aktif)
+    mesajlar = []
+    if sonuc['k1'][i]:
+        onceki, simdiki = sonuc['k1_prev'][i], sonuc['k1_cur'][i]
+        mesajlar.append(f"📉 Dramatik Düşüş: {onceki:.1f} → {simdiki:.1f} m³ (%{((1-simdiki/onceki)*100):.0f})")
+    if sonuc['k2'][i]:
+        mesajlar.append(f"❄️ Kış Anomalisi: Aktif kış ayları ortalaması {winter_avg:.1f} m³ (Isınma beklentisinin altında)")
+    if sonuc['k3'][i]:
+        mesajlar.append(f"🌡️ Ters Sezonluk: Yaz ort. {np.mean(consumption[aktif_ay & yaz]):.1f} > Kış ort. {winter_avg:.1f} m³")
+    if sonuc['k4'][i]:
+        mesajlar.append(f"🔄 On-Off Pattern: {sonuc['transitions'][i]} kez aşırı dalgalanma (aktif dönemde)")
+    if sonuc['k5'][i]:
+        mesajlar.append(f"📍 Tek Ay İstisna: Max {sonuc['active_max'][i]:.1f} m³, diğer aktif aylar ort. {np.mean(aktif[aktif != aktif.max()]):.1f} m³")
+    if sonuc['k6'][i]:
+        mesajlar.append(f"🎯 Kaçak Sonrası Patlama: Önceki 3 aktif ay ort. {sonuc['k6_prev_avg'][i]:.1f} → {sonuc['k6_val'][i]:.1f} m³")
+    if sonuc['k7'][i]:
+        mesajlar.append(f"📊 Aşırı Volatilite: CV = {active_std / active_mean * 100:.1f}% (aktif dönemde)")
+    if sonuc['k8'][i]:
+        mesajlar.append(f"⚡ Mikro Tüketim: {sonuc['micro_months'][i]}/{sonuc['active_n'][i]} aktif ay <5 m³")
+    if sonuc['k9'][i]:
+        mesajlar.append(f"🔥 Hayalet Tüketim: {sonuc['ghost_months'][i]} aktif ay 0.5-3 m³ arası")
+    if sonuc['k10'][i]:
+        mesajlar.append(f"📈 Trend Kırılması: Min Z-score = {(aktif.min() - active_mean) / active_std:.2f} (aktif dönemde)")
+    if sonuc['k11'][i]:
+        mesajlar.append(f"🎲 Kaotik Desen: {sonuc['direction_changes'][i]} yön değişimi (aktif dönemde)")
+    if sonuc['k12'][i]:
+        mesajlar.append(f"⚠️ Anormal Düşük Ortalama: {active_mean:.1f} m³/ay (aktif dönemde)")
+    return mesajlar
@@ -5,6 +5,8 @@ import plotly.express as px
 import plotly.graph_objects as go
 from plotly.subplots import make_subplots
 import warnings
+from matris_motoru import analyze_consumption_matrix
+from onbellek import cached_frame
 warnings.filterwarnings('ignore')
 
 # Sayfa konfigürasyonu
@@ -99,181 +101,15 @@ def get_season(month):
         return "Sonbahar"
 
 def analyze_consumption_patterns(df, date_columns, tesisat_col, bina_col):
-    """Tüketim paternlerini analiz et"""
-    results = []
-    
-    for idx, row in df.iterrows():
-        tesisat_no = row[tesisat_col]
-        bina_no = row[bina_col]
-        
-        # Aylık tüketim verilerini al
-        consumption_data = []
-        for date_col in date_columns:
-            try:
-                value = row[date_col]
-                if pd.notna(value):
-                    year, month = date_col.split('/')
-                    consumption_data.append({
-                        'year': int(year),
-                        'month': int(month),
-                        'consumption': float(value) if value != 0 else 0,
-                        'season': get_season(int(month)),
-                        'date_str': date_col
-                    })
-            except:
-                continue
-        
-        if not consumption_data:
-            continue
-        
-        # DataFrame'e çevir ve tarihine göre sırala
-        cons_df = pd.DataFrame(consumption_data)
-        cons_df = cons_df.sort_values(['year', 'month'])
-        
-        # Mevsimsel ortalamalar (sıfır olmayan değerler için)
-        seasonal_avg = cons_df[cons_df['consumption'] > 0].groupby('season')['consumption'].mean()
-        
-        # Kış ayı tüketimi kontrolü
-        kis_tuketim = seasonal_avg.get('Kış', 0)
-        yaz_tuketim = seasonal_avg.get('Yaz', 0)
-        
-        # Anomali tespiti
-        anomalies = []
-        
-        # 1. Kış ayı düşük tüketim
-        if kis_tuketim < kis_tuketim_esigi and kis_tuketim > 0:
-            anomalies.append(f"Kış ayı düşük tüketim: {kis_tuketim:.1f} m³/ay")
-        
-        # 2. Kış-yaz tüketim farkı normal değil
-        if kis_tuketim > 0 and yaz_tuketim > 0:
-            if abs(kis_tuketim - yaz_tuketim) < 10:  # Fark çok az
-                anomalies.append(f"Kış-yaz tüketim farkı az: Kış {kis_tuketim:.1f}, Yaz {yaz_tuketim:.1f}")
-        
-        # 3. Toplam tüketim çok düşük
-        total_consumption = cons_df['consumption'].sum()
-        if total_consumption < 100:  # Yıllık 100 m³'den az
-            anomalies.append(f"Toplam tüketim çok düşük: {total_consumption:.1f} m³")
-        
-        # 4. Düzenli sıfır tüketim
-        zero_months = len(cons_df[cons_df['consumption'] == 0])
-        if zero_months > 6:
-            anomalies.append(f"Çok fazla sıfır tüketim: {zero_months} ay")
-        
-        # 5. ANI DÜŞÜŞ TESPİTİ - Kış aylarında ani düşüş (DÜZELTİLMİŞ)
-        kis_aylari = cons_df[cons_df['season'] == 'Kış'].copy()
-        
-        if len(kis_aylari) >= 3:  # En az 1 tam kış sezonu
-            # Kış sezonunu düzgün gruplamak için: Aralık ayını bir sonraki yıla ata
-            # Çünkü Aralık 2023 aslında 2023-2024 kışının başlangıcıdır
-            kis_aylari['kis_yili'] = kis_aylari.apply(
-                lambda row: row['year'] if row['month'] in [1, 2] else row['year'] + 1, 
-                axis=1
-            )
-            
-            # Yıllara göre kış aylarını grupla
-            kis_yillik = kis_aylari.groupby('kis_yili')['consumption'].mean()
-            
-            # Yıllık kış ortalamaları al (sıfır olmayan)
-            yillik_ortalamalar = kis_yillik[kis_yillik > 0]
-            
-            if len(yillik_ortalamalar) >= 2:
-                # En az 2 yıl veri varsa ani düşüş kontrolü yap
-                yillar = sorted(yillik_ortalamalar.index)
-                
-                for i in range(1, len(yillar)):
-                    onceki_yil = yillar[i-1]
-                    mevcut_yil = yillar[i]
-                    
-                    onceki_tuketim = yillik_ortalamalar[onceki_yil]
-                    mevcut_tuketim = yillik_ortalamalar[mevcut_yil]
-                    
-                    # Önceki kış yüksek tüketim ve ani düşüş kontrolü
-                    if (onceki_tuketim >= min_onceki_kis_tuketim and 
-                        mevcut_tuketim < onceki_tuketim * (1 - ani_dusus_orani/100)):
-                        
-                        dusus_orani = ((onceki_tuketim - mevcut_tuketim) / onceki_tuketim) * 100
-                        anomalies.append(f"Ani kış düşüşü: {onceki_yil-1}/{onceki_yil} kışı ({onceki_tuketim:.1f}) → {mevcut_yil-1}/{mevcut_yil} kışı ({mevcut_tuketim:.1f}), %{dusus_orani:.1f} düşüş")
-                
-                # Son 2 yıl özel kontrolü
-                if len(yillar) >= 2:
-                    son_iki_yil = yillar[-2:]
-                    if len(son_iki_yil) == 2:
-                        onceki_son = yillik_ortalamalar[son_iki_yil[0]]
-                        mevcut_son = yillik_ortalamalar[son_iki_yil[1]]
-                        
-                        if (onceki_son >= min_onceki_kis_tuketim and 
-                            mevcut_son < onceki_son * (1 - ani_dusus_orani/100)):
-                            
-                            dusus_orani = ((onceki_son - mevcut_son) / onceki_son) * 100
-                            anomalies.append(f"Son yıl ani düşüş: {son_iki_yil[0]-1}/{son_iki_yil[0]} → {son_iki_yil[1]-1}/{son_iki_yil[1]}, %{dusus_orani:.1f} düşüş")
-        
-        # 6. Bina ortalaması kontrolü (aynı binadaki diğer tesisatlarla karşılaştır)
-        bina_tesisatlari = df[df[bina_col] == bina_no]
-        if len(bina_tesisatlari) > 1:
-            bina_tuketimleri = []
-            for _, bina_row in bina_tesisatlari.iterrows():
-                bina_toplam = 0
-                bina_ay_sayisi = 0
-                for date_col in date_columns:
-                    try:
-                        val = bina_row[date_col]
-                        if pd.notna(val) and val > 0:
-                            bina_toplam += float(val)
-                            bina_ay_sayisi += 1
-                    except:
-                        continue
-                
-                if bina_ay_sayisi > 0:
-                    bina_tuketimleri.append(bina_toplam / bina_ay_sayisi)
-            
-            if len(bina_tuketimleri) > 1:
-                bina_ortalaması = np.mean(bina_tuketimleri)
-                mevcut_ortalama = cons_df[cons_df['consumption'] > 0]['consumption'].mean() if len(cons_df[cons_df['consumption'] > 0]) > 0 else 0
-                
-                if mevcut_ortalama > 0 and mevcut_ortalama < bina_ortalaması * (1 - bina_ort_dusuk_oran/100):
-                    anomalies.append(f"Bina ortalamasından %{bina_ort_dusuk_oran} düşük: {mevcut_ortalama:.1f} vs {bina_ortalaması:.1f}")
-        
-        # Ani düşüş bilgisi için ek analiz
-        kis_trend = "Stabil"
-        if len(kis_aylari) >= 3:
-            # Kış yılı kolonunu kullan
-            kis_aylari_trend = kis_aylari.copy()
-            if 'kis_yili' not in kis_aylari_trend.columns:
-                kis_aylari_trend['kis_yili'] = kis_aylari_trend.apply(
-                    lambda row: row['year'] if row['month'] in [1, 2] else row['year'] + 1, 
-                    axis=1
-                )
-            
-            kis_yillik = kis_aylari_trend.groupby('kis_yili')['consumption'].mean()
-            yillik_ortalamalar = kis_yillik[kis_yillik > 0]
-            
-            if len(yillik_ortalamalar) >= 2:
-                yillar = sorted(yillik_ortalamalar.index)
-                ilk_yil = yillik_ortalamalar[yillar[0]]
-                son_yil = yillik_ortalamalar[yillar[-1]]
-                
-                if son_yil < ilk_yil * 0.5:
-                    kis_trend = "Şiddetli Düşüş"
-                elif son_yil < ilk_yil * 0.7:
-                    kis_trend = "Orta Düşüş"
-                elif son_yil > ilk_yil * 1.5:
-                    kis_trend = "Artış"
-        
-        # Sonuçları kaydet
-        results.append({
-            'tesisat_no': tesisat_no,
-            'bina_no': bina_no,
-            'kis_tuketim': kis_tuketim,
-            'yaz_tuketim': yaz_tuketim,
-            'toplam_tuketim': total_consumption,
-            'ortalama_tuketim': cons_df[cons_df['consumption'] > 0]['consumption'].mean() if len(cons_df[cons_df['consumption'] > 0]) > 0 else 0,
-            'kis_trend': kis_trend,
-            'anomali_sayisi': len(anomalies),
-            'anomaliler': '; '.join(anomalies) if anomalies else 'Normal',
-            'suspicion_level': 'Şüpheli' if anomalies else 'Normal'
-        })
-    
-    return pd.DataFrame(results)
+    """Tüketim paternlerini analiz et (vektörel matris motoru)"""
+    return analyze_consumption_matrix(
+        df, date_columns, tesisat_col, bina_col,
+        kis_tuketim_esigi=kis_tuketim_esigi,
+        bina_ort_dusuk_oran=bina_ort_dusuk_oran,
+        ani_dusus_orani=ani_dusus_orani,
+        min_onceki_kis_tuketim=min_onceki_kis_tuketim,
+        kis_sezonu=True,
+    )
 
 def create_visualizations(results_df, original_df, date_columns):
     """Görselleştirmeler oluştur"""
@@ -349,7 +185,7 @@ def create_visualizations(results_df, original_df, date_columns):
 # Ana uygulama
 if uploaded_file is not None:
     # Veri yükleme
-    df = load_data(uploaded_file)
+    df = cached_frame(uploaded_file, 'anomaly_detection_guncel.load_data', load_data)
     
     if df is not None:
         st.success("✅ Dosya başarıyla yüklendi!")
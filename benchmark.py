@@ -0,0 +1,563 @@
+"""Performans karşılaştırmaları.
+
+Kullanım:
+    python benchmark.py pivot --satir 200000
+    python benchmark.py akis --satir 2000000 --parca 500000
+    python benchmark.py xlsx --tesisat 20000 --ay 48
+    python benchmark.py kup --tesisat 300000 --yil 3
+    python benchmark.py kriter --tesisat 100000 --ay 48
+    python benchmark.py paralel --tesisat 200000 --ay 48
+    python benchmark.py esik --tesisat 200000 --ay 48
+    python benchmark.py sirala --tesisat 2000000
+    python benchmark.py cekirdek --tesisat 200000 --ay 48
+"""
+import argparse
+import os
+import tempfile
+import time
+import tracemalloc
+import uuid
+
+import numpy as np
+import pandas as pd
+
+import cekirdekler
+from aktif_donem import build_active_arrays
+from bina_indeksi import build_building_index
+from kimlik import encode_ids
+from kriter_motoru import evaluate_criteria
+from paralel import (MAX_WORKERS, analyze_consumption_sharded, evaluate_criteria_sharded, rescore_consumption,
+                     shutdown_pools)
+from akis_okuma import clean_raw_chunk, map_raw_columns, stream_raw_csv
+from pivot_motoru import pivot_records
+from siralama import bucket_counts, top_k
+from tuketim_kupu import anomaly_calendar, build_consumption_cube, cube_value
+from xlsx_okuyucu import read_pivot_xlsx
+
+
+# -------------------- Sentetik veri --------------------
+def make_raw_records(satir, tesisat=None, donem=48, seed=42):
+    """Temizlenmiş ham kayıt tablosu üret (tesisat_no, bina_no, yil_ay, tuketim)"""
+    rng = np.random.default_rng(seed)
+    tesisat = tesisat or max(satir // donem, 1)
+    t = rng.integers(0, tesisat, satir)
+    periods = pd.period_range('2021-01', periods=donem, freq='M').strftime('%Y/%m').to_numpy()
+    return pd.DataFrame({
+        'tesisat_no': np.char.add('T', t.astype(str)),
+        'bina_no': np.char.add('B', (t // 6).astype(str)),
+        'yil_ay': periods[rng.integers(0, donem, satir)],
+        'tuketim': rng.gamma(2.0, 40.0, satir).round(2),
+    })
+
+
+# -------------------- Mevcut (eski) pivot yöntemleri --------------------
+def legacy_pivot_ham_veri(df_clean):
+    """ham_veri.py: grouped_df.iterrows ile sözlük doldurma"""
+    grouped_df = df_clean.groupby(['tesisat_no', 'bina_no', 'yil_ay'], as_index=False)['tuketim'].sum()
+    unique_dates = sorted(grouped_df['yil_ay'].unique())
+    pivot_dict = {}
+    for _, row in grouped_df.iterrows():
+        key = (row['tesisat_no'], row['bina_no'])
+        if key not in pivot_dict:
+            pivot_dict[key] = {'tesisat_no': row['tesisat_no'], 'bina_no': row['bina_no']}
+            for d in unique_dates:
+                pivot_dict[key][d] = 0
+        pivot_dict[key][row['yil_ay']] = row['tuketim']
+    final_df = pd.DataFrame(list(pivot_dict.values()))
+    return final_df[['tesisat_no', 'bina_no'] + unique_dates]
+
+
+def legacy_pivot_hamveri2(df_clean):
+    """hamveri2.py: grup x tarih iç içe filtreleme"""
+    grouped_df = df_clean.groupby(['tesisat_no', 'bina_no', 'yil_ay'], as_index=False)['tuketim'].sum()
+    all_dates = sorted(grouped_df['yil_ay'].unique())
+    pivot_data = []
+    for (tesisat, bina), group in grouped_df.groupby(['tesisat_no', 'bina_no']):
+        row_data = {'tesisat_no': tesisat, 'bina_no': bina}
+        for date in all_dates:
+            date_data = group[group['yil_ay'] == date]['tuketim']
+            row_data[date] = date_data.iloc[0] if not date_data.empty else 0
+        pivot_data.append(row_data)
+    final_df = pd.DataFrame(pivot_data)
+    return final_df[['tesisat_no', 'bina_no'] + all_dates]
+
+
+def write_raw_csv(path, satir, seed=42):
+    """Ham dışa aktarım biçiminde CSV yaz (Türkçe ondalık virgül)"""
+    df = make_raw_records(satir, seed=seed)
+    tarih = pd.to_datetime(df['yil_ay'], format='%Y/%m') + pd.to_timedelta(
+        np.random.default_rng(seed).integers(0, 28, len(df)), unit='D')
+    pd.DataFrame({
+        'Belge tarihi': tarih.dt.strftime('%d.%m.%Y'),
+        'Tüketim noktası': df['tesisat_no'],
+        'Bağlantı nesnesi': df['bina_no'],
+        'KWH Tüketim Sm3': df['tuketim'].map('{:.2f}'.format).str.replace('.', ',', regex=False),
+    }).to_csv(path, index=False)
+
+
+def full_read_pivot(path):
+    """Dosyanın tamamını okuyup temizleyen mevcut yol (load_data + convert_raw_to_pivot)"""
+    df = pd.read_csv(path, encoding='utf-8')
+    df = df.rename(columns=map_raw_columns(df.columns))
+    tesisat, bina, period, tuketim, _ = clean_raw_chunk(df.copy())
+    return pivot_records(tesisat, bina, period, tuketim)[0]
+
+
+def _timeit(func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - start
+
+
+def _measure(func, *args):
+    """Süre (izlemesiz çalıştırma) ve tracemalloc tepe belleği (MB)"""
+    result, elapsed = _timeit(func, *args)
+    tracemalloc.start()
+    func(*args)
+    peak = tracemalloc.get_traced_memory()[1] / 1024 ** 2
+    tracemalloc.stop()
+    return result, elapsed, peak
+
+
+def bench_pivot(args):
+    """Vektörel pivot motorunu iki eski yöntemle karşılaştır"""
+    df_clean = make_raw_records(args.satir)
+    print(f"Ham kayıt: {len(df_clean):,} satır, {df_clean['tesisat_no'].nunique():,} tesisat")
+
+    vektorel, t_vek = _timeit(lambda d: pivot_records(
+        d['tesisat_no'].to_numpy(), d['bina_no'].to_numpy(),
+        d['yil_ay'].to_numpy(), d['tuketim'].to_numpy())[0], df_clean)
+    print(f"  pivot_records (vektörel) : {t_vek:8.3f} sn")
+
+    for ad, func in [('ham_veri (iterrows)', legacy_pivot_ham_veri),
+                     ('hamveri2 (grup x tarih)', legacy_pivot_hamveri2)]:
+        if args.eski_limit and len(df_clean) > args.eski_limit:
+            print(f"  {ad:25s}: atlandı (> {args.eski_limit:,} satır)")
+            continue
+        eski, t_eski = _timeit(func, df_clean)
+        ayni = (np.array_equal(eski.iloc[:, :2].to_numpy(), vektorel.iloc[:, :2].to_numpy()) and
+                np.allclose(eski.iloc[:, 2:].to_numpy(dtype=float), vektorel.iloc[:, 2:].to_numpy()))
+        print(f"  {ad:25s}: {t_eski:8.3f} sn  (x{t_eski / t_vek:,.0f}, sonuç aynı: {ayni})")
+
+
+def bench_stream(args):
+    """Akışlı CSV okumayı tam okuma ile süre ve tepe bellek açısından karşılaştır"""
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'ham.csv')
+        write_raw_csv(path, args.satir)
+        print(f"Ham CSV: {args.satir:,} satır, {os.path.getsize(path) / 1024 ** 2:,.1f} MB")
+
+        tam, t_tam, m_tam = _measure(full_read_pivot, path)
+        print(f"  tam okuma          : {t_tam:8.3f} sn, tepe {m_tam:8.1f} MB")
+        akis, t_akis, m_akis = _measure(lambda p: stream_raw_csv(p, chunksize=args.parca)[0], path)
+        print(f"  akışlı ({args.parca:,} satır): {t_akis:8.3f} sn, tepe {m_akis:8.1f} MB")
+
+        ayni = (tam.shape == akis.shape and
+                np.array_equal(tam.iloc[:, :2].to_numpy(), akis.iloc[:, :2].to_numpy()) and
+                np.allclose(tam.iloc[:, 2:].to_numpy(), akis.iloc[:, 2:].to_numpy()))
+        print(f"  sonuç aynı: {ayni}, bellek oranı x{m_tam / m_akis:.1f}")
+
+
+def write_pivot_xlsx(path, tesisat, ay, seed=42):
+    """gmz.py biçiminde pivot xlsx yaz (tn, bn, adres + ay sütunları)
+
+    Her 50. satırın ilk ay hücresi ondalık virgüllü metindir ('12,5').
+    """
+    import openpyxl
+
+    rng = np.random.default_rng(seed)
+    months = pd.period_range('2021-01', periods=ay, freq='M').strftime('%Y/%m').tolist()
+    values = rng.gamma(2.0, 40.0, (tesisat, ay)).round(2)
+    wb = openpyxl.Workbook(write_only=True)
+    ws = wb.create_sheet()
+    ws.append(['tn', 'bn', 'adres', 'abone adı'] + months)
+    for i in range(tesisat):
+        aylar = values[i].tolist()
+        if i % 50 == 0:
+            aylar[0] = f"{aylar[0]:.2f}".replace('.', ',')
+        ws.append([100000 + i, 5000 + i // 6, f"Mahalle {i % 97} Sokak {i % 13}", f"Abone {i}"] + aylar)
+    wb.save(path)
+
+
+def bench_xlsx(args):
+    """Sütun seçmeli okuyucuyu pd.read_excel ile karşılaştır"""
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'pivot.xlsx')
+        write_pivot_xlsx(path, args.tesisat, args.ay)
+        print(f"Pivot xlsx: {args.tesisat:,} tesisat x {args.ay} ay, "
+              f"{os.path.getsize(path) / 1024 ** 2:,.1f} MB")
+
+        eski, t_eski, m_eski = _measure(pd.read_excel, path)
+        print(f"  pd.read_excel      : {t_eski:8.3f} sn, tepe {m_eski:8.1f} MB")
+        yeni, t_yeni, m_yeni = _measure(read_pivot_xlsx, path, ['tn', 'bn'])
+        print(f"  read_pivot_xlsx    : {t_yeni:8.3f} sn, tepe {m_yeni:8.1f} MB")
+        virgullu = read_pivot_xlsx(path, ['tn', 'bn'], decimal_comma=True)
+
+        # Uygulamaların ay sütunu dönüşümü: gmz düz to_numeric, parttern virgülleri düzeltir
+        eski_aylar = np.column_stack([pd.to_numeric(eski[col], errors='coerce') for col in eski.columns[4:]])
+        eski_virgullu = np.column_stack([
+            pd.to_numeric(eski[col].astype(str).str.replace(',', '.', regex=False), errors='coerce')
+            for col in eski.columns[4:]
+        ])
+        ayni = (list(yeni.columns) == ['tn', 'bn'] + list(eski.columns[4:]) and
+                np.array_equal(eski[['tn', 'bn']].to_numpy(), yeni[['tn', 'bn']].to_numpy()) and
+                np.array_equal(eski_aylar, yeni.iloc[:, 2:].to_numpy(), equal_nan=True) and
+                np.array_equal(eski_virgullu, virgullu.iloc[:, 2:].to_numpy(), equal_nan=True))
+        print(f"  sonuç aynı: {ayni}, x{t_eski / t_yeni:.1f} hızlı, bellek oranı x{m_eski / m_yeni:.1f}")
+        print(f"  çerçeve boyutu: {eski.memory_usage(deep=True).sum() / 1024 ** 2:,.1f} MB -> "
+              f"{yeni.memory_usage(deep=True).sum() / 1024 ** 2:,.1f} MB")
+
+
+# -------------------- Uzun format küp --------------------
+def make_long_records(tesisat, yil, seed=42):
+    """long_format.py biçiminde kayıtlar (tesisat_no, yil, ay, tuketim), %10 eksik ay"""
+    rng = np.random.default_rng(seed)
+    t = np.repeat(np.arange(tesisat), yil * 12)
+    y = np.tile(np.repeat(np.arange(2024 - yil + 1, 2025), 12), tesisat)
+    m = np.tile(np.arange(1, 13), tesisat * yil)
+    keep = rng.random(len(t)) > 0.1
+    return pd.DataFrame({
+        'tesisat_no': (100000 + t[keep]).astype(str),
+        'yil': y[keep],
+        'ay': m[keep],
+        'tuketim': rng.gamma(2.0, 40.0, int(keep.sum())).round(2),
+    })
+
+
+# analyze_facility'nin tesisat başına yaptığı sorgular: 13 ay değeri + son 6 ortalaması
+_SORGULAR = [(0, 12), (0, 11), (0, 10), (-1, 12), (-2, 12), (1, 1), (1, 2),
+             (0, 1), (0, 2), (-1, 1), (-1, 2), (-1, 11), (-1, 10)]
+
+
+def legacy_facility_lookups(df, tesisat_no, yil):
+    """long_format.py (eski): her sorgu tüm tabloyu filtreler"""
+    out = []
+    for dy, ay in _SORGULAR:
+        filtered = df[(df['tesisat_no'] == tesisat_no) & (df['yil'] == yil + dy) & (df['ay'] == ay)]
+        val = filtered['tuketim'].values[0] if not filtered.empty else np.nan
+        out.append(None if pd.isna(val) or val == 0 else float(val))
+    recent = df[(df['tesisat_no'] == tesisat_no) & (df['tuketim'] > 0) & (df['tuketim'].notna())]
+    out.append(recent['tuketim'].tail(6).mean() if not recent.empty else 0)
+    return out
+
+
+def cube_facility_lookups(cube, row, yil):
+    out = [cube_value(cube, row, yil + dy, ay) for dy, ay in _SORGULAR]
+    out.append(cube['recent_mean'][row])
+    return out
+
+
+def bench_cube(args):
+    """Tesisat başına DataFrame filtrelemesini küp indekslemesiyle karşılaştır"""
+    df = make_long_records(args.tesisat, args.yil)
+    yil = int(df['yil'].max()) - 1
+    tesisatlar = df['tesisat_no'].unique()
+    print(f"Uzun format: {len(df):,} kayıt, {len(tesisatlar):,} tesisat")
+
+    t0 = time.perf_counter()
+    cube = build_consumption_cube(df['tesisat_no'], df['yil'], df['ay'], df['tuketim'])
+    t_kur = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    yeni = [cube_facility_lookups(cube, cube['row_of'][t], yil) for t in tesisatlar]
+    t_sorgu = time.perf_counter() - t0
+    print(f"  küp kurulumu       : {t_kur:8.3f} sn ({cube['values'].nbytes / 1024 ** 2:,.1f} MB)")
+    print(f"  küp sorguları      : {t_sorgu:8.3f} sn (tüm tesisatlar)")
+
+    ornek = tesisatlar[:args.eski_limit]
+    t0 = time.perf_counter()
+    eski = [legacy_facility_lookups(df, t, yil) for t in ornek]
+    t_eski = time.perf_counter() - t0
+    tahmin = t_eski / len(ornek) * len(tesisatlar)
+    ayni = all(np.allclose(np.array(a, dtype=float), np.array(b, dtype=float), equal_nan=True)
+               for a, b in zip(eski, yeni))
+    print(f"  eski (DataFrame)   : {t_eski:8.3f} sn ({len(ornek):,} tesisat), "
+          f"tümü için tahmini {tahmin:,.0f} sn")
+    print(f"  sonuç aynı: {ayni}, x{tahmin / (t_kur + t_sorgu):,.0f} hızlı")
+
+    # Toplu takvim: tüm dönemler tek geçişte (segment eşiği long_format.assign_segment ile aynı)
+    esik = np.select([cube['recent_mean'] < 100, cube['recent_mean'] < 300, cube['recent_mean'] < 1000],
+                     [50, 40, 30], 25)
+    t0 = time.perf_counter()
+    takvim = anomaly_calendar(cube, esik)
+    t_takvim = time.perf_counter() - t0
+    n_donem = len(takvim['years'])
+    print(f"  takvim ({n_donem} dönem): {t_takvim:8.3f} sn, dönem dönem küp sorgusu ile "
+          f"tahmini {t_sorgu * n_donem:,.0f} sn, {int((takvim['flags'] > 0).sum()):,} anomali")
+
+
+# -------------------- gmz dört kriter --------------------
+GMZ_PARAMS = dict(min_normal_tuketim=20, bina_fark_esigi=65, ani_dusus_esigi=75,
+                  min_dusuk_ay=4, min_bina_daire=3)
+
+
+def make_pivot_matrix(tesisat, ay, seed=42):
+    """Sıfır / düşük dönemler içeren (tesisat x ay) float32 matris ve bina numaraları"""
+    rng = np.random.default_rng(seed)
+    values = rng.gamma(20.0, 4.0, (tesisat, ay)).astype(np.float32)
+    values[rng.random((tesisat, ay)) < 0.02] = 0
+    dusuk = rng.random(tesisat) < 0.05
+    values[dusuk, ay // 2:] *= 0.1
+    return values, (np.arange(tesisat) // 6).astype(str)
+
+
+def legacy_criteria(values, codes, month_mean, sizes, min_normal_tuketim, bina_fark_esigi,
+                    ani_dusus_esigi, min_dusuk_ay, min_bina_daire):
+    """gmz.py (eski): satır başına ay döngüleri, (risk_puan, kriter_sayisi) listesi"""
+    out = []
+    for pos in range(len(values)):
+        tuketim = values[pos]
+        kod = codes[pos]
+        if kod < 0 or sizes[kod] < min_bina_daire:
+            out.append(None)
+            continue
+        bina_ort = month_mean[kod]
+        n_bina = sum(1 for i in range(len(tuketim)) if bina_ort[i] > min_normal_tuketim and
+                     ((bina_ort[i] - tuketim[i]) / bina_ort[i]) * 100 > bina_fark_esigi)
+        n_dusus = sum(1 for i in range(1, len(tuketim)) if tuketim[i - 1] > min_normal_tuketim and
+                      ((tuketim[i - 1] - tuketim[i]) / tuketim[i - 1]) * 100 > ani_dusus_esigi)
+        seriler = []
+        for kosul in (lambda v: v < min_normal_tuketim, lambda v: v == 0):
+            seri = en_uzun = 0
+            for val in tuketim:
+                seri = seri + 1 if kosul(val) else 0
+                en_uzun = max(en_uzun, seri)
+            seriler.append(en_uzun)
+        k = [n_bina >= 4, n_dusus >= 2, seriler[0] >= min_dusuk_ay, seriler[1] >= 3]
+        puan = k[0] * n_bina * 15 + k[1] * n_dusus * 20 + k[2] * seriler[0] * 10 + k[3] * seriler[1] * 12
+        out.append((puan, sum(k)))
+    return out
+
+
+def bench_criteria(args):
+    """gmz satır döngüsünü matris motoruyla karşılaştır"""
+    values, bina = make_pivot_matrix(args.tesisat, args.ay)
+    index = build_building_index(bina, values)
+    print(f"Pivot: {args.tesisat:,} tesisat x {args.ay} ay, {len(index['keys']):,} bina")
+
+    t0 = time.perf_counter()
+    sonuc = evaluate_criteria(values, index['codes'], index['month_mean'], index['sizes'], **GMZ_PARAMS)
+    t_yeni = time.perf_counter() - t0
+    print(f"  matris motoru      : {t_yeni:8.3f} sn, {int(sonuc['aday'].sum()):,} aday")
+
+    n = min(args.eski_limit, args.tesisat)
+    t0 = time.perf_counter()
+    eski = legacy_criteria(values[:n], index['codes'], index['month_mean'], index['sizes'], **GMZ_PARAMS)
+    t_eski = time.perf_counter() - t0
+    tahmin = t_eski / n * args.tesisat
+    ayni = all(e is None if not sonuc['uygun'][i] else
+               e == (sonuc['risk_puan'][i], sonuc['kriter_sayisi'][i]) for i, e in enumerate(eski))
+    print(f"  eski satır döngüsü : {t_eski:8.3f} sn ({n:,} tesisat), tümü için tahmini {tahmin:,.1f} sn")
+    print(f"  sonuç aynı: {ayni}, x{tahmin / t_yeni:,.0f} hızlı")
+
+
+# -------------------- bina parçalı paralel analiz --------------------
+TESPIT_PARAMS = dict(kis_tuketim_esigi=100, bina_ort_dusuk_oran=50, ani_dusus_orani=60,
+                     min_onceki_kis_tuketim=200)
+
+
+def _worker_counts(en_fazla):
+    """1, 2, 4, ... en_fazla"""
+    sayilar = [1]
+    while sayilar[-1] * 2 < en_fazla:
+        sayilar.append(sayilar[-1] * 2)
+    if en_fazla > 1:
+        sayilar.append(en_fazla)
+    return sayilar
+
+
+def make_pivot_frame(tesisat, ay, seed=42):
+    """`make_pivot_matrix` verisinden tespit biçimli pivot çerçeve ve tarih sütunları"""
+    values, bina = make_pivot_matrix(tesisat, ay, seed)
+    date_cols = list(pd.period_range('2021-01', periods=ay, freq='M').strftime('%Y/%m'))
+    df = pd.DataFrame(values, columns=date_cols)
+    df.insert(0, 'bina_no', bina)
+    df.insert(0, 'tesisat_no', np.char.add('T', np.arange(tesisat).astype(str)))
+    return df, date_cols, values, bina
+
+
+def bench_parallel(args):
+    """İşçi sayısına göre hızlanma eğrisi (tespit matrisi ve gmz kriterleri)"""
+    df, date_cols, values, bina = make_pivot_frame(args.tesisat, args.ay)
+    bina_kod, _ = encode_ids(bina)
+    print(f"Pivot: {args.tesisat:,} tesisat x {args.ay} ay, {MAX_WORKERS} CPU")
+
+    olcumler = {
+        'tespit matrisi': lambda w: analyze_consumption_sharded(
+            df, date_cols, 'tesisat_no', 'bina_no', workers=w, **TESPIT_PARAMS),
+        'gmz kriterleri': lambda w: evaluate_criteria_sharded(values, bina_kod, workers=w, **GMZ_PARAMS),
+    }
+    for ad, calistir in olcumler.items():
+        seri = None
+        for w in _worker_counts(args.isci or MAX_WORKERS):
+            calistir(w)  # havuzun kurulması ölçüme dahil edilmez
+            t0 = time.perf_counter()
+            sonuc = calistir(w)
+            sure = time.perf_counter() - t0
+            if seri is None:
+                seri, referans = sure, sonuc
+            if isinstance(sonuc, pd.DataFrame):
+                ayni = sonuc.equals(referans)
+            else:
+                ayni = all(np.array_equal(sonuc[k], referans[k], equal_nan=True) for k in referans)
+            print(f"  {ad} {w:>3} işçi: {sure:8.3f} sn, x{seri / sure:5.2f}, sonuç aynı: {ayni}")
+    shutdown_pools()
+
+
+# -------------------- eşik değişikliğinde yeniden puanlama --------------------
+def bench_rescore(args):
+    """Tam analiz ile oturumdaki / depodaki özelliklerden yalnızca eşik karşılaştırması"""
+    df, date_cols, _, _ = make_pivot_frame(args.tesisat, args.ay)
+    print(f"Pivot: {args.tesisat:,} tesisat x {args.ay} ay")
+
+    state = {}
+    # Her çalıştırmada yeni anahtar: tam analiz özellik deposundaki eski tabloyu okumasın
+    anahtar = ('benchmark', args.tesisat, args.ay, uuid.uuid4().hex)
+    _, t_tam = _timeit(lambda: analyze_consumption_sharded(
+        df, date_cols, 'tesisat_no', 'bina_no', workers=1, state=state, anahtar=anahtar, **TESPIT_PARAMS))
+    print(f"  tam analiz (özellik + eşik): {t_tam:8.3f} sn")
+
+    for oran in (0.5, 0.8, 1.2):
+        esikler = {k: v * oran for k, v in TESPIT_PARAMS.items()}
+        sonuc, sure = _timeit(lambda: rescore_consumption(
+            df, date_cols, 'tesisat_no', 'bina_no', state, anahtar, **esikler))
+        beklenen = analyze_consumption_sharded(df, date_cols, 'tesisat_no', 'bina_no', workers=1, **esikler)
+        print(f"  eşikler x{oran:.1f} yeniden puanlama: {sure:8.3f} sn, x{t_tam / sure:5.1f}, "
+              f"{int((sonuc['suspicion_level'] == 'Şüpheli').sum()):,} şüpheli, sonuç aynı: {sonuc.equals(beklenen)}")
+
+    # Yeni oturum: özellikler diskteki özellik deposundan okunur
+    sonuc, sure = _timeit(lambda: rescore_consumption(
+        df, date_cols, 'tesisat_no', 'bina_no', {}, anahtar, **TESPIT_PARAMS))
+    beklenen = analyze_consumption_sharded(df, date_cols, 'tesisat_no', 'bina_no', workers=1, **TESPIT_PARAMS)
+    print(f"  yeni oturum, özellik deposundan: {sure:8.3f} sn, x{t_tam / sure:5.1f}, "
+          f"sonuç aynı: {sonuc.equals(beklenen)}")
+
+
+# -------------------- inceleme listesi: ilk K --------------------
+def legacy_ranking(puan, k):
+    """Eski gmz akışı: sözlük listesi, tam sıralama, üç kategori geçişi, ilk k"""
+    liste = [{'pos': i, 'risk_puan': int(p)} for i, p in enumerate(puan)]
+    liste.sort(key=lambda x: x['risk_puan'], reverse=True)
+    kritik = [x for x in liste if x['risk_puan'] >= 150]
+    yuksek = [x for x in liste if 100 <= x['risk_puan'] < 150]
+    orta = [x for x in liste if 80 <= x['risk_puan'] < 100]
+    return [x['pos'] for x in liste[:k]], (len(orta), len(yuksek), len(kritik))
+
+
+def bench_ranking(args):
+    """Tam sıralama ile skor dizisinde kısmi seçim (ilk K) ve tek geçişte kategori sayıları"""
+    rng = np.random.default_rng(42)
+    puan = rng.integers(80, 250, args.tesisat)
+    print(f"{args.tesisat:,} aday, ilk {args.k}")
+
+    (eski, eski_sayilar), t_eski = _timeit(legacy_ranking, puan, args.k)
+    print(f"  sözlük listesi + tam sıralama: {t_eski:8.3f} sn")
+
+    def yeni():
+        return top_k(puan, args.k), tuple(bucket_counts(puan, [100, 150]).tolist())
+
+    (secilen, sayilar), t_yeni = _timeit(yeni)
+    print(f"  top_k + bucket_counts        : {t_yeni:8.3f} sn, x{t_eski / t_yeni:,.0f} hızlı, "
+          f"sonuç aynı: {secilen.tolist() == eski and sayilar == eski_sayilar}")
+
+
+# -------------------- sıralı kural çekirdekleri --------------------
+def _kernel_calls(values, act, mean):
+    return {
+        'low_zero_streaks': lambda: cekirdekler.low_zero_streaks(values, 20),
+        'burst_after_low': lambda: cekirdekler.burst_after_low(act['values'], act['offsets']),
+        'direction_changes': lambda: cekirdekler.direction_changes(act['values'], act['offsets']),
+        'increase_scores': lambda: cekirdekler.increase_scores(act['values'], act['offsets'], mean),
+    }
+
+
+def _parts(sonuc):
+    return sonuc if isinstance(sonuc, tuple) else (sonuc,)
+
+
+def bench_kernels(args):
+    """Numba çekirdekleri (ilk çağrı = derleme / disk önbelleği) ile NumPy karşılıkları"""
+    values = make_pivot_matrix(args.tesisat, args.ay)[0]
+    act = build_active_arrays(values)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mean = np.bincount(act['rows'], weights=act['values'], minlength=len(values)) / act['counts']
+    print(f"{args.tesisat:,} tesisat x {args.ay} ay, {len(act['values']):,} aktif değer")
+
+    numba_var = cekirdekler.NUMBA_AVAILABLE
+    cekirdekler.NUMBA_AVAILABLE = False
+    referans = {}
+    for ad, cagri in _kernel_calls(values, act, mean).items():
+        referans[ad], sure = _timeit(cagri)
+        print(f"  {ad:<18} NumPy: {sure:8.3f} sn")
+    if not numba_var:
+        print("  Numba kurulu değil (veya ANOMALI_NUMBA=0): yalnızca NumPy sürümleri ölçüldü")
+        return
+
+    cekirdekler.NUMBA_AVAILABLE = True
+    for ad, cagri in _kernel_calls(values, act, mean).items():
+        _, ilk = _timeit(cagri)
+        sonuc, sure = _timeit(cagri)
+        ayni = all(np.array_equal(a, b, equal_nan=True) for a, b in zip(_parts(sonuc), _parts(referans[ad])))
+        print(f"  {ad:<18} Numba: {sure:8.3f} sn (ilk çağrı {ilk:6.3f} sn), sonuç aynı: {ayni}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Doğalgaz anomali motorları için performans ölçümleri")
+    sub = parser.add_subparsers(dest='komut', required=True)
+
+    p = sub.add_parser('pivot', help="Ham -> pivot dönüşümü")
+    p.add_argument('--satir', type=int, default=200_000)
+    p.add_argument('--eski-limit', type=int, default=200_000,
+                   help="Bu satır sayısının üzerinde eski yöntemler çalıştırılmaz")
+    p.set_defaults(func=bench_pivot)
+
+    p = sub.add_parser('akis', help="Akışlı (parça parça) ham CSV okuma")
+    p.add_argument('--satir', type=int, default=2_000_000)
+    p.add_argument('--parca', type=int, default=500_000)
+    p.set_defaults(func=bench_stream)
+
+    p = sub.add_parser('xlsx', help="Sütun seçmeli salt-okunur xlsx okuma")
+    p.add_argument('--tesisat', type=int, default=20_000)
+    p.add_argument('--ay', type=int, default=48)
+    p.set_defaults(func=bench_xlsx)
+
+    p = sub.add_parser('kup', help="long_format tesisat analizi: küp indeksleme")
+    p.add_argument('--tesisat', type=int, default=300_000)
+    p.add_argument('--yil', type=int, default=3)
+    p.add_argument('--eski-limit', type=int, default=50,
+                   help="Eski yöntemin ölçüleceği tesisat sayısı (süre tümüne oranlanır)")
+    p.set_defaults(func=bench_cube)
+
+    p = sub.add_parser('kriter', help="gmz dört kriter: matris motoru")
+    p.add_argument('--tesisat', type=int, default=100_000)
+    p.add_argument('--ay', type=int, default=48)
+    p.add_argument('--eski-limit', type=int, default=10_000,
+                   help="Eski döngünün ölçüleceği tesisat sayısı (süre tümüne oranlanır)")
+    p.set_defaults(func=bench_criteria)
+
+    p = sub.add_parser('paralel', help="Bina parçalı süreç havuzu: hızlanma eğrisi")
+    p.add_argument('--tesisat', type=int, default=200_000)
+    p.add_argument('--ay', type=int, default=48)
+    p.add_argument('--isci', type=int, default=0, help="En fazla işçi sayısı (varsayılan: CPU sayısı)")
+    p.set_defaults(func=bench_parallel)
+
+    p = sub.add_parser('esik', help="Eşik değişikliği: özelliklerden yeniden puanlama")
+    p.add_argument('--tesisat', type=int, default=200_000)
+    p.add_argument('--ay', type=int, default=48)
+    p.set_defaults(func=bench_rescore)
+
+    p = sub.add_parser('sirala', help="İnceleme listesi: tam sıralama yerine ilk K")
+    p.add_argument('--tesisat', type=int, default=2_000_000)
+    p.add_argument('--k', type=int, default=50)
+    p.set_defaults(func=bench_ranking)
+
+    p = sub.add_parser('cekirdek', help="Sıralı kural çekirdekleri: Numba / NumPy")
+    p.add_argument('--tesisat', type=int, default=200_000)
+    p.add_argument('--ay', type=int, default=48)
+    p.set_defaults(func=bench_kernels)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
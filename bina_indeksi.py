@@ -0,0 +1,119 @@
+"""Bina bazında önceden hesaplanmış toplu indeks.
+
+Tek bir gruplama geçişiyle her bina için daire sayısı, aylık ortalamalar ve
+sıfır olmayan tesisat ortalamaları hesaplanır. Tesisat -> bina eşlemesi
+`codes` (kimlik sözlüğü kodları, eksik bina -1) ve binaların tesisat listeleri
+`order`/`offsets` (CSR düzeni) ile tutulur; kurallar bina sorgusunu
+DataFrame filtrelemek yerine dizi indekslemesiyle yapar.
+"""
+import numpy as np
+import pandas as pd
+
+from cekirdekler import segment_sums
+from kimlik import encode_ids, lookup_code
+
+
+def build_building_index(bina_values, values=None, vocab=None, codes=None):
+    """Bina anahtarlarından (ve isteğe bağlı tüketim matrisinden) indeks oluştur
+
+    Bina numaraları `kimlik.encode_ids` ile normalize edilir ('123' ve
+    '123.0' aynı bina). Paylaşılan bir sözlük verilirse kodlar onunkilerdir.
+    Önceden kodlanmış `codes` (0..k-1, eksik -1) verilirse bina_values
+    kullanılmaz; anahtarlar kodların kendisidir (sözlük yok).
+    values: (tesisat x ay) veya (kayıt,) tüketim dizisi, NaN = veri yok.
+    """
+    if codes is None:
+        codes, vocab = encode_ids(bina_values, vocab)
+        keys = pd.Index(vocab['keys'], dtype=object)
+    else:
+        codes = np.asarray(codes)
+        keys = pd.RangeIndex(int(codes.max()) + 1 if len(codes) else 0)
+    codes = codes.astype(np.int64)
+    n_bina = len(keys)
+    valid = codes >= 0
+
+    sizes = np.bincount(codes[valid], minlength=n_bina)
+    order = np.argsort(np.where(valid, codes, n_bina), kind='stable')[:int(valid.sum())]
+    offsets = np.concatenate(([0], np.cumsum(sizes)))
+
+    index = {
+        'codes': codes,
+        'keys': keys,
+        'vocab': vocab,
+        'sizes': sizes,
+        'order': order,
+        'offsets': offsets,
+    }
+    if values is None:
+        return index
+
+    values = np.asarray(values, dtype=np.float64)
+    if values.ndim == 1:
+        values = values[:, None]
+    present = ~np.isnan(values)
+    filled = np.where(present, values, 0.0)
+
+    # Aylık bina ortalaması (sıfırlar dahil, boş hücreler hariç); paylaşılan
+    # sözlükte üyesi olmayan binalar boş kalır
+    month_sum = np.zeros((n_bina, values.shape[1]))
+    month_cnt = np.zeros((n_bina, values.shape[1]), dtype=np.int64)
+    dolu = np.flatnonzero(sizes > 0)
+    if len(dolu):
+        month_sum[dolu] = np.add.reduceat(filled[order], offsets[dolu], axis=0)
+        month_cnt[dolu] = np.add.reduceat(present[order].astype(np.int64), offsets[dolu], axis=0)
+    month_mean = np.full(month_sum.shape, np.nan)
+    np.divide(month_sum, month_cnt, out=month_mean, where=month_cnt > 0)
+
+    # Tesisatın sıfır olmayan ortalaması ve binadaki ortalaması (eski döngüdeki
+    # gibi tesisat başına ve bina içinde dosya sırasıyla np.mean)
+    positive = values > 0
+    nz_cnt = positive.sum(axis=1)
+    nz_sum = segment_sums(values[positive], np.cumsum(nz_cnt) - nz_cnt, nz_cnt)
+    unit_mean = np.zeros(len(values))
+    np.divide(nz_sum, nz_cnt, out=unit_mean, where=nz_cnt > 0)
+    unit_has = nz_cnt > 0
+
+    bina_nz_units = np.bincount(codes[valid], weights=unit_has[valid].astype(np.float64),
+                                minlength=n_bina).astype(np.int64)
+    birimler = order[unit_has[order]]
+    bina_nz_sum = segment_sums(unit_mean[birimler], np.cumsum(bina_nz_units) - bina_nz_units, bina_nz_units)
+    nonzero_mean = np.zeros(n_bina)
+    np.divide(bina_nz_sum, bina_nz_units, out=nonzero_mean, where=bina_nz_units > 0)
+
+    month_present = ~np.isnan(month_mean)
+    overall_mean = np.full(n_bina, np.nan)
+    np.divide(np.where(month_present, month_mean, 0.0).sum(axis=1), month_present.sum(axis=1),
+              out=overall_mean, where=month_present.any(axis=1))
+
+    index.update({
+        'month_mean': month_mean,
+        'overall_mean': overall_mean,
+        'nonzero_mean': nonzero_mean,
+        'nonzero_units': bina_nz_units,
+        'unit_nonzero_mean': unit_mean,
+        'unit_nonzero_count': nz_cnt,
+    })
+    return index
+
+
+def lookup(index, name, fill=np.nan):
+    """Bina istatistiğini tesisat sırasına yay (binası olmayanlara `fill`)"""
+    stat = index[name]
+    codes = index['codes']
+    valid = codes >= 0
+    out_shape = (len(codes),) + stat.shape[1:]
+    out = np.full(out_shape, fill, dtype=np.result_type(stat.dtype, type(fill)))
+    out[valid] = stat[codes[valid]]
+    return out
+
+
+def building_code(index, bina_no):
+    """Bina numarasının kodu (bulunamazsa -1)"""
+    return lookup_code(index['vocab'], bina_no)
+
+
+def building_members(index, code):
+    """Bina kodundaki tesisatların satır konumları"""
+    if code < 0:
+        return np.empty(0, dtype=np.int64)
+    return index['order'][index['offsets'][code]:index['offsets'][code + 1]]
@@ -0,0 +1,234 @@
+"""Sıralı kural döngüleri için isteğe bağlı Numba çekirdekleri.
+
+Doğası gereği sıralı olan kurallar düz tüketim dizileri üzerinde tek geçişli
+döngüler olarak yazılmıştır:
+
+    low_zero_streaks    - gmz KRİTER 3 / 4: en uzun düşük ve sıfır serileri
+                          (tesisat x ay matrisinin satırları)
+    max_run_length      - satır başına en uzun ardışık True serisi
+    burst_after_low     - parttern KURAL 6 "Kaçak Sonrası Patlama"
+    direction_changes   - parttern KURAL 11 "Kaotik Desen"
+    increase_scores     - tt ani artış ve sıfır sonrası artış puanları
+    segment_sums        - ardışık grupların grup başına `ndarray.sum` toplamları
+
+parttern ve tt çekirdekleri düzensiz (ragged) dizilerle çalışır: satır i'nin
+değerleri `values[offsets[i]:offsets[i+1]]` aralığındadır. Numba kuruluysa
+döngüler `njit(cache=True)` ile derlenir (derleme sonucu __pycache__
+altında saklanır, sonraki açılışlarda yeniden derlenmez); değilse aynı
+sonucu veren NumPy (kaydırma / kümülatif toplam / bincount) sürümleri
+kullanılır. ANOMALI_NUMBA=0 ortam değişkeni Numba'yı kapatır.
+"""
+import os
+
+import numpy as np
+
+try:
+    from numba import njit
+    NUMBA_AVAILABLE = os.environ.get('ANOMALI_NUMBA', '1') != '0'
+except ImportError:
+    NUMBA_AVAILABLE = False
+
+
+def _jit(func):
+    return njit(cache=True, nogil=True)(func) if NUMBA_AVAILABLE else func
+
+
+# --- Döngü çekirdekleri (Numba varsa derlenir) ---
+
+@_jit
+def _run_lengths_loop(mask):
+    n, m = mask.shape
+    out = np.zeros(n, dtype=np.int64)
+    for i in range(n):
+        seri = en_uzun = 0
+        for j in range(m):
+            if mask[i, j]:
+                seri += 1
+                if seri > en_uzun:
+                    en_uzun = seri
+            else:
+                seri = 0
+        out[i] = en_uzun
+    return out
+
+
+@_jit
+def _streaks_loop(values, esik):
+    n, m = values.shape
+    dusuk = np.zeros(n, dtype=np.int64)
+    sifir = np.zeros(n, dtype=np.int64)
+    for i in range(n):
+        d = s = en_d = en_s = 0
+        for j in range(m):
+            v = values[i, j]
+            d = d + 1 if v < esik else 0
+            s = s + 1 if v == 0 else 0
+            if d > en_d:
+                en_d = d
+            if s > en_s:
+                en_s = s
+        dusuk[i] = en_d
+        sifir[i] = en_s
+    return dusuk, sifir
+
+
+@_jit
+def _burst_loop(a, offsets, dusuk, patlama):
+    n = len(offsets) - 1
+    prev_avg = np.full(n, np.nan)
+    val = np.full(n, np.nan)
+    for i in range(n):
+        for j in range(offsets[i] + 3, offsets[i + 1]):
+            p = (a[j - 3] + a[j - 2] + a[j - 1]) / 3
+            if p < dusuk and a[j] > patlama:
+                prev_avg[i] = p
+                val[i] = a[j]
+                break
+    return prev_avg, val
+
+
+@_jit
+def _direction_loop(a, offsets, esik):
+    n = len(offsets) - 1
+    out = np.zeros(n, dtype=np.int64)
+    for i in range(n):
+        for j in range(offsets[i] + 2, offsets[i + 1]):
+            t1 = a[j - 1] - a[j - 2]
+            t2 = a[j] - a[j - 1]
+            if abs(t1) > esik and abs(t2) > esik and ((t1 > 0 and t2 < 0) or (t1 < 0 and t2 > 0)):
+                out[i] += 1
+    return out
+
+
+@_jit
+def _increase_loop(v, offsets, mean):
+    n = len(offsets) - 1
+    out = np.zeros(n)
+    for i in range(n):
+        for j in range(offsets[i] + 1, offsets[i + 1]):
+            onceki, simdiki = v[j - 1], v[j]
+            if simdiki > onceki * 2:
+                out[i] += 3
+            elif simdiki > onceki * 1.5:
+                out[i] += 2
+            if onceki == 0 and simdiki > mean[i]:
+                out[i] += 4
+    return out
+
+
+# --- NumPy karşılıkları ---
+
+def _run_lengths_numpy(mask):
+    """Kümülatif toplamdan, son False konumundaki kümülatif değer (ileri
+    doğru maksimumla taşınarak) çıkarılır; kalan, o konumda biten serinin boyudur."""
+    if mask.shape[1] == 0:
+        return np.zeros(mask.shape[0], dtype=np.int64)
+    csum = np.cumsum(mask, axis=1, dtype=np.int64)
+    reset = np.maximum.accumulate(np.where(mask, 0, csum), axis=1)
+    return (csum - reset).max(axis=1)
+
+
+def _ragged(offsets, gecmis):
+    """Satır başından en az `gecmis` eleman sonraki konumlar ve satırları"""
+    sizes = np.diff(offsets)
+    rows = np.repeat(np.arange(len(sizes)), sizes)
+    pos = np.arange(offsets[-1]) - offsets[rows]
+    idx = np.flatnonzero(pos >= gecmis)
+    return idx, rows[idx]
+
+
+def first_per_row(hit, rows, n_rows):
+    """Her satırdaki ilk True konumu (yoksa -1)"""
+    first = np.full(n_rows, -1, dtype=np.int64)
+    idx = np.flatnonzero(hit)[::-1]
+    first[rows[idx]] = idx
+    return first
+
+
+# --- Genel arayüz ---
+
+def max_run_length(mask):
+    """Her satırdaki en uzun ardışık True serisinin uzunluğu (1B dizi tek satırdır)"""
+    mask = np.asarray(mask, dtype=bool)
+    if mask.ndim == 1:
+        mask = mask[None, :]
+    if NUMBA_AVAILABLE:
+        return _run_lengths_loop(np.ascontiguousarray(mask))
+    return _run_lengths_numpy(mask)
+
+
+def low_zero_streaks(values, esik):
+    """Satır başına en uzun `< esik` ve `== 0` serileri (NaN iki seriyi de keser)"""
+    values = np.asarray(values, dtype=np.float64)
+    if NUMBA_AVAILABLE:
+        return _streaks_loop(np.ascontiguousarray(values), float(esik))
+    return _run_lengths_numpy(values < esik), _run_lengths_numpy(values == 0)
+
+
+def burst_after_low(a, offsets, dusuk=40, patlama=200):
+    """Önceki 3 değerin ortalaması `dusuk` altındayken `patlama` üstüne çıkılan ilk konum
+
+    Döner: satır başına (önceki 3 ortalama, patlama değeri); yoksa NaN.
+    """
+    a = np.asarray(a, dtype=np.float64)
+    offsets = np.asarray(offsets, dtype=np.int64)
+    if NUMBA_AVAILABLE:
+        return _burst_loop(a, offsets, float(dusuk), float(patlama))
+    i6, r6 = _ragged(offsets, 3)
+    prev_avg = (a[i6 - 3] + a[i6 - 2] + a[i6 - 1]) / 3
+    ilk = first_per_row((prev_avg < dusuk) & (a[i6] > patlama), r6, len(offsets) - 1)
+    # -1 (tetiklenmedi) sona eklenen NaN'a düşer
+    return np.append(prev_avg, np.nan)[ilk], np.append(a[i6], np.nan)[ilk]
+
+
+def direction_changes(a, offsets, esik=10):
+    """Satır başına, iki ardışık farkın da `esik`ten büyük olup işaret değiştirdiği konum sayısı"""
+    a = np.asarray(a, dtype=np.float64)
+    offsets = np.asarray(offsets, dtype=np.int64)
+    if NUMBA_AVAILABLE:
+        return _direction_loop(a, offsets, float(esik))
+    i11, r11 = _ragged(offsets, 2)
+    trend1 = a[i11 - 1] - a[i11 - 2]
+    trend2 = a[i11] - a[i11 - 1]
+    degisim = ((np.abs(trend1) > esik) & (np.abs(trend2) > esik) &
+               (((trend1 > 0) & (trend2 < 0)) | ((trend1 < 0) & (trend2 > 0))))
+    return np.bincount(r11, weights=degisim, minlength=len(offsets) - 1).astype(np.int64)
+
+
+def increase_scores(v, offsets, mean):
+    """Satır başına ardışık değer çiftlerinin artış puanı toplamı
+
+    %100 üstü artış 3, %50 üstü 2; önceki değer 0 iken satır ortalamasının
+    (`mean`) üzerine çıkış ayrıca 4 puan.
+    """
+    v = np.asarray(v, dtype=np.float64)
+    offsets = np.asarray(offsets, dtype=np.int64)
+    mean = np.asarray(mean, dtype=np.float64)
+    if NUMBA_AVAILABLE:
+        return _increase_loop(v, offsets, mean)
+    ardisik, grup = _ragged(offsets, 1)
+    onceki, simdiki = v[ardisik - 1], v[ardisik]
+    artis = np.where(simdiki > onceki * 2, 3, np.where(simdiki > onceki * 1.5, 2, 0))
+    sifir_sonrasi = np.where((onceki == 0) & (simdiki > mean[grup]), 4, 0)
+    return np.bincount(grup, weights=artis + sifir_sonrasi, minlength=len(offsets) - 1)
+
+
+def segment_sums(values, starts, sizes):
+    """Ardışık grupların toplamları (grup başına `ndarray.sum`)
+
+    Grup i, `values[starts[i]:starts[i] + sizes[i]]` aralığıdır. Aynı
+    uzunluktaki gruplar (grup x uzunluk) bir bloğa toplanıp `sum(axis=1)` ile
+    toplanır; her satır, grubun tek başına `np.sum` / `np.mean` indirgemesidir
+    (bincount / groupby toplamları son basamakta farklılaşabilir, eşik
+    sınırındaki karşılaştırmaları değiştirir).
+    """
+    values = np.asarray(values, dtype=np.float64)
+    starts = np.asarray(starts, dtype=np.int64)
+    sizes = np.asarray(sizes, dtype=np.int64)
+    sonuc = np.zeros(len(starts))
+    sira = np.argsort(sizes, kind='stable')
+    uzunluklar, ilk = np.unique(sizes[sira], return_index=True)
+    for uzunluk, gruplar in zip(uzunluklar, np.split(sira, ilk[1:])):
+        if uzunluk > 0:
+            sonuc[gruplar] = values[starts[gruplar][:, None] + np.arange(uzunluk)].sum(axis=1)
+    return sonuc
@@ -5,6 +5,20 @@ import plotly.graph_objects as go
 from io import BytesIO
 import openpyxl
 from openpyxl.styles import PatternFill, Font, Alignment
+from bina_indeksi import build_building_index
+from onbellek import cached_frame, file_hash
+from xlsx_okuyucu import read_pivot_xlsx
+from kimlik import intern_frame, decode_ids
+from kriter_motoru import KRITER_BINA, KRITER_DUSUS, KRITER_DUSUK, KRITER_SIFIR, criteria_sweep
+from paralel import evaluate_criteria_sharded, DEFAULT_WORKERS, MAX_WORKERS
+from ozellik_deposu import matrix_features
+from siralama import top_k, bucket_codes
+
+# Risk puanı kategori sınırları (80-99 orta, 100-149 yüksek, 150+ kritik) ve kodları
+RISK_SINIRLARI = [100, 150]
+RISK_KATEGORILERI = {"Kritik (150+)": 2, "Yüksek (100-149)": 1, "Orta (80-99)": 0}
+# Ayrıntısı gösterilen en fazla tesisat
+GOSTERIM_SAYISI = 50
 
 st.set_page_config(page_title="Doğalgaz Kaçak Tespit", layout="wide", page_icon="🔥")
 
@@ -23,6 +37,8 @@ with st.sidebar:
     bina_fark_esigi = st.slider("Bina Fark Eşiği (%)", 50, 90, 65, 5)
     min_dusuk_ay = st.slider("Min Düşük Tüketim Süresi (Ay)", 3, 8, 4)
     min_bina_daire = st.number_input("Min Bina Daire Sayısı", 2, 10, 3)
+    paralel_isci = st.number_input("Paralel İşçi Sayısı", 1, MAX_WORKERS, min(DEFAULT_WORKERS, MAX_WORKERS),
+                                   help="Tesisatlar bina numarasına göre parçalanıp bu kadar süreçte değerlendirilir")
     
     st.markdown("---")
     st.markdown("### ✅ Kaçak Kriterleri")
@@ -41,7 +57,8 @@ uploaded_file = st.file_uploader("📁 Excel Dosyası Yükleyin", type=['xlsx',
 
 if uploaded_file:
     try:
-        df = pd.read_excel(uploaded_file)
+        df = cached_frame(uploaded_file, 'gmz.read_xlsx', lambda f: read_pivot_xlsx(f, ['tn', 'bn']),
+                          params={'decimal_comma': False})
         df.columns = df.columns.str.strip()
         
         ay_cols = [col for col in df.columns if col not in ['tn', 'bn']]
@@ -54,150 +71,123 @@ if uploaded_file:
         
         with st.spinner("🔍 Detaylı analiz yapılıyor..."):
             
-            kariddat_list = []
+            # Kimlikler int32 kodlara, tüketimler float32 matrise çevrilir;
+            # bina ortalamaları aynı bina sözlüğüyle tek geçişte indekslenir
+            kompakt = intern_frame(df, 'tn', 'bn', ay_cols)
+            tn_text = decode_ids(kompakt['tesisat'], kompakt['vocabs']['tesisat'])
+            bn_text = decode_ids(kompakt['bina'], kompakt['vocabs']['bina'])
+            bina_index = build_building_index(df['bn'], kompakt['values'], vocab=kompakt['vocabs']['bina'])
             
-            for idx, row in df.iterrows():
-                tn = row['tn']
-                bn = row['bn']
-                tuketim = row[ay_cols].values
-                
-                # Bina kontrolü
-                bina_df = df[df['bn'] == bn]
-                if len(bina_df) < min_bina_daire:
-                    continue
-                
-                bina_ort = bina_df[ay_cols].mean()
-                
-                # KRİTER 1: Bina Anomalisi
-                bina_dusuk_aylar = []
-                for i, ay in enumerate(ay_cols):
-                    b_ort = bina_ort[ay]
-                    t_val = tuketim[i]
-                    
-                    if b_ort > min_normal_tuketim:
-                        fark_pct = ((b_ort - t_val) / b_ort) * 100
-                        if fark_pct > bina_fark_esigi:
-                            bina_dusuk_aylar.append({
-                                'ay': ay,
-                                'tuketim': t_val,
-                                'bina_ort': b_ort,
-                                'fark': fark_pct
-                            })
-                
-                kriter1 = len(bina_dusuk_aylar) >= 4
-                
-                # KRİTER 2: Ani Düşüş
-                ani_dusus_list = []
-                for i in range(1, len(tuketim)):
-                    onceki = tuketim[i-1]
-                    simdiki = tuketim[i]
-                    
-                    if onceki > min_normal_tuketim:
-                        dusus_pct = ((onceki - simdiki) / onceki) * 100
-                        if dusus_pct > ani_dusus_esigi:
-                            ani_dusus_list.append({
-                                'ay': ay_cols[i],
-                                'onceki': onceki,
-                                'simdiki': simdiki,
-                                'dusus': dusus_pct
-                            })
-                
-                kriter2 = len(ani_dusus_list) >= 2
-                
-                # KRİTER 3: Sürekli Düşük Tüketim
-                dusuk_seri = 0
-                max_dusuk_seri = 0
-                for val in tuketim:
-                    if val < min_normal_tuketim:
-                        dusuk_seri += 1
-                        max_dusuk_seri = max(max_dusuk_seri, dusuk_seri)
-                    else:
-                        dusuk_seri = 0
-                
-                kriter3 = max_dusuk_seri >= min_dusuk_ay
-                
-                # KRİTER 4: Sıfır Dönem
-                sifir_seri = 0
-                max_sifir_seri = 0
-                for val in tuketim:
-                    if val == 0:
-                        sifir_seri += 1
-                        max_sifir_seri = max(max_sifir_seri, sifir_seri)
-                    else:
-                        sifir_seri = 0
-                
-                kriter4 = max_sifir_seri >= 3
-                
-                # Kriterleri say
-                kriter_sayisi = sum([kriter1, kriter2, kriter3, kriter4])
+            # Tesisat özellikleri (ortalamalar, bina ortalaması) veri sürümü başına bir kez, özellik deposundan
+            ozellikler = matrix_features(st.session_state, ('gmz', file_hash(uploaded_file)),
+                                         kompakt['values'], ay_cols, bina_index)
+            pozitif_ort = ozellikler['pozitif_ort'].to_numpy()
+            bina_ay_ort = ozellikler['bina_ay_ort'].to_numpy()
+            
+            # Dört kriter ve risk puanı tüm tesisatlar için matris üzerinde
+            # (bina bazlı parçalar halinde paralel süreçlerde, matris paylaşımlı bellekte)
+            ilerleme = st.progress(0.0)
+            sonuc = evaluate_criteria_sharded(
+                kompakt['values'], kompakt['bina'], workers=paralel_isci, progress=ilerleme.progress,
+                state=st.session_state, anahtar=('gmz', file_hash(uploaded_file)),
+                min_normal_tuketim=min_normal_tuketim, bina_fark_esigi=bina_fark_esigi,
+                ani_dusus_esigi=ani_dusus_esigi, min_dusuk_ay=min_dusuk_ay, min_bina_daire=min_bina_daire
+            )
+            ilerleme.empty()
+            
+            # Adaylar dizilerde kalır; ayrıntı sözlüğü yalnızca gösterilen / dışa aktarılan tesisatlar için kurulur
+            adaylar = np.flatnonzero(sonuc['aday'])
+            
+            def aday_ozeti(pos):
+                kriterler = sonuc['kriterler'][pos]
+                max_dusuk_seri = int(sonuc['max_dusuk_seri'][pos])
+                max_sifir_seri = int(sonuc['max_sifir_seri'][pos])
                 
-                # Risk puanı hesapla
-                risk_puan = 0
-                if kriter1:
-                    risk_puan += len(bina_dusuk_aylar) * 15
-                if kriter2:
-                    risk_puan += len(ani_dusus_list) * 20
-                if kriter3:
-                    risk_puan += max_dusuk_seri * 10
-                if kriter4:
-                    risk_puan += max_sifir_seri * 12
+                # Sebepler
+                sebepler = []
+                if kriterler & KRITER_BINA:
+                    sebepler.append(f"🏢 {int(sonuc['bina_sayisi'][pos])} ay binadan %{bina_fark_esigi}+ düşük")
+                if kriterler & KRITER_DUSUS:
+                    sebepler.append(f"📉 {int(sonuc['dusus_sayisi'][pos])} kez %{ani_dusus_esigi}+ ani düşüş")
+                if kriterler & KRITER_DUSUK:
+                    sebepler.append(f"⬇️ {max_dusuk_seri} ay sürekli düşük tüketim")
+                if kriterler & KRITER_SIFIR:
+                    sebepler.append(f"⭕ {max_sifir_seri} ay sıfır tüketim")
                 
-                # KARAR: En az 2 kriter VE 80+ puan
-                if kriter_sayisi >= 2 and risk_puan >= 80:
-                    
-                    # Sebepler
-                    sebepler = []
-                    if kriter1:
-                        sebepler.append(f"🏢 {len(bina_dusuk_aylar)} ay binadan %{bina_fark_esigi}+ düşük")
-                    if kriter2:
-                        sebepler.append(f"📉 {len(ani_dusus_list)} kez %{ani_dusus_esigi}+ ani düşüş")
-                    if kriter3:
-                        sebepler.append(f"⬇️ {max_dusuk_seri} ay sürekli düşük tüketim")
-                    if kriter4:
-                        sebepler.append(f"⭕ {max_sifir_seri} ay sıfır tüketim")
-                    
-                    # Ortalamalar
-                    pozitif_tuketim = tuketim[tuketim > 0]
-                    ort_tuketim = np.mean(pozitif_tuketim) if len(pozitif_tuketim) > 0 else 0
-                    
-                    kariddat_list.append({
-                        'tn': tn,
-                        'bn': bn,
-                        'risk_puan': risk_puan,
-                        'kriter_sayisi': kriter_sayisi,
-                        'sebepler': sebepler,
-                        'bina_daire': len(bina_df),
-                        'ort_tuketim': ort_tuketim,
-                        'bina_ort_genel': bina_ort.mean(),
-                        'bina_anomali': bina_dusuk_aylar,
-                        'ani_dusus': ani_dusus_list,
-                        'max_dusuk_seri': max_dusuk_seri if kriter3 else 0,
-                        'max_sifir_seri': max_sifir_seri if kriter4 else 0
-                    })
+                return {
+                    'tn': tn_text[pos],
+                    'bn': bn_text[pos],
+                    'risk_puan': int(sonuc['risk_puan'][pos]),
+                    'kriter_sayisi': int(sonuc['kriter_sayisi'][pos]),
+                    'sebepler': sebepler,
+                    'bina_daire': int(sonuc['bina_daire'][pos]),
+                    'bina_kodu': bina_index['codes'][pos],
+                    'pos': pos,
+                    'ort_tuketim': float(pozitif_ort[pos]),
+                    'bina_ort_genel': bina_ay_ort[pos],
+                    'max_dusuk_seri': max_dusuk_seri if kriterler & KRITER_DUSUK else 0,
+                    'max_sifir_seri': max_sifir_seri if kriterler & KRITER_SIFIR else 0
+                }
             
-            # Sırala
-            kariddat_list.sort(key=lambda x: x['risk_puan'], reverse=True)
+            def aday_detayi(pos):
+                item = aday_ozeti(pos)
+                tuketim = kompakt['values'][pos]
+                bina_ort = bina_index['month_mean'][item['bina_kodu']]
+                item['bina_anomali'] = [{
+                    'ay': ay_cols[i],
+                    'tuketim': tuketim[i],
+                    'bina_ort': bina_ort[i],
+                    'fark': sonuc['bina_fark'][pos, i]
+                } for i in np.flatnonzero(sonuc['bina_dusuk'][pos])]
+                item['ani_dusus'] = [{
+                    'ay': ay_cols[i + 1],
+                    'onceki': tuketim[i],
+                    'simdiki': tuketim[i + 1],
+                    'dusus': sonuc['dusus_pct'][pos, i]
+                } for i in np.flatnonzero(sonuc['ani_dusus'][pos])]
+                return item
         
         # Sonuçlar
         st.success(f"✅ Analiz tamamlandı!")
         st.markdown("---")
         st.header("📊 Tespit Sonuçları")
         
-        if kariddat_list:
-            # Risk kategorileri
-            kritik = [k for k in kariddat_list if k['risk_puan'] >= 150]
-            yuksek = [k for k in kariddat_list if 100 <= k['risk_puan'] < 150]
-            orta = [k for k in kariddat_list if 80 <= k['risk_puan'] < 100]
+        if len(adaylar):
+            # Risk kategorileri tek geçişte (0: orta, 1: yüksek, 2: kritik)
+            kategori = bucket_codes(sonuc['risk_puan'][adaylar], RISK_SINIRLARI)
+            orta, yuksek, kritik = np.bincount(kategori, minlength=3).tolist()
             
             col1, col2, col3, col4 = st.columns(4)
             with col1:
-                st.metric("🚨 Toplam Şüpheli", len(kariddat_list))
+                st.metric("🚨 Toplam Şüpheli", len(adaylar))
             with col2:
-                st.metric("🔴 Kritik (150+)", len(kritik))
+                st.metric("🔴 Kritik (150+)", kritik)
             with col3:
-                st.metric("🟠 Yüksek (100-149)", len(yuksek))
+                st.metric("🟠 Yüksek (100-149)", yuksek)
             with col4:
-                st.metric("🟡 Orta (80-99)", len(orta))
+                st.metric("🟡 Orta (80-99)", orta)
+            
+            # Eşik taraması: bir eşiğin ızgarasında şüpheli sayısı (diğer eşikler kenar çubuğundaki)
+            with st.expander("🎚️ Eşik Taraması"):
+                tarama = {
+                    'bina_fark_esigi': ("Bina Fark Eşiği (%)", 50, 90, bina_fark_esigi),
+                    'ani_dusus_esigi': ("Ani Düşüş (%)", 60, 95, ani_dusus_esigi),
+                    'min_dusuk_ay': ("Min Düşük Tüketim Süresi (Ay)", 3, 8, min_dusuk_ay),
+                }
+                param = st.selectbox("Taranacak Eşik", list(tarama), format_func=lambda p: tarama[p][0],
+                                     key='esik_taramasi')
+                etiket, alt, ust, mevcut = tarama[param]
+                grid = np.arange(alt, ust + 1)
+                sayilar = criteria_sweep(
+                    kompakt['values'], bina_index['codes'], bina_index['month_mean'], bina_index['sizes'],
+                    param, grid, min_normal_tuketim=min_normal_tuketim, bina_fark_esigi=bina_fark_esigi,
+                    ani_dusus_esigi=ani_dusus_esigi, min_dusuk_ay=min_dusuk_ay, min_bina_daire=min_bina_daire
+                )
+                fig = go.Figure(go.Scatter(x=grid, y=sayilar, mode='lines+markers', line=dict(color='red')))
+                fig.add_vline(x=mevcut, line_dash='dash', line_color='gray')
+                fig.update_layout(xaxis_title=etiket, yaxis_title='Şüpheli Tesisat', height=300)
+                st.plotly_chart(fig, use_container_width=True)
+                st.caption(f"Mevcut değer ({mevcut}): {len(adaylar)} şüpheli")
             
             st.markdown("---")
             
@@ -205,23 +195,17 @@ if uploaded_file:
             st.subheader("🔍 Şüpheli Tesisatlar")
             risk_filter = st.multiselect(
                 "Risk Seviyesi",
-                ["Kritik (150+)", "Yüksek (100-149)", "Orta (80-99)"],
+                list(RISK_KATEGORILERI),
                 default=["Kritik (150+)", "Yüksek (100-149)"]
             )
             
-            filtered = []
-            if "Kritik (150+)" in risk_filter:
-                filtered.extend(kritik)
-            if "Yüksek (100-149)" in risk_filter:
-                filtered.extend(yuksek)
-            if "Orta (80-99)" in risk_filter:
-                filtered.extend(orta)
-            
-            filtered.sort(key=lambda x: x['risk_puan'], reverse=True)
+            filtered = adaylar[np.isin(kategori, [RISK_KATEGORILERI[r] for r in risk_filter])]
             
             st.info(f"📋 Gösterilen: {len(filtered)} tesisat")
             
-            for i, item in enumerate(filtered[:50], 1):
+            # Yalnızca ilk 50 seçilip sıralanır
+            for i, pos in enumerate(top_k(sonuc['risk_puan'], GOSTERIM_SAYISI, filtered), 1):
+                item = aday_detayi(pos)
                 
                 # Risk rengi
                 if item['risk_puan'] >= 150:
@@ -240,8 +224,8 @@ if uploaded_file:
                     
                     with col1:
                         # Grafik
-                        t_data = df[df['tn'] == item['tn']][ay_cols].values[0]
-                        b_data = df[df['bn'] == item['bn']][ay_cols].mean().values
+                        t_data = kompakt['values'][item['pos']]
+                        b_data = bina_index['month_mean'][item['bina_kodu']]
                         
                         fig = go.Figure()
                         fig.add_trace(go.Scatter(
@@ -317,13 +301,13 @@ if uploaded_file:
             st.markdown("---")
             st.subheader("📥 Excel Raporu")
             
-            def create_excel(kariddat_list, df, ay_cols):
+            def create_excel(kariddat_list, values, ay_cols):
                 output = BytesIO()
                 
                 with pd.ExcelWriter(output, engine='openpyxl') as writer:
                     rows = []
                     for k in kariddat_list:
-                        t_row = df[df['tn'] == k['tn']].iloc[0]
+                        t_row = values[k['pos']]
                         
                         row = {
                             'Tesisat No': k['tn'],
@@ -336,8 +320,9 @@ if uploaded_file:
                             'Tespit Sebepleri': ' | '.join(k['sebepler'])
                         }
                         
-                        for ay in ay_cols:
-                            row[ay] = t_row[ay]
+                        # float32 değer en kısa ondalık gösterimiyle yazılır (12.3, 12.300000190734863 değil)
+                        for i, ay in enumerate(ay_cols):
+                            row[ay] = float(str(t_row[i]))
                         
                         rows.append(row)
                     
@@ -375,7 +360,9 @@ if uploaded_file:
                 output2.seek(0)
                 return output2.getvalue()
             
-            excel_data = create_excel(kariddat_list, df, ay_cols)
+            # Rapor tüm adayları risk puanına göre sıralı içerir
+            sirali = top_k(sonuc['risk_puan'], len(adaylar), adaylar)
+            excel_data = create_excel([aday_ozeti(pos) for pos in sirali], kompakt['values'], ay_cols)
             st.download_button(
                 "📊 Excel Raporu İndir",
                 data=excel_data,
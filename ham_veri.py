@@ -5,6 +5,18 @@ import plotly.express as px
 import plotly.graph_objects as go
 import warnings
 from io import BytesIO
+from paralel import DEFAULT_WORKERS, MAX_WORKERS
+from is_kuyrugu import job_result
+from sonuc_deposu import (export_excel, group_keys, group_rows, result_key, select_rows,
+                          session_results, sort_rows, table)
+from pivot_motoru import pivot_records
+from onbellek import cached_frame, file_hash
+from tespit_paneli import (SONUC_ETIKETLERI, YUVARLANAN_SUTUNLAR, SUPHELI_SUTUNLARI,
+                           TUM_SONUC_SUTUNLARI, SIRALAMA_SECENEKLERI,
+                           analysis_params, analyze_consumption_patterns, rescore_thresholds,
+                           show_rule_set, show_threshold_sweep)
+from akis_okuma import stream_raw_csv
+from kimlik import normalize_ids
 
 warnings.filterwarnings('ignore')
 
@@ -25,6 +37,11 @@ uploaded_file = st.sidebar.file_uploader(
     type=['csv', 'xlsx', 'xls'],
     help="Tesisat numarası, bina numarası ve aylık tüketim verilerini içeren dosya"
 )
+akisli_okuma = st.sidebar.checkbox(
+    "Büyük ham CSV için akışlı okuma",
+    value=False,
+    help="Ham CSV parça parça okunup doğrudan pivot tabloya toplanır; dosyanın tamamı belleğe alınmaz"
+)
 
 # -------------------- Parametreler --------------------
 st.sidebar.header("⚙️ Analiz Parametreleri")
@@ -52,6 +69,12 @@ min_onceki_kis_tuketim = st.sidebar.slider(
     help="Ani düşüş tespiti için önceki kış aylarında minimum tüketim"
 )
 
+paralel_isci = st.sidebar.number_input(
+    "Paralel işçi sayısı",
+    min_value=1, max_value=MAX_WORKERS, value=min(DEFAULT_WORKERS, MAX_WORKERS),
+    help="Analiz bina numarasına göre parçalanıp bu kadar süreçte çalıştırılır (1 = tek süreç)"
+)
+
 # -------------------- Yardımcılar --------------------
 def load_data(file):
     """Dosyayı yükle ve temizle"""
@@ -74,6 +97,32 @@ def load_data(file):
         st.error(f"Dosya yükleme hatası: {str(e)}")
         return None
 
+def load_raw_csv_streaming(file):
+    """Ham CSV'yi parça parça okuyup pivot formata dönüştür (akışlı mod)"""
+    try:
+        st.info("🔄 Ham CSV parça parça okunuyor ve pivot formata toplanıyor...")
+        ilerleme = st.progress(0.0)
+        final_df, rapor = stream_raw_csv(file, progress=ilerleme.progress)
+
+        st.write(f"✓ Kolon eşleştirmesi: {rapor['kolon_eslesme']}")
+        st.write(f"📊 Veri temizleme raporu ({rapor['parca_sayisi']} parça):")
+        st.write(f"   • Başlangıç: {rapor['baslangic']:,} kayıt")
+        st.write(f"   • Tarih temizleme sonrası: {rapor['tarih_sonrasi']:,} kayıt")
+        st.write(f"   • Son temizlik sonrası: {rapor['son']:,} kayıt")
+
+        if final_df.empty:
+            st.error("❌ Temizleme sonrası veri kalmadı!")
+            return None
+
+        if rapor['duplicate_grup'] > 0:
+            st.write(f"⚠️ {rapor['duplicate_grup']} adet duplicate grup bulundu, toplamları alındı")
+        st.write(f"   • Toplam tüketim: {rapor['toplam_tuketim']:,.0f} m³")
+        st.write(f"✅ Pivot table oluşturuldu: {len(final_df)} satır x {len(final_df.columns)} sütun")
+        return final_df
+    except Exception as e:
+        st.error(f"❌ Akışlı okuma hatası: {str(e)}")
+        return None
+
 def detect_data_format(df):
     """Veri formatını tespit et"""
     columns = [col.lower().strip() for col in df.columns]
@@ -163,9 +212,9 @@ def convert_raw_to_pivot(df):
             df_clean['belge_tarihi'], errors='coerce', dayfirst=True
         )
         
-        # String sütunları temizle
-        df_clean['tesisat_no'] = df_clean['tesisat_no'].astype(str).str.strip()
-        df_clean['bina_no'] = df_clean['bina_no'].astype(str).str.strip()
+        # Kimlikleri normalize et (boşluk, '123.0', 'nan' / 'None' -> eksik)
+        df_clean['tesisat_no'] = normalize_ids(df_clean['tesisat_no'])
+        df_clean['bina_no'] = normalize_ids(df_clean['bina_no'])
         
         # Geçersiz kayıtları temizle
         df_clean = df_clean.dropna(subset=['belge_tarihi'])
@@ -180,15 +229,11 @@ def convert_raw_to_pivot(df):
         # Yıl/ay sütunu oluştur
         df_clean['yil_ay'] = df_clean['belge_tarihi'].dt.strftime('%Y/%m')
         
-        # 'nan' string değerlerini ve boş değerleri temizle
+        # Eksik kimlikli kayıtları temizle
         df_clean = df_clean[
-            (df_clean['tesisat_no'] != 'nan') & 
-            (df_clean['bina_no'] != 'nan') & 
-            (df_clean['yil_ay'].notna()) &
-            (df_clean['tesisat_no'] != '') & 
-            (df_clean['bina_no'] != '') &
-            (df_clean['tesisat_no'] != 'None') & 
-            (df_clean['bina_no'] != 'None')
+            df_clean['tesisat_no'].notna() &
+            df_clean['bina_no'].notna() &
+            df_clean['yil_ay'].notna()
         ]
         
         final_clean_size = len(df_clean)
@@ -213,56 +258,23 @@ def convert_raw_to_pivot(df):
         st.write(f"   • Tarih aralığı: {df_clean['yil_ay'].min()} - {df_clean['yil_ay'].max()}")
         st.write(f"   • Toplam tüketim: {df_clean['tuketim'].sum():,.0f} m³")
         
-        # Duplicate kontrolü ve birleştirme
-        st.info("🔄 Veriler gruplandırılıyor...")
-        
-        # Önce duplicate kontrolü yapalım
-        duplicates = df_clean.groupby(['tesisat_no', 'bina_no', 'yil_ay']).size()
-        duplicate_count = (duplicates > 1).sum()
-        if duplicate_count > 0:
-            st.write(f"⚠️ {duplicate_count} adet duplicate grup bulundu, toplamları alınacak")
-        
-        # Gruplama ve toplama işlemi
-        grouped_df = df_clean.groupby(
-            ['tesisat_no', 'bina_no', 'yil_ay'], as_index=False
-        )['tuketim'].sum()
-        
-        st.write(f"✓ Gruplandırma tamamlandı: {len(grouped_df):,} benzersiz kayıt")
-        
-        # Manuel pivot işlemi - Dictionary tabanlı
-        st.info("📊 Pivot table oluşturuluyor...")
+        # Gruplama ve pivot: kodlara çevrilip tek geçişte yoğun matrise toplanır
+        st.info("🔄 Veriler gruplandırılıyor ve pivot table oluşturuluyor...")
+        final_df, pivot_bilgi = pivot_records(
+            df_clean['tesisat_no'].to_numpy(),
+            df_clean['bina_no'].to_numpy(),
+            df_clean['yil_ay'].to_numpy(),
+            df_clean['tuketim'].to_numpy()
+        )
         
-        # Tüm benzersiz değerleri al
-        unique_tesisats = sorted(grouped_df['tesisat_no'].unique())
-        unique_binas = sorted(grouped_df['bina_no'].unique())  
-        unique_dates = sorted(grouped_df['yil_ay'].unique())
+        if pivot_bilgi['duplicate_grup'] > 0:
+            st.write(f"⚠️ {pivot_bilgi['duplicate_grup']} adet duplicate grup bulundu, toplamları alınacak")
+        st.write(f"✓ Gruplandırma tamamlandı: {pivot_bilgi['grup_sayisi']:,} benzersiz kayıt")
         
         st.write(f"📈 Pivot boyutları:")
-        st.write(f"   • Tesisat sayısı: {len(unique_tesisats)}")
-        st.write(f"   • Bina sayısı: {len(unique_binas)}")
-        st.write(f"   • Tarih sayısı: {len(unique_dates)}")
-        
-        # Pivot dictionary'si oluştur
-        pivot_dict = {}
-        
-        # Her grup için pivot dictionary'yi doldur
-        for _, row in grouped_df.iterrows():
-            key = (row['tesisat_no'], row['bina_no'])
-            date = row['yil_ay']
-            value = row['tuketim']
-            
-            if key not in pivot_dict:
-                pivot_dict[key] = {'tesisat_no': row['tesisat_no'], 'bina_no': row['bina_no']}
-                # Tüm tarihleri 0 ile başlat
-                for d in unique_dates:
-                    pivot_dict[key][d] = 0
-            
-            # Değeri güncelle
-            pivot_dict[key][date] = value
-        
-        # Dictionary'yi DataFrame'e çevir
-        pivot_rows = list(pivot_dict.values())
-        final_df = pd.DataFrame(pivot_rows)
+        st.write(f"   • Tesisat sayısı: {pivot_bilgi['tesisat_sayisi']}")
+        st.write(f"   • Bina sayısı: {pivot_bilgi['bina_sayisi']}")
+        st.write(f"   • Tarih sayısı: {pivot_bilgi['tarih_sayisi']}")
         
         # Sütun sırasını düzenle
         date_cols = [col for col in final_df.columns if col not in ['tesisat_no', 'bina_no']]
@@ -309,12 +321,6 @@ def convert_raw_to_pivot(df):
                     st.write("- İlk 3 satır:")
                     st.dataframe(df_clean.head(3))
                     
-            if 'grouped_df' in locals():
-                st.write("**grouped_df bilgileri:**")
-                st.write(f"- Shape: {grouped_df.shape}")
-                st.write("- Sample:")
-                st.dataframe(grouped_df.head(3))
-                
         except Exception as debug_error:
             st.write(f"Debug bilgileri alınamadı: {debug_error}")
             
@@ -353,138 +359,14 @@ def get_season(month):
     else:
         return "Sonbahar"
 
-def analyze_consumption_patterns(df, date_columns, tesisat_col, bina_col):
-    """Tüketim paternlerini analiz et"""
-    results = []
-
-    for _, row in df.iterrows():
-        tesisat_no = row[tesisat_col]
-        bina_no = row[bina_col]
-
-        # Aylık tüketim verilerini al
-        consumption_data = []
-        for date_col in date_columns:
-            try:
-                value = row[date_col]
-                if pd.notna(value) and value != '':
-                    year, month = date_col.split('/')
-                    consumption_data.append({
-                        'year': int(year),
-                        'month': int(month),
-                        'consumption': float(value) if value != 0 else 0,
-                        'season': get_season(int(month)),
-                        'date_str': date_col
-                    })
-            except Exception:
-                continue
-
-        if not consumption_data:
-            continue
-
-        cons_df = pd.DataFrame(consumption_data).sort_values(['year', 'month'])
-
-        # Mevsimsel ortalamalar (sıfır olmayan)
-        nonzero = cons_df[cons_df['consumption'] > 0]
-        seasonal_avg = nonzero.groupby('season')['consumption'].mean() if not nonzero.empty else pd.Series(dtype=float)
-
-        kis_tuketim = float(seasonal_avg.get('Kış', 0) or 0)
-        yaz_tuketim = float(seasonal_avg.get('Yaz', 0) or 0)
-
-        anomalies = []
-
-        # 1) Kış düşük tüketim
-        if 0 < kis_tuketim < kis_tuketim_esigi:
-            anomalies.append(f"Kış ayı düşük tüketim: {kis_tuketim:.1f} m³/ay")
-
-        # 2) Kış-yaz farkı az
-        if kis_tuketim > 0 and yaz_tuketim > 0:
-            if abs(kis_tuketim - yaz_tuketim) < 10:
-                anomalies.append(f"Kış-yaz tüketim farkı az: Kış {kis_tuketim:.1f}, Yaz {yaz_tuketim:.1f}")
-
-        # 3) Toplam çok düşük
-        total_consumption = cons_df['consumption'].sum()
-        if total_consumption < 100:
-            anomalies.append(f"Toplam tüketim çok düşük: {total_consumption:.1f} m³")
-
-        # 4) Çok fazla sıfır
-        zero_months = int((cons_df['consumption'] == 0).sum())
-        if zero_months > 6:
-            anomalies.append(f"Çok fazla sıfır tüketim: {zero_months} ay")
-
-        # 5) Kış aylarında ani düşüş
-        kis_aylari = cons_df[cons_df['season'] == 'Kış'].copy()
-        if len(kis_aylari) >= 4:
-            kis_yillik = kis_aylari.groupby('year')['consumption'].mean()
-            yillik_ort = kis_yillik[kis_yillik > 0]
-            if len(yillik_ort) >= 2:
-                yillar = sorted(yillik_ort.index)
-                for i in range(1, len(yillar)):
-                    oy, my = yillar[i-1], yillar[i]
-                    onceki, mevcut = yillik_ort[oy], yillik_ort[my]
-                    if (onceki >= min_onceki_kis_tuketim and
-                        mevcut < onceki * (1 - ani_dusus_orani/100)):
-                        dus = ((onceki - mevcut) / onceki) * 100
-                        anomalies.append(
-                            f"Ani kış düşüşü: {oy} ({onceki:.1f}) → {my} ({mevcut:.1f}), %{dus:.1f} düşüş"
-                        )
-
-                if len(yillar) >= 2:
-                    oy, my = yillar[-2], yillar[-1]
-                    onceki, mevcut = yillik_ort[oy], yillik_ort[my]
-                    if (onceki >= min_onceki_kis_tuketim and
-                        mevcut < onceki * (1 - ani_dusus_orani/100)):
-                        dus = ((onceki - mevcut) / onceki) * 100
-                        anomalies.append(f"Son yıl ani düşüş: {oy} → {my}, %{dus:.1f} düşüş")
-
-        # 6) Bina ortalaması karşılaştırma
-        bina_tesisatlari = df[df[bina_col] == bina_no]
-        if len(bina_tesisatlari) > 1:
-            bina_tuketimleri = []
-            for _, br in bina_tesisatlari.iterrows():
-                vals = []
-                for dc in date_columns:
-                    v = br.get(dc, np.nan)
-                    if pd.notna(v) and float(v) > 0:
-                        vals.append(float(v))
-                if vals:
-                    bina_tuketimleri.append(np.mean(vals))
-
-            if len(bina_tuketimleri) > 1:
-                bina_ort = float(np.mean(bina_tuketimleri))
-                mevcut_ort = float(nonzero['consumption'].mean()) if not nonzero.empty else 0
-                if mevcut_ort > 0 and mevcut_ort < bina_ort * (1 - bina_ort_dusuk_oran/100):
-                    anomalies.append(f"Bina ortalamasından %{bina_ort_dusuk_oran} düşük: {mevcut_ort:.1f} vs {bina_ort:.1f}")
-
-        # Kış trend etiketi
-        kis_trend = "Stabil"
-        if len(kis_aylari) >= 4:
-            kis_yillik = kis_aylari.groupby('year')['consumption'].mean()
-            yillik_ort = kis_yillik[kis_yillik > 0]
-            if len(yillik_ort) >= 2:
-                yillar = sorted(yillik_ort.index)
-                ilk_yil = yillik_ort[yillar[0]]
-                son_yil = yillik_ort[yillar[-1]]
-                if son_yil < ilk_yil * 0.5:
-                    kis_trend = "Şiddetli Düşüş"
-                elif son_yil < ilk_yil * 0.7:
-                    kis_trend = "Orta Düşüş"
-                elif son_yil > ilk_yil * 1.5:
-                    kis_trend = "Artış"
-
-        results.append({
-            'tesisat_no': tesisat_no,
-            'bina_no': bina_no,
-            'kis_tuketim': kis_tuketim,
-            'yaz_tuketim': yaz_tuketim,
-            'toplam_tuketim': total_consumption,
-            'ortalama_tuketim': float(nonzero['consumption'].mean()) if not nonzero.empty else 0,
-            'kis_trend': kis_trend,
-            'anomali_sayisi': len(anomalies),
-            'anomaliler': '; '.join(anomalies) if anomalies else 'Normal',
-            'suspicion_level': 'Şüpheli' if anomalies else 'Normal'
-        })
-
-    return pd.DataFrame(results)
+def current_thresholds():
+    """Kenar çubuğundaki eşik değerleri"""
+    return dict(
+        kis_tuketim_esigi=kis_tuketim_esigi,
+        bina_ort_dusuk_oran=bina_ort_dusuk_oran,
+        ani_dusus_orani=ani_dusus_orani,
+        min_onceki_kis_tuketim=min_onceki_kis_tuketim,
+    )
 
 def create_visualizations(results_df, original_df, date_columns):
     """Görselleştirmeler oluştur"""
@@ -559,7 +441,10 @@ def create_visualizations(results_df, original_df, date_columns):
 
 # -------------------- Ana uygulama --------------------
 if uploaded_file is not None:
-    df = load_data(uploaded_file)
+    if akisli_okuma and uploaded_file.name.lower().endswith('.csv'):
+        df = cached_frame(uploaded_file, 'ham_veri.stream_raw_csv', load_raw_csv_streaming)
+    else:
+        df = cached_frame(uploaded_file, 'ham_veri.load_data', load_data)
 
     if df is not None:
         st.success("✅ Dosya başarıyla yüklendi!")
@@ -568,7 +453,8 @@ if uploaded_file is not None:
 
         if data_format == 'raw':
             st.info("🔄 Raw veri formatı tespit edildi. Pivot formata dönüştürülüyor...")
-            df_pivot = convert_raw_to_pivot(df)
+            df_pivot = cached_frame(uploaded_file, 'ham_veri.convert_raw_to_pivot',
+                                    lambda _: convert_raw_to_pivot(df))
 
             if df_pivot is not None:
                 st.success("✅ Veri başarıyla pivot formata dönüştürüldü!")
@@ -612,6 +498,14 @@ if uploaded_file is not None:
             st.write(f"**Tespit edilen tarih sütunları:** {len(date_columns)} adet")
             st.write(f"Tarih aralığı: {rng[0]} - {rng[-1]}")
 
+        # Analiz arka planda çalışır; sonuç oturumda ve diskte (dosya özeti + eşikler) saklanır.
+        # Eşik değişince oturumdaki özelliklerden anında yeniden puanlanır;
+        # filtre / sıralama değişiklikleri analizi yeniden çalıştırmaz
+        uygulama_anahtari = ('ham_veri', file_hash(uploaded_file), akisli_okuma)
+        sonuc_anahtari = result_key(file_hash(uploaded_file), 'ham_veri.analiz',
+                                    analysis_params(date_columns, tesisat_col, bina_col, current_thresholds(),
+                                                    akisli_okuma=akisli_okuma))
+
         # Analiz butonu
         if st.button("🔍 Anomali Analizini Başlat", type="primary"):
             if not date_columns:
@@ -619,97 +513,94 @@ if uploaded_file is not None:
             elif not tesisat_col or not bina_col:
                 st.error("❌ Lütfen tesisat ve bina sütunlarını seçin!")
             else:
-                with st.spinner("Analiz yapılıyor..."):
-                    results_df = analyze_consumption_patterns(df, date_columns, tesisat_col, bina_col)
-
-                    if not results_df.empty:
-                        st.subheader("📈 Analiz Sonuçları")
-                        c1, c2, c3, c4 = st.columns(4)
-                        with c1: st.metric("Toplam Tesisat", len(results_df))
-                        with c2:
-                            suspicious_count = int((results_df['suspicion_level'] == 'Şüpheli').sum())
-                            st.metric("Şüpheli Tesisat", suspicious_count)
-                        with c3:
-                            if len(results_df) > 0:
-                                suspicious_rate = (suspicious_count / len(results_df)) * 100
-                                st.metric("Şüpheli Oran", f"{suspicious_rate:.1f}%")
-                        with c4:
-                            total_anomalies = int(results_df['anomali_sayisi'].sum())
-                            st.metric("Toplam Anomali", total_anomalies)
-
-                        # Görselleştirmeler
-                        st.subheader("📊 Görselleştirmeler")
-                        create_visualizations(results_df, df, date_columns)
-
-                        # Şüpheli tesisatlar
-                        st.subheader("🚨 Şüpheli Tesisatlar")
-                        suspicious_df = results_df[results_df['suspicion_level'] == 'Şüpheli'].copy()
-
-                        if not suspicious_df.empty:
-                            display_cols = ['tesisat_no', 'bina_no', 'kis_tuketim', 'yaz_tuketim',
-                                            'ortalama_tuketim', 'kis_trend', 'anomali_sayisi', 'anomaliler']
-                            suspicious_display = suspicious_df[display_cols].copy()
-                            suspicious_display.columns = ['Tesisat No', 'Bina No', 'Kış Tüketim',
-                                                          'Yaz Tüketim', 'Ortalama Tüketim', 'Kış Trend',
-                                                          'Anomali Sayısı', 'Anomaliler']
-                            for col in ['Kış Tüketim', 'Yaz Tüketim', 'Ortalama Tüketim']:
-                                suspicious_display[col] = suspicious_display[col].round(1)
-
-                            st.dataframe(suspicious_display, use_container_width=True, hide_index=True)
-
-                            buffer = BytesIO()
-                            with pd.ExcelWriter(buffer, engine='openpyxl') as writer:
-                                suspicious_display.to_excel(writer, index=False, sheet_name='Şüpheli Tesisatlar')
-                            st.download_button(
-                                label="📥 Şüpheli Tesisatları İndir (Excel)",
-                                data=buffer.getvalue(),
-                                file_name="supheli_tesisatlar.xlsx",
-                                mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
-                            )
-                        else:
-                            st.success("🎉 Şüpheli tesisat bulunamadı!")
-
-                        # Tüm Sonuçlar
-                        st.subheader("📋 Tüm Sonuçlar")
-
-                        filter_col1, filter_col2 = st.columns(2)
-                        with filter_col1:
-                            suspicion_filter = st.selectbox("Şüpheli Durumu", options=['Tümü', 'Şüpheli', 'Normal'], index=0)
-                        with filter_col2:
-                            bina_list = sorted(results_df['bina_no'].dropna().astype(str).unique().tolist()) if not results_df.empty else []
-                            bina_filter = st.selectbox("Bina Numarası", options=['Tümü'] + bina_list, index=0)
-
-                        filtered_df = results_df.copy()
-                        if suspicion_filter != 'Tümü':
-                            filtered_df = filtered_df[filtered_df['suspicion_level'] == suspicion_filter]
-                        if bina_filter != 'Tümü':
-                            filtered_df = filtered_df[filtered_df['bina_no'] == bina_filter]
-
-                        if not filtered_df.empty:
-                            display_cols = ['tesisat_no', 'bina_no', 'kis_tuketim', 'yaz_tuketim',
-                                            'ortalama_tuketim', 'kis_trend', 'suspicion_level', 'anomaliler']
-                            filtered_display = filtered_df[display_cols].copy()
-                            filtered_display.columns = ['Tesisat No', 'Bina No', 'Kış Tüketim',
-                                                        'Yaz Tüketim', 'Ortalama Tüketim', 'Kış Trend',
-                                                        'Durum', 'Anomaliler']
-                            for col in ['Kış Tüketim', 'Yaz Tüketim', 'Ortalama Tüketim']:
-                                filtered_display[col] = filtered_display[col].round(1)
-
-                            st.dataframe(filtered_display, use_container_width=True, hide_index=True)
-
-                            buffer_all = BytesIO()
-                            with pd.ExcelWriter(buffer_all, engine='openpyxl') as writer:
-                                filtered_display.to_excel(writer, index=False, sheet_name='Tüm Sonuçlar')
-                            st.download_button(
-                                label="📥 Filtrelenmiş Sonuçları İndir (Excel)",
-                                data=buffer_all.getvalue(),
-                                file_name="dogalgaz_analiz_sonuclari.xlsx",
-                                mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
-                            )
-                        else:
-                            st.warning("Filtreye uygun veri bulunamadı.")
-                    else:
-                        st.warning("⚠️ Analiz sonucunda veri oluşmadı. Lütfen veri formatını kontrol edin.")
+                analyze_consumption_patterns(df, date_columns, tesisat_col, bina_col, sonuc_anahtari,
+                                             uygulama_anahtari, current_thresholds(), paralel_isci)
+        
+        sonuc = session_results(
+            'ham_veri.sonuc', sonuc_anahtari, ['suspicion_level', 'bina_no'], SONUC_ETIKETLERI, YUVARLANAN_SUTUNLAR,
+            fresh=job_result('ham_veri.analiz', key=sonuc_anahtari),
+            rescore=lambda: rescore_thresholds(df, date_columns, tesisat_col, bina_col, uygulama_anahtari,
+                                               current_thresholds())
+        )
+        results_df = sonuc['df'] if sonuc is not None else None
+        if results_df is not None:
+            if not results_df.empty:
+                st.subheader("📈 Analiz Sonuçları")
+                c1, c2, c3, c4 = st.columns(4)
+                suspicious_rows = group_rows(sonuc, 'suspicion_level', 'Şüpheli')
+                with c1: st.metric("Toplam Tesisat", len(results_df))
+                with c2:
+                    suspicious_count = len(suspicious_rows)
+                    st.metric("Şüpheli Tesisat", suspicious_count)
+                with c3:
+                    if len(results_df) > 0:
+                        suspicious_rate = (suspicious_count / len(results_df)) * 100
+                        st.metric("Şüpheli Oran", f"{suspicious_rate:.1f}%")
+                with c4:
+                    total_anomalies = int(results_df['anomali_sayisi'].sum())
+                    st.metric("Toplam Anomali", total_anomalies)
+
+                # Eşik taraması (özelliklerden, bütün ızgara tek geçişte)
+                show_threshold_sweep(date_columns, bina_col, uygulama_anahtari, current_thresholds())
+                
+                # Kural seti (özellik tablosu üzerinde, kural birleşimleri tek geçişte)
+                show_rule_set(df, date_columns, tesisat_col, bina_col, uygulama_anahtari, current_thresholds())
+                
+                # Görselleştirmeler
+                st.subheader("📊 Görselleştirmeler")
+                create_visualizations(results_df, df, date_columns)
+
+                # Şüpheli tesisatlar (grup indeksinden, yeniden filtrelemeden)
+                st.subheader("🚨 Şüpheli Tesisatlar")
+
+                if suspicious_count > 0:
+                    suspicious_display = table(sonuc, suspicious_rows, SUPHELI_SUTUNLARI)
+                    st.dataframe(suspicious_display, use_container_width=True, hide_index=True)
+
+                    st.download_button(
+                        label="📥 Şüpheli Tesisatları İndir (Excel)",
+                        data=export_excel(sonuc, 'supheli', suspicious_display, 'Şüpheli Tesisatlar'),
+                        file_name="supheli_tesisatlar.xlsx",
+                        mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+                    )
+                else:
+                    st.success("🎉 Şüpheli tesisat bulunamadı!")
+
+                # Tüm Sonuçlar
+                st.subheader("📋 Tüm Sonuçlar")
+
+                filter_col1, filter_col2, filter_col3 = st.columns(3)
+                with filter_col1:
+                    suspicion_filter = st.selectbox("Şüpheli Durumu", options=['Tümü', 'Şüpheli', 'Normal'], index=0)
+                with filter_col2:
+                    bina_filter = st.selectbox("Bina Numarası", options=['Tümü'] + group_keys(sonuc, 'bina_no'), index=0)
+                with filter_col3:
+                    siralama = st.selectbox("Sıralama", options=['Varsayılan'] + list(SIRALAMA_SECENEKLERI), index=0)
+                    azalan = st.checkbox("Azalan sıra", value=True)
+
+                # Filtre / sıralama: grup indeksi dilimleri ve hazır sıra numaraları
+                filtered_rows = select_rows(sonuc, {
+                    'suspicion_level': None if suspicion_filter == 'Tümü' else suspicion_filter,
+                    'bina_no': None if bina_filter == 'Tümü' else bina_filter,
+                })
+                if siralama != 'Varsayılan':
+                    filtered_rows = sort_rows(sonuc, filtered_rows, SIRALAMA_SECENEKLERI[siralama], ascending=not azalan)
+
+                if len(filtered_rows) > 0:
+                    filtered_display = table(sonuc, filtered_rows, TUM_SONUC_SUTUNLARI)
+                    st.dataframe(filtered_display, use_container_width=True, hide_index=True)
+
+                    st.download_button(
+                        label="📥 Filtrelenmiş Sonuçları İndir (Excel)",
+                        data=export_excel(sonuc, ('tum', suspicion_filter, bina_filter, siralama, azalan),
+                                          filtered_display, 'Tüm Sonuçlar'),
+                        file_name="dogalgaz_analiz_sonuclari.xlsx",
+                        mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+                    )
+                else:
+                    st.warning("Filtreye uygun veri bulunamadı.")
+            else:
+                st.warning("⚠️ Analiz sonucunda veri oluşmadı. Lütfen veri formatını kontrol edin.")
 
 else:
     st.info("👈 Lütfen sol panelden bir dosya yükleyin")
@@ -811,7 +702,7 @@ if uploaded_file is not None and 'df' in locals():
     
     # Tesisat bazında detay analiz
     if st.sidebar.button("🔍 Tesisat Detay Analizi"):
-        if 'results_df' in locals() and not results_df.empty:
+        if 'results_df' in locals() and results_df is not None and not results_df.empty:
             st.subheader("🔍 Tesisat Detay Analizi")
             
             # Tesisat seçimi
@@ -894,7 +785,7 @@ if uploaded_file is not None and 'df' in locals():
     
     # Bina bazında karşılaştırma
     if st.sidebar.button("🏢 Bina Karşılaştırması"):
-        if 'results_df' in locals() and not results_df.empty:
+        if 'results_df' in locals() and results_df is not None and not results_df.empty:
             st.subheader("🏢 Bina Bazında Karşılaştırma")
             
             # Bina seçimi
@@ -948,7 +839,7 @@ if uploaded_file is not None and 'df' in locals():
     
     # Excel rapor oluşturucu
     if st.sidebar.button("📄 Detaylı Excel Raporu"):
-        if 'results_df' in locals() and not results_df.empty and 'df' in locals():
+        if 'results_df' in locals() and results_df is not None and not results_df.empty and 'df' in locals():
             st.subheader("📄 Detaylı Excel Raporu Oluşturuluyor...")
             
             with st.spinner("Rapor hazırlanıyor..."):
@@ -4,7 +4,15 @@ import numpy as np
 import plotly.express as px
 import plotly.graph_objects as go
 import warnings
-from io import BytesIO
+from paralel import DEFAULT_WORKERS, MAX_WORKERS
+from is_kuyrugu import job_result
+from sonuc_deposu import export_excel, group_rows, result_key, session_results, table
+from pivot_motoru import pivot_records
+from onbellek import cached_frame, file_hash
+from tespit_paneli import (SONUC_ETIKETLERI, YUVARLANAN_SUTUNLAR, SUPHELI_SUTUNLARI,
+                           analysis_params, analyze_consumption_patterns, rescore_thresholds,
+                           show_rule_set, show_threshold_sweep)
+from kimlik import normalize_ids
 
 warnings.filterwarnings('ignore')
 
@@ -52,6 +60,12 @@ min_onceki_kis_tuketim = st.sidebar.slider(
     help="Ani düşüş tespiti için önceki kış aylarında minimum tüketim"
 )
 
+paralel_isci = st.sidebar.number_input(
+    "Paralel işçi sayısı",
+    min_value=1, max_value=MAX_WORKERS, value=min(DEFAULT_WORKERS, MAX_WORKERS),
+    help="Analiz bina numarasına göre parçalanıp bu kadar süreçte çalıştırılır (1 = tek süreç)"
+)
+
 # -------------------- Yardımcılar --------------------
 def load_data(file):
     """Dosyayı yükle ve temizle"""
@@ -140,9 +154,9 @@ def convert_raw_to_pivot(df):
             df_clean['tuketim'], errors='coerce'
         )
         
-        # String sütunları temizle
-        df_clean['tesisat_no'] = df_clean['tesisat_no'].astype(str).str.strip()
-        df_clean['bina_no'] = df_clean['bina_no'].astype(str).str.strip()
+        # Kimlikleri normalize et (boşluk, '123.0', 'nan' / 'None' -> eksik)
+        df_clean['tesisat_no'] = normalize_ids(df_clean['tesisat_no'])
+        df_clean['bina_no'] = normalize_ids(df_clean['bina_no'])
         
         # Geçersiz kayıtları temizle
         df_clean = df_clean.dropna(subset=['belge_tarihi', 'tesisat_no', 'bina_no'])
@@ -152,40 +166,19 @@ def convert_raw_to_pivot(df):
         df_clean['yil_ay'] = df_clean['belge_tarihi'].dt.strftime('%Y/%m')
         
         # Boş kayıtları temizle
-        df_clean = df_clean[
-            (df_clean['tesisat_no'] != 'nan') & 
-            (df_clean['bina_no'] != 'nan') & 
-            (df_clean['yil_ay'].notna())
-        ]
+        df_clean = df_clean[df_clean['yil_ay'].notna()]
         
         if df_clean.empty:
             st.error("Temizleme sonrası veri kalmadı!")
             return None
         
-        # Veriyi grupla ve topla
-        grouped_df = df_clean.groupby(
-            ['tesisat_no', 'bina_no', 'yil_ay'], as_index=False
-        )['tuketim'].sum()
-        
-        # Manuel pivot işlemi (pivot_table problemi için)
-        pivot_data = []
-        
-        # Tüm benzersiz tarih değerlerini al
-        all_dates = sorted(grouped_df['yil_ay'].unique())
-        
-        # Her tesisat-bina çifti için bir satır oluştur
-        for (tesisat, bina), group in grouped_df.groupby(['tesisat_no', 'bina_no']):
-            row_data = {'tesisat_no': tesisat, 'bina_no': bina}
-            
-            # Her tarih için tüketim değerini ekle
-            for date in all_dates:
-                date_data = group[group['yil_ay'] == date]['tuketim']
-                row_data[date] = date_data.iloc[0] if not date_data.empty else 0
-            
-            pivot_data.append(row_data)
-        
-        # DataFrame'e dönüştür
-        final_df = pd.DataFrame(pivot_data)
+        # Veriyi grupla ve pivotla (kodlara çevrilip tek geçişte toplanır)
+        final_df, _ = pivot_records(
+            df_clean['tesisat_no'].to_numpy(),
+            df_clean['bina_no'].to_numpy(),
+            df_clean['yil_ay'].to_numpy(),
+            df_clean['tuketim'].to_numpy()
+        )
         
         # Tarih sütunlarını sırala
         date_cols = [c for c in final_df.columns if c not in ['tesisat_no', 'bina_no']]
@@ -232,138 +225,14 @@ def get_season(month):
     else:
         return "Sonbahar"
 
-def analyze_consumption_patterns(df, date_columns, tesisat_col, bina_col):
-    """Tüketim paternlerini analiz et"""
-    results = []
-
-    for _, row in df.iterrows():
-        tesisat_no = row[tesisat_col]
-        bina_no = row[bina_col]
-
-        # Aylık tüketim verilerini al
-        consumption_data = []
-        for date_col in date_columns:
-            try:
-                value = row[date_col]
-                if pd.notna(value) and value != '':
-                    year, month = date_col.split('/')
-                    consumption_data.append({
-                        'year': int(year),
-                        'month': int(month),
-                        'consumption': float(value) if value != 0 else 0,
-                        'season': get_season(int(month)),
-                        'date_str': date_col
-                    })
-            except Exception:
-                continue
-
-        if not consumption_data:
-            continue
-
-        cons_df = pd.DataFrame(consumption_data).sort_values(['year', 'month'])
-
-        # Mevsimsel ortalamalar (sıfır olmayan)
-        nonzero = cons_df[cons_df['consumption'] > 0]
-        seasonal_avg = nonzero.groupby('season')['consumption'].mean() if not nonzero.empty else pd.Series(dtype=float)
-
-        kis_tuketim = float(seasonal_avg.get('Kış', 0) or 0)
-        yaz_tuketim = float(seasonal_avg.get('Yaz', 0) or 0)
-
-        anomalies = []
-
-        # 1) Kış düşük tüketim
-        if 0 < kis_tuketim < kis_tuketim_esigi:
-            anomalies.append(f"Kış ayı düşük tüketim: {kis_tuketim:.1f} m³/ay")
-
-        # 2) Kış-yaz farkı az
-        if kis_tuketim > 0 and yaz_tuketim > 0:
-            if abs(kis_tuketim - yaz_tuketim) < 10:
-                anomalies.append(f"Kış-yaz tüketim farkı az: Kış {kis_tuketim:.1f}, Yaz {yaz_tuketim:.1f}")
-
-        # 3) Toplam çok düşük
-        total_consumption = cons_df['consumption'].sum()
-        if total_consumption < 100:
-            anomalies.append(f"Toplam tüketim çok düşük: {total_consumption:.1f} m³")
-
-        # 4) Çok fazla sıfır
-        zero_months = int((cons_df['consumption'] == 0).sum())
-        if zero_months > 6:
-            anomalies.append(f"Çok fazla sıfır tüketim: {zero_months} ay")
-
-        # 5) Kış aylarında ani düşüş
-        kis_aylari = cons_df[cons_df['season'] == 'Kış'].copy()
-        if len(kis_aylari) >= 4:
-            kis_yillik = kis_aylari.groupby('year')['consumption'].mean()
-            yillik_ort = kis_yillik[kis_yillik > 0]
-            if len(yillik_ort) >= 2:
-                yillar = sorted(yillik_ort.index)
-                for i in range(1, len(yillar)):
-                    oy, my = yillar[i-1], yillar[i]
-                    onceki, mevcut = yillik_ort[oy], yillik_ort[my]
-                    if (onceki >= min_onceki_kis_tuketim and
-                        mevcut < onceki * (1 - ani_dusus_orani/100)):
-                        dus = ((onceki - mevcut) / onceki) * 100
-                        anomalies.append(
-                            f"Ani kış düşüşü: {oy} ({onceki:.1f}) → {my} ({mevcut:.1f}), %{dus:.1f} düşüş"
-                        )
-
-                if len(yillar) >= 2:
-                    oy, my = yillar[-2], yillar[-1]
-                    onceki, mevcut = yillik_ort[oy], yillik_ort[my]
-                    if (onceki >= min_onceki_kis_tuketim and
-                        mevcut < onceki * (1 - ani_dusus_orani/100)):
-                        dus = ((onceki - mevcut) / onceki) * 100
-                        anomalies.append(f"Son yıl ani düşüş: {oy} → {my}, %{dus:.1f} düşüş")
-
-        # 6) Bina ortalaması karşılaştırma
-        bina_tesisatlari = df[df[bina_col] == bina_no]
-        if len(bina_tesisatlari) > 1:
-            bina_tuketimleri = []
-            for _, br in bina_tesisatlari.iterrows():
-                vals = []
-                for dc in date_columns:
-                    v = br.get(dc, np.nan)
-                    if pd.notna(v) and float(v) > 0:
-                        vals.append(float(v))
-                if vals:
-                    bina_tuketimleri.append(np.mean(vals))
-
-            if len(bina_tuketimleri) > 1:
-                bina_ort = float(np.mean(bina_tuketimleri))
-                mevcut_ort = float(nonzero['consumption'].mean()) if not nonzero.empty else 0
-                if mevcut_ort > 0 and mevcut_ort < bina_ort * (1 - bina_ort_dusuk_oran/100):
-                    anomalies.append(f"Bina ortalamasından %{bina_ort_dusuk_oran} düşük: {mevcut_ort:.1f} vs {bina_ort:.1f}")
-
-        # Kış trend etiketi
-        kis_trend = "Stabil"
-        if len(kis_aylari) >= 4:
-            kis_yillik = kis_aylari.groupby('year')['consumption'].mean()
-            yillik_ort = kis_yillik[kis_yillik > 0]
-            if len(yillik_ort) >= 2:
-                yillar = sorted(yillik_ort.index)
-                ilk_yil = yillik_ort[yillar[0]]
-                son_yil = yillik_ort[yillar[-1]]
-                if son_yil < ilk_yil * 0.5:
-                    kis_trend = "Şiddetli Düşüş"
-                elif son_yil < ilk_yil * 0.7:
-                    kis_trend = "Orta Düşüş"
-                elif son_yil > ilk_yil * 1.5:
-                    kis_trend = "Artış"
-
-        results.append({
-            'tesisat_no': tesisat_no,
-            'bina_no': bina_no,
-            'kis_tuketim': kis_tuketim,
-            'yaz_tuketim': yaz_tuketim,
-            'toplam_tuketim': total_consumption,
-            'ortalama_tuketim': float(nonzero['consumption'].mean()) if not nonzero.empty else 0,
-            'kis_trend': kis_trend,
-            'anomali_sayisi': len(anomalies),
-            'anomaliler': '; '.join(anomalies) if anomalies else 'Normal',
-            'suspicion_level': 'Şüpheli' if anomalies else 'Normal'
-        })
-
-    return pd.DataFrame(results)
+def current_thresholds():
+    """Kenar çubuğundaki eşik değerleri"""
+    return dict(
+        kis_tuketim_esigi=kis_tuketim_esigi,
+        bina_ort_dusuk_oran=bina_ort_dusuk_oran,
+        ani_dusus_orani=ani_dusus_orani,
+        min_onceki_kis_tuketim=min_onceki_kis_tuketim,
+    )
 
 def create_visualizations(results_df, original_df, date_columns):
     """Görselleştirmeler oluştur"""
@@ -438,7 +307,7 @@ def create_visualizations(results_df, original_df, date_columns):
 
 # -------------------- Ana uygulama --------------------
 if uploaded_file is not None:
-    df = load_data(uploaded_file)
+    df = cached_frame(uploaded_file, 'hamveri2.load_data', load_data)
 
     if df is not None:
         st.success("✅ Dosya başarıyla yüklendi!")
@@ -447,7 +316,8 @@ if uploaded_file is not None:
 
         if data_format == 'raw':
             st.info("🔄 Raw veri formatı tespit edildi. Pivot formata dönüştürülüyor...")
-            df_pivot = convert_raw_to_pivot(df)
+            df_pivot = cached_frame(uploaded_file, 'hamveri2.convert_raw_to_pivot',
+                                    lambda _: convert_raw_to_pivot(df))
 
             if df_pivot is not None:
                 st.success("✅ Veri başarıyla pivot formata dönüştürüldü!")
@@ -491,6 +361,13 @@ if uploaded_file is not None:
             st.write(f"**Tespit edilen tarih sütunları:** {len(date_columns)} adet")
             st.write(f"Tarih aralığı: {rng[0]} - {rng[-1]}")
 
+        # Analiz arka planda çalışır; sonuç oturumda ve diskte (dosya özeti + eşikler) saklanır.
+        # Eşik değişince oturumdaki özelliklerden anında yeniden puanlanır;
+        # diğer widget değişiklikleri analizi yeniden çalıştırmaz
+        uygulama_anahtari = ('hamveri2', file_hash(uploaded_file))
+        sonuc_anahtari = result_key(file_hash(uploaded_file), 'hamveri2.analiz',
+                                    analysis_params(date_columns, tesisat_col, bina_col, current_thresholds()))
+
         # Analiz butonu
         if st.button("🔍 Anomali Analizini Başlat", type="primary"):
             if not date_columns:
@@ -498,52 +375,55 @@ if uploaded_file is not None:
             elif not tesisat_col or not bina_col:
                 st.error("❌ Lütfen tesisat ve bina sütunlarını seçin!")
             else:
-                with st.spinner("Analiz yapılıyor..."):
-                    results_df = analyze_consumption_patterns(df, date_columns, tesisat_col, bina_col)
-
-                    if not results_df.empty:
-                        st.subheader("📈 Analiz Sonuçları")
-                        c1, c2, c3, c4 = st.columns(4)
-                        with c1: st.metric("Toplam Tesisat", len(results_df))
-                        with c2:
-                            suspicious_count = int((results_df['suspicion_level'] == 'Şüpheli').sum())
-                            st.metric("Şüpheli Tesisat", suspicious_count)
-                        with c3:
-                            if len(results_df) > 0:
-                                suspicious_rate = (suspicious_count / len(results_df)) * 100
-                                st.metric("Şüpheli Oran", f"{suspicious_rate:.1f}%")
-                        with c4:
-                            total_anomalies = int(results_df['anomali_sayisi'].sum())
-                            st.metric("Toplam Anomali", total_anomalies)
-
-                        # Görselleştirmeler
-                        st.subheader("📊 Görselleştirmeler")
-                        create_visualizations(results_df, df, date_columns)
-
-                        # Şüpheli tesisatlar
-                        st.subheader("🚨 Şüpheli Tesisatlar")
-                        suspicious_df = results_df[results_df['suspicion_level'] == 'Şüpheli'].copy()
-
-                        if not suspicious_df.empty:
-                            display_cols = ['tesisat_no', 'bina_no', 'kis_tuketim', 'yaz_tuketim',
-                                            'ortalama_tuketim', 'kis_trend', 'anomali_sayisi', 'anomaliler']
-                            suspicious_display = suspicious_df[display_cols].copy()
-                            suspicious_display.columns = ['Tesisat No', 'Bina No', 'Kış Tüketim',
-                                                          'Yaz Tüketim', 'Ortalama Tüketim', 'Kış Trend',
-                                                          'Anomali Sayısı', 'Anomaliler']
-                            for col in ['Kış Tüketim', 'Yaz Tüketim', 'Ortalama Tüketim']:
-                                suspicious_display[col] = suspicious_display[col].round(1)
-
-                            st.dataframe(suspicious_display, use_container_width=True, hide_index=True)
-
-                            buffer = BytesIO()
-                            with pd.ExcelWriter(buffer, engine='openpyxl') as writer:
-                                suspicious_display.to_excel(writer, index=False, sheet_name='Şüpheli Tesisatlar')
-                            st.download_button(
-                                label="📥 Şüpheli Tesisatları İndir (Excel)",
-                                data=buffer.getvalue(),
-                                file_name="supheli_tesisatlar.xlsx",
-                                mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
-                            )
-                        else:
-                            st.success("🎉 Şüpheli tesisat bulunamadı!")
+                analyze_consumption_patterns(df, date_columns, tesisat_col, bina_col, sonuc_anahtari,
+                                             uygulama_anahtari, current_thresholds(), paralel_isci)
+        
+        sonuc = session_results(
+            'hamveri2.sonuc', sonuc_anahtari, ['suspicion_level', 'bina_no'], SONUC_ETIKETLERI, YUVARLANAN_SUTUNLAR,
+            fresh=job_result('hamveri2.analiz', key=sonuc_anahtari),
+            rescore=lambda: rescore_thresholds(df, date_columns, tesisat_col, bina_col, uygulama_anahtari,
+                                               current_thresholds())
+        )
+        results_df = sonuc['df'] if sonuc is not None else None
+        if results_df is not None:
+            if not results_df.empty:
+                st.subheader("📈 Analiz Sonuçları")
+                c1, c2, c3, c4 = st.columns(4)
+                suspicious_rows = group_rows(sonuc, 'suspicion_level', 'Şüpheli')
+                with c1: st.metric("Toplam Tesisat", len(results_df))
+                with c2:
+                    suspicious_count = len(suspicious_rows)
+                    st.metric("Şüpheli Tesisat", suspicious_count)
+                with c3:
+                    if len(results_df) > 0:
+                        suspicious_rate = (suspicious_count / len(results_df)) * 100
+                        st.metric("Şüpheli Oran", f"{suspicious_rate:.1f}%")
+                with c4:
+                    total_anomalies = int(results_df['anomali_sayisi'].sum())
+                    st.metric("Toplam Anomali", total_anomalies)
+
+                # Eşik taraması (özelliklerden, bütün ızgara tek geçişte)
+                show_threshold_sweep(date_columns, bina_col, uygulama_anahtari, current_thresholds())
+                
+                # Kural seti (özellik tablosu üzerinde, kural birleşimleri tek geçişte)
+                show_rule_set(df, date_columns, tesisat_col, bina_col, uygulama_anahtari, current_thresholds())
+                
+                # Görselleştirmeler
+                st.subheader("📊 Görselleştirmeler")
+                create_visualizations(results_df, df, date_columns)
+
+                # Şüpheli tesisatlar (grup indeksinden, yeniden filtrelemeden)
+                st.subheader("🚨 Şüpheli Tesisatlar")
+
+                if suspicious_count > 0:
+                    suspicious_display = table(sonuc, suspicious_rows, SUPHELI_SUTUNLARI)
+                    st.dataframe(suspicious_display, use_container_width=True, hide_index=True)
+
+                    st.download_button(
+                        label="📥 Şüpheli Tesisatları İndir (Excel)",
+                        data=export_excel(sonuc, 'supheli', suspicious_display, 'Şüpheli Tesisatlar'),
+                        file_name="supheli_tesisatlar.xlsx",
+                        mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+                    )
+                else:
+                    st.success("🎉 Şüpheli tesisat bulunamadı!")
@@ -0,0 +1,209 @@
+"""Uzun analizler için arka plan iş yürütücüsü.
+
+Analiz butonları işi betik içinde çalıştırmak yerine süreç genelinde
+paylaşılan bir iş parçacığı havuzuna gönderir; iş kimliği
+`st.session_state`te tutulur. Böylece widget etkileşimleri (yeniden
+çalıştırmalar) analizi kesmez:
+
+- İlerleme, işin kaydına yazılır ve sayfa `st.fragment(run_every=...)` ile
+  yoklanır; iş bitince sayfa bir kez yeniden çalıştırılır.
+- İptal işbirlikçidir: iş fonksiyonuna verilen `progress` geri çağrısı,
+  iptal istenmişse `IsIptalEdildi` fırlatır; henüz başlamamış iş kuyruktan
+  düşülür.
+- Aynı anahtarlı (dosya özeti + parametreler) iş tekrar istenirse, başka bir
+  oturumdan da olsa, yeni iş açılmaz; çalışan / biten iş paylaşılır. İş,
+  ona bağlı son oturum da bıraktığında iptal edilir.
+
+İş fonksiyonları Streamlit çağrısı yapmamalıdır (arka plan iş parçacığında
+betik bağlamı yoktur).
+
+Ayarlar:
+    ANOMALI_ES_ZAMANLI_IS  - aynı anda çalışan en fazla iş (varsayılan: 2)
+"""
+import os
+import threading
+import time
+import traceback
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+import streamlit as st
+
+ES_ZAMANLI_IS = int(os.environ.get('ANOMALI_ES_ZAMANLI_IS', 2))
+# Biten işlerin sonuçları bu süre (sn) boyunca saklanır
+SONUC_SURESI = 3600
+YOKLAMA_SURESI = 1.0
+
+_executor = ThreadPoolExecutor(max_workers=ES_ZAMANLI_IS, thread_name_prefix='analiz')
+_lock = threading.Lock()
+_jobs = {}     # iş kimliği -> iş kaydı
+_by_key = {}   # iş anahtarı -> iş kimliği (yinelenen işler için)
+
+
+class IsIptalEdildi(Exception):
+    """İş kullanıcı tarafından iptal edildi"""
+
+
+def _run(job, fn, args, kwargs):
+    if job['iptal'].is_set():
+        job['durum'] = 'iptal'
+        return
+    # Panel 'calisiyor' durumunu gördüğünde başlangıç zamanı hazır olmalı
+    job['baslangic'] = time.time()
+    job['durum'] = 'calisiyor'
+
+    def progress(oran):
+        if job['iptal'].is_set():
+            raise IsIptalEdildi()
+        job['ilerleme'] = float(oran)
+
+    try:
+        job['sonuc'] = fn(*args, progress=progress, **kwargs)
+        job['ilerleme'] = 1.0
+        job['durum'] = 'bitti'
+    except IsIptalEdildi:
+        job['durum'] = 'iptal'
+    except Exception as e:
+        job['hata'] = f"{e}\n{traceback.format_exc()}"
+        job['durum'] = 'hata'
+    finally:
+        job['bitis'] = time.time()
+        if job['durum'] != 'bitti':
+            with _lock:
+                if _by_key.get(job['key']) == job['id']:
+                    del _by_key[job['key']]
+
+
+def _prune():
+    """Süresi dolan veya sahipsiz kalan biten işleri sil"""
+    simdi = time.time()
+    for job_id, job in list(_jobs.items()):
+        if job['bitis'] is None:
+            continue
+        if not job['sahipler'] or simdi - job['bitis'] > SONUC_SURESI:
+            del _jobs[job_id]
+            if _by_key.get(job['key']) == job_id:
+                del _by_key[job['key']]
+
+
+def submit_job(key, sahip, fn, *args, **kwargs):
+    """`fn(*args, progress=..., **kwargs)` işini kuyruğa ekle, iş kimliğini döndür
+
+    key: işin kimliği (aynı anahtarlı çalışan / biten iş varsa o döner),
+    sahip: işi isteyen oturumun belirteci.
+    """
+    with _lock:
+        _prune()
+        job = _jobs.get(_by_key.get(key))
+        if job is not None:
+            job['sahipler'].add(sahip)
+            return job['id']
+
+        job_id = uuid.uuid4().hex[:12]
+        job = {
+            'id': job_id,
+            'key': key,
+            'durum': 'bekliyor',
+            'ilerleme': 0.0,
+            'sonuc': None,
+            'hata': None,
+            'iptal': threading.Event(),
+            'sahipler': {sahip},
+            'olusturma': time.time(),
+            'baslangic': None,
+            'bitis': None,
+        }
+        _jobs[job_id] = job
+        _by_key[key] = job_id
+        job['future'] = _executor.submit(_run, job, fn, args, kwargs)
+    return job_id
+
+
+def release_job(job_id, sahip):
+    """Oturumun işle bağını kopar; başka sahibi kalmayan süren iş iptal edilir"""
+    with _lock:
+        job = _jobs.get(job_id)
+        if job is None:
+            return
+        job['sahipler'].discard(sahip)
+        if job['sahipler'] or job['bitis'] is not None:
+            return
+        job['iptal'].set()
+        if _by_key.get(job['key']) == job_id:
+            del _by_key[job['key']]
+        if job['future'].cancel():
+            job['durum'] = 'iptal'
+            job['bitis'] = time.time()
+
+
+def job_status(job_id):
+    """İş kaydı (bilinmiyorsa None)"""
+    return _jobs.get(job_id)
+
+
+# -------------------- Streamlit yardımcıları --------------------
+def _session_token():
+    if '_is_oturumu' not in st.session_state:
+        st.session_state['_is_oturumu'] = uuid.uuid4().hex
+    return st.session_state['_is_oturumu']
+
+
+def start_job(slot, key, fn, *args, **kwargs):
+    """Oturumun `slot` adlı işini başlat (aynı slottaki önceki iş bırakılır)"""
+    sahip = _session_token()
+    onceki = st.session_state.get(slot)
+    job_id = submit_job(key, sahip, fn, *args, **kwargs)
+    if onceki is not None and onceki != job_id:
+        release_job(onceki, sahip)
+    st.session_state[slot] = job_id
+    return job_id
+
+
+def cancel_job(slot):
+    """Oturumun `slot` işini iptal et (başka oturum da bekliyorsa iş sürer)"""
+    job_id = st.session_state.pop(slot, None)
+    if job_id is not None:
+        release_job(job_id, _session_token())
+
+
+@st.fragment(run_every=YOKLAMA_SURESI)
+def _job_panel(slot, job_id, etiket):
+    job = _jobs.get(job_id)
+    if job is None or job['bitis'] is not None:
+        st.rerun()
+        return
+    if job['durum'] == 'bekliyor' or job['baslangic'] is None:
+        st.info(f"⏳ {etiket}: sırada bekliyor...")
+    else:
+        sure = time.time() - job['baslangic']
+        st.progress(job['ilerleme'], text=f"⚙️ {etiket}: %{job['ilerleme'] * 100:.0f} ({sure:.0f} sn)")
+    if st.button("⏹️ İptal Et", key=f"{slot}_iptal"):
+        cancel_job(slot)
+        st.rerun()
+
+
+def job_result(slot, etiket="Analiz", key=None):
+    """Oturumun `slot` işinin sonucu
+
+    İş sürüyorsa ilerleme çubuğu ve iptal butonu gösterilir ve None döner;
+    hata / iptal durumunda mesaj gösterilir ve None döner. key verilirse
+    yalnızca o anahtarla başlatılmış işin sonucu döner.
+    """
+    job_id = st.session_state.get(slot)
+    if job_id is None:
+        return None
+    job = _jobs.get(job_id)
+    if job is None:
+        st.session_state.pop(slot, None)
+        return None
+    if job['durum'] == 'bitti':
+        return job['sonuc'] if key is None or job['key'] == key else None
+    if job['durum'] == 'hata':
+        st.error(f"❌ {etiket} başarısız oldu:")
+        st.code(job['hata'])
+        return None
+    if job['durum'] == 'iptal':
+        st.warning(f"⏹️ {etiket} iptal edildi.")
+        return None
+    _job_panel(slot, job_id, etiket)
+    return None
@@ -0,0 +1,146 @@
+"""yenii.py kayıt bazlı anomali dedektörleri için gruplanmış vektörel motor.
+
+Kayıtlar bir kez tesisat (dosyadaki ilk görünüş sırası) ve tarih sırasına
+dizilir; bina ve kış yılı ortalamaları groupby ile, önceki yıl
+karşılaştırması tesisat içi `shift` ile, tesisat özeti ve Excel özet
+sayfaları adlandırılmış toplamalarla (named aggregation) hesaplanır.
+Tesisat başına filtreleme / sıralama veya grup başına Series kurulmaz.
+Çıktılar yenii.py'nin önceki satır döngüsü / `groupby.apply` sonuçlarıyla
+aynıdır (sütunlar ve satır sırası dahil).
+"""
+import numpy as np
+import pandas as pd
+
+from cekirdekler import segment_sums
+
+# Kış ayları (Kasım, Aralık, Ocak, Şubat)
+KIS_AYLARI = [11, 12, 1, 2]
+
+
+def winter_low(df, esik):
+    """Kış aylarında `esik` altındaki tüketim kayıtları"""
+    kis_verileri = df[df['ay'].isin(KIS_AYLARI)]
+    anomaliler = kis_verileri[kis_verileri['tuketim_miktari'] < esik].copy()
+    if anomaliler.empty:
+        return pd.DataFrame()
+    anomaliler['anomali_tipi'] = 'Kış Ayı Düşük Tüketim'
+    anomaliler['aciklama'] = f'{esik} sm³/ay altında kış tüketimi'
+    return anomaliler
+
+
+def building_low(df, oran):
+    """Bina kayıt ortalamasının %`oran`ının altındaki tüketim kayıtları (bina_ortalama sütunuyla)"""
+    # Her bina için ortalama tüketim, kayıtlara yayılmış (binası boş kayıtlarda NaN)
+    bina_ortalama = df.groupby('baglanti_nesnesi')['tuketim_miktari'].transform('mean').to_numpy(dtype=float)
+
+    maske = df['tuketim_miktari'].to_numpy(dtype=float) < bina_ortalama * (oran / 100)
+    anomaliler = df[maske].copy()
+    if anomaliler.empty:
+        return pd.DataFrame()
+    anomaliler['bina_ortalama'] = bina_ortalama[maske]
+    anomaliler['anomali_tipi'] = 'Bina Ortalamasından Düşük'
+    anomaliler['aciklama'] = f'Bina ortalamasından %{100-oran} daha düşük'
+    return anomaliler
+
+
+def sudden_drop(df, oran, min_tuketim):
+    """Kış ortalaması bir önceki yılın kışına göre %`oran`dan fazla düşen tesisat-yılların kış kayıtları
+
+    Önceki yılın kış ortalaması en az `min_tuketim` olmalıdır. Satırlar
+    tesisatın ilk görünüş sırası, yıl ve tarih sırasındadır.
+    """
+    kodlar, _ = pd.factorize(df['tuketim_noktasi'])
+    sira = np.lexsort((df['tarih'].to_numpy(), kodlar))
+    sira = sira[df['ay'].isin(KIS_AYLARI).to_numpy()[sira]]
+    kis = pd.DataFrame({
+        'kod': kodlar[sira],
+        'yil': df['yil'].to_numpy()[sira],
+        'tuketim': df['tuketim_miktari'].to_numpy()[sira],
+    })
+
+    # Tesisat-yıl kış ortalamaları ve tesisat içinde bir önceki kayıtlı yıl
+    gruplar = kis.groupby(['kod', 'yil'], sort=True)
+    yillik = gruplar['tuketim'].mean().reset_index(name='mevcut')
+    onceki_yil = yillik.groupby('kod')['yil'].shift()
+    onceki = yillik.groupby('kod')['mevcut'].shift().where(onceki_yil == yillik['yil'] - 1)
+    dusus = ((onceki >= min_tuketim) & (yillik['mevcut'] < onceki * ((100 - oran) / 100))).to_numpy()
+
+    grup = gruplar.ngroup().to_numpy()
+    secilen = dusus[grup]
+    if not secilen.any():
+        return pd.DataFrame()
+    anomaliler = df.iloc[sira[secilen]].reset_index(drop=True)
+    anomaliler['anomali_tipi'] = 'Ani Düşüş'
+    anomaliler['aciklama'] = [
+        f'%{oran} ani düşüş (Önceki: {o:.1f}, Mevcut: {m:.1f})'
+        for o, m in zip(onceki.to_numpy()[grup[secilen]], yillik['mevcut'].to_numpy()[grup[secilen]])
+    ]
+    return anomaliler
+
+
+def _unique_lists(df, keys, column):
+    """Grup başına sütunun benzersiz değerleri (ilk görünüş sırasıyla, liste olarak)"""
+    return df[keys + [column]].drop_duplicates().groupby(keys, sort=True)[column].agg(list)
+
+
+def _joined(lists, sep):
+    """`_unique_lists` listelerini `sep` ile birleştir (metin sütunu)"""
+    return lists.str.join(sep).astype(str)
+
+
+def facility_summary(anomali_df):
+    """Anomali kayıtlarından tesisat başına tek satır (tesisat numarasına göre sıralı)
+
+    Satır, tesisatın ilk anomali kaydıdır; anomali_tipi türlerin ' + ' ile
+    birleşimi, tarih_str tek tarih veya 'en küçük - en büyük', tuketim_miktari
+    ortalama; min_tuketim, max_tuketim ve anomali_sayisi eklenir.
+    """
+    kodlar, _ = pd.factorize(anomali_df['tuketim_noktasi'], sort=True)
+    ozet = anomali_df.iloc[np.unique(kodlar, return_index=True)[1]].reset_index(drop=True)
+
+    gruplu = anomali_df.assign(kod=kodlar)
+    stats = gruplu.groupby('kod', sort=True).agg(
+        min_tuketim=('tuketim_miktari', 'min'),
+        max_tuketim=('tuketim_miktari', 'max'),
+        anomali_sayisi=('tuketim_miktari', 'size'),
+        ilk_tarih=('tarih_str', 'min'),
+        son_tarih=('tarih_str', 'max'),
+        tarih_sayisi=('tarih_str', 'nunique'),
+    ).reset_index(drop=True)
+    turler = _unique_lists(gruplu, ['kod'], 'anomali_tipi').reset_index(drop=True)
+
+    # Ortalama: grup içi kayıt sırasıyla grup başına toplam / adet (Series.mean gibi)
+    sira = np.argsort(kodlar, kind='stable')
+    adet = stats['anomali_sayisi'].to_numpy()
+    baslangic = np.concatenate(([0], np.cumsum(adet)[:-1]))
+    toplam = segment_sums(anomali_df['tuketim_miktari'].to_numpy(dtype=float)[sira], baslangic, adet)
+
+    ozet['anomali_tipi'] = _joined(turler, ' + ')
+    ozet['tarih_str'] = stats['ilk_tarih'].where(stats['tarih_sayisi'] == 1,
+                                                 stats['ilk_tarih'] + ' - ' + stats['son_tarih'])
+    ozet['tuketim_miktari'] = toplam / adet
+    ozet['min_tuketim'] = stats['min_tuketim']
+    ozet['max_tuketim'] = stats['max_tuketim']
+    ozet['anomali_sayisi'] = stats['anomali_sayisi']
+    ozet['aciklama'] = ('Toplam ' + stats['anomali_sayisi'].astype(str) + ' anomali - ' +
+                        _joined(turler, ', '))
+    return ozet
+
+
+def summary_sheets(anomali_df):
+    """Excel 'Tesisat_Özeti' ve 'Bina_Özeti' sayfaları (indeksli, 2 basamak)"""
+    tesisat_anahtar = ['tuketim_noktasi', 'baglanti_nesnesi']
+    tesisat_ozet = anomali_df.groupby(tesisat_anahtar).agg(
+        Anomali_Sayısı=('tuketim_miktari', 'count'),
+        Ortalama_Tüketim=('tuketim_miktari', 'mean'),
+    )
+    tesisat_ozet.insert(0, 'Anomali_Türleri', _joined(_unique_lists(anomali_df, tesisat_anahtar, 'anomali_tipi'), ', '))
+    tesisat_ozet['Tarihler'] = _joined(_unique_lists(anomali_df, tesisat_anahtar, 'tarih_str'), ', ')
+
+    bina_ozet = anomali_df.groupby('baglanti_nesnesi').agg(
+        Tesisat_Sayısı=('tuketim_noktasi', 'nunique'),
+        Toplam_Anomali=('tuketim_miktari', 'count'),
+        Ortalama_Tüketim=('tuketim_miktari', 'mean'),
+    )
+    bina_ozet.insert(1, 'Anomali_Türleri', _joined(_unique_lists(anomali_df, ['baglanti_nesnesi'], 'anomali_tipi'), ', '))
+    return tesisat_ozet.round(2), bina_ozet.round(2)
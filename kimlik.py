@@ -0,0 +1,107 @@
+"""Tesisat / bina numaraları için kompakt kimlik katmanı.
+
+Kimlikler bir kez normalize edilir (boşluklar, Excel'in '123.0' / 123.0
+biçimleri, 'nan' / 'None' / boş değerler) ve paylaşılan bir sözlük üzerinden
+int32 kodlara çevrilir. Analizler kodlar üzerinde tamsayı karşılaştırmasıyla
+çalışır; metin yalnızca gösterim ve dışa aktarımda `decode_ids` ile geri
+üretilir. Tüketim matrisi float32 olarak tutulur.
+"""
+import re
+
+import numpy as np
+import pandas as pd
+
+MISSING_TOKENS = {'', 'nan', 'none', 'nat', '<na>', 'null'}
+_FLOAT_INT_RE = re.compile(r'^([+-]?\d+)\.0*$')
+
+
+def normalize_id(value):
+    """Tek bir kimlik değerini normalize et (eksikse None)"""
+    if value is None:
+        return None
+    if isinstance(value, (float, np.floating)):
+        if np.isnan(value):
+            return None
+        if float(value).is_integer():
+            return str(int(value))
+        return repr(float(value))
+    if isinstance(value, (int, np.integer)):
+        return str(int(value))
+    text = str(value).strip()
+    if text.lower() in MISSING_TOKENS:
+        return None
+    m = _FLOAT_INT_RE.match(text)
+    return m.group(1) if m else text
+
+
+def normalize_ids(values):
+    """Kimlik dizisini normalize et; dönüşüm yalnızca benzersiz değerlere uygulanır"""
+    codes, uniques = pd.factorize(pd.Series(values, dtype=object).reset_index(drop=True),
+                                  use_na_sentinel=False)
+    normalized = np.array([normalize_id(u) for u in uniques], dtype=object)
+    return normalized[codes] if len(codes) else np.empty(0, dtype=object)
+
+
+def new_vocab():
+    """Boş kimlik sözlüğü: keys (kod -> metin) ve index (metin -> kod)"""
+    return {'keys': [], 'index': {}}
+
+
+def encode_ids(values, vocab=None):
+    """Kimlikleri sözlükteki int32 kodlara çevir (eksik değerler -1)
+
+    Sözlük verilirse yeni kimlikler sona eklenir; aynı sözlüğü paylaşan
+    kaynaklar aynı kodları kullanır.
+    """
+    if vocab is None:
+        vocab = new_vocab()
+    codes, uniques = pd.factorize(pd.Series(values, dtype=object).reset_index(drop=True),
+                                  use_na_sentinel=False)
+    keys, index = vocab['keys'], vocab['index']
+    mapped = np.empty(len(uniques), dtype=np.int32)
+    for i, u in enumerate(uniques):
+        key = normalize_id(u)
+        if key is None:
+            mapped[i] = -1
+            continue
+        code = index.get(key)
+        if code is None:
+            code = index[key] = len(keys)
+            keys.append(key)
+        mapped[i] = code
+    return (mapped[codes] if len(codes) else np.empty(0, dtype=np.int32)), vocab
+
+
+def decode_ids(codes, vocab, missing=None):
+    """int32 kodları metin kimliklere çevir (gösterim / dışa aktarım için)"""
+    codes = np.asarray(codes)
+    keys = np.array(vocab['keys'] + [missing], dtype=object)
+    return keys[np.where(codes >= 0, codes, len(keys) - 1)]
+
+
+def lookup_code(vocab, value):
+    """Tek bir kimliğin kodu (sözlükte yoksa -1)"""
+    key = normalize_id(value)
+    return vocab['index'].get(key, -1) if key is not None else -1
+
+
+def intern_frame(df, tesisat_col, bina_col, value_cols, vocabs=None):
+    """Pivot tabloyu kompakt biçime çevir
+
+    Döner: {'tesisat', 'bina'}: int32 kodlar, 'values': float32 (tesisat x ay),
+    'value_cols', 'vocabs': {'tesisat', 'bina'} paylaşılan sözlükler
+    """
+    vocabs = vocabs or {'tesisat': new_vocab(), 'bina': new_vocab()}
+    tesisat, _ = encode_ids(df[tesisat_col], vocabs['tesisat'])
+    if bina_col is not None:
+        bina, _ = encode_ids(df[bina_col], vocabs['bina'])
+    else:
+        bina = np.full(len(df), -1, dtype=np.int32)
+    values = df[list(value_cols)].to_numpy(dtype=np.float32, na_value=np.nan)
+    return {
+        'tesisat': tesisat,
+        'bina': bina,
+        'values': values,
+        'value_cols': list(value_cols),
+        'vocabs': vocabs,
+    }
@@ -0,0 +1,161 @@
+"""gmz.py dört kriterli kaçak tespiti için matris motoru.
+
+Tüm tesisatlar (tesisat x ay) matrisi üzerinde tek seferde değerlendirilir:
+bina ortalamaları bina indeksinden (grup kodları) gelir, bina farkı ve aydan
+aya düşüş yüzdeleri toplu matrislerle, en uzun düşük / sıfır tüketim serileri
+tek geçişli ardışık-seri (run-length) çekirdeğiyle (`cekirdekler`, Numba
+varsa derlenmiş) hesaplanır. Kurallar gmz.py'deki satır döngüsüyle aynıdır.
+"""
+import numpy as np
+
+from cekirdekler import low_zero_streaks
+
+# Kriter bayrakları
+KRITER_BINA = 1    # KRİTER 1: bina anomalisi
+KRITER_DUSUS = 2   # KRİTER 2: ani düşüş
+KRITER_DUSUK = 4   # KRİTER 3: sürekli düşük tüketim
+KRITER_SIFIR = 8   # KRİTER 4: sıfır dönem
+
+
+def count_above(critical, grid, inclusive=False):
+    """Izgaranın her noktası için kritik değeri noktadan büyük olan satır sayısı
+
+    Eşik taramaları için: satır, eşik kritik değerinin altındayken
+    işaretlenir (inclusive=True ise eşitken de). Kritik değerler bir kez
+    sıralanır, her ızgara noktası ikili aramadır.
+    """
+    critical = np.sort(np.asarray(critical, dtype=np.float64))
+    side = 'left' if inclusive else 'right'
+    return len(critical) - np.searchsorted(critical, np.asarray(grid, dtype=np.float64), side=side)
+
+
+def _building_rows(values, bina_codes, bina_month_mean, bina_sizes):
+    """Tesisat sırasında bina aylık ortalamaları ve daire sayıları"""
+    codes = np.asarray(bina_codes, dtype=np.int64)
+    # Binası olmayan tesisatlar son (boş) satıra bakar: 0 daire, NaN ortalama
+    month_mean = np.asarray(bina_month_mean, dtype=np.float64)
+    month_mean = np.vstack([month_mean.reshape(-1, values.shape[1]),
+                            np.full((1, values.shape[1]), np.nan)])
+    sizes = np.append(np.asarray(bina_sizes, dtype=np.int64), 0)
+    codes = np.where(codes >= 0, codes, len(sizes) - 1)
+    return month_mean[codes], sizes[codes]
+
+
+def evaluate_criteria(values, bina_codes, bina_month_mean, bina_sizes,
+                      min_normal_tuketim, bina_fark_esigi, ani_dusus_esigi,
+                      min_dusuk_ay, min_bina_daire):
+    """Dört kriteri ve risk puanını tüm tesisatlar için hesapla
+
+    values: (tesisat x ay) tüketim matrisi (eksikler 0)
+    bina_codes: tesisatın bina kodu (-1 = bina yok), bina_month_mean /
+    bina_sizes: bina indeksinin aylık ortalamaları ve daire sayıları
+
+    Döner: dict; satır başına 'uygun' (bina daire sayısı yeterli),
+    'bina_sayisi', 'dusus_sayisi', 'max_dusuk_seri', 'max_sifir_seri',
+    'kriterler' (KRITER_* bayrakları), 'kriter_sayisi', 'risk_puan', 'aday'
+    ve sebep / detay için 'bina_fark', 'bina_dusuk', 'dusus_pct', 'ani_dusus'
+    matrisleri.
+    """
+    values = np.asarray(values)
+    bina_ort, bina_daire = _building_rows(values, bina_codes, bina_month_mean, bina_sizes)
+    uygun = bina_daire >= min_bina_daire
+
+    # KRİTER 1: bina ortalamasından yüzde fark
+    with np.errstate(invalid='ignore', divide='ignore'):
+        bina_fark = (bina_ort - values) / bina_ort * 100
+    bina_dusuk = (bina_ort > min_normal_tuketim) & (bina_fark > bina_fark_esigi)
+    bina_sayisi = bina_dusuk.sum(axis=1)
+
+    # KRİTER 2: aydan aya düşüş (önceki ay normal tüketimin üzerindeyse)
+    onceki, simdiki = values[:, :-1], values[:, 1:]
+    with np.errstate(invalid='ignore', divide='ignore'):
+        dusus_pct = (onceki - simdiki) / onceki * 100
+    ani_dusus = (onceki > min_normal_tuketim) & (dusus_pct > ani_dusus_esigi)
+    dusus_sayisi = ani_dusus.sum(axis=1)
+
+    # KRİTER 3 / 4: en uzun düşük ve sıfır serileri
+    max_dusuk_seri, max_sifir_seri = low_zero_streaks(values, min_normal_tuketim)
+
+    kriter1 = bina_sayisi >= 4
+    kriter2 = dusus_sayisi >= 2
+    kriter3 = max_dusuk_seri >= min_dusuk_ay
+    kriter4 = max_sifir_seri >= 3
+    kriterler = (kriter1 * KRITER_BINA | kriter2 * KRITER_DUSUS |
+                 kriter3 * KRITER_DUSUK | kriter4 * KRITER_SIFIR).astype(np.uint8)
+    kriter_sayisi = (kriter1.astype(np.int64) + kriter2 + kriter3 + kriter4)
+
+    risk_puan = (np.where(kriter1, bina_sayisi * 15, 0) +
+                 np.where(kriter2, dusus_sayisi * 20, 0) +
+                 np.where(kriter3, max_dusuk_seri * 10, 0) +
+                 np.where(kriter4, max_sifir_seri * 12, 0))
+
+    # KARAR: bina yeterli, en az 2 kriter ve 80+ puan
+    aday = uygun & (kriter_sayisi >= 2) & (risk_puan >= 80)
+
+    return {
+        'uygun': uygun,
+        'bina_daire': bina_daire,
+        'bina_sayisi': bina_sayisi,
+        'dusus_sayisi': dusus_sayisi,
+        'max_dusuk_seri': max_dusuk_seri,
+        'max_sifir_seri': max_sifir_seri,
+        'kriterler': kriterler,
+        'kriter_sayisi': kriter_sayisi,
+        'risk_puan': risk_puan,
+        'aday': aday,
+        'bina_fark': bina_fark,
+        'bina_dusuk': bina_dusuk,
+        'dusus_pct': dusus_pct,
+        'ani_dusus': ani_dusus,
+    }
+
+
+SWEEP_PARAMS = ('bina_fark_esigi', 'ani_dusus_esigi', 'min_dusuk_ay')
+
+
+def criteria_sweep(values, bina_codes, bina_month_mean, bina_sizes, param, grid, **params):
+    """Tek bir eşiğin ızgara değerlerinde aday sayıları (diğer eşikler sabit)
+
+    param: `SWEEP_PARAMS`tan biri, params: `evaluate_criteria` eşikleri.
+    Eşik yalnızca kendi kriterinin sayısını / serisini ve puan katkısını
+    değiştirir; her tesisat için adaylığın başladığı kritik eşik bir kez
+    hesaplanır (ör. bina kriteri için gereken ay sayısı kadar en büyük bina
+    farkının en küçüğü) ve ızgara `count_above` ile sayılır. Sayılar
+    `evaluate_criteria` 'aday' sayılarıyla aynıdır.
+    """
+    values = np.asarray(values)
+    sonuc = evaluate_criteria(values, bina_codes, bina_month_mean, bina_sizes, **params)
+    min_normal = params['min_normal_tuketim']
+    bit, agirlik, en_az, sayi = {
+        'bina_fark_esigi': (KRITER_BINA, 15, 4, sonuc['bina_sayisi']),
+        'ani_dusus_esigi': (KRITER_DUSUS, 20, 2, sonuc['dusus_sayisi']),
+        'min_dusuk_ay': (KRITER_DUSUK, 10, None, sonuc['max_dusuk_seri']),
+    }[param]
+
+    # Taranan kriter çıkarılınca kalan kriter sayısı / puan
+    aktif = (sonuc['kriterler'] & bit) > 0
+    diger_sayi = sonuc['kriter_sayisi'] - aktif
+    diger_puan = sonuc['risk_puan'] - np.where(aktif, sayi * agirlik, 0)
+    her_zaman = sonuc['uygun'] & (diger_sayi >= 2) & (diger_puan >= 80)
+    olabilir = sonuc['uygun'] & (diger_sayi >= 1) & ~her_zaman
+
+    if param == 'min_dusuk_ay':
+        # Seri uzunluğu eşiğe bağlı değil: kriter, eşik <= seri iken açık
+        kritik = np.where(olabilir & (diger_puan + sayi * agirlik >= 80), sayi, -np.inf)
+        kritik = np.where(her_zaman, np.inf, kritik)
+        return count_above(kritik, grid, inclusive=True)
+
+    # Kriter sayısı (eşiği aşan ay sayısı) en az `gereken` olmalı
+    if param == 'bina_fark_esigi':
+        bina_ort, _ = _building_rows(values, bina_codes, bina_month_mean, bina_sizes)
+        fark = np.where(bina_ort > min_normal, sonuc['bina_fark'], -np.inf)
+    else:
+        fark = np.where(values[:, :-1] > min_normal, sonuc['dusus_pct'], -np.inf)
+    gereken = np.maximum(en_az, np.ceil((80 - diger_puan) / agirlik)).astype(np.int64)
+    # Eşik, gereken'inci en büyük farkın altındayken kriter yeterli sayıda tutar
+    sirali = -np.sort(-fark, axis=1)
+    yeterli = olabilir & (gereken <= fark.shape[1])
+    kritik = np.full(len(values), -np.inf)
+    kritik[yeterli] = sirali[yeterli, gereken[yeterli] - 1]
+    kritik = np.where(her_zaman, np.inf, kritik)
+    return count_above(kritik, grid)
@@ -0,0 +1,293 @@
+"""Bildirimsel kural motoru: tesisat özellik tablosu üzerinde vektörel kurallar.
+
+Her kural bir sözlükle tanımlanır:
+
+    'ad'          - kısa ad (bit sırası kural listesindeki sıradır)
+    'baslik'      - ekranda gösterilen ad
+    'girdiler'    - kullandığı özellik sütunları (`rule_inputs`)
+    'parametreler'- eşik adları ve varsayılan değerleri
+    'kosul'       - özellik / parametre adlarıyla koşul ifadesi
+                    ('kis_ort > 0 and kis_ort < kis_esik', '0 < cv < 300')
+    'puan'        - sabit puan veya ifade ('max_sifir_seri * 5')
+    'mesaj'       - str.format şablonu (girdiler ve parametrelerle)
+
+`compile_rules` ifadeleri bir kez ayrıştırır: yalnızca bildirilen adlara,
+aritmetik / karşılaştırma işlemlerine ve `IZINLI_FONKSIYONLAR`a izin verir;
+`and` / `or` / `not` ve zincirleme karşılaştırmalar eleman bazlı `&` / `|` /
+`~` işlemlerine çevrilir. `evaluate_rules` derlenmiş kuralları tüm tesisatlar
+için NumPy dizileri üzerinde çalıştırır ve tesisat başına anomali bit maskesi
+(uint64, bit i = i. kural) ile puan döndürür; Python döngüsü yalnızca kural
+sayısı kadardır. NaN içeren karşılaştırmalar tetiklenmez. Mesajlar yalnızca
+istenen satırlar için biçimlenir.
+
+`KURALLAR` tespit / ham_veri / hamveri2 eşiklerinin tek tanımıdır:
+`matris_motoru.score_consumption` ve `threshold_sweep` bayraklarını bu
+kurallardan alır (ani düşüş kuralı her kış yılı çifti için de çalışır,
+`pair_inputs`).
+"""
+import ast
+
+import numpy as np
+
+IZINLI_FONKSIYONLAR = {
+    'abs': np.abs,
+    'where': np.where,
+    'minimum': np.minimum,
+    'maximum': np.maximum,
+    'isnan': np.isnan,
+    'sqrt': np.sqrt,
+    'log1p': np.log1p,
+}
+
+_IZINLI_DUGUMLER = (
+    ast.Expression, ast.BinOp, ast.UnaryOp, ast.Compare, ast.BoolOp, ast.Call, ast.Name, ast.Load,
+    ast.Constant, ast.Add, ast.Sub, ast.Mult, ast.Div, ast.Pow, ast.Mod, ast.USub, ast.UAdd, ast.Not,
+    ast.Invert, ast.BitAnd, ast.BitOr, ast.And, ast.Or, ast.Lt, ast.LtE, ast.Gt, ast.GtE, ast.Eq, ast.NotEq,
+)
+
+# Varsayılan kural seti (özellik deposu sütunları + `rule_inputs` türetilmiş sütunları)
+KURALLAR = [
+    {
+        'ad': 'kis_dusuk',
+        'baslik': "Kış ayı düşük tüketim",
+        'girdiler': ['kis_ort'],
+        'parametreler': {'kis_esik': 50},
+        'kosul': 'kis_ort > 0 and kis_ort < kis_esik',
+        'puan': 30,
+        'mesaj': "Kış ayı düşük tüketim: {kis_ort:.1f} m³/ay",
+    },
+    {
+        'ad': 'bina_farki',
+        'baslik': "Bina ortalamasından düşük",
+        'girdiler': ['pozitif_ort', 'bina_ort', 'bina_adet'],
+        'parametreler': {'bina_oran': 60},
+        'kosul': 'bina_adet > 1 and pozitif_ort > 0 and pozitif_ort < bina_ort * (1 - bina_oran / 100)',
+        'puan': 25,
+        'mesaj': "Bina ortalamasından %{bina_oran} düşük: {pozitif_ort:.1f} vs {bina_ort:.1f}",
+    },
+    {
+        'ad': 'ani_dusus',
+        'baslik': "Son kış ani düşüş",
+        'girdiler': ['kis_dusus', 'onceki_kis', 'son_kis'],
+        'parametreler': {'dusus_orani': 50, 'min_onceki': 100},
+        'kosul': 'onceki_kis >= min_onceki and son_kis < onceki_kis * (1 - dusus_orani / 100)',
+        'puan': 35,
+        'mesaj': "Son kış ani düşüş: {onceki_kis:.1f} → {son_kis:.1f}, %{kis_dusus:.1f} düşüş",
+    },
+    {
+        'ad': 'sifir_seri',
+        'baslik': "Ardışık sıfır / boş tüketim",
+        'girdiler': ['max_sifir_seri'],
+        'parametreler': {'min_sifir_ay': 3},
+        'kosul': 'max_sifir_seri >= min_sifir_ay',
+        'puan': 'max_sifir_seri * 5',
+        'mesaj': "{max_sifir_seri:.0f} ay ardışık sıfır / boş tüketim",
+    },
+    {
+        'ad': 'oynaklik',
+        'baslik': "Aşırı volatilite",
+        'girdiler': ['cv'],
+        'parametreler': {'cv_esik': 150},
+        'kosul': 'cv > cv_esik',
+        'puan': 20,
+        'mesaj': "Aşırı volatilite: CV %{cv:.0f}",
+    },
+    {
+        'ad': 'mevsimsiz',
+        'baslik': "Kış-yaz farkı az",
+        'girdiler': ['kis_ort', 'yaz_ort'],
+        'parametreler': {'fark_esik': 10},
+        'kosul': 'kis_ort > 0 and yaz_ort > 0 and abs(kis_ort - yaz_ort) < fark_esik',
+        'puan': 15,
+        'mesaj': "Kış-yaz tüketim farkı az: Kış {kis_ort:.1f}, Yaz {yaz_ort:.1f}",
+    },
+    {
+        'ad': 'toplam_dusuk',
+        'baslik': "Toplam tüketim çok düşük",
+        'girdiler': ['toplam'],
+        'parametreler': {'toplam_esik': 100},
+        'kosul': 'toplam < toplam_esik',
+        'puan': 15,
+        'mesaj': "Toplam tüketim çok düşük: {toplam:.1f} m³",
+    },
+    {
+        'ad': 'sifir_ay',
+        'baslik': "Çok fazla sıfır tüketim",
+        'girdiler': ['sifir_ay'],
+        'parametreler': {'max_sifir_ay': 6},
+        'kosul': 'sifir_ay > max_sifir_ay',
+        'puan': 15,
+        'mesaj': "Çok fazla sıfır tüketim: {sifir_ay:.0f} ay",
+    },
+]
+
+
+class _Vektorel(ast.NodeTransformer):
+    """and / or / not ve zincirleme karşılaştırmaları eleman bazlı işlemlere çevir"""
+
+    def visit_BoolOp(self, node):
+        self.generic_visit(node)
+        op = ast.BitAnd() if isinstance(node.op, ast.And) else ast.BitOr()
+        sonuc = node.values[0]
+        for deger in node.values[1:]:
+            sonuc = ast.BinOp(left=sonuc, op=op, right=deger)
+        return sonuc
+
+    def visit_UnaryOp(self, node):
+        self.generic_visit(node)
+        if isinstance(node.op, ast.Not):
+            return ast.UnaryOp(op=ast.Invert(), operand=node.operand)
+        return node
+
+    def visit_Compare(self, node):
+        self.generic_visit(node)
+        if len(node.ops) == 1:
+            return node
+        sol, parcalar = node.left, []
+        for op, sag in zip(node.ops, node.comparators):
+            parcalar.append(ast.Compare(left=sol, ops=[op], comparators=[sag]))
+            sol = sag
+        sonuc = parcalar[0]
+        for parca in parcalar[1:]:
+            sonuc = ast.BinOp(left=sonuc, op=ast.BitAnd(), right=parca)
+        return sonuc
+
+
+def _compile_expression(ifade, adlar, kural):
+    """İfadeyi doğrula ve vektörel koda derle (izinsiz ad / işlemde ValueError)"""
+    agac = ast.parse(str(ifade), mode='eval')
+    for dugum in ast.walk(agac):
+        if not isinstance(dugum, _IZINLI_DUGUMLER):
+            raise ValueError(f"Kural '{kural}': izin verilmeyen ifade öğesi {type(dugum).__name__}")
+        if isinstance(dugum, ast.Call) and not (isinstance(dugum.func, ast.Name)
+                                                and dugum.func.id in IZINLI_FONKSIYONLAR):
+            raise ValueError(f"Kural '{kural}': izin verilmeyen fonksiyon çağrısı")
+        if isinstance(dugum, ast.Name) and dugum.id not in adlar and dugum.id not in IZINLI_FONKSIYONLAR:
+            raise ValueError(f"Kural '{kural}': bildirilmemiş ad '{dugum.id}'")
+    agac = ast.fix_missing_locations(_Vektorel().visit(agac))
+    return compile(agac, f'<kural {kural}>', 'eval')
+
+
+def compile_rules(kurallar=None):
+    """Kural listesini derle (en fazla 64 kural)
+
+    Döner: {'kurallar', 'kosullar', 'puanlar' (sabit veya kod), 'girdiler'
+    (gereken sütunlar), 'parametreler' (varsayılanlar)}.
+    """
+    kurallar = KURALLAR if kurallar is None else list(kurallar)
+    if len(kurallar) > 64:
+        raise ValueError("En fazla 64 kural derlenebilir (uint64 bit maskesi)")
+    kosullar, puanlar, girdiler, parametreler = [], [], [], {}
+    for kural in kurallar:
+        adlar = set(kural['girdiler']) | set(kural.get('parametreler', {}))
+        kosullar.append(_compile_expression(kural['kosul'], adlar, kural['ad']))
+        puan = kural.get('puan', 1)
+        puanlar.append(puan if isinstance(puan, (int, float)) else _compile_expression(puan, adlar, kural['ad']))
+        girdiler.extend(g for g in kural['girdiler'] if g not in girdiler)
+        for ad, deger in kural.get('parametreler', {}).items():
+            if parametreler.get(ad, deger) != deger:
+                raise ValueError(f"'{ad}' parametresi kurallarda farklı varsayılanlarla tanımlı")
+            parametreler[ad] = deger
+    return {'kurallar': kurallar, 'kosullar': kosullar, 'puanlar': puanlar,
+            'girdiler': girdiler, 'parametreler': parametreler}
+
+
+def _drop_inputs(son, onceki):
+    girdi = {'son_kis': son, 'onceki_kis': onceki}
+    with np.errstate(invalid='ignore', divide='ignore'):
+        girdi['kis_dusus'] = np.where(onceki > 0, (1 - son / onceki) * 100, np.nan)
+    return girdi
+
+
+def rule_inputs(features, table=None):
+    """Kural girdileri (sütun adı -> tesisat sırasında dizi)
+
+    features: `matris_motoru.features_from_table` sözlüğü; table verilirse
+    özellik tablosunun sayısal sütunları da eklenir. Son kış yılının düşüşü:
+    'son_kis' (son pozitif kış yılı ortalaması), 'onceki_kis' (ondan önceki
+    pozitif kış yılı), 'kis_dusus' (% düşüş; yeterli kış verisi yoksa NaN).
+    """
+    girdi = {} if table is None else {col: table[col].to_numpy(dtype=np.float64) for col in table.columns
+                                      if np.issubdtype(table[col].dtype, np.number)}
+    for ad, anahtar in [('kis_ort', 'kis_tuketim'), ('yaz_ort', 'yaz_tuketim'), ('pozitif_ort', 'ortalama_tuketim'),
+                        ('toplam', 'toplam_tuketim'), ('sifir_ay', 'sifir_ay'), ('bina_ort', 'bina_ort'),
+                        ('bina_adet', 'bina_adet')]:
+        girdi[ad] = np.asarray(features[anahtar], dtype=np.float64)
+    yearly, prev_val, last_pos = features['kis_yillik'], features['onceki_deger'], features['son_yil']
+    n, k = yearly.shape
+    son = np.full(n, np.nan)
+    onceki = np.full(n, np.nan)
+    if k:
+        rows = np.arange(n)
+        col = np.clip(last_pos, 0, k - 1)
+        gecerli = features['yil_ok'] & (last_pos >= 0)
+        son = np.where(gecerli, yearly[rows, col], np.nan)
+        onceki = np.where(gecerli, prev_val[rows, col], np.nan)
+    girdi.update(_drop_inputs(son, onceki))
+    return girdi
+
+
+def pair_inputs(features):
+    """Ani düşüş kuralının kış yılı çifti girdileri (tesisat x kış yılı, satır düzeninde düzleştirilmiş)
+
+    Her yıl, tesisatın kendinden önceki son pozitif kış yılıyla karşılaştırılır;
+    yıl yeterliliği olmayan tesisatlarda, pozitif olmayan yıllarda ve önceki
+    pozitif yılı olmayan yıllarda girdiler NaN'dır (kural tetiklenmez).
+    """
+    yearly, prev_val = features['kis_yillik'], features['onceki_deger']
+    gecerli = features['yil_ok'][:, None] & (yearly > 0) & (features['onceki_yil'] >= 0)
+    return _drop_inputs(np.where(gecerli, yearly, np.nan).ravel(), np.where(gecerli, prev_val, np.nan).ravel())
+
+
+def _namespace(derleme, girdi, params):
+    eksik = [g for g in derleme['girdiler'] if g not in girdi]
+    if eksik:
+        raise ValueError(f"Kural girdileri bulunamadı: {', '.join(eksik)}")
+    degerler = dict(derleme['parametreler'])
+    degerler.update(params or {})
+    ns = dict(IZINLI_FONKSIYONLAR)
+    ns.update({g: girdi[g] for g in derleme['girdiler']})
+    ns.update(degerler)
+    return ns, degerler
+
+
+def evaluate_rules(derleme, girdi, params=None):
+    """Derlenmiş kuralları tüm tesisatlar için değerlendir
+
+    girdi: `rule_inputs` sözlüğü; params: varsayılanların üzerine yazılan
+    parametreler. Döner: {'maske' (uint64 bit maskesi), 'puan', 'kural_sayisi',
+    'bayraklar' (kural adı -> bool dizi)}.
+    """
+    ns, _ = _namespace(derleme, girdi, params)
+    n = len(next(iter(girdi.values()))) if girdi else 0
+    maske = np.zeros(n, dtype=np.uint64)
+    puan = np.zeros(n)
+    kural_sayisi = np.zeros(n, dtype=np.int64)
+    bayraklar = {}
+    with np.errstate(invalid='ignore', divide='ignore'):
+        for bit, (kural, kosul, agirlik) in enumerate(zip(derleme['kurallar'], derleme['kosullar'],
+                                                           derleme['puanlar'])):
+            bayrak = np.broadcast_to(np.asarray(eval(kosul, {'__builtins__': {}}, ns), dtype=bool), n)
+            if not isinstance(agirlik, (int, float)):
+                agirlik = np.nan_to_num(np.broadcast_to(eval(agirlik, {'__builtins__': {}}, ns), n))
+            maske |= bayrak.astype(np.uint64) << np.uint64(bit)
+            puan += np.where(bayrak, agirlik, 0)
+            kural_sayisi += bayrak
+            bayraklar[kural['ad']] = bayrak
+    return {'maske': maske, 'puan': puan, 'kural_sayisi': kural_sayisi, 'bayraklar': bayraklar}
+
+
+def rule_messages(derleme, girdi, sonuc, rows, params=None, sep='; '):
+    """Verilen satırların tetiklenen kural mesajları (kural sırasıyla, `sep` ile birleşik)"""
+    _, degerler = _namespace(derleme, girdi, params)
+    mesajlar = []
+    for i in np.asarray(rows, dtype=np.int64):
+        maske = int(sonuc['maske'][i])
+        parcalar = []
+        for bit, kural in enumerate(derleme['kurallar']):
+            if maske >> bit & 1:
+                alanlar = {g: girdi[g][i] for g in kural['girdiler']}
+                alanlar.update(degerler)
+                parcalar.append(kural['mesaj'].format(**alanlar))
+        mesajlar.append(sep.join(parcalar))
+    return mesajlar
@@ -5,6 +5,12 @@ from datetime import datetime
 import io
 import plotly.express as px
 import plotly.graph_objects as go
+from onbellek import cached_frame, file_hash
+from xlsx_okuyucu import read_xlsx
+from tuketim_kupu import (build_consumption_cube, cube_value, facility_records,
+                          anomaly_calendar, calendar_summary, calendar_period)
+from is_kuyrugu import start_job, job_result
+from ozellik_deposu import matrix_features
 
 st.set_page_config(page_title="Doğalgaz Anomali Tespit", page_icon="📊", layout="wide")
 
@@ -39,20 +45,9 @@ def parse_date(date_str):
     except:
         return None, None
 
-def get_consumption(df, tesisat_no, year, month):
-    """Belirli tesisat, yıl ve ay için tüketim değerini getir"""
-    filtered = df[(df['tesisat_no'] == tesisat_no) & 
-                  (df['yil'] == year) & 
-                  (df['ay'] == month)]
-    
-    if filtered.empty:
-        return None
-    
-    val = filtered['tuketim'].values[0]
-    if pd.isna(val) or val == 0:
-        return None
-    
-    return float(val)
+def get_consumption(cube, row, year, month):
+    """Belirli tesisat (küp satırı), yıl ve ay için tüketim değerini getir"""
+    return cube_value(cube, row, year, month)
 
 def calculate_trend(v1, v2, v3):
     """3 değer arasındaki ortalama trendi hesapla"""
@@ -75,11 +70,12 @@ def assign_segment(avg_consumption):
     else:
         return 'D', 25
 
-def analyze_facility(df, tesisat_no, analysis_year, analysis_month, threshold):
-    """Tek bir tesisat için anomali analizi yap"""
+def analyze_facility(cube, tesisat_no, analysis_year, analysis_month, threshold):
+    """Tek bir tesisat için anomali analizi yap (tüm sorgular küp indekslemesi)"""
+    row = cube['row_of'].get(tesisat_no, -1)
     
     # Mevcut ay değeri
-    current_val = get_consumption(df, tesisat_no, analysis_year, analysis_month)
+    current_val = get_consumption(cube, row, analysis_year, analysis_month)
     
     # Önceki 2 ay
     prev1_month = 12 if analysis_month == 1 else analysis_month - 1
@@ -87,12 +83,12 @@ def analyze_facility(df, tesisat_no, analysis_year, analysis_month, threshold):
     prev2_month = 11 if analysis_month <= 2 else (12 if analysis_month == 2 else analysis_month - 2)
     prev2_year = analysis_year - 1 if analysis_month <= 2 else analysis_year
     
-    prev1_val = get_consumption(df, tesisat_no, prev1_year, prev1_month)
-    prev2_val = get_consumption(df, tesisat_no, prev2_year, prev2_month)
+    prev1_val = get_consumption(cube, row, prev1_year, prev1_month)
+    prev2_val = get_consumption(cube, row, prev2_year, prev2_month)
     
     # Önceki 2 yılın aynı ayı
-    prev_year1_val = get_consumption(df, tesisat_no, analysis_year - 1, analysis_month)
-    prev_year2_val = get_consumption(df, tesisat_no, analysis_year - 2, analysis_month)
+    prev_year1_val = get_consumption(cube, row, analysis_year - 1, analysis_month)
+    prev_year2_val = get_consumption(cube, row, analysis_year - 2, analysis_month)
     
     # Sonraki 2 ay (trend için)
     next1_month = 1 if analysis_month == 12 else analysis_month + 1
@@ -100,23 +96,17 @@ def analyze_facility(df, tesisat_no, analysis_year, analysis_month, threshold):
     next2_month = 2 if analysis_month >= 11 else (1 if analysis_month == 11 else analysis_month + 2)
     next2_year = analysis_year + 1 if analysis_month >= 11 else analysis_year
     
-    next1_val = get_consumption(df, tesisat_no, next1_year, next1_month)
-    next2_val = get_consumption(df, tesisat_no, next2_year, next2_month)
+    next1_val = get_consumption(cube, row, next1_year, next1_month)
+    next2_val = get_consumption(cube, row, next2_year, next2_month)
     
     # 2024 ve 2023 için aynı aylar (trend)
-    y2024_m1_val = get_consumption(df, tesisat_no, analysis_year - 1, next1_month)
-    y2024_m2_val = get_consumption(df, tesisat_no, analysis_year - 1, next2_month)
-    y2023_m1_val = get_consumption(df, tesisat_no, analysis_year - 2, next1_month)
-    y2023_m2_val = get_consumption(df, tesisat_no, analysis_year - 2, next2_month)
-    
-    # Segment belirleme (son 6 ay ortalaması)
-    recent_data = df[(df['tesisat_no'] == tesisat_no) & 
-                     (df['tuketim'] > 0) & 
-                     (df['tuketim'].notna())]
-    if not recent_data.empty:
-        avg_consumption = recent_data['tuketim'].tail(6).mean()
-    else:
-        avg_consumption = 0
+    y2024_m1_val = get_consumption(cube, row, analysis_year - 1, next1_month)
+    y2024_m2_val = get_consumption(cube, row, analysis_year - 1, next2_month)
+    y2023_m1_val = get_consumption(cube, row, analysis_year - 2, next1_month)
+    y2023_m2_val = get_consumption(cube, row, analysis_year - 2, next2_month)
+    
+    # Segment belirleme (son 6 pozitif kaydın ortalaması, küp oluşturulurken hesaplanır)
+    avg_consumption = cube['recent_mean'][row] if row >= 0 else 0
     
     segment, segment_threshold = assign_segment(avg_consumption)
     
@@ -218,6 +208,54 @@ def analyze_facility(df, tesisat_no, analysis_year, analysis_month, threshold):
         'priority_score': priority_score
     }
 
+def analyze_facilities(cube, tesisat_list, analysis_year, analysis_month, threshold, progress=None):
+    """Tüm tesisatları seçilen dönem için analiz et (arka plan işi, Streamlit çağrısı yok)"""
+    results = []
+    adim = max(len(tesisat_list) // 100, 1)
+    
+    for idx, tesisat_no in enumerate(tesisat_list):
+        result = analyze_facility(cube, tesisat_no, analysis_year, analysis_month, threshold)
+        if result:
+            results.append(result)
+        if progress is not None and ((idx + 1) % adim == 0 or idx + 1 == len(tesisat_list)):
+            progress((idx + 1) / len(tesisat_list))
+    
+    return {
+        'results': results,
+        'analysis_year': analysis_year,
+        'analysis_month': analysis_month,
+    }
+
+def cube_features(cube, anahtar):
+    """Küpün tesisat özellik tablosu (özellik deposundan, veri sürümü başına bir kez)
+
+    Küpte sıfır ve boş aylar NaN olduğundan 'bos_ay' / 'max_sifir_seri'
+    veri olmayan ayları sayar.
+    """
+    n_fac, n_year, _ = cube['values'].shape
+    donemler = [f"{cube['year0'] + y}/{ay:02d}" for y in range(n_year) for ay in range(1, 13)]
+    return matrix_features(st.session_state, anahtar, cube['values'].reshape(n_fac, -1), donemler)
+
+def get_cube(df, file_id, anahtar):
+    """Yüklenen dosyanın tüketim küpü ve özellik tablosu (dosya değişmedikçe yeniden kurulmaz)"""
+    if st.session_state.get('cube_file_id') != file_id:
+        st.session_state['cube'] = build_consumption_cube(df['tesisat_no'], df['yil'], df['ay'], df['tuketim'])
+        st.session_state['cube_features'] = cube_features(st.session_state['cube'], anahtar)
+        st.session_state['cube_file_id'] = file_id
+        st.session_state.pop('calendar', None)
+    return st.session_state['cube']
+
+def sutun_turu(col):
+    """Sütun adını tesisat / tarih / tüketim olarak sınıflandır (eşleşmezse None)"""
+    col = str(col).strip().lower()
+    if 'tesisat' in col or 'no' in col:
+        return 'tesisat'
+    elif 'tarih' in col or 'ay' in col or 'donem' in col:
+        return 'tarih'
+    elif 'tuketim' in col or 'm3' in col or 'miktar' in col:
+        return 'tuketim'
+    return None
+
 # Başlık
 st.title("📊 Doğalgaz Tüketim Anomali Tespit Sistemi")
 st.markdown("**Uzun Format (Long Format) - Her satır bir ay verisi**")
@@ -228,7 +266,10 @@ uploaded_file = st.file_uploader("Excel dosyasını yükleyin", type=['xlsx', 'x
 
 if uploaded_file is not None:
     # Dosyayı oku
-    df_raw = pd.read_excel(uploaded_file)
+    df_raw = cached_frame(uploaded_file, 'long_format.read_xlsx',
+                          lambda f: read_xlsx(f, usecols=lambda c: sutun_turu(c) is not None,
+                                              numeric=lambda c: sutun_turu(c) == 'tuketim'),
+                          params={'decimal_comma': False})
     
     # Sütun adlarını normalize et
     df_raw.columns = df_raw.columns.str.strip().str.lower()
@@ -239,11 +280,12 @@ if uploaded_file is not None:
     tuketim_col = None
     
     for col in df_raw.columns:
-        if 'tesisat' in col or 'no' in col:
+        tur = sutun_turu(col)
+        if tur == 'tesisat':
             tesisat_col = col
-        elif 'tarih' in col or 'ay' in col or 'donem' in col:
+        elif tur == 'tarih':
             tarih_col = col
-        elif 'tuketim' in col or 'm3' in col or 'miktar' in col:
+        elif tur == 'tuketim':
             tuketim_col = col
     
     if not all([tesisat_col, tarih_col, tuketim_col]):
@@ -311,28 +353,52 @@ if uploaded_file is not None:
     
     # Analiz butonu
     if st.button("🔍 Analizi Başlat", type="primary", use_container_width=True):
-        with st.spinner('Analiz ediliyor...'):
-            results = []
-            progress_bar = st.progress(0)
-            
-            for idx, tesisat_no in enumerate(unique_tesisats):
-                result = analyze_facility(df, tesisat_no, analysis_year, analysis_month, base_threshold)
-                if result:
-                    results.append(result)
-                progress_bar.progress((idx + 1) / len(unique_tesisats))
-            
-            progress_bar.empty()
-            
-            # Sonuçları session state'e kaydet
-            st.session_state['results'] = results
-            st.session_state['df'] = df
-            st.session_state['analysis_year'] = analysis_year
-            st.session_state['analysis_month'] = analysis_month
+        # (tesisat x yıl x ay) küpü bir kez kurulur, tesisat analizleri dizi indekslemesidir
+        cube = get_cube(df, uploaded_file.file_id, ('long_format', file_hash(uploaded_file)))
+        start_job('long_format.analiz',
+                  ('long_format', file_hash(uploaded_file), analysis_year, analysis_month, base_threshold),
+                  analyze_facilities, cube, unique_tesisats, analysis_year, analysis_month, base_threshold)
+    
+    # Analiz arka planda çalışır; iş bitince sonuçları session state'e kaydet
+    sonuc = job_result('long_format.analiz')
+    if sonuc is not None:
+        st.session_state.update(sonuc)
+        st.session_state['df'] = df
+    
+    # Toplu takvim: tüm tesisatlar x tüm dönemler için Analiz 1/2/3
+    st.markdown("### 📅 Toplu Anomali Takvimi")
+    if st.button("📅 Tüm Dönemleri Analiz Et", use_container_width=True):
+        with st.spinner('Tüm dönemler analiz ediliyor...'):
+            cube = get_cube(df, uploaded_file.file_id, ('long_format', file_hash(uploaded_file)))
+            segment_esikleri = [assign_segment(avg)[1] for avg in cube['recent_mean']]
+            st.session_state['calendar'] = anomaly_calendar(cube, segment_esikleri)
+    
+    if 'calendar' in st.session_state:
+        calendar = st.session_state['calendar']
+        ozet = calendar_summary(calendar)
+        ozet['dönem'] = [f"{REVERSE_MONTH_MAP[a]}.{str(y)[2:]}" for y, a in zip(ozet['yil'], ozet['ay'])]
+        
+        takvim = ozet.pivot(index='yil', columns='ay', values='anomali').rename(columns=REVERSE_MONTH_MAP)
+        st.dataframe(takvim, use_container_width=True)
+        
+        fig = px.bar(ozet, x='dönem', y=['dusus', 'artis'], title='Dönem Bazında Anomali Sayıları')
+        fig.update_layout(height=300, margin=dict(l=0, r=0, t=30, b=0))
+        st.plotly_chart(fig, use_container_width=True)
+        
+        donem = st.selectbox("Dönem", options=list(range(len(ozet))),
+                             format_func=lambda i: ozet['dönem'].iloc[i],
+                             index=len(ozet) - 1, key='calendar_period')
+        donem_df = calendar_period(calendar, int(ozet['yil'].iloc[donem]), int(ozet['ay'].iloc[donem]))
+        donem_df['yon'] = np.where(donem_df['yon'] < 0, 'Düşüş', 'Artış')
+        st.info(f"📊 {ozet['dönem'].iloc[donem]}: **{len(donem_df):,}** anomalili tesisat")
+        st.dataframe(donem_df.head(1000), use_container_width=True)
 
 # Sonuçları göster
 if 'results' in st.session_state:
     results = st.session_state['results']
     df = st.session_state['df']
+    cube = st.session_state['cube']
+    ozellikler = st.session_state['cube_features']
     analysis_year = st.session_state['analysis_year']
     analysis_month = st.session_state['analysis_month']
     
@@ -483,10 +549,19 @@ if 'results' in st.session_state:
                     st.write(f"Mevcut Tüketim: **{result['current_val']:.1f} m³**" if result['current_val'] else "Veri yok")
                     st.write(f"Segment: **{result['segment']}**")
                     st.write(f"Öncelik Skoru: **{result['priority_score']:.0f}**")
+                    
+                    # Tesisat özellikleri (özellik deposu)
+                    row = cube['row_of'].get(result['tesisat_no'], -1)
+                    if row >= 0:
+                        ozellik = ozellikler.iloc[row]
+                        st.write(f"Kış / Yaz Ort.: **{ozellik['kis_ort']:.1f} / {ozellik['yaz_ort']:.1f} m³**")
+                        st.write(f"Değişim Katsayısı: **%{ozellik['cv']:.0f}**")
+                        st.write(f"En Uzun Veri Yok Serisi: **{int(ozellik['max_sifir_seri'])} ay**")
                 
                 with col2:
                     # Tesisat için grafik
-                    tesisat_data = df[df['tesisat_no'] == result['tesisat_no']].copy()
+                    row = cube['row_of'].get(result['tesisat_no'], -1)
+                    tesisat_data = df.iloc[facility_records(cube, row)].copy() if row >= 0 else df.iloc[:0].copy()
                     tesisat_data = tesisat_data.sort_values(['yil', 'ay'])
                     tesisat_data['tarih_str'] = tesisat_data.apply(
                         lambda x: f"{REVERSE_MONTH_MAP[int(x['ay'])]}.{str(int(x['yil']))[2:]}", axis=1
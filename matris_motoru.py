@@ -0,0 +1,518 @@
+"""Pivot tüketim verisi için vektörel matris motoru.
+
+Tarih sütunları (YYYY/MM) tek bir float matrise (tesisat x ay) çevrilir,
+mevsim / yıl maskeleri bir kez hesaplanır ve tüm kurallar birkaç NumPy
+geçişiyle bütün tesisatlar için aynı anda değerlendirilir. Eşiklerden
+bağımsız özellikler (`facility_features` tablosu, `ozellik_deposu` ile
+kalıcı) eşik karşılaştırmalarından (`score_consumption`) ayrıdır; eşik
+değişikliğinde yalnızca ikincisi çalışır. Karşılaştırmalar `kural_motoru`
+kurallarıdır (`TESPIT_KURALLARI`); burada yalnızca mesajlar biçimlenir.
+"""
+import numpy as np
+import pandas as pd
+
+from bina_indeksi import build_building_index, lookup
+from cekirdekler import max_run_length, segment_sums
+from kriter_motoru import count_above
+from kural_motoru import KURALLAR, compile_rules, evaluate_rules, pair_inputs, rule_inputs
+
+RESULT_COLUMNS = [
+    'tesisat_no', 'bina_no', 'kis_tuketim', 'yaz_tuketim', 'toplam_tuketim',
+    'ortalama_tuketim', 'kis_trend', 'anomali_sayisi', 'anomaliler', 'suspicion_level'
+]
+
+# Özellik hesabı değiştiğinde artırılır: depodaki eski özellik tabloları ve
+# analiz sonuçları (anahtarlarında sürüm var) yeniden kullanılmaz
+OZELLIK_SURUMU = 2
+
+
+def get_season(month):
+    """Ayı mevsime göre kategorize et"""
+    if month in [12, 1, 2]:
+        return "Kış"
+    elif month in [3, 4, 5]:
+        return "İlkbahar"
+    elif month in [6, 7, 8]:
+        return "Yaz"
+    else:
+        return "Sonbahar"
+
+
+def parse_period_columns(date_columns):
+    """YYYY/MM sütun adlarından yıl ve ay dizilerini çıkar"""
+    years = np.array([int(str(c).split('/')[0]) for c in date_columns], dtype=np.int32)
+    months = np.array([int(str(c).split('/')[1]) for c in date_columns], dtype=np.int32)
+    return years, months
+
+
+def build_consumption_matrix(df, date_columns):
+    """Tarih sütunlarını tek bir float matrise (tesisat x ay) dönüştür
+
+    Sayıya çevrilemeyen veya boş hücreler NaN ("veri yok") olarak kalır.
+    Sütunlar (yıl, ay) sırasına dizilir ve mevsim maskeleri bir kez hesaplanır.
+    """
+    years, months = parse_period_columns(date_columns)
+    order = np.lexsort((months, years))
+    date_columns = [date_columns[i] for i in order]
+    years, months = years[order], months[order]
+
+    block = df[date_columns]
+    if all(pd.api.types.is_numeric_dtype(t) for t in block.dtypes):
+        values = block.to_numpy(dtype=np.float64, na_value=np.nan)
+    else:
+        values = block.apply(pd.to_numeric, errors='coerce').to_numpy(dtype=np.float64, na_value=np.nan)
+    # Satır düzeni: satır toplamları parça / tam matris fark etmeksizin aynı sırayla toplanır
+    values = np.ascontiguousarray(values)
+
+    seasons = np.array([get_season(int(m)) for m in months], dtype=object)
+    return {
+        'values': values,
+        'date_columns': date_columns,
+        'years': years,
+        'months': months,
+        'seasons': seasons,
+        'kis_mask': seasons == "Kış",
+        'yaz_mask': seasons == "Yaz",
+    }
+
+
+def _series_sum(values, mask):
+    """Maskeye uyan hücrelerin satır toplamı ve adedi, eski döngüdeki `Series.sum()` gibi
+
+    Hücreler sütun sırasıyla satır başına tek bir `ndarray.sum` ile toplanır
+    (`cekirdekler.segment_sums`); sonuç satırın parça / tam matriste
+    olmasından bağımsızdır.
+    """
+    count = mask.sum(axis=1)
+    return segment_sums(values[mask], np.cumsum(count) - count, count), count
+
+
+def _series_mean(values, mask):
+    """Maskeye uyan hücrelerin satır ortalaması (hiç yoksa 0), `Series.mean()` gibi"""
+    total, count = _series_sum(values, mask)
+    mean = np.zeros(len(values))
+    np.divide(total, count, out=mean, where=count > 0)
+    return mean, count
+
+
+def _group_mean(values, mask):
+    """Maskeye uyan hücrelerin satır ortalaması (hiç yoksa NaN), `groupby(...).mean()` gibi
+
+    pandas grup ortalaması hücreleri satır sırasıyla Kahan düzeltmeli toplar;
+    burada aynı toplama sütun sırasıyla bütün tesisatlar için birlikte yapılır.
+    """
+    n = len(values)
+    total = np.zeros(n)
+    comp = np.zeros(n)
+    for j in np.flatnonzero(mask.any(axis=0)):
+        sec = mask[:, j]
+        y = values[:, j] - comp
+        t = total + y
+        c = (t - total) - y
+        # ±inf değerlerde düzeltme NaN olur; pandas'taki gibi sıfırlanır
+        comp = np.where(sec, np.where(c == c, c, 0.0), comp)
+        total = np.where(sec, t, total)
+    count = mask.sum(axis=1)
+    mean = np.full(n, np.nan)
+    np.divide(total, count, out=mean, where=count > 0)
+    return mean
+
+
+def winter_year_means(matrix, kis_sezonu=False):
+    """Her tesisat için yıllık kış ortalamaları (tesisat x kış yılı)
+
+    kis_sezonu=True ise Aralık bir sonraki yılın kışına atanır
+    (Aralık 2023 + Ocak/Şubat 2024 = 2024 kışı). Hiç veri olmayan yıllar NaN.
+    """
+    values = matrix['values']
+    kis_mask = matrix['kis_mask']
+    keys = matrix['years'].astype(np.int64).copy()
+    if kis_sezonu:
+        keys = keys + (matrix['months'] == 12)
+
+    kis_idx = np.flatnonzero(kis_mask)
+    kis_keys = np.unique(keys[kis_idx])
+    valid = ~np.isnan(values)
+
+    means = np.full((len(values), len(kis_keys)), np.nan)
+    for j, key in enumerate(kis_keys):
+        idx = kis_idx[keys[kis_idx] == key]
+        means[:, j] = _group_mean(values[:, idx], valid[:, idx])
+    return kis_keys, means, valid[:, kis_idx].sum(axis=1)
+
+
+def _previous_positive(yearly):
+    """Her yıl sütunu için kendinden önceki son pozitif yıl ortalaması ve indeksi"""
+    n, k = yearly.shape
+    prev_val = np.full((n, k), np.nan)
+    prev_idx = np.full((n, k), -1, dtype=np.int64)
+    last_val = np.full(n, np.nan)
+    last_idx = np.full(n, -1, dtype=np.int64)
+    for j in range(k):
+        prev_val[:, j] = last_val
+        prev_idx[:, j] = last_idx
+        pos = yearly[:, j] > 0
+        last_val = np.where(pos, yearly[:, j], last_val)
+        last_idx = np.where(pos, j, last_idx)
+    return prev_val, prev_idx
+
+
+TREND_LABELS = np.array(["Stabil", "Artış", "Orta Düşüş", "Şiddetli Düşüş"], dtype=object)
+
+
+def facility_features(matrix, bina_index=None, kis_sezonu=False):
+    """Eşiklerden bağımsız tesisat özellik tablosu (tesisat sırasında, `ozellik_deposu` sütunları)
+
+    matrix: `build_consumption_matrix` sözlüğü (veya aynı anahtarlı, sütun
+    sırası korunmuş `ozellik_deposu.period_matrix`), NaN = veri yok. Boş
+    hücreler toplam / ay ortalaması / sapma / seri hesaplarında 0 sayılır;
+    'sifir_ay' yalnızca kayıtlı sıfırları sayar. Yıllık kış ortalamaları
+    'kis_<yıl>' sütunlarıdır. bina_index verilmezse bina sütunları 0 / NaN.
+
+    Mesajlardaki ortalamalar ve toplam eski satır döngüsünün toplama sırasıyla
+    hesaplanır (`_group_mean`, `_series_mean`), sonuçlar bit düzeyinde aynıdır.
+    'bina_ort' tesisat ve bina ortalamalarının np.mean'idir (ham_veri /
+    hamveri2 döngüsü); tespit / anomaly_detection döngüleri tesisat aylarını
+    sırayla topladığından bu uygulamalarda son basamakta (~1e-16 göreli)
+    farklılaşabilir, yalnızca tam sınırdaki bina karşılaştırmasını etkiler.
+    """
+    values = matrix['values']
+    n, m = values.shape
+
+    valid = ~np.isnan(values)
+    filled = np.where(valid, values, 0.0)
+    positive = values > 0
+
+    # Genel ve mevsimsel ortalamalar (sıfır olmayan); eski döngüdeki gibi
+    # mevsimler groupby ortalaması, genel ortalama Series.mean
+    pozitif_ort, pozitif_ay = _series_mean(values, positive)
+    kis_ort = _group_mean(values, positive & matrix['kis_mask'])
+    yaz_ort = _group_mean(values, positive & matrix['yaz_mask'])
+    kis_ort[np.isnan(kis_ort)] = 0.0
+    yaz_ort[np.isnan(yaz_ort)] = 0.0
+
+    # Tüm aylar üzerinden dağılım (boş = 0)
+    ay_ort = filled.mean(axis=1) if m else np.zeros(n)
+    std = filled.std(axis=1) if m else np.zeros(n)
+    cv = np.zeros(n)
+    np.divide(std, ay_ort, out=cv, where=ay_ort > 0)
+    cv *= 100
+    min_pozitif = np.where(positive, values, np.inf).min(axis=1) if m else np.zeros(n)
+
+    table = {
+        'veri_ay': valid.sum(axis=1),
+        'bos_ay': (~valid).sum(axis=1),
+        'toplam': _series_sum(values, valid)[0],
+        'ay_ort': ay_ort,
+        'std': std,
+        'cv': cv,
+        'pozitif_ay': pozitif_ay,
+        'pozitif_ort': pozitif_ort,
+        'kis_ort': kis_ort,
+        'yaz_ort': yaz_ort,
+        'sifir_ay': (values == 0).sum(axis=1),
+        'cok_dusuk_ay': (positive & (values < 5)).sum(axis=1),
+        'max_sifir_seri': max_run_length(filled == 0),
+        'max_tuketim': filled.max(axis=1) if m else np.zeros(n),
+        'min_pozitif': np.where(np.isfinite(min_pozitif), min_pozitif, 0.0),
+    }
+
+    # Yıllık kış ortalamaları
+    kis_keys, yearly, kis_count = winter_year_means(matrix, kis_sezonu)
+    table['kis_ay'] = kis_count
+    for j, key in enumerate(kis_keys):
+        table[f"kis_{key}"] = yearly[:, j]
+
+    # Bina ortalamaları (indeks sorgusu)
+    if bina_index is None:
+        table['bina_ort'] = np.zeros(n)
+        table['bina_adet'] = np.zeros(n, dtype=np.int64)
+        table['bina_ay_ort'] = np.full(n, np.nan)
+    else:
+        table['bina_ort'] = lookup(bina_index, 'nonzero_mean', fill=0.0).astype(np.float64)
+        table['bina_adet'] = lookup(bina_index, 'nonzero_units', fill=0).astype(np.int64)
+        table['bina_ay_ort'] = lookup(bina_index, 'overall_mean').astype(np.float64)
+    return pd.DataFrame({key: np.asarray(col, dtype=np.float64 if col.dtype.kind == 'f' else np.int64)
+                         for key, col in table.items()})
+
+
+def winter_columns(table):
+    """Özellik tablosundaki kış yılları ve (tesisat x kış yılı) ortalama matrisi"""
+    cols = [c for c in table.columns if c.startswith('kis_') and c[4:].isdigit()]
+    keys = np.array([int(c[4:]) for c in cols], dtype=np.int64)
+    return keys, table[cols].to_numpy(dtype=np.float64).reshape(len(table), len(cols))
+
+
+def features_from_table(table, kis_sezonu=False):
+    """Özellik tablosundan puanlama dizileri (`score_consumption` girdisi)
+
+    Önceki pozitif kış yılı, kış trend kodu (`TREND_LABELS` indeksi) ve yıl
+    yeterliliği tablodaki yıllık kış ortalamalarından türetilir. 'kis_keys'
+    (kış yılları) dışındaki bütün diziler tesisat sırasındadır.
+    """
+    n = len(table)
+    kis_keys, yearly = winter_columns(table)
+
+    min_kis_ay = 3 if kis_sezonu else 4
+    yearly_pos = yearly > 0
+    yil_ok = (table['kis_ay'].to_numpy() >= min_kis_ay) & (yearly_pos.sum(axis=1) >= 2)
+    prev_val, prev_idx = _previous_positive(yearly)
+
+    k = yearly.shape[1]
+    cols = np.arange(k)
+    first_pos = np.where(yearly_pos, cols, k).min(axis=1) if k else np.zeros(n, dtype=np.int64)
+    last_pos = np.where(yearly_pos, cols, -1).max(axis=1) if k else np.full(n, -1)
+    rows = np.arange(n)
+
+    # Kış trend kodu
+    kis_trend = np.zeros(n, dtype=np.int8)
+    if k:
+        ilk = yearly[rows, np.clip(first_pos, 0, k - 1)]
+        son = yearly[rows, np.clip(last_pos, 0, k - 1)]
+        with np.errstate(invalid='ignore'):
+            kis_trend[yil_ok & (son > ilk * 1.5)] = 1
+            kis_trend[yil_ok & (son < ilk * 0.7)] = 2
+            kis_trend[yil_ok & (son < ilk * 0.5)] = 3
+
+    return {
+        'has_data': table['veri_ay'].to_numpy() > 0,
+        'kis_tuketim': table['kis_ort'].to_numpy(),
+        'yaz_tuketim': table['yaz_ort'].to_numpy(),
+        'ortalama_tuketim': table['pozitif_ort'].to_numpy(),
+        'toplam_tuketim': table['toplam'].to_numpy(),
+        'sifir_ay': table['sifir_ay'].to_numpy(),
+        'kis_yillik': yearly,
+        'yil_ok': yil_ok,
+        'onceki_deger': prev_val,
+        'onceki_yil': prev_idx,
+        'son_yil': last_pos.astype(np.int64),
+        'kis_trend': kis_trend,
+        'bina_ort': table['bina_ort'].to_numpy(),
+        'bina_adet': table['bina_adet'].to_numpy(),
+        'kis_keys': kis_keys,
+    }
+
+
+def consumption_features(df, date_columns, bina_col, kis_sezonu=False, matrix=None, bina_index=None):
+    """Eşiklerden bağımsız tesisat özellikleri (tesisat başına diziler)
+
+    `facility_features` tablosu + `features_from_table`. Eşik değişikliğinde
+    yeniden hesaplanmaz; `score_consumption` yalnızca karşılaştırmaları yapar.
+    """
+    if matrix is None:
+        matrix = build_consumption_matrix(df, list(date_columns))
+    if bina_index is None:
+        bina_index = build_building_index(df[bina_col], matrix['values'])
+    return features_from_table(facility_features(matrix, bina_index, kis_sezonu), kis_sezonu)
+
+
+# results_df kuralları (`kural_motoru.KURALLAR` adları) ve kenar çubuğu eşiklerinin kural parametreleri
+TESPIT_KURALLARI = ['kis_dusuk', 'mevsimsiz', 'toplam_dusuk', 'sifir_ay', 'ani_dusus', 'bina_farki']
+ESIK_PARAMETRELERI = {
+    'kis_tuketim_esigi': 'kis_esik',
+    'bina_ort_dusuk_oran': 'bina_oran',
+    'ani_dusus_orani': 'dusus_orani',
+    'min_onceki_kis_tuketim': 'min_onceki',
+}
+_DERLEME = compile_rules([kural for kural in KURALLAR if kural['ad'] in TESPIT_KURALLARI])
+_DUSUS_DERLEME = compile_rules([kural for kural in KURALLAR if kural['ad'] == 'ani_dusus'])
+
+
+def rule_params(**esikler):
+    """Kenar çubuğu eşiklerinden (`ESIK_PARAMETRELERI` anahtarları) kural parametreleri"""
+    return {ESIK_PARAMETRELERI[ad]: deger for ad, deger in esikler.items()}
+
+
+def _rule_flags(features, params):
+    """`TESPIT_KURALLARI` bayrakları (kural adı -> tesisat dizisi) ve ani düşüş çiftleri (tesisat x kış yılı)
+
+    Kural girdileri ilk puanlamada bir kez kurulur, özelliklerde saklanır.
+    """
+    girdi = features.get('_kural_girdileri')
+    if girdi is None:
+        girdi = features['_kural_girdileri'] = {'tesisat': rule_inputs(features), 'cift': pair_inputs(features)}
+    bayraklar = evaluate_rules(_DERLEME, girdi['tesisat'], params)['bayraklar']
+    cift = evaluate_rules(_DUSUS_DERLEME, girdi['cift'], params)['bayraklar']['ani_dusus']
+    return bayraklar, cift.reshape(features['kis_yillik'].shape)
+
+
+def _texts(features, ad, idx, fmt):
+    """`idx` satırlarının `fmt(i)` metinleri (tesisat başına bir kez biçimlenir, özelliklerde saklanır)"""
+    metinler = features.setdefault('_mesajlar', {})
+    if ad not in metinler:
+        n = len(features['kis_tuketim'])
+        metinler[ad] = (np.full(n, '', dtype=object), np.zeros(n, dtype=bool))
+    metin, hazir = metinler[ad]
+    eksik = idx[~hazir[idx]]
+    metin[eksik] = [fmt(i) for i in eksik]
+    hazir[eksik] = True
+    return metin[idx]
+
+
+def score_consumption(features, tesisat, bina, kis_tuketim_esigi, bina_ort_dusuk_oran,
+                      ani_dusus_orani, min_onceki_kis_tuketim, kis_sezonu=False):
+    """Özellikler üzerinde eşik karşılaştırmaları ve mesajlar (`results_df`)
+
+    tesisat / bina: tesisat sırasında etiket dizileri. Bayraklar
+    `TESPIT_KURALLARI`nın `evaluate_rules` sonucudur; ani kış düşüşü her
+    kış yılı çifti için ayrı mesajdır. Yalnızca işaretlenen satırlar için
+    mesaj üretilir; ham veriye dönülmez.
+    """
+    kis_tuketim = features['kis_tuketim']
+    yaz_tuketim = features['yaz_tuketim']
+    ortalama = features['ortalama_tuketim']
+    toplam = features['toplam_tuketim']
+    yearly = features['kis_yillik']
+    prev_val = features['onceki_deger']
+    prev_idx = features['onceki_yil']
+    last_pos = features['son_yil']
+    kis_keys = features['kis_keys']
+    zero_months = features['sifir_ay']
+    bina_ort = features['bina_ort']
+    n = len(kis_tuketim)
+    k = yearly.shape[1]
+
+    bayraklar, pair_flag = _rule_flags(features, rule_params(
+        kis_tuketim_esigi=kis_tuketim_esigi, bina_ort_dusuk_oran=bina_ort_dusuk_oran,
+        ani_dusus_orani=ani_dusus_orani, min_onceki_kis_tuketim=min_onceki_kis_tuketim))
+
+    # Anomali mesajları (kural sırası korunur); eşikten bağımsız metinler önbellekte
+    mesaj = np.full(n, '', dtype=object)
+    anomali_sayisi = np.zeros(n, dtype=np.int64)
+
+    def ekle(idx, metin):
+        onceki = mesaj[idx]
+        mesaj[idx] = np.where(anomali_sayisi[idx] > 0, onceki + '; ', onceki) + metin
+        anomali_sayisi[idx] += 1
+
+    def yil_etiketi(key):
+        return f"{key - 1}/{key} kışı" if kis_sezonu else f"{key}"
+
+    def son_etiketi(key):
+        return f"{key - 1}/{key}" if kis_sezonu else f"{key}"
+
+    idx = np.flatnonzero(bayraklar['kis_dusuk'])
+    ekle(idx, _texts(features, 'kis', idx, lambda i: f"Kış ayı düşük tüketim: {kis_tuketim[i]:.1f} m³/ay"))
+    idx = np.flatnonzero(bayraklar['mevsimsiz'])
+    ekle(idx, _texts(features, 'mevsimsiz', idx,
+                     lambda i: f"Kış-yaz tüketim farkı az: Kış {kis_tuketim[i]:.1f}, Yaz {yaz_tuketim[i]:.1f}"))
+    idx = np.flatnonzero(bayraklar['toplam_dusuk'])
+    ekle(idx, _texts(features, 'toplam', idx, lambda i: f"Toplam tüketim çok düşük: {toplam[i]:.1f} m³"))
+    idx = np.flatnonzero(bayraklar['sifir_ay'])
+    ekle(idx, _texts(features, 'sifir', idx, lambda i: f"Çok fazla sıfır tüketim: {zero_months[i]} ay"))
+
+    # Ani kış düşüşleri: aynı tesisatta yıl sırasıyla
+    for j in range(k):
+        idx = np.flatnonzero(pair_flag[:, j])
+        ekle(idx, np.array([
+            f"Ani kış düşüşü: {yil_etiketi(kis_keys[prev_idx[i, j]])} ({prev_val[i, j]:.1f}) → "
+            f"{yil_etiketi(kis_keys[j])} ({yearly[i, j]:.1f}), "
+            f"%{((prev_val[i, j] - yearly[i, j]) / prev_val[i, j]) * 100:.1f} düşüş"
+            for i in idx
+        ], dtype=object))
+    idx = np.flatnonzero(bayraklar['ani_dusus'])
+    ekle(idx, np.array([
+        f"Son yıl ani düşüş: {son_etiketi(kis_keys[prev_idx[i, last_pos[i]]])} → "
+        f"{son_etiketi(kis_keys[last_pos[i]])}, "
+        f"%{((prev_val[i, last_pos[i]] - yearly[i, last_pos[i]]) / prev_val[i, last_pos[i]]) * 100:.1f} düşüş"
+        for i in idx
+    ], dtype=object))
+
+    idx = np.flatnonzero(bayraklar['bina_farki'])
+    ekle(idx, f"Bina ortalamasından %{bina_ort_dusuk_oran} düşük: " +
+         _texts(features, 'bina', idx, lambda i: f"{ortalama[i]:.1f} vs {bina_ort[i]:.1f}"))
+
+    keep = np.flatnonzero(features['has_data'])
+    anomali_sayisi = anomali_sayisi[keep]
+    results_df = pd.DataFrame({
+        'tesisat_no': np.asarray(tesisat)[keep],
+        'bina_no': np.asarray(bina)[keep],
+        'kis_tuketim': kis_tuketim[keep],
+        'yaz_tuketim': yaz_tuketim[keep],
+        'toplam_tuketim': toplam[keep],
+        'ortalama_tuketim': ortalama[keep],
+        'kis_trend': TREND_LABELS[features['kis_trend'][keep]],
+        'anomali_sayisi': anomali_sayisi,
+        'anomaliler': np.where(anomali_sayisi > 0, mesaj[keep], 'Normal').tolist(),
+        'suspicion_level': np.where(anomali_sayisi > 0, 'Şüpheli', 'Normal'),
+    })
+    return results_df
+
+
+SWEEP_PARAMS = ('kis_tuketim_esigi', 'bina_ort_dusuk_oran', 'ani_dusus_orani', 'min_onceki_kis_tuketim')
+
+
+def threshold_sweep(features, param, grid, kis_tuketim_esigi, bina_ort_dusuk_oran,
+                    ani_dusus_orani, min_onceki_kis_tuketim):
+    """Tek bir eşiğin ızgara değerlerinde şüpheli tesisat sayıları (diğer eşikler sabit)
+
+    param: `SWEEP_PARAMS`tan biri. Her tesisat için kuralın tetiklendiği
+    kritik eşik bir kez hesaplanır; ızgaranın bütün noktaları sıralı kritik
+    değerler üzerinde ikili aramayla sayılır (`kriter_motoru.count_above`).
+    Sayılar `score_consumption` sonucundaki 'Şüpheli' sayılarıdır.
+    """
+    kis = features['kis_tuketim']
+    n = len(kis)
+    grid = np.asarray(grid, dtype=np.float64)
+    params = rule_params(kis_tuketim_esigi=kis_tuketim_esigi, bina_ort_dusuk_oran=bina_ort_dusuk_oran,
+                         ani_dusus_orani=ani_dusus_orani, min_onceki_kis_tuketim=min_onceki_kis_tuketim)
+
+    # Taranan eşiğin kuralı dışındaki kurallar (ani düşüş: herhangi bir kış yılı çifti)
+    bayraklar, pair_flag = _rule_flags(features, params)
+    bayraklar = dict(bayraklar, ani_dusus=pair_flag.any(axis=1))
+    kural = {'kis_tuketim_esigi': 'kis_dusuk', 'bina_ort_dusuk_oran': 'bina_farki',
+             'ani_dusus_orani': 'ani_dusus', 'min_onceki_kis_tuketim': 'ani_dusus'}[param]
+    base = np.zeros(n, dtype=bool)
+    for ad, flag in bayraklar.items():
+        if ad != kural:
+            base = base | flag
+
+    # Taranan eşik her değeri geçirecek şekilde (±sonsuz) verilince kuralın geri kalan koşulları
+    serbest = np.inf if param == 'kis_tuketim_esigi' else -np.inf
+    uygun, uygun_cift = _rule_flags(features, dict(params, **{ESIK_PARAMETRELERI[param]: serbest}))
+    uygun = uygun[kural]
+
+    # Kritik değer: tesisat, eşik bu değerin altındayken işaretlenir
+    inclusive = False
+    with np.errstate(invalid='ignore', divide='ignore'):
+        if param == 'kis_tuketim_esigi':
+            # kis < eşik  <=>  -kis > -eşik
+            kritik = np.where(uygun, -kis, -np.inf)
+            grid = -grid
+        elif param == 'bina_ort_dusuk_oran':
+            kritik = np.where(uygun, (1 - features['ortalama_tuketim'] / features['bina_ort']) * 100, -np.inf)
+        elif param == 'ani_dusus_orani':
+            yearly = features['kis_yillik']
+            dusus = np.where(uygun_cift, (1 - yearly / features['onceki_deger']) * 100, -np.inf)
+            kritik = dusus.max(axis=1) if dusus.shape[1] else np.full(n, -np.inf)
+        else:
+            onceki = np.where(uygun_cift, features['onceki_deger'], -np.inf)
+            kritik = onceki.max(axis=1) if onceki.shape[1] else np.full(n, -np.inf)
+            inclusive = True
+    kritik = np.where(base, np.inf, kritik)
+    kritik = np.where(features['has_data'], kritik, -np.inf)
+    return count_above(kritik, grid, inclusive)
+
+
+def analyze_consumption_matrix(df, date_columns, tesisat_col, bina_col,
+                               kis_tuketim_esigi, bina_ort_dusuk_oran,
+                               ani_dusus_orani, min_onceki_kis_tuketim,
+                               kis_sezonu=False, matrix=None, bina_index=None):
+    """Tüketim paternlerini tüm tesisatlar için matris üzerinde analiz et
+
+    `analyze_consumption_patterns` ile aynı `results_df` sütunlarını üretir.
+    kis_sezonu=True, Aralık ayını bir sonraki kışa atayan (en az 3 kış ayı)
+    güncel kış yılı tanımını kullanır. Aynı veri için hazırlanmış `matrix`
+    ve `bina_index` verilirse yeniden hesaplanmaz. İki aşamalıdır:
+    `consumption_features` (eşikten bağımsız) + `score_consumption`.
+    """
+    if matrix is None:
+        matrix = build_consumption_matrix(df, list(date_columns))
+    if len(matrix['values']) == 0 or matrix['values'].shape[1] == 0:
+        return pd.DataFrame(columns=RESULT_COLUMNS)
+    features = consumption_features(df, date_columns, bina_col, kis_sezonu, matrix, bina_index)
+    return score_consumption(
+        features, df[tesisat_col].to_numpy(), df[bina_col].to_numpy(),
+        kis_tuketim_esigi, bina_ort_dusuk_oran, ani_dusus_orani, min_onceki_kis_tuketim,
+        kis_sezonu=kis_sezonu,
+    )
@@ -0,0 +1,58 @@
+"""new.py için tesis x mevsim gruplu anomali puanlama motoru.
+
+İstatistikler her (Tüketim noktası, Mevsim) grubu için `groupby().transform`
+ile tek geçişte hesaplanır; sonuçlar kayıtların indeksine hizalı döner (satır
+sırası veya tesis sayısından bağımsız). Tesis sütunu yoksa yalnızca mevsime
+göre gruplanır.
+
+Yöntemler (bayrak: 1 anomali, -1 normal):
+    zscore - |x - ortalama| / std > eşik (std örneklem std'si; tek kayıtlı
+             veya sabit gruplar anomali sayılmaz)
+    iqr    - x < Q1 - 1.5*IQR veya x > Q3 + 1.5*IQR
+    mad    - medyan / MAD tabanlı dayanıklı z (0.6745 * |x - medyan| / MAD)
+             > eşik; MAD = 0 olan gruplar anomali sayılmaz
+"""
+import numpy as np
+import pandas as pd
+
+# Dayanıklı z için normal dağılım düzeltmesi (Iglewicz-Hoaglin)
+MAD_KATSAYI = 0.6745
+IQR_KATSAYI = 1.5
+
+
+def _keys(df, facility_col, season_col):
+    """Grup sütunları (tesis sütunu yoksa yalnızca mevsim)"""
+    return [df[facility_col], df[season_col]] if facility_col in df.columns else [df[season_col]]
+
+
+def _flags(mask):
+    return np.where(mask, 1, -1)
+
+
+def seasonal_zscore(df, threshold=3, value_col='Sm3', facility_col='Tüketim noktası', season_col='Mevsim'):
+    """Tesis x mevsim z-skoru; döner: (bayraklar, |z|) df indeksine hizalı Series"""
+    keys = _keys(df, facility_col, season_col)
+    grup = df[value_col].groupby(keys, sort=False)
+    z = ((df[value_col] - grup.transform('mean')) / grup.transform('std')).abs()
+    return pd.Series(_flags(z > threshold), index=df.index), z
+
+
+def seasonal_iqr(df, value_col='Sm3', facility_col='Tüketim noktası', season_col='Mevsim'):
+    """Tesis x mevsim IQR sınırları dışındaki kayıtlar; döner: df indeksine hizalı bayraklar"""
+    keys = _keys(df, facility_col, season_col)
+    grup = df[value_col].groupby(keys, sort=False)
+    q1 = grup.transform('quantile', 0.25)
+    q3 = grup.transform('quantile', 0.75)
+    iqr = q3 - q1
+    x = df[value_col]
+    return pd.Series(_flags((x < q1 - IQR_KATSAYI * iqr) | (x > q3 + IQR_KATSAYI * iqr)), index=df.index)
+
+
+def seasonal_mad(df, threshold=3.5, value_col='Sm3', facility_col='Tüketim noktası', season_col='Mevsim'):
+    """Tesis x mevsim medyan / MAD dayanıklı z-skoru; döner: (bayraklar, dayanıklı z)"""
+    keys = _keys(df, facility_col, season_col)
+    grup = df[value_col].groupby(keys, sort=False)
+    sapma = (df[value_col] - grup.transform('median')).abs()
+    mad = sapma.groupby(keys, sort=False).transform('median')
+    z = MAD_KATSAYI * sapma / mad.where(mad > 0)
+    return pd.Series(_flags(z > threshold), index=df.index), z
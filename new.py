@@ -8,6 +8,10 @@ from datetime import datetime, timedelta
 from sklearn.ensemble import IsolationForest
 from sklearn.preprocessing import StandardScaler
 from scipy import stats
+from onbellek import file_hash
+from ozellik_deposu import records_features
+from mevsim_motoru import seasonal_zscore, seasonal_iqr, seasonal_mad
+from orman_motoru import facility_model, facility_scores, facility_vectors, last_model, record_scores
 import warnings
 warnings.filterwarnings('ignore')
 
@@ -65,7 +69,7 @@ def add_seasonal_features(df):
     return df
 
 def detect_anomalies_isolation_forest(df, contamination=0.1):
-    """Isolation Forest ile anomali tespiti"""
+    """Isolation Forest ile kayıt bazlı anomali tespiti (tesis sütunu olmayan dosyalar için)"""
     # Özellik matrisini hazırla
     features = ['Sm3', 'Sin_Ay', 'Cos_Ay']
     X = df[features].copy()
@@ -76,53 +80,13 @@ def detect_anomalies_isolation_forest(df, contamination=0.1):
     
     # Isolation Forest modelini eğit
     iso_forest = IsolationForest(contamination=contamination, random_state=42)
-    anomalies = iso_forest.fit_predict(X_scaled)
+    anomalies = np.where(iso_forest.fit_predict(X_scaled) == -1, 1, -1)  # 1 anomali, -1 normal
     
     # Anomali skorları
     scores = iso_forest.decision_function(X_scaled)
     
     return anomalies, scores
 
-def detect_anomalies_zscore(df, threshold=3):
-    """Z-Score yöntemi ile anomali tespiti (mevsimsel düzeltmeli)"""
-    df_copy = df.copy()
-    
-    # Her mevsim için ayrı z-score hesapla
-    anomalies = []
-    z_scores = []
-    
-    for season in df_copy['Mevsim'].unique():
-        season_data = df_copy[df_copy['Mevsim'] == season]['Sm3']
-        mean_val = season_data.mean()
-        std_val = season_data.std()
-        
-        season_z_scores = np.abs((season_data - mean_val) / std_val)
-        season_anomalies = (season_z_scores > threshold).astype(int) * 2 - 1  # -1 normal, 1 anomali
-        
-        z_scores.extend(season_z_scores.tolist())
-        anomalies.extend(season_anomalies.tolist())
-    
-    return np.array(anomalies), np.array(z_scores)
-
-def detect_anomalies_iqr(df):
-    """IQR yöntemi ile anomali tespiti (mevsimsel düzeltmeli)"""
-    df_copy = df.copy()
-    anomalies = []
-    
-    for season in df_copy['Mevsim'].unique():
-        season_data = df_copy[df_copy['Mevsim'] == season]['Sm3']
-        Q1 = season_data.quantile(0.25)
-        Q3 = season_data.quantile(0.75)
-        IQR = Q3 - Q1
-        
-        lower_bound = Q1 - 1.5 * IQR
-        upper_bound = Q3 + 1.5 * IQR
-        
-        season_anomalies = ((season_data < lower_bound) | (season_data > upper_bound)).astype(int) * 2 - 1
-        anomalies.extend(season_anomalies.tolist())
-    
-    return np.array(anomalies)
-
 def create_time_series_plot(df, anomalies_col):
     """Zaman serisi grafiği oluştur"""
     fig = make_subplots(rows=2, cols=1, 
@@ -191,13 +155,25 @@ def main():
             # Sidebar parametreleri
             method = st.sidebar.selectbox(
                 "Anomali Tespit Yöntemi",
-                ["Isolation Forest", "Z-Score (Mevsimsel)", "IQR (Mevsimsel)"]
+                ["Isolation Forest", "Z-Score (Mevsimsel)", "IQR (Mevsimsel)", "Medyan/MAD (Mevsimsel)"]
             )
             
             if method == "Isolation Forest":
                 contamination = st.sidebar.slider("Anomali Oranı", 0.01, 0.3, 0.1, 0.01)
+                yalnizca_puanla = st.sidebar.checkbox(
+                    "Son eğitilen modelle puanla",
+                    help="Yeni dosyanın tesislerini yeniden eğitmeden oturumda son eğitilen modelle puanlar")
             elif method == "Z-Score (Mevsimsel)":
                 threshold = st.sidebar.slider("Z-Score Eşiği", 1.5, 5.0, 3.0, 0.1)
+            elif method == "Medyan/MAD (Mevsimsel)":
+                threshold = st.sidebar.slider("Dayanıklı Z Eşiği", 2.0, 6.0, 3.5, 0.1)
+            
+            # Tesis bazında özellikler (özellik deposu; aynı dosya için bir kez hesaplanır)
+            ozellikler = None
+            if 'Tüketim noktası' in df.columns:
+                ozellikler = records_features(st.session_state, ('new', file_hash(uploaded_file)),
+                                              df['Tüketim noktası'], df['Belge tarihi'], df['Sm3'],
+                                              id_name='Tüketim noktası')
             
             # Tesis seçimi
             if 'Tüketim noktası' in df.columns:
@@ -207,18 +183,29 @@ def main():
                 if selected_facility != "Tümü":
                     df = df[df['Tüketim noktası'] == selected_facility]
             
-            # Anomali tespiti yap
-            if method == "Isolation Forest":
+            # Anomali tespiti yap (mevsimsel yöntemler tesis x mevsim gruplarında, kayıt indeksine hizalı)
+            if method == "Isolation Forest" and ozellikler is not None:
+                # Tesis bazlı model (dosya + oran için bir kez eğitilir, sonra yalnızca puanlanır)
+                X = facility_vectors(ozellikler)
+                veri_ozeti = file_hash(uploaded_file)
+                model = last_model(st.session_state)
+                if yalnizca_puanla and model is not None:
+                    st.sidebar.caption(f"Kayıtlı model kullanılıyor (anomali oranı {model['contamination']:.2f})")
+                else:
+                    model = facility_model(st.session_state, veri_ozeti, X, contamination)
+                flags, scores = facility_scores(st.session_state, model, veri_ozeti, X)
+                df['Anomali'], df['Anomali_Skoru'] = record_scores(ozellikler, flags, scores,
+                                                                   df['Tüketim noktası'])
+            elif method == "Isolation Forest":
                 anomalies, scores = detect_anomalies_isolation_forest(df, contamination)
                 df['Anomali'] = anomalies
                 df['Anomali_Skoru'] = scores
             elif method == "Z-Score (Mevsimsel)":
-                anomalies, z_scores = detect_anomalies_zscore(df, threshold)
-                df['Anomali'] = anomalies
-                df['Z_Score'] = z_scores
+                df['Anomali'], df['Z_Score'] = seasonal_zscore(df, threshold)
+            elif method == "Medyan/MAD (Mevsimsel)":
+                df['Anomali'], df['Dayanikli_Z'] = seasonal_mad(df, threshold)
             else:  # IQR
-                anomalies = detect_anomalies_iqr(df)
-                df['Anomali'] = anomalies
+                df['Anomali'] = seasonal_iqr(df)
             
             # Sonuçları göster
             col1, col2, col3, col4 = st.columns(4)
@@ -260,6 +247,8 @@ def main():
                     display_cols.append('Anomali_Skoru')
                 elif method == "Z-Score (Mevsimsel)":
                     display_cols.append('Z_Score')
+                elif method == "Medyan/MAD (Mevsimsel)":
+                    display_cols.append('Dayanikli_Z')
                 
                 st.dataframe(anomaly_df[display_cols], use_container_width=True)
                 
@@ -284,26 +273,49 @@ def main():
             
             st.dataframe(seasonal_stats, use_container_width=True)
             
+            # Tesis özellikleri
+            if ozellikler is not None:
+                st.subheader("🏠 Tesis Özellikleri")
+                tesis_ozet = ozellikler[['Tüketim noktası', 'veri_ay', 'pozitif_ort', 'kis_ort', 'yaz_ort',
+                                         'cv', 'max_sifir_seri']]
+                if selected_facility != "Tümü":
+                    tesis_ozet = tesis_ozet[tesis_ozet['Tüketim noktası'] == selected_facility]
+                tesis_ozet = tesis_ozet.rename(columns={
+                    'veri_ay': 'Kayıtlı Ay', 'pozitif_ort': 'Ortalama Tüketim', 'kis_ort': 'Kış Ortalaması',
+                    'yaz_ort': 'Yaz Ortalaması', 'cv': 'Değişim Katsayısı (%)',
+                    'max_sifir_seri': 'En Uzun Sıfır / Boş Seri (Ay)'
+                }).round(2)
+                st.dataframe(tesis_ozet, use_container_width=True)
+            
             # Metodoloji açıklaması
             with st.expander("ℹ️ Metodoloji Hakkında"):
                 if method == "Isolation Forest":
                     st.write("""
                     **Isolation Forest**: Makine öğrenmesi tabanlı anomali tespit yöntemi.
-                    - Mevsimsel değişiklikleri trigonometrik özellikler ile modeller
+                    - Her tesis için aylık tüketimden özellik vektörü kurar (ortalama, değişkenlik, kış/yaz oranı, sıfır serileri...)
+                    - Tesis bazında anomali bulur; anormal tesisin tüm kayıtları işaretlenir
+                    - Eğitilen model dosya ve anomali oranı için saklanır, tekrar çalıştırmalarda yalnızca puanlanır
                     - Anomali oranı parametresi ile hassaslık ayarlanabilir
                     - Çok boyutlu anomalileri tespit edebilir
                     """)
                 elif method == "Z-Score (Mevsimsel)":
                     st.write("""
                     **Z-Score (Mevsimsel)**: İstatistiksel anomali tespit yöntemi.
-                    - Her mevsim için ayrı ortalama ve standart sapma hesaplar
+                    - Her tesis ve mevsim için ayrı ortalama ve standart sapma hesaplar
                     - Z-Score eşiği ile hassaslık ayarlanabilir
                     - Mevsimsel değişiklikleri dikkate alır
                     """)
+                elif method == "Medyan/MAD (Mevsimsel)":
+                    st.write("""
+                    **Medyan/MAD (Mevsimsel)**: Aykırı değerlerden etkilenmeyen dayanıklı z-skoru.
+                    - Her tesis ve mevsim için medyan ve medyan mutlak sapma (MAD) hesaplar
+                    - Dayanıklı z = 0.6745 × |tüketim - medyan| / MAD
+                    - Birkaç aşırı okuma ortalama ve standart sapmayı bozduğunda Z-Score'a göre daha güvenilirdir
+                    """)
                 else:
                     st.write("""
                     **IQR (Mevsimsel)**: Çeyrekler arası mesafe tabanlı anomali tespit.
-                    - Her mevsim için ayrı IQR hesaplar
+                    - Her tesis ve mevsim için ayrı IQR hesaplar
                     - Q1 - 1.5*IQR ve Q3 + 1.5*IQR sınırları kullanır
                     - Robust ve anlaşılır yöntem
                     """)
@@ -321,7 +333,7 @@ def main():
         
         ### ⚡ Özellikler:
         - Mevsimsel değişiklikleri dikkate alan akıllı anomali tespiti
-        - Üç farklı anomali tespit yöntemi
+        - Dört farklı anomali tespit yöntemi
         - İnteraktif görselleştirme
         - Detaylı anomali raporu ve CSV indirme
         """)
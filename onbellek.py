@@ -0,0 +1,192 @@
+"""Yüklenen dosyalar için içerik özetiyle anahtarlanan disk önbelleği.
+
+Dosya içeriğinin özeti (blake2b) ve bir ad alanı ("ham_veri.load_data",
+"gmz.read_excel" gibi) birlikte anahtar olur. Okunmuş ve temizlenmiş
+DataFrame diske Feather (sıkıştırmasız Arrow IPC) olarak yazılır ve sonraki
+yeniden çalıştırmalarda / aynı dosyanın tekrar yüklenmesinde bellek
+eşlemeli (memory_map) olarak geri okunur. pyarrow yoksa veya çerçeve Arrow'a
+çevrilemiyorsa (metin olmayan sütun adları, karışık tipli sütunlar) pickle
+kullanılır. Toplam boyut sınırı aşıldığında en uzun süredir kullanılmayan
+dosyalar silinir (LRU, dosya değişiklik zamanı ile). Analiz sonuçları da
+aynı dizinde dosya özeti + eşik parametrelerinden üretilen anahtarla
+(`cache_key`) `read_frame` / `write_frame` üzerinden saklanır; eğitilmiş
+modeller (`orman_motoru`, .joblib) da boyut sınırına dahildir.
+
+Ayarlar ortam değişkenleriyle değiştirilebilir:
+    ANOMALI_ONBELLEK_DIZIN  - önbellek dizini (varsayılan: ./.onbellek)
+    ANOMALI_ONBELLEK_MB     - en fazla toplam boyut, MB (varsayılan: 2048)
+"""
+import hashlib
+import os
+import tempfile
+
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.feather as feather
+    PYARROW_AVAILABLE = True
+except ImportError:
+    PYARROW_AVAILABLE = False
+
+CACHE_DIR = os.environ.get('ANOMALI_ONBELLEK_DIZIN', os.path.join(os.getcwd(), '.onbellek'))
+MAX_CACHE_BYTES = int(float(os.environ.get('ANOMALI_ONBELLEK_MB', 2048)) * 1024 * 1024)
+
+_HASH_CHUNK = 8 * 1024 * 1024
+_upload_hashes = {}
+
+
+def file_hash(file):
+    """Yüklenen dosyanın (UploadedFile, dosya nesnesi veya yol) içerik özeti
+
+    Streamlit her yeniden çalıştırmada aynı UploadedFile'ı verir; aynı
+    `file_id` için özet bir kez hesaplanır.
+    """
+    file_id = getattr(file, 'file_id', None)
+    if file_id is not None and file_id in _upload_hashes:
+        return _upload_hashes[file_id]
+
+    h = hashlib.blake2b(digest_size=20)
+    if isinstance(file, (str, os.PathLike)):
+        with open(file, 'rb') as f:
+            for chunk in iter(lambda: f.read(_HASH_CHUNK), b''):
+                h.update(chunk)
+    elif hasattr(file, 'getbuffer'):
+        h.update(file.getbuffer())
+    else:
+        pos = file.tell()
+        file.seek(0)
+        for chunk in iter(lambda: file.read(_HASH_CHUNK), b''):
+            h.update(chunk)
+        file.seek(pos)
+
+    digest = h.hexdigest()
+    if file_id is not None:
+        _upload_hashes[file_id] = digest
+    return digest
+
+
+def cache_key(digest, namespace, params=None):
+    """Dosya özeti + ad alanı + (isteğe bağlı) parametrelerden önbellek anahtarı"""
+    parca = f"{namespace}|{digest}|{sorted(params.items()) if params else ''}"
+    return hashlib.blake2b(parca.encode('utf-8'), digest_size=16).hexdigest()
+
+
+def _paths(key):
+    return (os.path.join(CACHE_DIR, key + '.feather'),
+            os.path.join(CACHE_DIR, key + '.pkl'))
+
+
+def _read(key):
+    """Önbellekteki çerçeveyi oku (yoksa None) ve kullanım zamanını güncelle"""
+    feather_path, pickle_path = _paths(key)
+    try:
+        if PYARROW_AVAILABLE and os.path.exists(feather_path):
+            table = feather.read_table(feather_path, memory_map=True)
+            df = table.to_pandas(split_blocks=True, self_destruct=True)
+            os.utime(feather_path)
+            return df
+        if os.path.exists(pickle_path):
+            df = pd.read_pickle(pickle_path)
+            os.utime(pickle_path)
+            return df
+    except Exception:
+        # Bozuk / yarım kalmış dosya: sil ve yeniden üret
+        for path in (feather_path, pickle_path):
+            if os.path.exists(path):
+                os.remove(path)
+    return None
+
+
+def _write(key, df):
+    """Çerçeveyi atomik olarak önbelleğe yaz (Feather, olmazsa pickle)"""
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    feather_path, pickle_path = _paths(key)
+    fd, tmp_path = tempfile.mkstemp(dir=CACHE_DIR, suffix='.tmp')
+    os.close(fd)
+    try:
+        target = pickle_path
+        if PYARROW_AVAILABLE:
+            try:
+                feather.write_feather(df, tmp_path, compression='uncompressed')
+                target = feather_path
+            except (pa.ArrowException, ValueError, TypeError):
+                target = pickle_path
+        if target == pickle_path:
+            df.to_pickle(tmp_path)
+        os.replace(tmp_path, target)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    evict()
+
+
+def evict(max_bytes=None):
+    """Toplam boyut sınırı aşılırsa en eski kullanılan dosyaları sil"""
+    max_bytes = MAX_CACHE_BYTES if max_bytes is None else max_bytes
+    if not os.path.isdir(CACHE_DIR):
+        return
+    entries = []
+    for name in os.listdir(CACHE_DIR):
+        if not name.endswith(('.feather', '.pkl', '.joblib')):
+            continue
+        path = os.path.join(CACHE_DIR, name)
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            continue
+        entries.append((stat.st_mtime, stat.st_size, path))
+
+    total = sum(size for _, size, _ in entries)
+    for _, size, path in sorted(entries):
+        if total <= max_bytes:
+            break
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        total -= size
+
+
+def cached_frame(file, namespace, loader, params=None):
+    """`loader(file)` sonucunu dosya içeriğine göre önbellekten getir
+
+    Aynı içerik ve ad alanı için daha önce üretilmiş çerçeve varsa diskten
+    okunur; yoksa loader çalıştırılır ve sonucu yazılır. Loader None
+    döndürürse (okuma hatası) hiçbir şey saklanmaz.
+    """
+    if file is None:
+        return None
+    key = cache_key(file_hash(file), namespace, params)
+    df = _read(key)
+    if df is not None:
+        return df
+
+    if hasattr(file, 'seek'):
+        file.seek(0)
+    df = loader(file)
+    if isinstance(df, pd.DataFrame):
+        try:
+            _write(key, df)
+        except OSError:
+            # Disk dolu / yazma izni yok: önbelleksiz devam et
+            pass
+    return df
+
+
+def read_frame(key):
+    """Anahtarla saklanmış çerçeve (yoksa None)"""
+    return _read(key)
+
+
+def write_frame(key, df):
+    """Çerçeveyi anahtarla sakla (disk hatasında sessizce geçilir)"""
+    try:
+        _write(key, df)
+    except OSError:
+        pass
+
+
+def clear_cache():
+    """Önbellek dizinindeki tüm dosyaları sil"""
+    evict(max_bytes=0)
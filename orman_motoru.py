@@ -0,0 +1,147 @@
+"""new.py için tesis bazlı Isolation Forest hattı (önbellekli model).
+
+Her tesis için aylık matristen (`ozellik_deposu.records_features`) bir
+özellik vektörü kurulur; ölçekleyici + model (`StandardScaler` +
+`IsolationForest`, `max_samples` alt örneklemeli, `n_jobs=-1`) tek bir
+sklearn Pipeline olarak eğitilir ve joblib ile önbellek dizinine
+(`onbellek.CACHE_DIR`, `.joblib`) dosya özeti + anomali oranı anahtarıyla
+yazılır. Aynı dosya / oran için yeniden çalıştırmalarda model oturumdan veya
+diskten okunur; tesis skorları da (model, veri) çifti için oturumda tutulur.
+"Yalnızca puanla" yolu son eğitilen modeli yeni yüklenen dosyanın
+tesislerine uygular.
+"""
+import os
+import tempfile
+
+import joblib
+import numpy as np
+import pandas as pd
+import sklearn
+from sklearn.ensemble import IsolationForest
+from sklearn.pipeline import make_pipeline
+from sklearn.preprocessing import StandardScaler
+
+import onbellek
+from onbellek import cache_key, evict
+
+# Tesis özellik tablosundan modele giren sütunlar (+ kis_yaz_orani)
+OZELLIKLER = ['ay_ort', 'std', 'cv', 'pozitif_ort', 'kis_ort', 'yaz_ort', 'sifir_ay',
+              'cok_dusuk_ay', 'max_sifir_seri', 'max_tuketim', 'bos_ay']
+# Her ağacın gördüğü en fazla tesis sayısı
+MAX_ORNEK = 4096
+AGAC_SAYISI = 200
+
+
+def facility_vectors(ozellikler):
+    """Özellik tablosundan (tesis x özellik) model girdisi (NaN = 0)"""
+    X = ozellikler[OZELLIKLER].to_numpy(dtype=np.float64)
+    kis, yaz = ozellikler['kis_ort'].to_numpy(dtype=np.float64), ozellikler['yaz_ort'].to_numpy(dtype=np.float64)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        oran = np.where(yaz > 0, kis / yaz, 0.0)
+    return np.nan_to_num(np.column_stack([X, oran]), nan=0.0, posinf=0.0, neginf=0.0)
+
+
+def model_key(digest, contamination):
+    """Veri özeti + anomali oranından model anahtarı"""
+    return cache_key(digest, 'orman_motoru', {'contamination': round(float(contamination), 4),
+                                              'ozellikler': OZELLIKLER, 'sklearn': sklearn.__version__})
+
+
+def _path(key):
+    return os.path.join(onbellek.CACHE_DIR, key + '.joblib')
+
+
+def load_model(key):
+    """Diskteki modeli oku (yoksa / bozuksa None)"""
+    path = _path(key)
+    if not os.path.exists(path):
+        return None
+    try:
+        model = joblib.load(path)
+        os.utime(path)
+        return model
+    except Exception:
+        os.remove(path)
+        return None
+
+
+def save_model(key, model):
+    """Modeli atomik olarak yaz (disk hatasında sessizce geçilir)"""
+    try:
+        os.makedirs(onbellek.CACHE_DIR, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=onbellek.CACHE_DIR, suffix='.tmp')
+        os.close(fd)
+        try:
+            joblib.dump(model, tmp_path)
+            os.replace(tmp_path, _path(key))
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        evict()
+    except OSError:
+        pass
+
+
+def fit_model(X, contamination):
+    """Ölçekleyici + Isolation Forest hattını eğit"""
+    model = make_pipeline(
+        StandardScaler(),
+        IsolationForest(n_estimators=AGAC_SAYISI, max_samples=min(MAX_ORNEK, len(X)),
+                        contamination=contamination, n_jobs=-1, random_state=42),
+    )
+    return model.fit(X)
+
+
+def facility_model(state, digest, X, contamination):
+    """Veri sürümünün model kaydı ({'key', 'model', 'contamination'}): oturum -> disk -> eğitim
+
+    state: st.session_state (veya dict, None olabilir). Son kullanılan model
+    'orman_modeli' altında tutulur (yalnızca puanlama yolu için).
+    """
+    key = model_key(digest, contamination)
+    entry = None if state is None else state.get('orman_modeli')
+    if entry is not None and entry['key'] == key:
+        return entry
+    model = load_model(key)
+    if model is None:
+        model = fit_model(X, contamination)
+        save_model(key, model)
+    entry = {'key': key, 'model': model, 'contamination': contamination}
+    if state is not None:
+        state['orman_modeli'] = entry
+    return entry
+
+
+def last_model(state):
+    """Oturumda son eğitilen / yüklenen model kaydı (yoksa None)"""
+    return None if state is None else state.get('orman_modeli')
+
+
+def score_facilities(model, X):
+    """Tesis bayrakları (1 anomali, -1 normal) ve skorları (düşük = daha anormal)"""
+    scores = model.decision_function(X)
+    return np.where(scores < 0, 1, -1), scores
+
+
+def facility_scores(state, entry, digest, X):
+    """`entry` modeliyle veri sürümünün tesis bayrak / skorları (oturumda saklanır)"""
+    key = (entry['key'], digest)
+    cached = None if state is None else state.get('orman_puanlari')
+    if cached is not None and cached['key'] == key:
+        return cached['flags'], cached['scores']
+    flags, scores = score_facilities(entry['model'], X)
+    if state is not None:
+        state['orman_puanlari'] = {'key': key, 'flags': flags, 'scores': scores}
+    return flags, scores
+
+
+def record_scores(ozellikler, flags, scores, tesisler, id_name='Tüketim noktası'):
+    """Tesis bayrak / skorlarını kayıtlara yay (`tesisler` Series'inin indeksine hizalı)
+
+    Tesisi özellik tablosunda olmayan kayıtlar (ör. boş tesis) normal (-1)
+    sayılır, skorları NaN'dır.
+    """
+    kod = pd.Index(ozellikler[id_name]).get_indexer(tesisler)
+    # -1 (tabloda yok) sona eklenen normal bayrağa / NaN skora düşer
+    return (pd.Series(np.append(flags, -1)[kod], index=tesisler.index),
+            pd.Series(np.append(scores, np.nan)[kod], index=tesisler.index))
@@ -0,0 +1,161 @@
+"""Tesisat bazında kalıcı özellik deposu.
+
+Dedektörlerin ortak kullandığı eşikten bağımsız özellikler
+(`matris_motoru.facility_features`) her veri sürümü (dosya özeti + betik +
+sütun seçimi) için bir kez hesaplanır ve önbellek dizinine sütunsal olarak
+(`onbellek.write_frame`, Feather) yazılır; aynı oturumda `st.session_state`
+benzeri bir sözlükte de tutulur. Yeni bir dedektör ham veriye dönmeden
+tablodan okur.
+
+Sütunlar (tesisat sırasında, NaN = veri yok):
+    veri_ay, bos_ay     - dolu / boş ay sayısı
+    toplam              - toplam tüketim (boş = 0)
+    ay_ort, std, cv     - tüm aylar üzerinden ortalama, standart sapma,
+                          değişim katsayısı % (boş = 0; ortalama 0 ise cv 0)
+    pozitif_ay, pozitif_ort - sıfırdan büyük ay sayısı ve ortalaması
+    kis_ort, yaz_ort    - kış / yaz aylarının sıfırdan büyük ortalaması
+    sifir_ay            - kayıtlı sıfır ay sayısı (boşlar hariç)
+    cok_dusuk_ay        - 0 < tüketim < 5 olan ay sayısı
+    max_sifir_seri      - en uzun ardışık sıfır / boş ay serisi
+    max_tuketim, min_pozitif - en yüksek ve sıfırdan büyük en düşük tüketim
+    kis_ay              - dolu kış ayı sayısı
+    kis_<yıl>           - yıllık kış ortalaması (sıfırlar dahil, boşlar hariç)
+    bina_ort, bina_adet - binadaki tesisatların sıfır olmayan ortalamalarının
+                          ortalaması ve bu ortalamaya giren tesisat sayısı
+    bina_ay_ort         - bina aylık ortalamalarının genel ortalaması
+"""
+import re
+
+import numpy as np
+import pandas as pd
+
+from aktif_donem import month_seasons
+from matris_motoru import facility_features, get_season
+from onbellek import cache_key, read_frame, write_frame
+
+_YIL = re.compile(r'(19|20)\d{2}')
+_AY = re.compile(r'(?:^|\D)(\d{1,2})(?:\D|$)')
+
+
+def column_periods(date_columns):
+    """Sütun adlarından yıl, ay ve kış / yaz maskeleri (sütun sırası korunur)
+
+    'YYYY/MM' biçimi ay numarasıyla, diğer adlar (ör. 'Ocak 2023') ay
+    adlarıyla (`aktif_donem.month_seasons`) mevsime atanır. Yıl veya ay
+    bulunamayan sütunlarda değer 0'dır.
+    """
+    years, months = [], []
+    for col in date_columns:
+        text = str(col)
+        yil = _YIL.search(text)
+        years.append(int(yil.group()) if yil else 0)
+        kalan = text.replace(yil.group(), ' ') if yil else text
+        ay = _AY.search(kalan)
+        months.append(int(ay.group(1)) if ay and 1 <= int(ay.group(1)) <= 12 else 0)
+    years = np.array(years, dtype=np.int32)
+    months = np.array(months, dtype=np.int32)
+
+    kis, yaz = month_seasons(date_columns)
+    sayisal = months > 0
+    seasons = np.array([get_season(int(m)) if m else '' for m in months], dtype=object)
+    kis = np.where(sayisal, seasons == "Kış", kis)
+    yaz = np.where(sayisal, seasons == "Yaz", yaz)
+    return years, months, kis, yaz
+
+
+def period_matrix(values, date_columns):
+    """(tesisat x ay) diziden `facility_features` matris sözlüğü (sütun sırası korunur)"""
+    years, months, kis, yaz = column_periods(date_columns)
+    return {
+        'values': np.asarray(values, dtype=np.float64),
+        'date_columns': list(date_columns),
+        'years': years,
+        'months': months,
+        'kis_mask': kis,
+        'yaz_mask': yaz,
+    }
+
+
+def records_matrix(tesisat, tarih, tuketim):
+    """Kayıt bazlı (uzun) veriden tesisat x ay matrisi (aynı aydaki kayıtlar toplanır)
+
+    Döner: (tesisat anahtarları, 'YYYY/MM' sütunları, matris). Kaydı
+    olmayan aylar NaN.
+    """
+    tarih = pd.to_datetime(pd.Series(tarih).reset_index(drop=True), errors='coerce')
+    codes, keys = pd.factorize(pd.Series(tesisat).reset_index(drop=True))
+    tuketim = pd.to_numeric(pd.Series(tuketim), errors='coerce').to_numpy(dtype=np.float64)
+    donem = (tarih.dt.year * 12 + tarih.dt.month - 1).to_numpy(dtype=np.float64, na_value=np.nan)
+    ok = (codes >= 0) & ~np.isnan(donem) & ~np.isnan(tuketim)
+
+    donemler, col = np.unique(donem[ok].astype(np.int64), return_inverse=True)
+    n, m = len(keys), len(donemler)
+    sums = np.zeros(n * m)
+    counts = np.zeros(n * m, dtype=np.int64)
+    flat = codes[ok].astype(np.int64) * m + col
+    np.add.at(sums, flat, tuketim[ok])
+    np.add.at(counts, flat, 1)
+    values = np.where(counts > 0, sums, np.nan).reshape(n, m)
+    date_columns = [f"{d // 12}/{d % 12 + 1:02d}" for d in donemler]
+    return keys, date_columns, values
+
+
+def feature_key(anahtar, params):
+    """Veri kimliği (betik adı, dosya özeti...) + sütun parametrelerinden depo anahtarı"""
+    return cache_key('|'.join(map(str, anahtar)), 'ozellik_deposu', params)
+
+
+def stored_table(state, key):
+    """Oturumdaki veya diskteki özellik tablosu (yoksa None, hesaplamaz)"""
+    entry = None if state is None else state.get('ozellik_deposu')
+    if entry is not None and entry['key'] == key:
+        return entry['table']
+    table = read_frame(key)
+    if table is not None and state is not None:
+        state['ozellik_deposu'] = {'key': key, 'table': table}
+    return table
+
+
+def feature_table(state, key, build, progress=None):
+    """Veri sürümünün özellik tablosu; yoksa `build()` ile bir kez hesaplanıp yazılır
+
+    state: st.session_state (veya dict, None olabilir); key: `feature_key`.
+    """
+    table = stored_table(state, key)
+    if table is None:
+        table = build()
+        write_frame(key, table)
+        if state is not None:
+            state['ozellik_deposu'] = {'key': key, 'table': table}
+    elif progress is not None:
+        progress(1.0)
+    return table
+
+
+def matrix_features(state, anahtar, values, date_columns, bina_index=None, kis_sezonu=False):
+    """(tesisat x ay) dizinin depodaki özellik tablosu (sütun sırası korunur)
+
+    anahtar None ise tablo saklanmadan hesaplanır.
+    """
+    def build():
+        return facility_features(period_matrix(values, date_columns), bina_index, kis_sezonu)
+
+    if anahtar is None:
+        return build()
+    key = feature_key(anahtar, {'date_columns': [str(c) for c in date_columns], 'kis_sezonu': kis_sezonu,
+                                'bina': bina_index is not None})
+    return feature_table(state, key, build)
+
+
+def records_features(state, anahtar, tesisat, tarih, tuketim, id_name='tesisat'):
+    """Kayıt bazlı verinin tesisat özellik tablosu (`records_matrix` ile, ilk sütun `id_name`)
+
+    Matris yalnızca tablo depoda yoksa kurulur.
+    """
+    def build():
+        keys, date_columns, values = records_matrix(tesisat, tarih, tuketim)
+        table = facility_features(period_matrix(values, date_columns))
+        table.insert(0, id_name, np.asarray(keys, dtype=object))
+        return table
+
+    return feature_table(state, feature_key(anahtar, {'id_name': id_name}), build)
@@ -0,0 +1,413 @@
+"""Bina bazında parçalara (shard) bölünmüş paralel analiz.
+
+Pivot tablo `bina_no`ya göre parçalanır: bir binanın bütün tesisatları aynı
+parçaya düşer, böylece bina ortalaması karşılaştırmaları parça içinde kalır
+ve sonuç tek işlemli analizle aynıdır. Parçalar bir süreç havuzunda
+(ProcessPoolExecutor) çalıştırılır, sonuçlar orijinal satır sırasına göre
+birleştirilir (deterministik). İşçi sayısı 1 ise veya veri küçükse analiz
+aynı süreçte çalışır.
+
+Havuz `spawn` bağlamıyla kurulur (Streamlit'in iş parçacıklı sürecinde
+fork güvenli değildir) ve aynı işçi sayısı için yeniden kullanılır.
+Tüketim matrisi ve kod dizileri işçilere pickle ile değil paylaşımlı bellek
+bölütleriyle (`paylasimli_bellek`) aktarılır; işçilere yalnızca bölüt
+adları ve parçanın satır konumları gider.
+
+Ayarlar:
+    ANOMALI_ISCI            - varsayılan işçi sayısı (varsayılan: CPU sayısı)
+    ANOMALI_PARALEL_MIN_SATIR - paralel çalışma için en az satır (varsayılan: 20000)
+"""
+import atexit
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, as_completed, wait
+from contextlib import contextmanager
+
+import numpy as np
+import pandas as pd
+
+from aktif_donem import evaluate_active_rules
+from bina_indeksi import build_building_index
+from kimlik import encode_ids
+from kriter_motoru import evaluate_criteria
+from kural_motoru import compile_rules, evaluate_rules, rule_inputs
+from matris_motoru import (OZELLIK_SURUMU, RESULT_COLUMNS, build_consumption_matrix, facility_features,
+                           features_from_table, score_consumption, threshold_sweep)
+from ozellik_deposu import feature_key, feature_table, stored_table
+from paylasimli_bellek import (attached, copy_arrays, empty_arrays, release_arrays,
+                               session_segments, share_arrays)
+
+MAX_WORKERS = os.cpu_count() or 1
+DEFAULT_WORKERS = int(os.environ.get('ANOMALI_ISCI', MAX_WORKERS))
+# Bu satır sayısının altında havuz kurma / veri taşıma maliyeti kazançtan büyüktür
+PARALEL_MIN_SATIR = int(os.environ.get('ANOMALI_PARALEL_MIN_SATIR', 20_000))
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def _pool(workers):
+    """İşçi sayısına göre paylaşılan süreç havuzu (arka plan işleri arasında da)"""
+    with _pools_lock:
+        pool = _pools.get(workers)
+        if pool is None:
+            pool = _pools[workers] = ProcessPoolExecutor(
+                max_workers=workers, mp_context=multiprocessing.get_context('spawn'))
+    return pool
+
+
+@atexit.register
+def shutdown_pools():
+    """Açık havuzları kapat"""
+    for pool in _pools.values():
+        pool.shutdown(wait=False, cancel_futures=True)
+    _pools.clear()
+
+
+def shard_by_codes(codes, n_shards):
+    """Satır konumlarını bina bütünlüğünü bozmadan yaklaşık eşit parçalara böl
+
+    codes: `kimlik.encode_ids` bina kodları (-1 = eksik). Binası olmayan
+    satırlar tek başına birim sayılır. Döner: artan satır konumlarından
+    oluşan dizilerin listesi (boş parça yok).
+    """
+    codes = np.asarray(codes).astype(np.int64)
+    n = len(codes)
+    if n == 0:
+        return []
+    # Eksik bina: her satır ayrı birim
+    eksik = codes < 0
+    codes[eksik] = codes.max() + 1 + np.arange(int(eksik.sum()))
+
+    order = np.argsort(codes, kind='stable')
+    sorted_codes = codes[order]
+    unit_start = np.flatnonzero(np.r_[True, sorted_codes[1:] != sorted_codes[:-1]])
+    # Parça sınırları: kümülatif satır sayısı hedeflerine en yakın birim başlangıcı
+    targets = np.arange(1, n_shards) * n / n_shards
+    cuts = unit_start[np.clip(np.searchsorted(unit_start, targets), 0, len(unit_start) - 1)]
+    bounds = np.unique(np.concatenate(([0], cuts, [n])))
+    return [np.sort(order[a:b]) for a, b in zip(bounds[:-1], bounds[1:]) if b > a]
+
+
+def shard_by_building(bina_values, n_shards):
+    """Bina numaralarından (`kimlik.encode_ids` ile normalize edilerek) parçalar"""
+    codes, _ = encode_ids(bina_values)
+    return shard_by_codes(codes, n_shards)
+
+
+def run_sharded(worker, payloads, workers=None, progress=None):
+    """`worker(*payload)` çağrılarını havuzda çalıştır, sonuçları parça sırasıyla döndür
+
+    worker modül düzeyinde (içe aktarılabilir) bir fonksiyon olmalıdır.
+    progress: tamamlanan parça oranıyla (0-1) çağrılır; fırlattığı istisna
+    (ör. iş iptali) kalan parçaları iptal eder.
+    """
+    workers = DEFAULT_WORKERS if workers is None else max(int(workers), 1)
+    results = [None] * len(payloads)
+    if workers <= 1 or len(payloads) <= 1:
+        for i, payload in enumerate(payloads):
+            results[i] = worker(*payload)
+            if progress is not None:
+                progress((i + 1) / len(payloads))
+        return results
+
+    pool = _pool(workers)
+    futures = {pool.submit(worker, *payload): i for i, payload in enumerate(payloads)}
+    try:
+        for done, future in enumerate(as_completed(futures), 1):
+            results[futures[future]] = future.result()
+            if progress is not None:
+                progress(done / len(payloads))
+    except BaseException:
+        # Hata / iptal: başlamamış parçaları kuyruktan düş, çalışanları bekle
+        # (paylaşımlı bölütler ancak sonra serbest bırakılabilir)
+        for future in futures:
+            future.cancel()
+        wait(futures)
+        raise
+    return results
+
+
+def _n_shards(n_rows, workers):
+    """Parça sayısı: işçi başına birkaç parça (ilerleme ve yük dengesi için)"""
+    workers = DEFAULT_WORKERS if workers is None else max(int(workers), 1)
+    if workers <= 1 or n_rows < PARALEL_MIN_SATIR:
+        return 1
+    return workers * 4
+
+
+def _local_codes(codes):
+    """Parçadaki genel bina kodlarını 0..k-1 aralığına sıkıştır (eksik -1 kalır)"""
+    out = np.full(len(codes), -1, dtype=np.int64)
+    var = codes >= 0
+    out[var] = np.unique(codes[var], return_inverse=True)[1]
+    return out
+
+
+@contextmanager
+def _input_segments(state, slot, key, build):
+    """Girdi bölütleri: oturum anahtarı varsa oturuma bağlı, yoksa çalışma süresince"""
+    if state is not None and key is not None:
+        yield session_segments(state, slot, key, build)
+        return
+    handle = share_arrays(build())
+    try:
+        yield handle
+    finally:
+        release_arrays(handle)
+
+
+def _run_into_shared(worker, handle, shards, probe, n_rows, args, workers, progress):
+    """Parçaları çalıştır; işçiler satır sonuçlarını paylaşımlı çıktı dizilerine yazar
+
+    probe: 0 satırlık girdiyle üretilmiş sonuç sözlüğü (çıktı şekli / tipi).
+    Döner: çıktı dizilerinin süreç içi kopyaları.
+    """
+    out_handle = empty_arrays({key: ((n_rows,) + arr.shape[1:], arr.dtype) for key, arr in probe.items()})
+    try:
+        payloads = [(handle, out_handle, pos) + args for pos in shards]
+        run_sharded(worker, payloads, workers, progress)
+        return copy_arrays(out_handle)
+    finally:
+        release_arrays(out_handle)
+
+
+def _write_rows(out_handle, pos, sonuc):
+    with attached(out_handle) as out:
+        for key, arr in sonuc.items():
+            out[key][pos] = arr
+
+
+# -------------------- tespit / ham_veri / hamveri2 --------------------
+def _features_worker(handle, out_handle, pos, meta, kis_sezonu):
+    with attached(handle) as arrays:
+        values = arrays['values'][pos]
+        bina = _local_codes(arrays['bina'][pos])
+    index = build_building_index(None, values, codes=bina)
+    tablo = facility_features(dict(meta, values=values), index, kis_sezonu)
+    _write_rows(out_handle, pos, {col: tablo[col].to_numpy() for col in tablo.columns})
+
+
+def _features_key(anahtar, date_columns, bina_col, kis_sezonu):
+    return None if anahtar is None else (anahtar, tuple(date_columns), bina_col, kis_sezonu)
+
+
+def _table_key(anahtar, date_columns, bina_col, kis_sezonu):
+    if anahtar is None:
+        return None
+    return feature_key(anahtar, {'date_columns': [str(c) for c in date_columns],
+                                 'bina_col': bina_col, 'kis_sezonu': kis_sezonu, 'surum': OZELLIK_SURUMU})
+
+
+def cached_features(state, anahtar, date_columns, bina_col, kis_sezonu=False):
+    """Aynı veri için oturumda saklanmış veya özellik deposundaki özellikler (yoksa None)"""
+    key = _features_key(anahtar, date_columns, bina_col, kis_sezonu)
+    if state is None or key is None:
+        return None
+    entry = state.get('paralel.ozellikler')
+    if entry is not None and entry['key'] == key:
+        return entry['features']
+    table = stored_table(state, _table_key(anahtar, date_columns, bina_col, kis_sezonu))
+    if table is None:
+        return None
+    features = features_from_table(table, kis_sezonu)
+    state['paralel.ozellikler'] = {'key': key, 'features': features}
+    return features
+
+
+def facility_features_sharded(df, date_columns, bina_col, workers=None, progress=None,
+                              state=None, anahtar=None, kis_sezonu=False):
+    """`facility_features` tablosunun bina parçalı paralel sürümü
+
+    Bina ortalamaları parça içinde tam veriyle aynıdır (bina tek parçada).
+    """
+    n_shards = _n_shards(len(df), workers)
+    if n_shards <= 1:
+        matrix = build_consumption_matrix(df, list(date_columns))
+        table = facility_features(matrix, build_building_index(df[bina_col], matrix['values']), kis_sezonu)
+        if progress is not None:
+            progress(1.0)
+        return table
+
+    # Sütun sırası / mevsim maskeleri (satırsız); değerler paylaşımlı bölütte
+    meta = build_consumption_matrix(df.iloc[:0], list(date_columns))
+    # Çıktı sütunlarının şekli / tipi (satırsız veriden)
+    probe = facility_features(meta, None, kis_sezonu)
+    del meta['values']
+
+    def build():
+        codes, _ = encode_ids(df[bina_col])
+        return {'values': build_consumption_matrix(df, list(date_columns))['values'], 'bina': codes}
+
+    key = None if anahtar is None else (anahtar, tuple(date_columns), bina_col)
+    with _input_segments(state, 'paralel.tuketim', key, build) as handle:
+        with attached(handle) as arrays:
+            shards = shard_by_codes(arrays['bina'], n_shards)
+        sonuc = _run_into_shared(_features_worker, handle, shards,
+                                 {col: probe[col].to_numpy() for col in probe.columns}, len(df),
+                                 (meta, kis_sezonu), workers, progress)
+    return pd.DataFrame(sonuc)
+
+
+def consumption_features_sharded(df, date_columns, bina_col, workers=None, progress=None,
+                                 state=None, anahtar=None, kis_sezonu=False):
+    """`consumption_features`in bina parçalı paralel sürümü
+
+    state / anahtar (st.session_state ve dosya özeti) verilirse özellik
+    tablosu özellik deposuna (`ozellik_deposu`, diskte) yazılır ve puanlama
+    dizileri oturumda saklanır: eşikler değişince ham veriye dönülmez.
+    """
+    features = cached_features(state, anahtar, date_columns, bina_col, kis_sezonu)
+    if features is not None:
+        if progress is not None:
+            progress(1.0)
+        return features
+
+    def build():
+        return facility_features_sharded(df, date_columns, bina_col, workers, progress,
+                                         state, anahtar, kis_sezonu)
+
+    table_key = _table_key(anahtar, date_columns, bina_col, kis_sezonu)
+    table = build() if table_key is None else feature_table(state, table_key, build, progress)
+    features = features_from_table(table, kis_sezonu)
+
+    key = _features_key(anahtar, date_columns, bina_col, kis_sezonu)
+    if state is not None and key is not None:
+        state['paralel.ozellikler'] = {'key': key, 'features': features}
+    return features
+
+
+def analyze_consumption_sharded(df, date_columns, tesisat_col, bina_col, workers=None,
+                                progress=None, state=None, anahtar=None, kis_sezonu=False, **params):
+    """`analyze_consumption_matrix`in bina parçalı paralel sürümü (aynı results_df)
+
+    Eşikten bağımsız özellikler parçalarda hesaplanır (tüketim matrisi ve bina
+    kodları paylaşımlı belleğe bir kez yazılır), eşik karşılaştırmaları üst
+    süreçte yapılır. state / anahtar verilirse bölütler ve özellikler oturum
+    boyunca aynı dosya için yeniden kullanılır.
+    """
+    if len(df) == 0 or len(date_columns) == 0:
+        if progress is not None:
+            progress(1.0)
+        return pd.DataFrame(columns=RESULT_COLUMNS)
+    features = consumption_features_sharded(df, date_columns, bina_col, workers, progress,
+                                            state, anahtar, kis_sezonu)
+    return score_consumption(features, df[tesisat_col].to_numpy(), df[bina_col].to_numpy(),
+                             kis_sezonu=kis_sezonu, **params)
+
+
+def rescore_consumption(df, date_columns, tesisat_col, bina_col, state, anahtar,
+                        kis_sezonu=False, **params):
+    """Oturumdaki / depodaki özelliklerle yalnızca eşik karşılaştırmaları (özellik yoksa None)"""
+    features = cached_features(state, anahtar, date_columns, bina_col, kis_sezonu)
+    if features is None:
+        return None
+    return score_consumption(features, df[tesisat_col].to_numpy(), df[bina_col].to_numpy(),
+                             kis_sezonu=kis_sezonu, **params)
+
+
+def sweep_consumption(date_columns, bina_col, state, anahtar, param, grid, kis_sezonu=False, **params):
+    """Oturumdaki / depodaki özelliklerle tek eşiğin ızgara taraması (özellik yoksa None)
+
+    Döner: ızgaranın her noktasında şüpheli tesisat sayısı (`threshold_sweep`).
+    """
+    features = cached_features(state, anahtar, date_columns, bina_col, kis_sezonu)
+    if features is None:
+        return None
+    return threshold_sweep(features, param, grid, **params)
+
+
+def rule_scores(date_columns, bina_col, state, anahtar, kurallar=None, kis_sezonu=False, params=None):
+    """Oturumdaki / depodaki özellik tablosu üzerinde bildirimsel kural seti (tablo yoksa None)
+
+    Kural girdileri tablo başına bir kez kurulup oturumda saklanır; kural
+    seçimi veya parametre değişikliğinde yalnızca `evaluate_rules` çalışır.
+    Döner: (derlenmiş kurallar, girdiler, `evaluate_rules` sonucu).
+    """
+    key = _table_key(anahtar, date_columns, bina_col, kis_sezonu)
+    if state is None or key is None:
+        return None
+    entry = state.get('paralel.kural_girdileri')
+    if entry is None or entry['key'] != key:
+        table = stored_table(state, key)
+        if table is None:
+            return None
+        girdi = rule_inputs(features_from_table(table, kis_sezonu), table)
+        entry = state['paralel.kural_girdileri'] = {'key': key, 'girdi': girdi}
+    derleme = compile_rules(kurallar)
+    return derleme, entry['girdi'], evaluate_rules(derleme, entry['girdi'], params)
+
+
+# -------------------- gmz --------------------
+def _criteria(values, bina_codes, params):
+    index = build_building_index(None, values, codes=bina_codes)
+    return evaluate_criteria(values, index['codes'], index['month_mean'], index['sizes'], **params)
+
+
+def _criteria_worker(handle, out_handle, pos, params):
+    with attached(handle) as arrays:
+        values = arrays['values'][pos]
+        bina = _local_codes(arrays['bina'][pos])
+    _write_rows(out_handle, pos, _criteria(values, bina, params))
+
+
+def evaluate_criteria_sharded(values, bina_codes, workers=None, progress=None, state=None,
+                              anahtar=None, **params):
+    """gmz dört kriterinin bina parçalı paralel sürümü (`evaluate_criteria` sözlüğü)
+
+    bina_codes: `kimlik.encode_ids` bina kodları. Her parça kendi bina
+    indeksini kurar; bina tüm daireleriyle tek parçada olduğundan bina
+    ortalamaları tam veriyle aynıdır. Matris ve kodlar paylaşımlı bellekten
+    okunur, sonuçlar paylaşımlı çıktı dizilerine yazılır.
+    """
+    values = np.asarray(values)
+    bina_codes = np.asarray(bina_codes)
+    n_shards = _n_shards(len(values), workers)
+    if n_shards <= 1:
+        sonuc = _criteria(values, bina_codes, params)
+        if progress is not None:
+            progress(1.0)
+        return sonuc
+
+    shards = shard_by_codes(bina_codes, n_shards)
+    probe = _criteria(values[:0], bina_codes[:0], params)
+    with _input_segments(state, 'paralel.kriter', anahtar,
+                         lambda: {'values': values, 'bina': bina_codes}) as handle:
+        return _run_into_shared(_criteria_worker, handle, shards, probe, len(values),
+                                (params,), workers, progress)
+
+
+# -------------------- parttern --------------------
+def _active_rules_worker(handle, out_handle, pos, month_cols):
+    with attached(handle) as arrays:
+        values = arrays['values'][pos]
+    _write_rows(out_handle, pos, evaluate_active_rules(values, month_cols))
+
+
+def evaluate_active_rules_sharded(values, month_cols, bina_values=None, workers=None, progress=None,
+                                  state=None, anahtar=None):
+    """parttern aktif dönem kurallarının parçalı paralel sürümü
+
+    Kurallar abone bazlıdır; bina kolonu varsa parçalar yine binaya göre
+    kesilir (aynı bina aynı işçide), yoksa satır aralıklarına bölünür.
+    Tüketim matrisi paylaşımlı bellekten okunur.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    month_cols = list(month_cols)
+    n_shards = _n_shards(len(values), workers)
+    if n_shards <= 1:
+        sonuc = evaluate_active_rules(values, month_cols)
+        if progress is not None:
+            progress(1.0)
+        return sonuc
+
+    if bina_values is not None:
+        shards = shard_by_building(bina_values, n_shards)
+    else:
+        shards = [s for s in np.array_split(np.arange(len(values)), n_shards) if len(s)]
+    probe = evaluate_active_rules(values[:0], month_cols)
+    key = None if anahtar is None else (anahtar, tuple(month_cols))
+    with _input_segments(state, 'paralel.aktif', key, lambda: {'values': values}) as handle:
+        return _run_into_shared(_active_rules_worker, handle, shards, probe, len(values),
+                                (month_cols,), workers, progress)
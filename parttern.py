@@ -3,6 +3,13 @@ import pandas as pd
 import numpy as np
 from datetime import datetime
 import io
+from onbellek import cached_frame, file_hash
+from xlsx_okuyucu import read_pivot_xlsx
+from aktif_donem import month_seasons, anomaly_messages
+from ozellik_deposu import matrix_features
+from paralel import evaluate_active_rules_sharded, DEFAULT_WORKERS, MAX_WORKERS
+from is_kuyrugu import start_job, job_result
+from siralama import top_k, bucket_counts
 
 st.set_page_config(page_title="Doğalgaz Kaçak Tespit", page_icon="🔥", layout="wide")
 
@@ -39,16 +46,135 @@ with st.sidebar:
     Kaçak tespitinde aktif kullanım sırasındaki anomaliler önemlidir.
     """)
     
+    st.markdown("---")
+    paralel_isci = st.number_input("Paralel İşçi Sayısı", 1, MAX_WORKERS, min(DEFAULT_WORKERS, MAX_WORKERS),
+                                   help="Kurallar bina numarasına (yoksa satır aralıklarına) göre parçalanıp bu kadar süreçte çalışır")
+    
     st.markdown("---")
     st.info("⚠️ Risk Skoru >80: Yüksek Şüpheli")
     st.warning("📊 PDF pattern analizi ile optimize edilmiş kurallar")
 
+# Abone / bina kimlik kolonu adayları
+ABONE_COLUMNS = ['tesisat no', 'Tesisat No', 'TESISAT NO', 'tesisat_no', 'TesisatNo',
+                 'tn', 'Abone_ID', 'abone_id', 'TN', 'ABONE_ID']
+BINA_COLUMNS = ['bina no', 'Bina No', 'BINA NO', 'bina_no', 'BinaNo', 'BINA_NO']
+ID_COLUMNS = ABONE_COLUMNS + BINA_COLUMNS
+
+# Risk seviyesi sınırları (<=40 düşük, 41-60 orta, 61-80 yüksek, >80 çok yüksek)
+RISK_SINIRLARI = [40, 60, 80]
+# Tabloda gösterilen en fazla abone (Excel raporu filtrenin tamamını içerir)
+TABLO_SATIRI = 1000
+
+def analyze_subscribers(df, month_cols, abone_col, bina_col, workers=None, state=None, anahtar=None,
+                        progress=None):
+    """Tüm aboneler için aktif dönem kuralları ve risk skorları (arka plan işi)
+
+    Streamlit çağrısı yapmaz; ilerleme `progress(oran)` ile bildirilir.
+    Döner: dosya sırasındaki results_df (gösterim sırası `siralama.top_k` ile).
+    """
+    progress = progress or (lambda oran: None)
+    
+    # Tüketim matrisi (virgüllü metinler düzeltilir, okunamayanlar 0)
+    consumption = np.column_stack([
+        pd.to_numeric(df[month].astype(str).str.replace(',', '.', regex=False)
+                      if df[month].dtype == object else df[month], errors='coerce')
+        for month in month_cols
+    ]).astype(np.float64)
+    consumption[np.isnan(consumption)] = 0.0
+    progress(0.3)
+    
+    # İSTATİSTİKLER (özellik deposundan; aynı veri için bir kez hesaplanır)
+    ozellikler = matrix_features(state, anahtar, consumption, month_cols)
+    total_consumption = ozellikler['toplam'].to_numpy()
+    mean_consumption = ozellikler['ay_ort'].to_numpy()
+    std_dev = ozellikler['std'].to_numpy()
+    cv = ozellikler['cv'].to_numpy()
+    max_consumption = ozellikler['max_tuketim'].to_numpy()
+    min_non_zero = ozellikler['min_pozitif'].to_numpy()
+    zero_months = ozellikler['sifir_ay'].to_numpy()
+    very_low_months = ozellikler['cok_dusuk_ay'].to_numpy()
+    max_consecutive_zeros = ozellikler['max_sifir_seri'].to_numpy()
+    
+    # PATTERN ANALİZİ - SADECE AKTİF TÜKETİM DÖNEMLERİ (düz aktif ay dizisi üzerinde)
+    kurallar = evaluate_active_rules_sharded(
+        consumption, month_cols, df[bina_col] if bina_col else None, workers=workers,
+        progress=lambda oran: progress(0.3 + 0.4 * oran), state=state, anahtar=anahtar)
+    kis, yaz = month_seasons(month_cols)
+    progress(0.7)
+    
+    abone_ids = df[abone_col].to_numpy()
+    bina_nos = df[bina_col].to_numpy() if bina_col else np.full(len(df), None)
+    
+    results = []
+    for i in range(len(df)):
+        if i % 10_000 == 0:
+            progress(0.7 + 0.3 * i / len(df))
+        abone_id = abone_ids[i]
+        bina_no = bina_nos[i]
+        
+        # Eğer yeterli aktif tüketim yoksa analiz yapma
+        if not kurallar['analiz'][i]:
+            results.append({
+                'Tesisat_No': abone_id,
+                'Bina_No': bina_no if bina_no else '-',
+                'Risk_Skoru': 0,
+                'Risk_Seviyesi': '⚪ ANALİZ DIŞI',
+                'Toplam_Tüketim': round(total_consumption[i], 2),
+                'Ortalama_Tüketim': 0,
+                'Standart_Sapma': 0,
+                'CV_%': 0,
+                'Sıfır_Ay': zero_months[i],
+                'Çok_Düşük_Ay': 0,
+                'Max_Ardışık_Sıfır': max_consecutive_zeros[i],
+                'Max_Tüketim': 0,
+                'Min_Tüketim': 0,
+                'Anomali_Sayısı': 0,
+                'Tespit_Edilen_Anomaliler': 'Yeterli aktif tüketim yok'
+            })
+            continue
+        
+        risk_score = kurallar['risk_score'][i]
+        anomalies = anomaly_messages(kurallar, i, consumption[i], kis, yaz)
+        
+        # Risk seviyesi
+        if risk_score > 80:
+            risk_level = "🔴 ÇOK YÜKSEK ŞÜPHELİ"
+        elif risk_score > 60:
+            risk_level = "🟠 YÜKSEK ŞÜPHELİ"
+        elif risk_score > 40:
+            risk_level = "🟡 ORTA ŞÜPHELİ"
+        else:
+            risk_level = "🟢 DÜŞÜK RİSK"
+        
+        results.append({
+            'Tesisat_No': abone_id,
+            'Bina_No': bina_no if bina_no else '-',
+            'Risk_Skoru': risk_score,
+            'Risk_Seviyesi': risk_level,
+            'Toplam_Tüketim': round(total_consumption[i], 2),
+            'Ortalama_Tüketim': round(mean_consumption[i], 2),
+            'Standart_Sapma': round(std_dev[i], 2),
+            'CV_%': round(cv[i], 1),
+            'Sıfır_Ay': zero_months[i],
+            'Çok_Düşük_Ay': very_low_months[i],
+            'Max_Ardışık_Sıfır': max_consecutive_zeros[i],
+            'Max_Tüketim': round(max_consumption[i], 2),
+            'Min_Tüketim': round(min_non_zero[i], 2) if min_non_zero[i] > 0 else 0,
+            'Anomali_Sayısı': len(anomalies),
+            'Tespit_Edilen_Anomaliler': ' | '.join(anomalies) if anomalies else 'Anomali tespit edilmedi'
+        })
+    
+    return pd.DataFrame(results)
+
+
 # Dosya yükleme
 uploaded_file = st.file_uploader("📁 Excel Dosyası Yükleyin", type=['xlsx', 'xls'])
 
 if uploaded_file is not None:
     try:
-        df = pd.read_excel(uploaded_file)
+        df = cached_frame(uploaded_file, 'parttern.read_xlsx',
+                          lambda f: read_pivot_xlsx(f, ID_COLUMNS, decimal_comma=True),
+                          params={'decimal_comma': True})
         df.columns = df.columns.str.strip()
         
         st.success(f"✅ Dosya başarıyla yüklendi! {len(df)} abone analiz edilecek.")
@@ -60,13 +186,12 @@ if uploaded_file is not None:
         abone_col = None
         bina_col = None
         
-        for col in ['tesisat no', 'Tesisat No', 'TESISAT NO', 'tesisat_no', 'TesisatNo',
-                    'tn', 'Abone_ID', 'abone_id', 'TN', 'ABONE_ID']:
+        for col in ABONE_COLUMNS:
             if col in df.columns:
                 abone_col = col
                 break
         
-        for col in ['bina no', 'Bina No', 'BINA NO', 'bina_no', 'BinaNo', 'BINA_NO']:
+        for col in BINA_COLUMNS:
             if col in df.columns:
                 bina_col = col
                 break
@@ -110,257 +235,30 @@ if uploaded_file is not None:
         st.info(f"📅 Analiz edilecek dönem: {month_cols[0]} → {month_cols[-1]} ({len(month_cols)} ay)")
         
         if st.button("🚀 Kaçak Analizi Başlat", type="primary"):
-            progress_bar = st.progress(0)
-            status_text = st.empty()
-            
-            results = []
-            
-            for idx, row in df.iterrows():
-                progress_bar.progress((idx + 1) / len(df))
-                status_text.text(f"Analiz ediliyor: {row[abone_col]} ({idx+1}/{len(df)})")
-                
-                # Tüketim değerlerini al
-                consumption = []
-                for month in month_cols:
-                    val = row.get(month, 0)
-                    if pd.isna(val):
-                        consumption.append(0.0)
-                    else:
-                        try:
-                            # Virgüllü sayıları düzelt
-                            if isinstance(val, str):
-                                val = val.replace(',', '.')
-                            consumption.append(float(val))
-                        except:
-                            consumption.append(0.0)
-                
-                abone_id = row[abone_col]
-                bina_no = row[bina_col] if bina_col and (bina_col in row.index) else None
-                
-                # İSTATİSTİKLER
-                total_consumption = sum(consumption)
-                mean_consumption = np.mean(consumption) if consumption else 0
-                std_dev = np.std(consumption) if consumption else 0
-                cv = (std_dev / mean_consumption * 100) if mean_consumption > 0 else 0
-                
-                non_zero = [c for c in consumption if c > 0]
-                max_consumption = max(consumption) if consumption else 0
-                min_non_zero = min(non_zero) if non_zero else 0
-                
-                zero_months = sum(1 for c in consumption if c == 0)
-                very_low_months = sum(1 for c in consumption if 0 < c < 5)
-                
-                # --- HATA DÜZELTME: Maksimum ardışık sıfır sayısı ---
-                max_consecutive_zeros = 0
-                _current_zeros = 0
-                for c in consumption:
-                    try:
-                        is_zero = (float(c) == 0.0)
-                    except:
-                        is_zero = False
-
-                    if is_zero:
-                        _current_zeros += 1
-                        if _current_zeros > max_consecutive_zeros:
-                            max_consecutive_zeros = _current_zeros
-                    else:
-                        _current_zeros = 0
-                # --- DÜZELTME SONU ---
-                
-                # PATTERN ANALİZİ - SADECE AKTİF TÜKETİM DÖNEMLERİ
-                risk_score = 0
-                anomalies = []
-                
-                # Sıfır olmayan ayları filtrele
-                active_consumption = [c for c in consumption if c > 0]
-                active_indices = [i for i, c in enumerate(consumption) if c > 0]
-                
-                # Eğer hiç aktif tüketim yoksa analiz yapma
-                if len(active_consumption) < 3:
-                    anomalies.append("ℹ️ Yeterli aktif tüketim verisi yok (3 aydan az)")
-                    risk_score = 0
-                    
-                    results.append({
-                        'Tesisat_No': abone_id,
-                        'Bina_No': bina_no if bina_no else '-',
-                        'Risk_Skoru': 0,
-                        'Risk_Seviyesi': '⚪ ANALİZ DIŞI',
-                        'Toplam_Tüketim': round(total_consumption, 2),
-                        'Ortalama_Tüketim': 0,
-                        'Standart_Sapma': 0,
-                        'CV_%': 0,
-                        'Sıfır_Ay': zero_months,
-                        'Çok_Düşük_Ay': 0,
-                        'Max_Ardışık_Sıfır': max_consecutive_zeros,
-                        'Max_Tüketim': 0,
-                        'Min_Tüketim': 0,
-                        'Anomali_Sayısı': 0,
-                        'Tespit_Edilen_Anomaliler': 'Yeterli aktif tüketim yok'
-                    })
-                    continue
-                
-                # Aktif dönem istatistikleri
-                active_mean = np.mean(active_consumption)
-                active_std = np.std(active_consumption)
-                active_cv = (active_std / active_mean * 100) if active_mean > 0 else 0
-                active_max = max(active_consumption)
-                active_min = min(active_consumption)
-                
-                # KURAL 1: Dramatik Düşüş (%90+) - SADECE AKTİF DÖNEMLER ARASI
-                for i in range(1, len(active_consumption)):
-                    if active_consumption[i-1] > 50 and active_consumption[i] < active_consumption[i-1] * 0.1:
-                        risk_score += 35
-                        anomalies.append(f"📉 Dramatik Düşüş: {active_consumption[i-1]:.1f} → {active_consumption[i]:.1f} m³ (%{((1-active_consumption[i]/active_consumption[i-1])*100):.0f})")
-                        break
-                
-                # KURAL 2: Kış Anomalisi - SADECE AKTİF KIŞ AYLARINDAKİ DÜŞÜK TÜKETİM
-                winter_active = []
-                summer_active = []
-                
-                for i in active_indices:
-                    month = str(month_cols[i])
-                    if '/12' in month or '/01' in month or '/02' in month or \
-                       month in ['Aralık', 'Ocak', 'Şubat']:
-                        winter_active.append(consumption[i])
-                    elif '/06' in month or '/07' in month or '/08' in month or \
-                         month in ['Haziran', 'Temmuz', 'Ağustos']:
-                        summer_active.append(consumption[i])
-                
-                if len(winter_active) >= 2:
-                    winter_avg = np.mean(winter_active)
-                    if winter_avg < 30:
-                        risk_score += 40
-                        anomalies.append(f"❄️ Kış Anomalisi: Aktif kış ayları ortalaması {winter_avg:.1f} m³ (Isınma beklentisinin altında)")
-                
-                # KURAL 3: Ters Sezonluk - Yazın kıştan fazla tüketim
-                if len(winter_active) >= 2 and len(summer_active) >= 2:
-                    summer_avg = np.mean(summer_active)
-                    winter_avg = np.mean(winter_active)
-                    if summer_avg > winter_avg * 1.2:
-                        risk_score += 30
-                        anomalies.append(f"🌡️ Ters Sezonluk: Yaz ort. {summer_avg:.1f} > Kış ort. {winter_avg:.1f} m³")
-                
-                # KURAL 4: On-Off Pattern - SADECE AKTİF AYLAR ARASI
-                transitions = 0
-                for i in range(1, len(active_consumption)):
-                    if (active_consumption[i-1] < 20 and active_consumption[i] > 100) or \
-                       (active_consumption[i-1] > 100 and active_consumption[i] < 20):
-                        transitions += 1
-                
-                if transitions >= 3:
-                    risk_score += 30
-                    anomalies.append(f"🔄 On-Off Pattern: {transitions} kez aşırı dalgalanma (aktif dönemde)")
-                
-                # KURAL 5: Tek Ay İstisna
-                if active_max > 150 and len(active_consumption) > 3:
-                    other_active = [c for c in active_consumption if c != active_max]
-                    if other_active and np.mean(other_active) < 50:
-                        risk_score += 25
-                        anomalies.append(f"📍 Tek Ay İstisna: Max {active_max:.1f} m³, diğer aktif aylar ort. {np.mean(other_active):.1f} m³")
-                
-                # KURAL 6: Kaçak Sonrası Patlama
-                if len(active_consumption) >= 4:
-                    for i in range(3, len(active_consumption)):
-                        prev_avg = np.mean(active_consumption[i-3:i])
-                        if prev_avg < 40 and active_consumption[i] > 200:
-                            risk_score += 40
-                            anomalies.append(f"🎯 Kaçak Sonrası Patlama: Önceki 3 aktif ay ort. {prev_avg:.1f} → {active_consumption[i]:.1f} m³")
-                            break
-                
-                # KURAL 7: Aşırı Volatilite
-                if active_cv > 150:
-                    risk_score += 25
-                    anomalies.append(f"📊 Aşırı Volatilite: CV = {active_cv:.1f}% (aktif dönemde)")
-                
-                # KURAL 8: Mikro Tüketim - Çoğu aktif ay <5 m³
-                micro_months = sum(1 for c in active_consumption if c < 5)
-                if micro_months > len(active_consumption) * 0.5:
-                    risk_score += 20
-                    anomalies.append(f"⚡ Mikro Tüketim: {micro_months}/{len(active_consumption)} aktif ay <5 m³")
-                
-                # KURAL 9: Hayalet Tüketim
-                ghost_months = sum(1 for c in active_consumption if 0.5 < c < 3)
-                if ghost_months >= 4:
-                    risk_score += 25
-                    anomalies.append(f"🔥 Hayalet Tüketim: {ghost_months} aktif ay 0.5-3 m³ arası")
-                
-                # KURAL 10: Trend Kırılması - Aktif dönemde
-                z_scores = [(c - active_mean) / active_std if active_std > 0 else 0 for c in active_consumption]
-                min_z = min(z_scores) if z_scores else 0
-                if min_z < -2.5:
-                    risk_score += 25
-                    anomalies.append(f"📈 Trend Kırılması: Min Z-score = {min_z:.2f} (aktif dönemde)")
-                
-                # KURAL 11: Kaotik Desen - Aktif dönemde
-                if len(active_consumption) >= 3:
-                    direction_changes = 0
-                    for i in range(2, len(active_consumption)):
-                        trend1 = active_consumption[i-1] - active_consumption[i-2]
-                        trend2 = active_consumption[i] - active_consumption[i-1]
-                        if abs(trend1) > 10 and abs(trend2) > 10:  # Anlamlı değişimler
-                            if (trend1 > 0 and trend2 < 0) or (trend1 < 0 and trend2 > 0):
-                                direction_changes += 1
-                    
-                    if direction_changes > len(active_consumption) * 0.5:
-                        risk_score += 20
-                        anomalies.append(f"🎲 Kaotik Desen: {direction_changes} yön değişimi (aktif dönemde)")
-                
-                # KURAL 12: Anormal Düşük Ortalama - Aktif dönemde
-                if active_mean < 15 and len(active_consumption) >= 6:
-                    risk_score += 30
-                    anomalies.append(f"⚠️ Anormal Düşük Ortalama: {active_mean:.1f} m³/ay (aktif dönemde)")
-                
-                # Risk seviyesi
-                if risk_score > 80:
-                    risk_level = "🔴 ÇOK YÜKSEK ŞÜPHELİ"
-                elif risk_score > 60:
-                    risk_level = "🟠 YÜKSEK ŞÜPHELİ"
-                elif risk_score > 40:
-                    risk_level = "🟡 ORTA ŞÜPHELİ"
-                else:
-                    risk_level = "🟢 DÜŞÜK RİSK"
-                
-                results.append({
-                    'Tesisat_No': abone_id,
-                    'Bina_No': bina_no if bina_no else '-',
-                    'Risk_Skoru': risk_score,
-                    'Risk_Seviyesi': risk_level,
-                    'Toplam_Tüketim': round(total_consumption, 2),
-                    'Ortalama_Tüketim': round(mean_consumption, 2),
-                    'Standart_Sapma': round(std_dev, 2),
-                    'CV_%': round(cv, 1),
-                    'Sıfır_Ay': zero_months,
-                    'Çok_Düşük_Ay': very_low_months,
-                    'Max_Ardışık_Sıfır': max_consecutive_zeros,
-                    'Max_Tüketim': round(max_consumption, 2),
-                    'Min_Tüketim': round(min_non_zero, 2) if min_non_zero > 0 else 0,
-                    'Anomali_Sayısı': len(anomalies),
-                    'Tespit_Edilen_Anomaliler': ' | '.join(anomalies) if anomalies else 'Anomali tespit edilmedi'
-                })
-            
-            results_df = pd.DataFrame(results)
-            results_df = results_df.sort_values('Risk_Skoru', ascending=False).reset_index(drop=True)
-            
-            progress_bar.empty()
-            status_text.empty()
-            
+            anahtar = ('parttern', file_hash(uploaded_file))
+            start_job('parttern.analiz', anahtar + (tuple(month_cols), abone_col, bina_col),
+                      analyze_subscribers, df, month_cols, abone_col, bina_col, workers=paralel_isci,
+                      state=st.session_state.setdefault('paylasimli_bellek', {}), anahtar=anahtar)
+        
+        # Analiz arka planda çalışır; iş bitince sonuçlar her yeniden çalıştırmada gösterilir
+        results_df = job_result('parttern.analiz')
+        if results_df is not None:
             st.success("✅ Analiz tamamlandı!")
             
-            # İSTATİSTİKLER
+            # İSTATİSTİKLER (risk seviyesi sayıları tek geçişte)
+            risk_skoru = results_df['Risk_Skoru'].to_numpy()
+            _, medium_risk, high_risk, very_high = bucket_counts(risk_skoru, RISK_SINIRLARI, right=True).tolist()
             col1, col2, col3, col4 = st.columns(4)
             
             with col1:
-                very_high = len(results_df[results_df['Risk_Skoru'] > 80])
                 st.metric("🔴 Çok Yüksek Şüpheli", very_high,
                          delta=f"%{(very_high/len(results_df)*100):.1f}")
             
             with col2:
-                high_risk = len(results_df[(results_df['Risk_Skoru'] > 60) & (results_df['Risk_Skoru'] <= 80)])
                 st.metric("🟠 Yüksek Şüpheli", high_risk,
                          delta=f"%{(high_risk/len(results_df)*100):.1f}")
             
             with col3:
-                medium_risk = len(results_df[(results_df['Risk_Skoru'] > 40) & (results_df['Risk_Skoru'] <= 60)])
                 st.metric("🟡 Orta Şüpheli", medium_risk,
                          delta=f"%{(medium_risk/len(results_df)*100):.1f}")
             
@@ -388,16 +286,19 @@ if uploaded_file is not None:
             with col3:
                 min_anomalies = st.slider("Minimum Anomali Sayısı", 0, 10, 2)
             
-            filtered_df = results_df[
+            filtered_rows = np.flatnonzero(
                 (results_df['Risk_Seviyesi'].isin(risk_filter)) &
                 (results_df['Risk_Skoru'] >= min_score) &
                 (results_df['Anomali_Sayısı'] >= min_anomalies)
-            ]
+            )
             
-            st.info(f"📊 Gösterilen abone sayısı: {len(filtered_df)} / {len(results_df)}")
+            st.info(f"📊 Gösterilen abone sayısı: {len(filtered_rows)} / {len(results_df)}")
+            if len(filtered_rows) > TABLO_SATIRI:
+                st.caption(f"Tabloda risk skoru en yüksek {TABLO_SATIRI} abone listelenir; Excel raporu tamamını içerir.")
             
+            tablo_df = results_df.iloc[top_k(risk_skoru, TABLO_SATIRI, filtered_rows)]
             st.dataframe(
-                filtered_df[['Tesisat_No', 'Bina_No', 'Risk_Skoru', 'Risk_Seviyesi',
+                tablo_df[['Tesisat_No', 'Bina_No', 'Risk_Skoru', 'Risk_Seviyesi',
                             'Toplam_Tüketim', 'Sıfır_Ay', 'Max_Ardışık_Sıfır',
                             'Anomali_Sayısı', 'Tespit_Edilen_Anomaliler']],
                 use_container_width=True,
@@ -408,6 +309,7 @@ if uploaded_file is not None:
             st.markdown("---")
             st.subheader("📥 Rapor İndir")
             
+            filtered_df = results_df.iloc[top_k(risk_skoru, len(filtered_rows), filtered_rows)]
             output = io.BytesIO()
             with pd.ExcelWriter(output, engine='openpyxl') as writer:
                 filtered_df.to_excel(writer, sheet_name='Kaçak Şüpheli Aboneler', index=False)
@@ -434,10 +336,10 @@ if uploaded_file is not None:
             st.markdown("---")
             st.subheader("🎯 En Şüpheli 20 Abone")
             
-            top_20 = results_df.head(20)
+            top_20 = results_df.iloc[top_k(risk_skoru, 20)]
             
-            for idx, row in top_20.iterrows():
-                with st.expander(f"#{idx+1} - Tesisat: {row['Tesisat_No']} | Bina: {row['Bina_No']} | Risk: {row['Risk_Skoru']} | {row['Risk_Seviyesi']}"):
+            for sira, (_, row) in enumerate(top_20.iterrows(), 1):
+                with st.expander(f"#{sira} - Tesisat: {row['Tesisat_No']} | Bina: {row['Bina_No']} | Risk: {row['Risk_Skoru']} | {row['Risk_Seviyesi']}"):
                     col1, col2, col3 = st.columns(3)
                     
                     with col1:
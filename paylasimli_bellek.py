@@ -0,0 +1,118 @@
+"""Paralel işçiler için paylaşımlı bellek (multiprocessing.shared_memory) dizileri.
+
+(tesisat x ay) tüketim matrisi ve kimlik / bina kod dizileri bir kez
+paylaşımlı bellek bölütlerine kopyalanır; işçi süreçleri yalnızca bölüt
+adlarını ve satır konumlarını alır, diziye kopyasız (zero-copy) bağlanır.
+Sonuç dizileri de aynı yolla üst süreçte ayrılan bölütlere yazılır; büyük
+matrisler pickle ile süreçler arasında taşınmaz.
+
+Yaşam döngüsü:
+- `share_arrays` ile açılan bölütleri `release_arrays` kapatır ve siler.
+- `session_segments` bölütleri Streamlit oturumuna (st.session_state) bağlar:
+  aynı veri için yeniden çalıştırmalarda tekrar kullanılır, veri değişince
+  eskiler silinir, oturum durumu çöp toplandığında (oturum bittiğinde) veya
+  süreç kapanırken bölütler serbest bırakılır.
+"""
+import weakref
+from contextlib import contextmanager
+from multiprocessing import shared_memory
+
+import numpy as np
+
+_owned = {}
+
+
+def share_arrays(arrays):
+    """Dizileri paylaşımlı bellek bölütlerine kopyala
+
+    Döner: tanıtıcı (handle) {ad: (bölüt adı, şekil, dtype)}; işçilere
+    gönderilebilir, `attached` ile açılır.
+    """
+    handle = {}
+    try:
+        for key, arr in arrays.items():
+            arr = np.ascontiguousarray(arr)
+            shm = shared_memory.SharedMemory(create=True, size=max(arr.nbytes, 1))
+            _owned[shm.name] = shm
+            handle[key] = (shm.name, arr.shape, arr.dtype.str)
+            np.ndarray(arr.shape, dtype=arr.dtype, buffer=shm.buf)[...] = arr
+    except Exception:
+        release_arrays(handle)
+        raise
+    return handle
+
+
+def empty_arrays(shapes):
+    """{ad: (şekil, dtype)} için sıfırlanmış paylaşımlı sonuç dizileri (tanıtıcı)"""
+    return share_arrays({key: np.zeros(shape, dtype=dtype) for key, (shape, dtype) in shapes.items()})
+
+
+@contextmanager
+def attached(handle):
+    """Tanıtıcıdaki bölütlere bağlan ve dizileri (kopyasız görünümler) ver
+
+    Çıkışta bölütler kapatılır; bloğun dışına taşan görünüm kalmamalıdır
+    (kalırsa bölüt, görünüm silinince kapanır).
+    """
+    segments = []
+    arrays = {}
+    try:
+        for key, (name, shape, dtype) in handle.items():
+            shm = shared_memory.SharedMemory(name=name)
+            segments.append(shm)
+            arrays[key] = np.ndarray(shape, dtype=np.dtype(dtype), buffer=shm.buf)
+        yield arrays
+    finally:
+        arrays.clear()
+        for shm in segments:
+            try:
+                shm.close()
+            except BufferError:
+                pass
+
+
+def copy_arrays(handle):
+    """Paylaşımlı dizilerin süreç içi kopyaları (bölüt silinmeden önce)"""
+    with attached(handle) as arrays:
+        return {key: arr.copy() for key, arr in arrays.items()}
+
+
+def release_arrays(handle):
+    """Bu sürecin açtığı bölütleri kapat ve sil"""
+    for name, _, _ in handle.values():
+        shm = _owned.pop(name, None)
+        if shm is None:
+            continue
+        try:
+            shm.close()
+        except BufferError:
+            pass
+        try:
+            shm.unlink()
+        except FileNotFoundError:
+            pass
+
+
+class _SegmentKaydi(dict):
+    """Oturum kaydı (dict zayıf referans almadığı için alt sınıf)"""
+
+
+def session_segments(state, slot, key, build):
+    """Oturuma bağlı paylaşımlı diziler
+
+    state: st.session_state (veya dict), slot: kayıt adı, key: verinin
+    kimliği (dosya özeti, sütunlar...), build: diziler sözlüğünü üreten
+    fonksiyon (yalnızca anahtar değiştiğinde çağrılır). Döner: tanıtıcı.
+    """
+    entry = state.get(slot)
+    if entry is not None and entry['key'] == key:
+        return entry['handle']
+    if entry is not None:
+        entry['finalizer']()
+
+    handle = share_arrays(build())
+    entry = _SegmentKaydi(key=key, handle=handle)
+    # Oturum durumu silindiğinde veya süreç kapanırken bölütleri bırak
+    entry['finalizer'] = weakref.finalize(entry, release_arrays, handle)
+    state[slot] = entry
+    return handle
@@ -0,0 +1,65 @@
+"""Ham (uzun) tüketim kayıtlarından pivot tabloya vektörel dönüşüm.
+
+Tesisat, bina ve dönem değerleri tamsayı kodlara çevrilir (pd.factorize) ve
+tüketimler tek bir np.bincount geçişiyle yoğun (tesisat-bina x dönem)
+matrise toplanır. Çıktı `convert_raw_to_pivot` ile aynı biçimdedir:
+`tesisat_no, bina_no, YYYY/MM...`
+"""
+import numpy as np
+import pandas as pd
+
+
+def period_label(period):
+    """YYYYMM tamsayısını 'YYYY/MM' etiketine çevir"""
+    return f"{int(period) // 100}/{int(period) % 100:02d}"
+
+
+def period_codes(dates):
+    """Tarih serisini YYYYMM tamsayı dönem koduna çevir (strftime'dan hızlı)"""
+    dates = pd.to_datetime(dates)
+    return (dates.dt.year * 100 + dates.dt.month).to_numpy()
+
+
+def pivot_records(tesisat, bina, period, tuketim):
+    """(tesisat, bina, dönem, tüketim) kayıtlarını tek geçişte pivot tabloya topla
+
+    Aynı (tesisat, bina, dönem) için birden fazla kayıt varsa toplamları
+    alınır, kaydı olmayan dönemler 0 olur. Satırlar (tesisat_no, bina_no),
+    dönem sütunları kronolojik sıradadır. `period` 'YYYY/MM' etiketleri veya
+    YYYYMM tamsayıları olabilir.
+
+    Döner: (pivot_df, bilgi) - bilgi: grup / duplicate / boyut sayıları
+    """
+    t_codes, t_uniques = pd.factorize(np.asarray(tesisat), sort=True)
+    b_codes, b_uniques = pd.factorize(np.asarray(bina), sort=True)
+    p_codes, p_uniques = pd.factorize(np.asarray(period), sort=True)
+    tuketim = np.asarray(tuketim, dtype=np.float64)
+
+    # (tesisat, bina) çiftleri; kodlar sıralı olduğundan çift sırası da sıralı
+    pair_key = t_codes.astype(np.int64) * max(len(b_uniques), 1) + b_codes
+    pair_codes, pair_uniques = pd.factorize(pair_key, sort=True)
+
+    n_pair, n_period = len(pair_uniques), len(p_uniques)
+    flat = pair_codes.astype(np.int64) * n_period + p_codes
+    sums = np.bincount(flat, weights=tuketim, minlength=n_pair * n_period)
+    counts = np.bincount(flat, minlength=n_pair * n_period)
+
+    if p_uniques.dtype.kind in 'iu':
+        labels = [period_label(p) for p in p_uniques]
+    else:
+        labels = [str(p) for p in p_uniques]
+
+    pair_t = pair_uniques // max(len(b_uniques), 1)
+    pair_b = pair_uniques % max(len(b_uniques), 1)
+    pivot_df = pd.DataFrame(sums.reshape(n_pair, n_period), columns=labels)
+    pivot_df.insert(0, 'bina_no', np.asarray(b_uniques)[pair_b])
+    pivot_df.insert(0, 'tesisat_no', np.asarray(t_uniques)[pair_t])
+
+    bilgi = {
+        'grup_sayisi': int((counts > 0).sum()),
+        'duplicate_grup': int((counts > 1).sum()),
+        'tesisat_sayisi': len(t_uniques),
+        'bina_sayisi': len(b_uniques),
+        'tarih_sayisi': n_period,
+    }
+    return pivot_df, bilgi
@@ -0,0 +1,123 @@
+"""tt.py risk analizi için gruplanmış (tesis bazlı) vektörel skor motoru.
+
+Kayıtlar bir kez tesis (ve tarih) sırasına dizilir; IQR sınırları, z-skor,
+aylık profil (mevsimsel) kontrolü, ani artış oranları, sıfır sonrası ani
+artış sayısı ve varyasyon katsayısı tüm tesisler için segment bazlı NumPy
+işlemleriyle hesaplanır. Kurallar `tt.calculate_risk_score` ve
+`tt.detect_anomalies` ile aynıdır:
+
+- IQR / z-skor / mevsimsel kontroller tesisin dosyadaki kayıt sırasıyla,
+  ani artış ve sıfır sonrası artış kuralları tarih sırasıyla çalışır
+  (sıralı tarama: `cekirdekler.increase_scores`, Numba varsa derlenmiş).
+- 3'ten az kaydı olan tesislerin risk skoru ve anomali sayısı 0'dır.
+"""
+import numpy as np
+import pandas as pd
+
+from cekirdekler import increase_scores
+
+RISK_COLUMNS = ['Tesis_ID', 'Risk_Skoru', 'Anomali_Sayısı', 'Ortalama_Tüketim',
+                'Maksimum_Tüketim', 'Tüketim_Varyasyonu', 'Kayıt_Sayısı']
+
+
+def _segments(codes, n_groups):
+    """Sıralı kodlar için grup boyutları, başlangıçları ve grup içi konumlar"""
+    sizes = np.bincount(codes, minlength=n_groups)
+    starts = np.concatenate(([0], np.cumsum(sizes)[:-1]))
+    position = np.arange(len(codes)) - starts[codes]
+    return sizes, starts, position
+
+
+def _group_percentile(sorted_vals, starts, sizes, q):
+    """Grup içinde sıralı değerlerden doğrusal enterpolasyonlu yüzdelik (np.percentile ile aynı)"""
+    n = np.maximum(sizes, 1)
+    pos = q / 100 * (n - 1)
+    lo = np.floor(pos).astype(np.int64)
+    hi = np.minimum(lo + 1, n - 1)
+    t = pos - lo
+    a = sorted_vals[np.minimum(starts + lo, len(sorted_vals) - 1)]
+    b = sorted_vals[np.minimum(starts + hi, len(sorted_vals) - 1)]
+    # NumPy'nin _lerp formülü (t >= 0.5 için uçtan geriye)
+    diff = b - a
+    return np.where(t >= 0.5, b - diff * (1 - t), a + diff * t)
+
+
+def score_facilities(tesis, tarih, tuketim, anomaly_method='iqr', threshold=2.5):
+    """Tüm tesisler için risk skoru ve özet istatistikler
+
+    tesis, tarih, tuketim: kayıt dizileri (NaN tüketim / tarih temizlenmiş)
+    anomaly_method: 'Anomali_Sayısı' sütunu için yöntem ('iqr', 'zscore', 'seasonal')
+
+    Döner: risk_df (RISK_COLUMNS, tesisler ilk görülme sırasıyla)
+    """
+    codes, keys = pd.factorize(pd.Series(tesis).reset_index(drop=True))
+    tuketim = np.asarray(tuketim, dtype=np.float64)
+    tarih = pd.Series(tarih).reset_index(drop=True)
+    ok = codes >= 0
+    n_fac = len(keys)
+
+    # Dosya sırası korunarak tesis bazında sıralama
+    order = np.flatnonzero(ok)[np.argsort(codes[ok], kind='stable')]
+    c = codes[order]
+    v = tuketim[order]
+    sizes, starts, position = _segments(c, n_fac)
+    n = sizes.astype(np.float64)
+    yeterli = sizes >= 3
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mean = np.bincount(c, weights=v, minlength=n_fac) / n
+        dev = v - mean[c]
+        std = np.sqrt(np.bincount(c, weights=dev * dev, minlength=n_fac) / n)
+        std_ddof1 = np.sqrt(np.bincount(c, weights=dev * dev, minlength=n_fac) / (n - 1))
+        maximum = np.full(n_fac, np.nan)
+        np.fmax.at(maximum, c, v)
+
+        # IQR: grup içinde değerleri sırala, yüzdelikleri al
+        by_value = np.lexsort((v, c))
+        sorted_vals = v[by_value]
+        q1 = _group_percentile(sorted_vals, starts, sizes, 25)
+        q3 = _group_percentile(sorted_vals, starts, sizes, 75)
+        iqr = q3 - q1
+        iqr_flag = (v < (q1 - 1.5 * iqr)[c]) | (v > (q3 + 1.5 * iqr)[c])
+
+        # Z-skor (popülasyon standart sapması)
+        z_flag = np.abs(dev / std[c]) > threshold
+
+        # Mevsimsel: grup içi konum % 12 -> aylık profil ortalaması, %50 sapma
+        slot = c.astype(np.int64) * 12 + position % 12
+        slot_mean = (np.bincount(slot, weights=v, minlength=n_fac * 12)
+                     / np.bincount(slot, minlength=n_fac * 12))
+        expected = slot_mean[slot]
+        seasonal_flag = (np.abs(v - expected) > expected * 0.5) & (sizes >= 12)[c]
+
+    flag = {'iqr': iqr_flag, 'zscore': z_flag, 'seasonal': seasonal_flag}.get(
+        anomaly_method, np.zeros(len(v), dtype=bool))
+    anomali_sayisi = np.where(yeterli, np.bincount(c, weights=flag, minlength=n_fac), 0)
+    toplam_anomali = np.bincount(c, weights=iqr_flag | z_flag, minlength=n_fac)
+
+    # Tarih sırası (eşit tarihlerde dosya sırası)
+    by_date = np.lexsort((tarih.to_numpy()[order], c))
+    offsets = np.concatenate(([0], np.cumsum(sizes)))
+
+    # 1. Ani artışlar (%100 -> 3, %50 -> 2)
+    # 2. Sıfır tüketim sonrası ortalamanın üzerine çıkış (+4)
+    skor = increase_scores(v[by_date], offsets, mean)
+
+    # 3. Düzensiz tüketim (varyasyon katsayısı)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        cv = np.where(mean > 0, std / mean, 0)
+    skor += np.where(cv > 1.0, 2, 0)
+
+    # 4. Anomali oranı (IQR ∪ z-skor)
+    skor += np.where(toplam_anomali > n * 0.3, 3, np.where(toplam_anomali > n * 0.15, 2, 0))
+    skor = np.where(yeterli, np.minimum(skor, 10), 0).astype(np.int64)
+
+    return pd.DataFrame({
+        'Tesis_ID': keys,
+        'Risk_Skoru': skor,
+        'Anomali_Sayısı': anomali_sayisi.astype(np.int64),
+        'Ortalama_Tüketim': mean,
+        'Maksimum_Tüketim': maximum,
+        'Tüketim_Varyasyonu': std_ddof1,
+        'Kayıt_Sayısı': sizes,
+    }, columns=RISK_COLUMNS)
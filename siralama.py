@@ -0,0 +1,47 @@
+"""İnceleme listeleri için kısmi sıralama ve risk kategorisi sayımları.
+
+Skorlar NumPy dizilerinde kalır; ekranda gösterilen ilk K satır
+`np.partition` ile K'inci değer bulunarak seçilir ve yalnızca bu K satır
+sıralanır (tüm liste sıralanmaz, Python sözlük listesi kurulmaz).
+Kategori (kritik / yüksek / orta...) sayıları tek `searchsorted` +
+`bincount` geçişiyle çıkar.
+"""
+import numpy as np
+
+
+def top_k(scores, k, rows=None):
+    """En yüksek skorlu k satırın konumları (skora göre azalan)
+
+    scores: tüm satırların skor dizisi, rows: aday satır konumları (None =
+    hepsi). Eşit skorlarda `rows` sırası korunur (kararlı sıralamayla aynı
+    sonuç); k, satır sayısından büyükse tüm satırlar sıralanır.
+    """
+    scores = np.asarray(scores)
+    rows = np.arange(len(scores)) if rows is None else np.asarray(rows, dtype=np.int64)
+    values = scores[rows]
+    if k <= 0 or len(rows) == 0:
+        return rows[:0]
+    if k < len(rows):
+        # K'inci en büyük değer; üstündekilerin hepsi, eşitlerin ilk gelenleri
+        esik = np.partition(values, len(values) - k)[len(values) - k]
+        ust = np.flatnonzero(values > esik)
+        esit = np.flatnonzero(values == esik)[:k - len(ust)]
+        secilen = np.sort(np.concatenate((ust, esit)))
+    else:
+        secilen = np.arange(len(rows))
+    return rows[secilen[np.argsort(-values[secilen], kind='stable')]]
+
+
+def bucket_codes(scores, edges, right=False):
+    """Skorların kategori kodları (0 = ilk sınırın altı, len(edges) = son sınır ve üstü)
+
+    edges: artan sınırlar; right=False ise sınır değeri üst kategoriye
+    (edges[i-1] <= skor < edges[i]), right=True ise alt kategoriye girer
+    (edges[i-1] < skor <= edges[i]).
+    """
+    return np.searchsorted(np.asarray(edges), np.asarray(scores), side='left' if right else 'right')
+
+
+def bucket_counts(scores, edges, right=False):
+    """Her kategorideki satır sayısı (tek geçiş, `bucket_codes` kodlarıyla aynı sıra)"""
+    return np.bincount(bucket_codes(scores, edges, right), minlength=len(edges) + 1)
@@ -0,0 +1,160 @@
+"""Analiz sonuçları için sütunsal sonuç deposu.
+
+Analiz çıktısı (results_df) oturumda (`st.session_state`) ve diskte
+(`onbellek`, dosya özeti + eşik parametreleriyle anahtarlanmış) saklanır;
+filtre / sıralama değişikliği gibi yeniden çalıştırmalar analizi tekrar
+çalıştırmaz. Depo bir kez kurulur:
+
+- 'groups': filtre sütunları için grup indeksleri (sıralı anahtarlar,
+  anahtar -> kod, CSR düzeninde satır konumları); filtre = dizi dilimi.
+- 'display': gösterim / dışa aktarım sütunları (yeniden adlandırılmış,
+  yuvarlanmış) tek bir çerçeve; tablolar bunun satır alt kümeleridir.
+- 'ranks': sıralama sütunları için sıra numaraları (ilk kullanımda).
+- 'exports': aynı filtre / sıralama için üretilmiş Excel baytları.
+"""
+from io import BytesIO
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+from onbellek import cache_key, read_frame, write_frame
+
+# Oturum başına saklanan Excel çıktısı sayısı
+MAX_EXPORTS = 8
+
+
+def result_key(digest, namespace, params):
+    """Dosya özeti + analiz adı + parametrelerden sonuç anahtarı"""
+    return cache_key(digest, namespace, params)
+
+
+def stored_analysis(key, fn, *args, progress=None, **kwargs):
+    """`fn(*args, progress=..., **kwargs)` sonucunu diskte anahtarla sakla
+
+    Aynı anahtarlı sonuç daha önce üretilmişse analiz çalıştırılmaz.
+    """
+    df = read_frame(key)
+    if df is None:
+        df = fn(*args, progress=progress, **kwargs)
+        write_frame(key, df)
+    elif progress is not None:
+        progress(1.0)
+    return df
+
+
+def _group_index(values):
+    """Sütun için sıralı anahtarlar ve CSR satır konumları (eksikler hariç)"""
+    values = pd.Series(values)
+    try:
+        codes, keys = pd.factorize(values, sort=True)
+    except TypeError:
+        # Karışık tipli sütun (ör. sayı ve metin bina no): metin olarak sırala
+        codes, keys = pd.factorize(values.where(values.isna(), values.astype(str)), sort=True)
+    valid = codes >= 0
+    sizes = np.bincount(codes[valid], minlength=len(keys))
+    return {
+        'keys': keys.tolist(),
+        'code_of': {k: i for i, k in enumerate(keys.tolist())},
+        'order': np.argsort(np.where(valid, codes, len(keys)), kind='stable')[:int(valid.sum())],
+        'offsets': np.concatenate(([0], np.cumsum(sizes))),
+    }
+
+
+def build_result_store(results_df, group_columns, labels, round_columns=()):
+    """Sonuç tablosundan depo kur
+
+    group_columns: filtre sütunları, labels: {sütun: gösterim adı} (gösterim
+    ve dışa aktarım sırası), round_columns: 1 basamağa yuvarlanacak gösterim
+    sütunları.
+    """
+    df = results_df.reset_index(drop=True)
+    display = df[list(labels)].rename(columns=labels)
+    for col in round_columns:
+        display[col] = display[col].round(1)
+    return {
+        'df': df,
+        'display': display,
+        'groups': {col: _group_index(df[col]) for col in group_columns},
+        'ranks': {},
+        'exports': {},
+    }
+
+
+def group_keys(store, column):
+    """Filtre sütununun (sıralı) değerleri"""
+    return store['groups'][column]['keys']
+
+
+def group_rows(store, column, key):
+    """Sütunu `key` olan satırların konumları (artan sırada)"""
+    group = store['groups'][column]
+    code = group['code_of'].get(key, -1)
+    if code < 0:
+        return np.empty(0, dtype=np.int64)
+    return group['order'][group['offsets'][code]:group['offsets'][code + 1]]
+
+
+def select_rows(store, filters):
+    """{sütun: değer} filtrelerine uyan satırlar (değer None ise filtre yok)"""
+    rows = None
+    for column, key in filters.items():
+        if key is None:
+            continue
+        members = group_rows(store, column, key)
+        rows = members if rows is None else np.intersect1d(rows, members, assume_unique=True)
+    return np.arange(len(store['df'])) if rows is None else rows
+
+
+def sort_rows(store, rows, column, ascending=True):
+    """Satırları sütuna göre sırala (eşitlerde tablo sırası)"""
+    rank = store['ranks'].get(column)
+    if rank is None:
+        order = np.argsort(store['df'][column].to_numpy(), kind='stable')
+        rank = store['ranks'][column] = np.empty(len(order), dtype=np.int64)
+        rank[order] = np.arange(len(order))
+    keys = rank[rows] if ascending else -rank[rows]
+    return rows[np.argsort(keys, kind='stable')]
+
+
+def table(store, rows, columns):
+    """Gösterim çerçevesinin satır / sütun alt kümesi"""
+    return store['display'].iloc[rows][list(columns)]
+
+
+def export_excel(store, memo_key, frame, sheet_name):
+    """Çerçevenin Excel baytları; aynı filtre / sıralama için yeniden yazılmaz"""
+    data = store['exports'].get(memo_key)
+    if data is None:
+        buffer = BytesIO()
+        with pd.ExcelWriter(buffer, engine='openpyxl') as writer:
+            frame.to_excel(writer, index=False, sheet_name=sheet_name)
+        data = buffer.getvalue()
+        if len(store['exports']) >= MAX_EXPORTS:
+            store['exports'].pop(next(iter(store['exports'])))
+        store['exports'][memo_key] = data
+    return data
+
+
+def session_results(slot, key, group_columns, labels, round_columns=(), fresh=None, rescore=None):
+    """Oturumdaki veya diskteki sonuç deposu (yoksa None)
+
+    key: `result_key` anahtarı; fresh: bu anahtarla yeni biten işin sonucu
+    (disk yazımı başarısız olsa da kullanılır); rescore: sonuç yoksa
+    önbellekteki ara verilerden (ör. eşikten bağımsız özellikler) hızlıca
+    sonuç üreten fonksiyon (üretemezse None), sonucu diske de yazılır.
+    """
+    entry = st.session_state.get(slot)
+    if entry is not None and entry['key'] == key:
+        return entry
+    df = fresh if fresh is not None else read_frame(key)
+    if df is None and rescore is not None:
+        df = rescore()
+        if df is not None:
+            write_frame(key, df)
+    if df is None:
+        return None
+    entry = build_result_store(df, group_columns, labels, round_columns)
+    entry['key'] = key
+    st.session_state[slot] = entry
+    return entry
@@ -5,7 +5,15 @@ import plotly.express as px
 import plotly.graph_objects as go
 from plotly.subplots import make_subplots
 import warnings
-from io import BytesIO
+from paralel import DEFAULT_WORKERS, MAX_WORKERS
+from is_kuyrugu import job_result
+from sonuc_deposu import (export_excel, group_keys, group_rows, result_key, select_rows,
+                          session_results, sort_rows, table)
+from onbellek import cached_frame, file_hash
+from tespit_paneli import (SONUC_ETIKETLERI, YUVARLANAN_SUTUNLAR, SUPHELI_SUTUNLARI,
+                           TUM_SONUC_SUTUNLARI, SIRALAMA_SECENEKLERI,
+                           analysis_params, analyze_consumption_patterns, rescore_thresholds,
+                           show_rule_set, show_threshold_sweep)
 warnings.filterwarnings('ignore')
 
 # Sayfa konfigürasyonu
@@ -52,6 +60,12 @@ min_onceki_kis_tuketim = st.sidebar.slider(
     help="Ani düşüş tespiti için önceki kış aylarında minimum tüketim"
 )
 
+paralel_isci = st.sidebar.number_input(
+    "Paralel işçi sayısı",
+    min_value=1, max_value=MAX_WORKERS, value=min(DEFAULT_WORKERS, MAX_WORKERS),
+    help="Analiz bina numarasına göre parçalanıp bu kadar süreçte çalıştırılır (1 = tek süreç)"
+)
+
 def load_data(file):
     """Dosyayı yükle ve temizle"""
     try:
@@ -99,166 +113,14 @@ def get_season(month):
     else:
         return "Sonbahar"
 
-def analyze_consumption_patterns(df, date_columns, tesisat_col, bina_col):
-    """Tüketim paternlerini analiz et"""
-    results = []
-    
-    for idx, row in df.iterrows():
-        tesisat_no = row[tesisat_col]
-        bina_no = row[bina_col]
-        
-        # Aylık tüketim verilerini al
-        consumption_data = []
-        for date_col in date_columns:
-            try:
-                value = row[date_col]
-                if pd.notna(value):
-                    year, month = date_col.split('/')
-                    consumption_data.append({
-                        'year': int(year),
-                        'month': int(month),
-                        'consumption': float(value) if value != 0 else 0,
-                        'season': get_season(int(month)),
-                        'date_str': date_col
-                    })
-            except:
-                continue
-        
-        if not consumption_data:
-            continue
-        
-        # DataFrame'e çevir ve tarihine göre sırala
-        cons_df = pd.DataFrame(consumption_data)
-        cons_df = cons_df.sort_values(['year', 'month'])
-        
-        # Mevsimsel ortalamalar (sıfır olmayan değerler için)
-        seasonal_avg = cons_df[cons_df['consumption'] > 0].groupby('season')['consumption'].mean()
-        
-        # Kış ayı tüketimi kontrolü
-        kis_tuketim = seasonal_avg.get('Kış', 0)
-        yaz_tuketim = seasonal_avg.get('Yaz', 0)
-        
-        # Anomali tespiti
-        anomalies = []
-        
-        # 1. Kış ayı düşük tüketim
-        if kis_tuketim < kis_tuketim_esigi and kis_tuketim > 0:
-            anomalies.append(f"Kış ayı düşük tüketim: {kis_tuketim:.1f} m³/ay")
-        
-        # 2. Kış-yaz tüketim farkı normal değil
-        if kis_tuketim > 0 and yaz_tuketim > 0:
-            if abs(kis_tuketim - yaz_tuketim) < 10:  # Fark çok az
-                anomalies.append(f"Kış-yaz tüketim farkı az: Kış {kis_tuketim:.1f}, Yaz {yaz_tuketim:.1f}")
-        
-        # 3. Toplam tüketim çok düşük
-        total_consumption = cons_df['consumption'].sum()
-        if total_consumption < 100:  # Yıllık 100 m³'den az
-            anomalies.append(f"Toplam tüketim çok düşük: {total_consumption:.1f} m³")
-        
-        # 4. Düzenli sıfır tüketim
-        zero_months = len(cons_df[cons_df['consumption'] == 0])
-        if zero_months > 6:
-            anomalies.append(f"Çok fazla sıfır tüketim: {zero_months} ay")
-        
-        # 5. ANI DÜŞÜŞ TESPİTİ - Kış aylarında ani düşüş
-        kis_aylari = cons_df[cons_df['season'] == 'Kış'].copy()
-        if len(kis_aylari) >= 4:  # En az 2 kış sezonu olmalı
-            # Yıllara göre kış aylarını grupla
-            kis_yillik = kis_aylari.groupby('year')['consumption'].mean()
-            
-            # Yıllık kış ortalamaları al (sıfır olmayan)
-            yillik_ortalamalar = kis_yillik[kis_yillik > 0]
-            
-            if len(yillik_ortalamalar) >= 2:
-                # En az 2 yıl veri varsa ani düşüş kontrolü yap
-                yillar = sorted(yillik_ortalamalar.index)
-                
-                for i in range(1, len(yillar)):
-                    onceki_yil = yillar[i-1]
-                    mevcut_yil = yillar[i]
-                    
-                    onceki_tuketim = yillik_ortalamalar[onceki_yil]
-                    mevcut_tuketim = yillik_ortalamalar[mevcut_yil]
-                    
-                    # Önceki kış yüksek tüketim ve ani düşüş kontrolü
-                    if (onceki_tuketim >= min_onceki_kis_tuketim and 
-                        mevcut_tuketim < onceki_tuketim * (1 - ani_dusus_orani/100)):
-                        
-                        dusus_orani = ((onceki_tuketim - mevcut_tuketim) / onceki_tuketim) * 100
-                        anomalies.append(f"Ani kış düşüşü: {onceki_yil} ({onceki_tuketim:.1f}) → {mevcut_yil} ({mevcut_tuketim:.1f}), %{dusus_orani:.1f} düşüş")
-                
-                # Son 2 yıl özel kontrolü
-                if len(yillar) >= 2:
-                    son_iki_yil = yillar[-2:]
-                    if len(son_iki_yil) == 2:
-                        onceki_son = yillik_ortalamalar[son_iki_yil[0]]
-                        mevcut_son = yillik_ortalamalar[son_iki_yil[1]]
-                        
-                        if (onceki_son >= min_onceki_kis_tuketim and 
-                            mevcut_son < onceki_son * (1 - ani_dusus_orani/100)):
-                            
-                            dusus_orani = ((onceki_son - mevcut_son) / onceki_son) * 100
-                            anomalies.append(f"Son yıl ani düşüş: {son_iki_yil[0]} → {son_iki_yil[1]}, %{dusus_orani:.1f} düşüş")
-        
-        # 6. Bina ortalaması kontrolü (aynı binadaki diğer tesisatlarla karşılaştır)
-        bina_tesisatlari = df[df[bina_col] == bina_no]
-        if len(bina_tesisatlari) > 1:
-            bina_tuketimleri = []
-            for _, bina_row in bina_tesisatlari.iterrows():
-                bina_toplam = 0
-                bina_ay_sayisi = 0
-                for date_col in date_columns:
-                    try:
-                        val = bina_row[date_col]
-                        if pd.notna(val) and val > 0:
-                            bina_toplam += float(val)
-                            bina_ay_sayisi += 1
-                    except:
-                        continue
-                
-                if bina_ay_sayisi > 0:
-                    bina_tuketimleri.append(bina_toplam / bina_ay_sayisi)
-            
-            if len(bina_tuketimleri) > 1:
-                bina_ortalaması = np.mean(bina_tuketimleri)
-                mevcut_ortalama = cons_df[cons_df['consumption'] > 0]['consumption'].mean() if len(cons_df[cons_df['consumption'] > 0]) > 0 else 0
-                
-                if mevcut_ortalama > 0 and mevcut_ortalama < bina_ortalaması * (1 - bina_ort_dusuk_oran/100):
-                    anomalies.append(f"Bina ortalamasından %{bina_ort_dusuk_oran} düşük: {mevcut_ortalama:.1f} vs {bina_ortalaması:.1f}")
-        
-        # Ani düşüş bilgisi için ek analiz
-        kis_trend = "Stabil"
-        if len(kis_aylari) >= 4:
-            kis_yillik = kis_aylari.groupby('year')['consumption'].mean()
-            yillik_ortalamalar = kis_yillik[kis_yillik > 0]
-            
-            if len(yillik_ortalamalar) >= 2:
-                yillar = sorted(yillik_ortalamalar.index)
-                ilk_yil = yillik_ortalamalar[yillar[0]]
-                son_yil = yillik_ortalamalar[yillar[-1]]
-                
-                if son_yil < ilk_yil * 0.5:
-                    kis_trend = "Şiddetli Düşüş"
-                elif son_yil < ilk_yil * 0.7:
-                    kis_trend = "Orta Düşüş"
-                elif son_yil > ilk_yil * 1.5:
-                    kis_trend = "Artış"
-        
-        # Sonuçları kaydet
-        results.append({
-            'tesisat_no': tesisat_no,
-            'bina_no': bina_no,
-            'kis_tuketim': kis_tuketim,
-            'yaz_tuketim': yaz_tuketim,
-            'toplam_tuketim': total_consumption,
-            'ortalama_tuketim': cons_df[cons_df['consumption'] > 0]['consumption'].mean() if len(cons_df[cons_df['consumption'] > 0]) > 0 else 0,
-            'kis_trend': kis_trend,
-            'anomali_sayisi': len(anomalies),
-            'anomaliler': '; '.join(anomalies) if anomalies else 'Normal',
-            'suspicion_level': 'Şüpheli' if anomalies else 'Normal'
-        })
-    
-    return pd.DataFrame(results)
+def current_thresholds():
+    """Kenar çubuğundaki eşik değerleri"""
+    return dict(
+        kis_tuketim_esigi=kis_tuketim_esigi,
+        bina_ort_dusuk_oran=bina_ort_dusuk_oran,
+        ani_dusus_orani=ani_dusus_orani,
+        min_onceki_kis_tuketim=min_onceki_kis_tuketim,
+    )
 
 def create_visualizations(results_df, original_df, date_columns):
     """Görselleştirmeler oluştur"""
@@ -334,7 +196,7 @@ def create_visualizations(results_df, original_df, date_columns):
 # Ana uygulama
 if uploaded_file is not None:
     # Veri yükleme
-    df = load_data(uploaded_file)
+    df = cached_frame(uploaded_file, 'tespit.load_data', load_data)
     
     if df is not None:
         st.success("✅ Dosya başarıyla yüklendi!")
@@ -368,139 +230,108 @@ if uploaded_file is not None:
         st.write(f"**Tespit edilen tarih sütunları:** {len(date_columns)} adet")
         st.write(f"Tarih aralığı: {min(date_columns)} - {max(date_columns)}")
         
+        # Analiz arka planda çalışır; sonuç oturumda ve diskte (dosya özeti + eşikler) saklanır.
+        # Eşik değişince oturumdaki özelliklerden anında yeniden puanlanır;
+        # filtre / sıralama değişiklikleri analizi yeniden çalıştırmaz
+        uygulama_anahtari = ('tespit', file_hash(uploaded_file))
+        sonuc_anahtari = result_key(file_hash(uploaded_file), 'tespit.analiz',
+                                    analysis_params(date_columns, tesisat_col, bina_col, current_thresholds()))
+
         # Analiz butonu
         if st.button("🔍 Anomali Analizini Başlat", type="primary"):
-            with st.spinner("Analiz yapılıyor..."):
-                
-                # Analiz yap
-                results_df = analyze_consumption_patterns(df, date_columns, tesisat_col, bina_col)
-                
-                # Sonuçları göster
-                st.subheader("📈 Analiz Sonuçları")
-                
-                # Özet istatistikler
-                col1, col2, col3, col4 = st.columns(4)
-                
-                with col1:
-                    st.metric("Toplam Tesisat", len(results_df))
-                
-                with col2:
-                    suspicious_count = len(results_df[results_df['suspicion_level'] == 'Şüpheli'])
-                    st.metric("Şüpheli Tesisat", suspicious_count)
-                
-                with col3:
-                    if len(results_df) > 0:
-                        suspicious_rate = (suspicious_count / len(results_df)) * 100
-                        st.metric("Şüpheli Oran", f"{suspicious_rate:.1f}%")
-                
-                with col4:
-                    total_anomalies = results_df['anomali_sayisi'].sum()
-                    st.metric("Toplam Anomali", total_anomalies)
-                
-                # Görselleştirmeler
-                st.subheader("📊 Görselleştirmeler")
-                create_visualizations(results_df, df, date_columns)
-                
-                # Şüpheli tesisatlar tablosu
-                st.subheader("🚨 Şüpheli Tesisatlar")
-                suspicious_df = results_df[results_df['suspicion_level'] == 'Şüpheli'].copy()
-                
-                if not suspicious_df.empty:
-                    # Sütunları düzenle
-                    display_cols = ['tesisat_no', 'bina_no', 'kis_tuketim', 'yaz_tuketim', 
-                                   'ortalama_tuketim', 'kis_trend', 'anomali_sayisi', 'anomaliler']
-                    
-                    suspicious_display = suspicious_df[display_cols].copy()
-                    suspicious_display.columns = ['Tesisat No', 'Bina No', 'Kış Tüketim', 
-                                                'Yaz Tüketim', 'Ortalama Tüketim', 'Kış Trend',
-                                                'Anomali Sayısı', 'Anomaliler']
-                    
-                    # Numeric columns için formatting
-                    for col in ['Kış Tüketim', 'Yaz Tüketim', 'Ortalama Tüketim']:
-                        suspicious_display[col] = suspicious_display[col].round(1)
-                    
-                    st.dataframe(
-                        suspicious_display,
-                        use_container_width=True,
-                        hide_index=True
-                    )
-                    
-                    # Excel indirme
-                    buffer = BytesIO()
-                    with pd.ExcelWriter(buffer, engine='openpyxl') as writer:
-                        suspicious_display.to_excel(writer, index=False, sheet_name='Şüpheli Tesisatlar')
-                    
-                    st.download_button(
-                        label="📥 Şüpheli Tesisatları İndir (Excel)",
-                        data=buffer.getvalue(),
-                        file_name="supheli_tesisatlar.xlsx",
-                        mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
-                    )
-                else:
-                    st.success("🎉 Şüpheli tesisat bulunamadı!")
-                
-                # Tüm sonuçlar
-                st.subheader("📋 Tüm Sonuçlar")
-                
-                # Filtreleme seçenekleri
-                filter_col1, filter_col2 = st.columns(2)
-                
-                with filter_col1:
-                    suspicion_filter = st.selectbox(
-                        "Şüpheli Durumu",
-                        options=['Tümü', 'Şüpheli', 'Normal'],
-                        index=0
-                    )
-                
-                with filter_col2:
-                    bina_filter = st.selectbox(
-                        "Bina Numarası",
-                        options=['Tümü'] + sorted(results_df['bina_no'].unique().tolist()),
-                        index=0
-                    )
-                
-                # Filtreleme uygula
-                filtered_df = results_df.copy()
-                
-                if suspicion_filter != 'Tümü':
-                    filtered_df = filtered_df[filtered_df['suspicion_level'] == suspicion_filter]
-                
-                if bina_filter != 'Tümü':
-                    filtered_df = filtered_df[filtered_df['bina_no'] == bina_filter]
-                
-                # Sonuçları göster
-                if not filtered_df.empty:
-                    display_cols = ['tesisat_no', 'bina_no', 'kis_tuketim', 'yaz_tuketim', 
-                                   'ortalama_tuketim', 'kis_trend', 'suspicion_level', 'anomaliler']
-                    
-                    filtered_display = filtered_df[display_cols].copy()
-                    filtered_display.columns = ['Tesisat No', 'Bina No', 'Kış Tüketim', 
-                                              'Yaz Tüketim', 'Ortalama Tüketim', 'Kış Trend',
-                                              'Durum', 'Anomaliler']
-                    
-                    # Numeric columns için formatting
-                    for col in ['Kış Tüketim', 'Yaz Tüketim', 'Ortalama Tüketim']:
-                        filtered_display[col] = filtered_display[col].round(1)
-                    
-                    st.dataframe(
-                        filtered_display,
-                        use_container_width=True,
-                        hide_index=True
-                    )
-                    
-                    # Tüm sonuçları Excel olarak indirme
-                    buffer_all = BytesIO()
-                    with pd.ExcelWriter(buffer_all, engine='openpyxl') as writer:
-                        filtered_display.to_excel(writer, index=False, sheet_name='Tüm Sonuçlar')
-                    
-                    st.download_button(
-                        label="📥 Filtrelenmiş Sonuçları İndir (Excel)",
-                        data=buffer_all.getvalue(),
-                        file_name="dogalgaz_analiz_sonuclari.xlsx",
-                        mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
-                    )
-                else:
-                    st.warning("Filtreye uygun veri bulunamadı.")
+            analyze_consumption_patterns(df, date_columns, tesisat_col, bina_col, sonuc_anahtari,
+                                         uygulama_anahtari, current_thresholds(), paralel_isci)
+        
+        sonuc = session_results(
+            'tespit.sonuc', sonuc_anahtari, ['suspicion_level', 'bina_no'], SONUC_ETIKETLERI, YUVARLANAN_SUTUNLAR,
+            fresh=job_result('tespit.analiz', key=sonuc_anahtari),
+            rescore=lambda: rescore_thresholds(df, date_columns, tesisat_col, bina_col, uygulama_anahtari,
+                                               current_thresholds())
+        )
+        results_df = sonuc['df'] if sonuc is not None else None
+        if results_df is not None:
+            # Sonuçları göster
+            st.subheader("📈 Analiz Sonuçları")
+            
+            # Özet istatistikler
+            col1, col2, col3, col4 = st.columns(4)
+            suspicious_rows = group_rows(sonuc, 'suspicion_level', 'Şüpheli')
+            
+            with col1:
+                st.metric("Toplam Tesisat", len(results_df))
+            
+            with col2:
+                suspicious_count = len(suspicious_rows)
+                st.metric("Şüpheli Tesisat", suspicious_count)
+            
+            with col3:
+                if len(results_df) > 0:
+                    suspicious_rate = (suspicious_count / len(results_df)) * 100
+                    st.metric("Şüpheli Oran", f"{suspicious_rate:.1f}%")
+            
+            with col4:
+                total_anomalies = results_df['anomali_sayisi'].sum()
+                st.metric("Toplam Anomali", total_anomalies)
+            
+            # Eşik taraması (özelliklerden, bütün ızgara tek geçişte)
+            show_threshold_sweep(date_columns, bina_col, uygulama_anahtari, current_thresholds())
+            
+            # Kural seti (özellik tablosu üzerinde, kural birleşimleri tek geçişte)
+            show_rule_set(df, date_columns, tesisat_col, bina_col, uygulama_anahtari, current_thresholds())
+            
+            # Görselleştirmeler
+            st.subheader("📊 Görselleştirmeler")
+            create_visualizations(results_df, df, date_columns)
+            
+            # Şüpheli tesisatlar (grup indeksinden, yeniden filtrelemeden)
+            st.subheader("🚨 Şüpheli Tesisatlar")
+
+            if suspicious_count > 0:
+                suspicious_display = table(sonuc, suspicious_rows, SUPHELI_SUTUNLARI)
+                st.dataframe(suspicious_display, use_container_width=True, hide_index=True)
+
+                st.download_button(
+                    label="📥 Şüpheli Tesisatları İndir (Excel)",
+                    data=export_excel(sonuc, 'supheli', suspicious_display, 'Şüpheli Tesisatlar'),
+                    file_name="supheli_tesisatlar.xlsx",
+                    mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+                )
+            else:
+                st.success("🎉 Şüpheli tesisat bulunamadı!")
+
+            # Tüm Sonuçlar
+            st.subheader("📋 Tüm Sonuçlar")
+
+            filter_col1, filter_col2, filter_col3 = st.columns(3)
+            with filter_col1:
+                suspicion_filter = st.selectbox("Şüpheli Durumu", options=['Tümü', 'Şüpheli', 'Normal'], index=0)
+            with filter_col2:
+                bina_filter = st.selectbox("Bina Numarası", options=['Tümü'] + group_keys(sonuc, 'bina_no'), index=0)
+            with filter_col3:
+                siralama = st.selectbox("Sıralama", options=['Varsayılan'] + list(SIRALAMA_SECENEKLERI), index=0)
+                azalan = st.checkbox("Azalan sıra", value=True)
+
+            # Filtre / sıralama: grup indeksi dilimleri ve hazır sıra numaraları
+            filtered_rows = select_rows(sonuc, {
+                'suspicion_level': None if suspicion_filter == 'Tümü' else suspicion_filter,
+                'bina_no': None if bina_filter == 'Tümü' else bina_filter,
+            })
+            if siralama != 'Varsayılan':
+                filtered_rows = sort_rows(sonuc, filtered_rows, SIRALAMA_SECENEKLERI[siralama], ascending=not azalan)
+
+            if len(filtered_rows) > 0:
+                filtered_display = table(sonuc, filtered_rows, TUM_SONUC_SUTUNLARI)
+                st.dataframe(filtered_display, use_container_width=True, hide_index=True)
+
+                st.download_button(
+                    label="📥 Filtrelenmiş Sonuçları İndir (Excel)",
+                    data=export_excel(sonuc, ('tum', suspicion_filter, bina_filter, siralama, azalan),
+                                      filtered_display, 'Tüm Sonuçlar'),
+                    file_name="dogalgaz_analiz_sonuclari.xlsx",
+                    mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+                )
+            else:
+                st.warning("Filtreye uygun veri bulunamadı.")
 
 else:
     st.info("👈 Lütfen sol panelden bir dosya yükleyin")
@@ -0,0 +1,157 @@
+"""tespit.py, ham_veri.py ve hamveri2.py'nin ortak analiz yardımcıları.
+
+Üç uygulama aynı tesisat analizini (`paralel.analyze_consumption_sharded`)
+çalıştırır; sonuç tablosu etiketleri, analiz işini başlatma, eşik
+değişikliğinde yeniden puanlama, eşik taraması ve kural seti paneli burada
+tek kopyadır. Uygulamaya özgü olanlar parametre olarak verilir:
+
+- anahtar: uygulama anahtarı, ör. ('tespit', dosya özeti); ilk elemanı
+  uygulama adıdır (iş adı '<ad>.analiz'). Oturumdaki özellikler
+  (`st.session_state['paylasimli_bellek']`) bu anahtarla ayrılır.
+- esikler: uygulamanın `current_thresholds()` sözlüğü (kenar çubuğu eşikleri).
+"""
+import numpy as np
+import pandas as pd
+import plotly.express as px
+import streamlit as st
+
+from paralel import analyze_consumption_sharded, rescore_consumption, rule_scores, sweep_consumption
+from kural_motoru import KURALLAR, rule_messages
+from matris_motoru import OZELLIK_SURUMU, rule_params
+from siralama import top_k
+from is_kuyrugu import start_job
+from sonuc_deposu import stored_analysis
+
+# Sonuç tablosu gösterim adları (gösterim / dışa aktarım sırası)
+SONUC_ETIKETLERI = {
+    'tesisat_no': 'Tesisat No',
+    'bina_no': 'Bina No',
+    'kis_tuketim': 'Kış Tüketim',
+    'yaz_tuketim': 'Yaz Tüketim',
+    'ortalama_tuketim': 'Ortalama Tüketim',
+    'kis_trend': 'Kış Trend',
+    'anomali_sayisi': 'Anomali Sayısı',
+    'suspicion_level': 'Durum',
+    'anomaliler': 'Anomaliler',
+}
+YUVARLANAN_SUTUNLAR = ['Kış Tüketim', 'Yaz Tüketim', 'Ortalama Tüketim']
+SUPHELI_SUTUNLARI = ['Tesisat No', 'Bina No', 'Kış Tüketim', 'Yaz Tüketim', 'Ortalama Tüketim',
+                     'Kış Trend', 'Anomali Sayısı', 'Anomaliler']
+TUM_SONUC_SUTUNLARI = ['Tesisat No', 'Bina No', 'Kış Tüketim', 'Yaz Tüketim', 'Ortalama Tüketim',
+                       'Kış Trend', 'Durum', 'Anomaliler']
+SIRALAMA_SECENEKLERI = {
+    'Kış Tüketim': 'kis_tuketim',
+    'Yaz Tüketim': 'yaz_tuketim',
+    'Ortalama Tüketim': 'ortalama_tuketim',
+    'Anomali Sayısı': 'anomali_sayisi',
+}
+
+# Eşik taraması: eşik -> (etiket, kenar çubuğu aralığı)
+ESIK_TARAMASI = {
+    'kis_tuketim_esigi': ("Kış ayı düşük tüketim eşiği (m³/ay)", 10, 100),
+    'bina_ort_dusuk_oran': ("Bina ortalamasından düşük olma oranı (%)", 30, 90),
+    'ani_dusus_orani': ("Ani düşüş oranı (%)", 40, 90),
+    'min_onceki_kis_tuketim': ("Minimum önceki kış tüketimi (m³)", 50, 200),
+}
+
+# Kural seti: eşikler kenar çubuğundaki (`matris_motoru.rule_params`), diğer parametreler kural varsayılanında
+KURAL_BASLIKLARI = {kural['ad']: kural['baslik'] for kural in KURALLAR}
+# Kural seti tablosunda gösterilen en fazla tesisat (puana göre ilk N)
+KURAL_TABLOSU = 20
+
+
+def _shared_state():
+    return st.session_state.setdefault('paylasimli_bellek', {})
+
+
+def analysis_params(date_columns, tesisat_col, bina_col, esikler, **ekstra):
+    """Analiz sonucunu belirleyen parametreler (sonuç anahtarı için)"""
+    return dict(
+        date_columns=[str(c) for c in date_columns],
+        tesisat_col=tesisat_col,
+        bina_col=bina_col,
+        surum=OZELLIK_SURUMU,
+        **ekstra,
+        **esikler,
+    )
+
+
+def analyze_consumption_patterns(df, date_columns, tesisat_col, bina_col, sonuc_anahtari, anahtar, esikler,
+                                 workers):
+    """Tüketim paternleri analizini arka plan işi olarak başlat (vektörel matris motoru, bina parçalı paralel)
+
+    Aynı sonuç anahtarlı (dosya özeti + sütunlar + eşikler) iş süren / biten
+    varsa (başka oturumda da olsa) o kullanılır; sonuç diskte de saklanır,
+    daha önce hesaplanmışsa analiz çalıştırılmaz.
+    """
+    start_job(
+        f'{anahtar[0]}.analiz', sonuc_anahtari,
+        stored_analysis, sonuc_anahtari, analyze_consumption_sharded, df, date_columns, tesisat_col, bina_col,
+        workers=workers, state=_shared_state(), anahtar=anahtar, **esikler
+    )
+
+
+def rescore_thresholds(df, date_columns, tesisat_col, bina_col, anahtar, esikler):
+    """Eşik değişikliğinde oturumdaki özelliklerle yalnızca karşılaştırmaları çalıştır (özellik yoksa None)"""
+    return rescore_consumption(df, date_columns, tesisat_col, bina_col, _shared_state(), anahtar, **esikler)
+
+
+def threshold_curve(date_columns, bina_col, anahtar, param, grid, esikler):
+    """Tek eşiğin ızgarasında şüpheli tesisat sayıları; diğer eşikler `esikler`deki (özellik yoksa None)"""
+    return sweep_consumption(date_columns, bina_col, _shared_state(), anahtar, param, grid, **esikler)
+
+
+def show_threshold_sweep(date_columns, bina_col, anahtar, esikler):
+    """Seçilen eşiğin her değeri için şüpheli sayısı eğrisi (analiz yeniden çalıştırılmaz)"""
+    with st.expander("🎚️ Eşik Taraması"):
+        esik = st.selectbox("Taranacak eşik", list(ESIK_TARAMASI),
+                            format_func=lambda k: ESIK_TARAMASI[k][0], key='esik_taramasi')
+        etiket, alt, ust = ESIK_TARAMASI[esik]
+        grid = np.arange(alt, ust + 1)
+        sayilar = threshold_curve(date_columns, bina_col, anahtar, esik, grid, esikler)
+        if sayilar is None:
+            st.info("Tarama için analiz özellikleri bulunamadı, analizi yeniden başlatın.")
+            return
+        secili = esikler[esik]
+        fig = px.line(x=grid, y=sayilar, markers=True, title="Eşik Değerine Göre Şüpheli Tesisat Sayısı",
+                      labels={'x': etiket, 'y': 'Şüpheli tesisat'})
+        fig.add_vline(x=secili, line_dash='dash', annotation_text=f"Seçili: {secili}")
+        st.plotly_chart(fig, use_container_width=True)
+        st.caption("Diğer eşikler kenar çubuğundaki değerlerinde sabittir; saha kapasitesine uyan "
+                   "şüpheli sayısını veren değer kenar çubuğundan seçilebilir.")
+
+
+def rule_set_scores(date_columns, bina_col, anahtar, kurallar, esikler):
+    """Seçilen kuralların özellik tablosu üzerinde puanları; eşikler `esikler`deki (tablo yoksa None)"""
+    return rule_scores(date_columns, bina_col, _shared_state(), anahtar, kurallar, params=rule_params(**esikler))
+
+
+def show_rule_set(df, date_columns, tesisat_col, bina_col, anahtar, esikler):
+    """Seçilen kural birleşiminin tetiklenme sayıları ve en yüksek puanlı tesisatlar (analiz yeniden çalıştırılmaz)"""
+    with st.expander("🧩 Kural Seti"):
+        secilen = st.multiselect("Kurallar", list(KURAL_BASLIKLARI), default=list(KURAL_BASLIKLARI),
+                                 format_func=KURAL_BASLIKLARI.get, key='kural_seti')
+        if not secilen:
+            st.info("En az bir kural seçin.")
+            return
+        sonuc = rule_set_scores(date_columns, bina_col, anahtar,
+                                [kural for kural in KURALLAR if kural['ad'] in secilen], esikler)
+        if sonuc is None:
+            st.info("Kural seti için analiz özellikleri bulunamadı, analizi yeniden başlatın.")
+            return
+        derleme, girdi, puanlar = sonuc
+        fig = px.bar(x=[KURAL_BASLIKLARI[ad] for ad in puanlar['bayraklar']],
+                     y=[int(bayrak.sum()) for bayrak in puanlar['bayraklar'].values()],
+                     title="Kurala Göre Tetiklenen Tesisat Sayısı", labels={'x': 'Kural', 'y': 'Tesisat'})
+        st.plotly_chart(fig, use_container_width=True)
+        st.metric("En az iki kuralı tetikleyen tesisat", int((puanlar['kural_sayisi'] >= 2).sum()))
+        ilk = top_k(puanlar['puan'], KURAL_TABLOSU, np.flatnonzero(puanlar['maske']))
+        st.dataframe(pd.DataFrame({
+            'Tesisat No': df[tesisat_col].to_numpy()[ilk],
+            'Bina No': df[bina_col].to_numpy()[ilk],
+            'Puan': puanlar['puan'][ilk],
+            'Kural Sayısı': puanlar['kural_sayisi'][ilk],
+            'Tetiklenen Kurallar': rule_messages(derleme, girdi, puanlar, ilk, sep=' | '),
+        }), use_container_width=True, hide_index=True)
+        st.caption("Kurallar özellik tablosu üzerinde birlikte değerlendirilir; eşikler kenar "
+                   "çubuğundaki değerlerdir. Puan, tetiklenen kuralların ağırlıklarının toplamıdır.")
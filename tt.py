@@ -6,8 +6,14 @@ import plotly.graph_objects as go
 from plotly.subplots import make_subplots
 from datetime import datetime, timedelta
 import warnings
+from onbellek import cached_frame
+from risk_motoru import score_facilities
+from siralama import top_k
 warnings.filterwarnings('ignore')
 
+# Yüksek risk tablosunda gösterilen en fazla tesis (risk skoruna göre ilk N)
+TABLO_SATIRI = 1000
+
 # Sayfa konfigürasyonu
 st.set_page_config(
     page_title="Doğalgaz Kaçak Kullanım Tespit Sistemi",
@@ -114,49 +120,8 @@ def detect_anomalies(df, tesis_id, method='iqr', threshold=2.5):
     
     return anomalies
 
-def calculate_risk_score(df, tesis_id):
-    """Risk skoru hesaplama"""
-    tesis_data = df[df['Tüketim noktası'] == tesis_id].copy()
-    
-    if len(tesis_data) < 3:
-        return 0
-    
-    tesis_data = tesis_data.sort_values('Belge tarihi')
-    consumption = tesis_data['KWH Tüke Sm3'].values
-    
-    risk_factors = []
-    
-    # 1. Ani artışlar
-    for i in range(1, len(consumption)):
-        if consumption[i] > consumption[i-1] * 2:  # %100 artış
-            risk_factors.append(3)
-        elif consumption[i] > consumption[i-1] * 1.5:  # %50 artış
-            risk_factors.append(2)
-    
-    # 2. Sıfır tüketim sonrası ani artış
-    for i in range(1, len(consumption)):
-        if consumption[i-1] == 0 and consumption[i] > np.mean(consumption):
-            risk_factors.append(4)
-    
-    # 3. Düzensiz tüketim paterni
-    cv = np.std(consumption) / np.mean(consumption) if np.mean(consumption) > 0 else 0
-    if cv > 1.0:  # Yüksek varyasyon katsayısı
-        risk_factors.append(2)
-    
-    # 4. Anomali sayısı
-    anomalies_iqr = detect_anomalies(df, tesis_id, 'iqr')
-    anomalies_zscore = detect_anomalies(df, tesis_id, 'zscore')
-    
-    total_anomalies = len(set(anomalies_iqr + anomalies_zscore))
-    if total_anomalies > len(consumption) * 0.3:  # %30'dan fazla anomali
-        risk_factors.append(3)
-    elif total_anomalies > len(consumption) * 0.15:  # %15'den fazla anomali
-        risk_factors.append(2)
-    
-    return min(sum(risk_factors), 10)  # Maksimum 10 risk skoru
-
 if uploaded_file is not None:
-    df = load_data(uploaded_file)
+    df = cached_frame(uploaded_file, 'tt.load_data', load_data)
     
     if df is not None:
         # Kolon adlarını kontrol et ve düzelt
@@ -277,59 +242,43 @@ if uploaded_file is not None:
             # Risk analizi
             st.header("📊 Risk Analizi")
             
-            # Her tesis için risk skoru hesapla
+            # Tüm tesisler için risk skoru (tek sıralama + grup bazlı vektörel hesap)
             tesis_list = df['Tüketim noktası'].unique()
-            risk_data = []
-            
-            progress_bar = st.progress(0)
-            for i, tesis_id in enumerate(tesis_list):
-                risk_score = calculate_risk_score(df, tesis_id)
-                anomalies = detect_anomalies(df, tesis_id, anomaly_method)
-                
-                tesis_df = df[df['Tüketim noktası'] == tesis_id]
-                
-                risk_data.append({
-                    'Tesis_ID': tesis_id,
-                    'Risk_Skoru': risk_score,
-                    'Anomali_Sayısı': len(anomalies),
-                    'Ortalama_Tüketim': tesis_df['KWH Tüke Sm3'].mean(),
-                    'Maksimum_Tüketim': tesis_df['KWH Tüke Sm3'].max(),
-                    'Tüketim_Varyasyonu': tesis_df['KWH Tüke Sm3'].std(),
-                    'Kayıt_Sayısı': len(tesis_df)
-                })
-                
-                progress_bar.progress((i + 1) / len(tesis_list))
-            
-            risk_df = pd.DataFrame(risk_data)
-            risk_df = risk_df.sort_values('Risk_Skoru', ascending=False)
+            risk_df = score_facilities(df['Tüketim noktası'], df['Belge tarihi'],
+                                       df['KWH Tüke Sm3'], anomaly_method)
+            risk_skoru = risk_df['Risk_Skoru'].to_numpy()
             
-            # Yüksek riskli tesisleri göster
-            high_risk = risk_df[risk_df['Risk_Skoru'] >= risk_threshold]
+            # Yüksek riskli tesisler skor dizisinde seçilir; tablo için yalnızca ilk N sıralanır
+            high_rows = np.flatnonzero(risk_skoru >= risk_threshold)
+            high_risk = risk_df.iloc[top_k(risk_skoru, TABLO_SATIRI, high_rows)]
             
             col1, col2 = st.columns([2, 1])
             
             with col1:
                 st.subheader(f"🚨 Yüksek Riskli Tesisler (Risk Skoru ≥ {risk_threshold})")
                 
-                if len(high_risk) > 0:
-                    # Risk dağılımı grafiği
-                    fig_risk = px.histogram(
-                        risk_df, 
-                        x='Risk_Skoru', 
-                        nbins=10,
+                if len(high_rows) > 0:
+                    # Risk dağılımı grafiği (kova sayıları tek histogram geçişinde, noktalar tarayıcıya gönderilmez)
+                    sayilar, sinirlar = np.histogram(risk_skoru, bins=10)
+                    fig_risk = px.bar(
+                        x=(sinirlar[:-1] + sinirlar[1:]) / 2,
+                        y=sayilar,
                         title="Risk Skoru Dağılımı",
-                        labels={'Risk_Skoru': 'Risk Skoru', 'count': 'Tesis Sayısı'}
+                        labels={'x': 'Risk Skoru', 'y': 'Tesis Sayısı'}
                     )
+                    fig_risk.update_traces(width=sinirlar[1] - sinirlar[0])
                     fig_risk.add_vline(x=risk_threshold, line_dash="dash", line_color="red")
                     st.plotly_chart(fig_risk, use_container_width=True)
                     
+                    if len(high_rows) > TABLO_SATIRI:
+                        st.caption(f"Risk skoru en yüksek {TABLO_SATIRI} tesis listelenir.")
                     st.dataframe(high_risk, use_container_width=True)
                 else:
                     st.success("Belirlenen risk eşiği üzerinde tesis bulunamadı.")
             
             with col2:
                 st.subheader("📈 Risk İstatistikleri")
-                st.metric("Yüksek Riskli Tesis", len(high_risk))
+                st.metric("Yüksek Riskli Tesis", len(high_rows))
                 st.metric("Ortalama Risk Skoru", f"{risk_df['Risk_Skoru'].mean():.2f}")
                 st.metric("Maksimum Risk Skoru", f"{risk_df['Risk_Skoru'].max()}")
             
@@ -340,7 +289,7 @@ if uploaded_file is not None:
             selected_tesis = st.selectbox(
                 "Analiz edilecek tesisi seçin:",
                 options=tesis_list,
-                index=0 if len(high_risk) == 0 else list(tesis_list).index(high_risk.iloc[0]['Tesis_ID'])
+                index=0 if len(high_rows) == 0 else list(tesis_list).index(high_risk.iloc[0]['Tesis_ID'])
             )
             
             if selected_tesis:
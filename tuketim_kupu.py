@@ -0,0 +1,215 @@
+"""Uzun format tüketim verisi için (tesisat x yıl x ay) küpü.
+
+Kayıtlar yükleme sonrasında bir kez yoğun bir float küpe yerleştirilir;
+`long_format.analyze_facility` içindeki her (tesisat, yıl, ay) sorgusu
+DataFrame taraması yerine dizi indekslemesi olur. NaN "veri yok" demektir:
+kaydı olmayan, tüketimi boş veya sıfır olan aylar NaN'dır (eski
+`get_consumption` bunların hepsi için None döndürüyordu). Aynı ay için
+birden fazla kayıt varsa ilk kayıt kullanılır.
+"""
+import numpy as np
+import pandas as pd
+
+
+def build_consumption_cube(tesisat, yil, ay, tuketim, son_n=6):
+    """Kayıtlardan küp ve tesisat bazlı yardımcı dizileri oluştur
+
+    Döner: {'values': (tesisat x yıl x 12) float küp, 'keys': tesisat
+    numaraları (ilk görülme sırasıyla), 'row_of': tesisat -> satır,
+    'year0': küpün ilk yılı, 'recent_mean': son `son_n` pozitif kaydın
+    ortalaması (kayıt sırasıyla, kaydı yoksa 0), 'order'/'offsets':
+    tesisatların kayıt konumları (CSR)}
+    """
+    codes, keys = pd.factorize(pd.Series(tesisat).reset_index(drop=True))
+    codes = codes.astype(np.int64)
+    yil = np.asarray(yil, dtype=np.int64)
+    ay = np.asarray(ay, dtype=np.int64)
+    tuketim = pd.to_numeric(pd.Series(tuketim), errors='coerce').to_numpy(dtype=np.float64)
+    n_fac = len(keys)
+
+    valid = codes >= 0
+    year0 = int(yil[valid].min()) if valid.any() else 0
+    n_year = int(yil[valid].max()) - year0 + 1 if valid.any() else 0
+
+    # İlk kayıt kazanır: düz indeksin ilk görüldüğü konum
+    values = np.full((n_fac, n_year, 12), np.nan)
+    flat = (codes * n_year + (yil - year0)) * 12 + (ay - 1)
+    ok = valid & (ay >= 1) & (ay <= 12)
+    first_flat, first_pos = np.unique(flat[ok], return_index=True)
+    first_vals = tuketim[np.flatnonzero(ok)[first_pos]]
+    first_vals = np.where(first_vals > 0, first_vals, np.nan)
+    values.reshape(-1)[first_flat] = first_vals
+
+    # Tesisat başına kayıt konumları (grafik / detay için)
+    sizes = np.bincount(codes[valid], minlength=n_fac)
+    order = np.argsort(np.where(valid, codes, n_fac), kind='stable')[:int(valid.sum())]
+    offsets = np.concatenate(([0], np.cumsum(sizes)))
+
+    # Son N pozitif kaydın ortalaması (kayıt sırasına göre, eski tail(N) ile aynı)
+    pos_mask = valid & (tuketim > 0)
+    pos_idx = np.flatnonzero(pos_mask)
+    pos_codes = codes[pos_idx]
+    pos_order = np.argsort(pos_codes, kind='stable')
+    pos_codes = pos_codes[pos_order]
+    pos_vals = tuketim[pos_idx][pos_order]
+    pos_sizes = np.bincount(pos_codes, minlength=n_fac)
+    pos_end = np.cumsum(pos_sizes)
+    from_end = pos_end[pos_codes] - np.arange(len(pos_codes))
+    last = from_end <= son_n
+    recent_sum = np.bincount(pos_codes[last], weights=pos_vals[last], minlength=n_fac)
+    recent_cnt = np.bincount(pos_codes[last], minlength=n_fac)
+    recent_mean = np.zeros(n_fac)
+    np.divide(recent_sum, recent_cnt, out=recent_mean, where=recent_cnt > 0)
+
+    return {
+        'values': values,
+        'keys': keys,
+        'row_of': {k: i for i, k in enumerate(keys)},
+        'year0': year0,
+        'recent_mean': recent_mean,
+        'order': order,
+        'offsets': offsets,
+    }
+
+
+def cube_value(cube, row, year, month):
+    """Küpteki tek hücre (veri yoksa veya küp dışındaysa None)"""
+    y = year - cube['year0']
+    if row < 0 or y < 0 or y >= cube['values'].shape[1]:
+        return None
+    val = cube['values'][row, y, month - 1]
+    return None if np.isnan(val) else float(val)
+
+
+def facility_records(cube, row):
+    """Tesisatın kayıtlarının DataFrame konumları"""
+    return cube['order'][cube['offsets'][row]:cube['offsets'][row + 1]]
+
+
+# Anomali takvimi bayrakları (analyze_facility'deki Analiz 1/2/3)
+ANALIZ1 = 1  # önceki ay
+ANALIZ2 = 2  # önceki yılın aynı ayı
+ANALIZ3 = 4  # trend
+
+
+def _column_index(year0, n_col, years, months):
+    """(yıl, ay) dizilerinin küp zaman eksenindeki sütunları; küp dışı -> n_col (NaN dolgu)"""
+    idx = (np.asarray(years) - year0) * 12 + np.asarray(months) - 1
+    return np.where((idx >= 0) & (idx < n_col), idx, n_col)
+
+
+def _calendar_block(flat, cols, esik, recent_mean):
+    """Bir tesisat bloğu için bayrak / yön / öncelik"""
+    cur, prev1, prev2, prev_year1, prev_year2, y1_m1, y1_m2, y2_m1, y2_m2 = (
+        flat[:, c] for c in cols)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        # ANALİZ 1 / 2: yüzde değişim (NaN karşılaştırmaları False)
+        change1 = (cur - prev1) / prev1 * 100
+        change2 = (cur - prev_year1) / prev_year1 * 100
+        a1 = np.abs(change1) >= esik
+        a2 = np.abs(change2) >= esik
+
+        # ANALİZ 3: trend farkı
+        trend_current = ((prev1 - prev2) + (cur - prev1)) / 2
+        trend_1 = ((y1_m1 - prev_year1) + (y1_m2 - y1_m1)) / 2
+        trend_2 = ((y2_m1 - prev_year2) + (y2_m2 - y2_m1)) / 2
+        a3 = (np.abs(trend_current - trend_1) >= esik) | (np.abs(trend_current - trend_2) >= esik)
+
+    flags = (a1 * ANALIZ1 | a2 * ANALIZ2 | a3 * ANALIZ3).astype(np.uint8)
+
+    # Anomali tipi: ilk tespit eden analizin yönü
+    azalis = np.where(a1, change1 < 0, np.where(a2, change2 < 0, trend_current < 0))
+    direction = np.where(flags > 0, np.where(azalis, -1, 1), 0).astype(np.int8)
+
+    # Öncelik: ortalama x en büyük (yuvarlanmış) yüzde değişim / 100
+    max_change = np.maximum(np.where(a1, np.abs(np.round(change1, 1)), 0),
+                            np.where(a2, np.abs(np.round(change2, 1)), 0))
+    priority = np.where((flags > 0) & np.isfinite(cur), recent_mean * max_change / 100, 0)
+    return flags, direction, priority.astype(np.float32)
+
+
+def anomaly_calendar(cube, segment_thresholds, block=50_000):
+    """Tüm tesisatlar ve tüm dönemler için Analiz 1/2/3'ü tek geçişte hesapla
+
+    Her dönemin önceki / sonraki ay ve önceki yıl değerleri küpün zaman
+    ekseni kaydırılarak (sütun indeksleriyle) alınır; ay / yıl geçiş
+    kuralları `analyze_facility` ile aynıdır. segment_thresholds: tesisat
+    başına segment eşiği (%). Ara diziler `block` tesisatlık bloklarla
+    sınırlanır.
+
+    Döner: {'flags': (tesisat x dönem) uint8 ANALIZ1|ANALIZ2|ANALIZ3,
+    'direction': int8 (-1 düşüş, 1 artış, 0 yok), 'priority': float32
+    öncelik skoru, 'years' / 'months': dönemler, 'keys': tesisatlar}
+    """
+    n_fac, n_year, _ = cube['values'].shape
+    year0 = cube['year0']
+    n_col = n_year * 12
+    values = cube['values'].reshape(n_fac, n_col)
+
+    # Takvim: verisi olan dönemler
+    dolu = np.flatnonzero(np.isfinite(values).any(axis=0))
+    y = year0 + dolu // 12
+    m = dolu % 12 + 1
+
+    prev1_m = np.where(m == 1, 12, m - 1)
+    prev1_y = np.where(m == 1, y - 1, y)
+    prev2_m = np.where(m <= 2, 11, m - 2)
+    prev2_y = np.where(m <= 2, y - 1, y)
+    next1_m = np.where(m == 12, 1, m + 1)
+    next2_m = np.where(m >= 11, 2, m + 2)
+    cols = [_column_index(year0, n_col, yy, mm) for yy, mm in (
+        (y, m), (prev1_y, prev1_m), (prev2_y, prev2_m), (y - 1, m), (y - 2, m),
+        (y - 1, next1_m), (y - 1, next2_m), (y - 2, next1_m), (y - 2, next2_m))]
+
+    esik = np.asarray(segment_thresholds, dtype=np.float64)
+    flags = np.zeros((n_fac, len(dolu)), dtype=np.uint8)
+    direction = np.zeros((n_fac, len(dolu)), dtype=np.int8)
+    priority = np.zeros((n_fac, len(dolu)), dtype=np.float32)
+    for start in range(0, n_fac, block):
+        sl = slice(start, start + block)
+        # Son sütun "veri yok" (NaN) dolgusu
+        flat = np.concatenate([values[sl], np.full((len(values[sl]), 1), np.nan)], axis=1)
+        flags[sl], direction[sl], priority[sl] = _calendar_block(
+            flat, cols, esik[sl, None], cube['recent_mean'][sl, None])
+
+    return {
+        'flags': flags,
+        'direction': direction,
+        'priority': priority,
+        'years': y,
+        'months': m,
+        'keys': cube['keys'],
+    }
+
+
+def calendar_summary(calendar):
+    """Dönem başına anomali sayıları"""
+    flags, direction = calendar['flags'], calendar['direction']
+    return pd.DataFrame({
+        'yil': calendar['years'],
+        'ay': calendar['months'],
+        'anomali': (flags > 0).sum(axis=0),
+        'dusus': (direction < 0).sum(axis=0),
+        'artis': (direction > 0).sum(axis=0),
+        'analiz1': (flags & ANALIZ1 > 0).sum(axis=0),
+        'analiz2': (flags & ANALIZ2 > 0).sum(axis=0),
+        'analiz3': (flags & ANALIZ3 > 0).sum(axis=0),
+    })
+
+
+def calendar_period(calendar, year, month):
+    """Tek dönemin anomalili tesisatları (öncelik sırasıyla)"""
+    sutun = np.flatnonzero((calendar['years'] == year) & (calendar['months'] == month))
+    if not len(sutun):
+        return pd.DataFrame(columns=['tesisat_no', 'analiz1', 'analiz2', 'analiz3', 'yon', 'oncelik'])
+    flags = calendar['flags'][:, sutun[0]]
+    rows = np.flatnonzero(flags)
+    out = pd.DataFrame({
+        'tesisat_no': np.asarray(calendar['keys'])[rows],
+        'analiz1': flags[rows] & ANALIZ1 > 0,
+        'analiz2': flags[rows] & ANALIZ2 > 0,
+        'analiz3': flags[rows] & ANALIZ3 > 0,
+        'yon': calendar['direction'][rows, sutun[0]],
+        'oncelik': calendar['priority'][rows, sutun[0]],
+    })
+    return out.sort_values('oncelik', ascending=False, kind='stable').reset_index(drop=True)
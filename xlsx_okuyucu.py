@@ -0,0 +1,295 @@
+"""Sütun seçmeli, salt-okunur xlsx okuyucu.
+
+`pd.read_excel` her hücre için openpyxl hücre nesnesi kurar ve tüm
+sütunları okur. Bu okuyucu çalışma sayfası XML'ini zip içinden akış halinde
+(iterparse) satır satır gezer, önce başlık satırını bulur, sonra yalnızca
+istenen sütunların hücrelerini çözer (kimlik + ay sütunları gibi) ve sayısal
+sütunları doğrudan float64 NumPy dizilerine çevirir. Diğer hücreler hiç
+çözülmeden atlanır. xlsx olmayan dosyalar (.xls) için `pd.read_excel`e
+geri dönülür.
+"""
+import posixpath
+import re
+import zipfile
+import xml.etree.ElementTree as ET
+from array import array
+from datetime import date, datetime
+
+import numpy as np
+import pandas as pd
+
+TURKISH_MONTHS = ['Ocak', 'Şubat', 'Mart', 'Nisan', 'Mayıs', 'Haziran',
+                  'Temmuz', 'Ağustos', 'Eylül', 'Ekim', 'Kasım', 'Aralık']
+
+_PERIOD_RE = re.compile(r'^\s*(\d{4}[/\-.]\d{1,2}|\d{1,2}[/\-.]\d{4})\b')
+_HEADER_SCAN_ROWS = 20
+
+_NS = '{http://schemas.openxmlformats.org/spreadsheetml/2006/main}'
+_REL_NS = '{http://schemas.openxmlformats.org/officeDocument/2006/relationships}'
+_PKG_REL_NS = '{http://schemas.openxmlformats.org/package/2006/relationships}'
+_CELL_REF_RE = re.compile(r'([A-Z]+)')
+# Yerleşik tarih / saat sayı biçimleri (ECMA-376)
+_BUILTIN_DATE_FORMATS = set(range(14, 23)) | {45, 46, 47}
+
+
+def is_month_column(header):
+    """Başlık bir ay / dönem sütunu mu (2023/01, 01.2023, tarih hücresi, 'Ocak')"""
+    if isinstance(header, (datetime, date, pd.Timestamp)):
+        return True
+    text = str(header).strip()
+    return bool(_PERIOD_RE.match(text)) or any(text.startswith(m) for m in TURKISH_MONTHS)
+
+
+def id_column_matcher(names):
+    """Verilen kimlik sütun adlarıyla (büyük/küçük harf ve boşluk duyarsız) eşleşen fonksiyon"""
+    names = {str(n).strip().lower() for n in names}
+    return lambda header: str(header).strip().lower() in names
+
+
+def _is_xlsx(file):
+    """Dosya bir zip (xlsx) arşivi mi"""
+    if isinstance(file, str):
+        with open(file, 'rb') as f:
+            return f.read(2) == b'PK'
+    pos = file.tell()
+    file.seek(0)
+    magic = file.read(2)
+    file.seek(pos)
+    return magic == b'PK'
+
+
+def _header_name(value, i):
+    if value is None:
+        return f"Unnamed: {i}"
+    if isinstance(value, str):
+        return value.strip()
+    return value
+
+
+def _find_header(rows, usecols):
+    """İlk satırlar içinde seçilen sütunlardan en az birini içeren başlık satırını bul
+
+    Döner: (başlık satırı, başlıktan önce okunan ama veri olan satırlar)
+    Bulunamazsa ilk satır başlık kabul edilir (pd.read_excel davranışı).
+    """
+    scanned = []
+    for row in rows:
+        scanned.append(row)
+        dolu = [v for v in row if v is not None]
+        if len(dolu) >= 2 and any(usecols(_header_name(v, i)) for i, v in enumerate(row) if v is not None):
+            return row, []
+        if len(scanned) >= _HEADER_SCAN_ROWS:
+            break
+    if not scanned:
+        return (), []
+    return scanned[0], scanned[1:]
+
+
+def _as_float(value, decimal_comma=False):
+    """Hücre değerini float'a çevir (pd.to_numeric(errors='coerce') gibi, olmazsa NaN)
+
+    decimal_comma=True ise metin hücrelerdeki virgüller önce noktaya çevrilir
+    ('12,5' -> 12.5; `.str.replace(',', '.')` + `pd.to_numeric` gibi).
+    """
+    if value is None:
+        return np.nan
+    if isinstance(value, (int, float)):
+        return float(value)
+    if isinstance(value, str):
+        if decimal_comma:
+            value = value.replace(',', '.')
+        # float() '1_000' ve ASCII dışı rakamları da kabul eder, to_numeric etmez
+        if '_' in value or not value.isascii():
+            return np.nan
+        try:
+            return float(value)
+        except ValueError:
+            return np.nan
+    return np.nan
+
+
+def _sheet_path(zf, sheet_name):
+    """Çalışma kitabındaki (ilk veya adı verilen) sayfanın zip içindeki yolu"""
+    workbook = ET.fromstring(zf.read('xl/workbook.xml'))
+    sheets = workbook.find(_NS + 'sheets')
+    sheet = sheets[0]
+    if sheet_name:
+        sheet = next(s for s in sheets if s.get('name') == sheet_name)
+    rid = sheet.get(_REL_NS + 'id')
+    rels = ET.fromstring(zf.read('xl/_rels/workbook.xml.rels'))
+    target = next(r.get('Target') for r in rels if r.get('Id') == rid)
+    if target.startswith('/'):
+        return target.lstrip('/')
+    return posixpath.normpath(posixpath.join('xl', target))
+
+
+def _shared_strings(zf):
+    if 'xl/sharedStrings.xml' not in zf.namelist():
+        return []
+    strings = []
+    for _, elem in ET.iterparse(zf.open('xl/sharedStrings.xml')):
+        if elem.tag == _NS + 'si':
+            strings.append(''.join(t.text or '' for t in elem.iter(_NS + 't')))
+            elem.clear()
+    return strings
+
+
+def _date_styles(zf):
+    """Tarih biçimli hücre stillerinin (cellXfs sırası) kümesi"""
+    if 'xl/styles.xml' not in zf.namelist():
+        return set()
+    from openpyxl.styles.numbers import is_date_format
+
+    styles = ET.fromstring(zf.read('xl/styles.xml'))
+    custom = {}
+    num_fmts = styles.find(_NS + 'numFmts')
+    if num_fmts is not None:
+        custom = {int(f.get('numFmtId')): f.get('formatCode') for f in num_fmts}
+    cell_xfs = styles.find(_NS + 'cellXfs')
+    date_styles = set()
+    for i, xf in enumerate(cell_xfs if cell_xfs is not None else []):
+        fmt = int(xf.get('numFmtId', 0))
+        if fmt in _BUILTIN_DATE_FORMATS or (fmt in custom and is_date_format(custom[fmt])):
+            date_styles.add(i)
+    return date_styles
+
+
+def _column_index(ref, cache):
+    """'AB12' hücre başvurusundan 0 tabanlı sütun indeksi"""
+    letters = _CELL_REF_RE.match(ref).group(1)
+    idx = cache.get(letters)
+    if idx is None:
+        idx = 0
+        for ch in letters:
+            idx = idx * 26 + ord(ch) - 64
+        idx -= 1
+        cache[letters] = idx
+    return idx
+
+
+def _cell_value(elem, shared, date_styles):
+    """<c> öğesinin Python değeri (openpyxl values_only ile aynı tipler)"""
+    t = elem.get('t')
+    if t == 'inlineStr':
+        return ''.join(x.text or '' for x in elem.iter(_NS + 't'))
+    v = elem.find(_NS + 'v')
+    if v is None or v.text is None:
+        return None
+    text = v.text
+    if t == 's':
+        return shared[int(text)]
+    if t in ('str', 'e'):
+        return text
+    if t == 'b':
+        return text == '1'
+    if t == 'd':
+        return pd.Timestamp(text).to_pydatetime()
+    if date_styles and int(elem.get('s', 0)) in date_styles:
+        from openpyxl.utils.datetime import from_excel
+        return from_excel(float(text))
+    if '.' in text or 'E' in text or 'e' in text:
+        return float(text)
+    return int(text)
+
+
+def _iter_rows(zf, sheet_path, shared, date_styles, wanted=None):
+    """Sayfa satırlarını {sütun indeksi: değer} sözlükleri olarak akıt
+
+    wanted verilirse (küme veya .send ile sonradan) yalnızca o sütunların
+    hücreleri çözülür.
+    """
+    cache = {}
+    row = {}
+    c_tag, row_tag = _NS + 'c', _NS + 'row'
+    for _, elem in ET.iterparse(zf.open(sheet_path)):
+        tag = elem.tag
+        if tag == c_tag:
+            ref = elem.get('r')
+            idx = _column_index(ref, cache) if ref else len(row)
+            if wanted is None or idx in wanted:
+                row[idx] = _cell_value(elem, shared, date_styles)
+            elem.clear()
+        elif tag == row_tag:
+            new_wanted = yield row
+            if new_wanted is not None:
+                wanted = new_wanted
+                yield None
+            row = {}
+            elem.clear()
+
+
+def read_xlsx(file, usecols=None, numeric=None, sheet_name=None, all_if_no_numeric=True, decimal_comma=False):
+    """xlsx dosyasını seçili sütunlarla, tipli dizilere çözerek oku
+
+    usecols: başlık -> bool, projeksiyona alınacak sütunlar (None = hepsi)
+    numeric: başlık -> bool, float64'e çevrilecek sütunlar (diğerleri pandas
+             gibi tip çıkarımıyla: tamsayı, float veya object)
+    all_if_no_numeric: seçimde hiç sayısal sütun yoksa tüm sütunlar okunur
+             (tanınmayan başlık biçimlerinde eski davranışa düşmek için)
+    decimal_comma: sayısal sütunlardaki metin hücrelerde ondalık virgül
+             kabul edilir ('12,5'); kapalıyken bu hücreler NaN olur
+    """
+    if not _is_xlsx(file):
+        if hasattr(file, 'seek'):
+            file.seek(0)
+        df = pd.read_excel(file, sheet_name=sheet_name or 0)
+        return df if usecols is None else df[[c for c in df.columns if usecols(c)]]
+
+    if hasattr(file, 'seek'):
+        file.seek(0)
+    usecols = usecols or (lambda header: True)
+    numeric = numeric or (lambda header: False)
+
+    with zipfile.ZipFile(file) as zf:
+        sheet_path = _sheet_path(zf, sheet_name)
+        shared = _shared_strings(zf)
+        date_styles = _date_styles(zf)
+
+        rows = _iter_rows(zf, sheet_path, shared, date_styles)
+        header_cells, pending = _find_header(
+            (tuple(r.get(i) for i in range(max(r) + 1)) if r else () for r in rows), usecols)
+
+        headers = [_header_name(v, i) for i, v in enumerate(header_cells)]
+        secili = [i for i, h in enumerate(headers) if usecols(h)]
+        if all_if_no_numeric and not any(numeric(headers[i]) for i in secili):
+            secili = list(range(len(headers)))
+        # Sayısal sütunlar doğrudan float64 tamponlarına (array('d')) yazılır
+        sayisal = {i for i in secili if numeric(headers[i])}
+        columns = {i: array('d') if i in sayisal else [] for i in secili}
+
+        def collect(get):
+            vals = [get(i) for i in secili]
+            if all(v is None for v in vals):
+                return
+            for i, v in zip(secili, vals):
+                columns[i].append(_as_float(v, decimal_comma) if i in sayisal else v)
+
+        for row in pending:
+            collect(lambda i: row[i] if i < len(row) else None)
+        # Başlıktan sonra yalnızca seçili sütunların hücreleri çözülür
+        try:
+            rows.send(set(secili))
+        except StopIteration:
+            pass
+        for row in rows:
+            collect(row.get)
+
+    data = {}
+    for i in secili:
+        if i in sayisal:
+            data[headers[i]] = np.frombuffer(columns[i], dtype=np.float64)
+        else:
+            data[headers[i]] = pd.Series(columns[i], dtype=object).infer_objects()
+    return pd.DataFrame(data)
+
+
+def read_pivot_xlsx(file, id_columns, sheet_name=None, decimal_comma=False):
+    """Pivot biçimli xlsx: kimlik sütunları + ay sütunları (float64)"""
+    is_id = id_column_matcher(id_columns)
+    return read_xlsx(
+        file,
+        usecols=lambda h: is_id(h) or is_month_column(h),
+        numeric=lambda h: not is_id(h),
+        sheet_name=sheet_name,
+        decimal_comma=decimal_comma,
+    )
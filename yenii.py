@@ -5,6 +5,9 @@ import plotly.express as px
 import plotly.graph_objects as go
 from datetime import datetime
 import io
+from onbellek import cached_frame
+from xlsx_okuyucu import read_xlsx
+from kayit_motoru import winter_low, building_low, sudden_drop, facility_summary, summary_sheets
 
 # Sayfa yapılandırması
 st.set_page_config(
@@ -25,18 +28,31 @@ uploaded_file = st.file_uploader(
     help="Excel dosyası: Tüketim Noktası, Bağlantı Nesnesi, Belge Tarihi, SM3 sütunları içermelidir"
 )
 
+# Sütun adlarını normalize etme fonksiyonu
+def normalize_column_name(col_name):
+    return col_name.lower().replace('ı', 'i').replace('ğ', 'g').replace('ü', 'u').replace('ö', 'o').replace('ş', 's').replace('ç', 'c').strip()
+
+def gerekli_sutun_mu(col):
+    """Okuma sırasında projeksiyona alınacak sütunlar (tesisat, bina, tarih, sm3)"""
+    col_normalized = normalize_column_name(str(col))
+    return (('tuketim' in col_normalized and 'nokta' in col_normalized) or
+            ('baglanti' in col_normalized and 'nesne' in col_normalized) or
+            ('belge' in col_normalized and 'tarih' in col_normalized) or
+            col_normalized in ['sm3', 'sm³'])
+
+def sm3_sutunu_mu(col):
+    return normalize_column_name(str(col)) in ['sm3', 'sm³']
+
 if uploaded_file is not None:
     try:
-        # Excel dosyasını okuma
-        df = pd.read_excel(uploaded_file)
+        # Excel dosyasını okuma (yalnızca gerekli sütunlar, Sm3 doğrudan float)
+        df = cached_frame(uploaded_file, 'yenii.read_xlsx',
+                          lambda f: read_xlsx(f, usecols=gerekli_sutun_mu, numeric=sm3_sutunu_mu),
+                          params={'decimal_comma': False})
         
         # Sütun adlarını temizleme (büyük/küçük harf ve boşluk hassasiyetini kaldırmak için)
         df.columns = df.columns.astype(str).str.strip()
         
-        # Sütun adlarını normalize etme fonksiyonu
-        def normalize_column_name(col_name):
-            return col_name.lower().replace('ı', 'i').replace('ğ', 'g').replace('ü', 'u').replace('ö', 'o').replace('ş', 's').replace('ç', 'c').strip()
-        
         # Gerekli sütunları bulma ve eşleme
         sutun_esleme = {}
         
@@ -157,79 +173,6 @@ if uploaded_file is not None:
     # Analiz başlatma butonu
     if st.sidebar.button("🔍 Anomali Analizi Başlat", type="primary"):
         
-        # Kış ayları tanımı (Kasım, Aralık, Ocak, Şubat)
-        kis_aylari = [11, 12, 1, 2]
-        
-        # Anomali tespit fonksiyonları
-        def kis_dusukluk_anomalisi(df, esik):
-            """Kış aylarında düşük tüketim anomalisi"""
-            kis_verileri = df[df['ay'].isin(kis_aylari)].copy()
-            if kis_verileri.empty:
-                return pd.DataFrame()
-                
-            anomaliler = kis_verileri[kis_verileri['tuketim_miktari'] < esik].copy()
-            if not anomaliler.empty:
-                anomaliler['anomali_tipi'] = 'Kış Ayı Düşük Tüketim'
-                anomaliler['aciklama'] = f'{esik} sm³/ay altında kış tüketimi'
-            return anomaliler
-            
-        def bina_ortalamasindan_dusuk_anomali(df, oran):
-            """Bina ortalamasından düşük tüketim anomalisi"""
-            # Her bina için ortalama tüketim hesaplama
-            bina_ortalamalari = df.groupby('baglanti_nesnesi')['tuketim_miktari'].mean().reset_index()
-            bina_ortalamalari.columns = ['baglanti_nesnesi', 'bina_ortalama']
-            
-            # Veriyi bina ortalamaları ile birleştirme
-            df_with_avg = df.merge(bina_ortalamalari, on='baglanti_nesnesi')
-            
-            # Anomali tespiti
-            esik_deger = df_with_avg['bina_ortalama'] * (oran / 100)
-            anomaliler = df_with_avg[df_with_avg['tuketim_miktari'] < esik_deger].copy()
-            
-            if not anomaliler.empty:
-                anomaliler['anomali_tipi'] = 'Bina Ortalamasından Düşük'
-                anomaliler['aciklama'] = f'Bina ortalamasından %{100-oran} daha düşük'
-            return anomaliler
-            
-        def ani_dusus_anomalisi(df, oran, min_tuketim):
-            """Ani düşüş anomalisi"""
-            anomaliler = []
-            
-            for tesisat in df['tuketim_noktasi'].unique():
-                tesisat_data = df[df['tuketim_noktasi'] == tesisat].sort_values('tarih')
-                
-                # Kış ayları için yıllık ortalamalar
-                kis_verileri = tesisat_data[tesisat_data['ay'].isin(kis_aylari)]
-                if kis_verileri.empty:
-                    continue
-                    
-                kis_ortalamalari = kis_verileri.groupby('yil')['tuketim_miktari'].mean()
-                
-                for yil in kis_ortalamalari.index:
-                    if yil == kis_ortalamalari.index.min():
-                        continue  # İlk yıl için karşılaştırma yapılamaz
-                        
-                    mevcut_kis = kis_ortalamalari[yil]
-                    onceki_kis = kis_ortalamalari.get(yil-1, np.nan)
-                    
-                    if (onceki_kis >= min_tuketim and 
-                        not pd.isna(mevcut_kis) and 
-                        not pd.isna(onceki_kis) and
-                        mevcut_kis < onceki_kis * ((100-oran)/100)):
-                        
-                        # Anomali kayıtlarını ekleme
-                        kis_kayitlari = tesisat_data[
-                            (tesisat_data['yil'] == yil) & 
-                            (tesisat_data['ay'].isin(kis_aylari))
-                        ].copy()
-                        
-                        if not kis_kayitlari.empty:
-                            kis_kayitlari['anomali_tipi'] = 'Ani Düşüş'
-                            kis_kayitlari['aciklama'] = f'%{oran} ani düşüş (Önceki: {onceki_kis:.1f}, Mevcut: {mevcut_kis:.1f})'
-                            anomaliler.append(kis_kayitlari)
-                        
-            return pd.concat(anomaliler, ignore_index=True) if anomaliler else pd.DataFrame()
-        
         # Progress bar
         progress_bar = st.progress(0)
         status_text = st.empty()
@@ -237,15 +180,15 @@ if uploaded_file is not None:
         # Anomali analizleri
         status_text.text("🔍 Kış ayı düşük tüketim anomalileri tespit ediliyor...")
         progress_bar.progress(25)
-        anomali_1 = kis_dusukluk_anomalisi(df_temiz, kis_tuketim_esigi)
+        anomali_1 = winter_low(df_temiz, kis_tuketim_esigi)
         
         status_text.text("🔍 Bina ortalamasından düşük tüketim anomalileri tespit ediliyor...")
         progress_bar.progress(50)
-        anomali_2 = bina_ortalamasindan_dusuk_anomali(df_temiz, bina_ort_dusuk_oran)
+        anomali_2 = building_low(df_temiz, bina_ort_dusuk_oran)
         
         status_text.text("🔍 Ani düşüş anomalileri tespit ediliyor...")
         progress_bar.progress(75)
-        anomali_3 = ani_dusus_anomalisi(df_temiz, ani_dusus_orani, min_onceki_kis_tuketim)
+        anomali_3 = sudden_drop(df_temiz, ani_dusus_orani, min_onceki_kis_tuketim)
         
         status_text.text("✅ Anomali analizi tamamlandı!")
         progress_bar.progress(100)
@@ -262,34 +205,8 @@ if uploaded_file is not None:
         if tum_anomaliler:
             anomali_df = pd.concat(tum_anomaliler, ignore_index=True)
             
-            # Aynı tesisat için anomali özetleme (tüm ayları birleştirme)
-            def tesisat_anomali_ozeti(group):
-                ozet = group.iloc[0].copy()
-                
-                # Anomali türlerini birleştir
-                anomali_turleri = group['anomali_tipi'].unique()
-                ozet['anomali_tipi'] = ' + '.join(anomali_turleri)
-                
-                # Tarih aralığını belirle
-                tarihler = group['tarih_str'].unique()
-                if len(tarihler) == 1:
-                    ozet['tarih_str'] = tarihler[0]
-                else:
-                    ozet['tarih_str'] = f"{min(tarihler)} - {max(tarihler)}"
-                
-                # Tüketim istatistikleri
-                ozet['tuketim_miktari'] = group['tuketim_miktari'].mean()  # Ortalama tüketim
-                ozet['min_tuketim'] = group['tuketim_miktari'].min()
-                ozet['max_tuketim'] = group['tuketim_miktari'].max()
-                ozet['anomali_sayisi'] = len(group)
-                
-                # Açıklamayı güncelle
-                ozet['aciklama'] = f"Toplam {len(group)} anomali - {', '.join(anomali_turleri)}"
-                
-                return ozet
-            
-            # Tesisat bazında anomalileri özetleme
-            anomali_df = anomali_df.groupby('tuketim_noktasi').apply(tesisat_anomali_ozeti).reset_index(drop=True)
+            # Aynı tesisat için anomali özetleme (tüm ayları birleştirme, adlandırılmış toplamalarla)
+            anomali_df = facility_summary(anomali_df)
             
             # Sonuçları görüntüleme
             st.header("🚨 Tespit Edilen Anomaliler")
@@ -379,22 +296,9 @@ if uploaded_file is not None:
                     })
                     ozet.to_excel(writer, sheet_name='Özet', index=False)
                     
-                    # Tesisat bazlı özet
-                    tesisat_ozet = anomali_df.groupby(['tuketim_noktasi', 'baglanti_nesnesi']).agg({
-                        'anomali_tipi': lambda x: ', '.join(x.unique()),
-                        'tuketim_miktari': ['count', 'mean'],
-                        'tarih_str': lambda x: ', '.join(x.unique())
-                    }).round(2)
-                    tesisat_ozet.columns = ['Anomali_Türleri', 'Anomali_Sayısı', 'Ortalama_Tüketim', 'Tarihler']
+                    # Tesisat ve bina bazlı özet
+                    tesisat_ozet, bina_ozet = summary_sheets(anomali_df)
                     tesisat_ozet.to_excel(writer, sheet_name='Tesisat_Özeti')
-                    
-                    # Bina bazlı özet
-                    bina_ozet = anomali_df.groupby('baglanti_nesnesi').agg({
-                        'tuketim_noktasi': 'nunique',
-                        'anomali_tipi': lambda x: ', '.join(x.unique()),
-                        'tuketim_miktari': ['count', 'mean']
-                    }).round(2)
-                    bina_ozet.columns = ['Tesisat_Sayısı', 'Anomali_Türleri', 'Toplam_Anomali', 'Ortalama_Tüketim']
                     bina_ozet.to_excel(writer, sheet_name='Bina_Özeti')
                     
                 processed_data = output.getvalue()